@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+热点路径微基准
+
+测量流式响应解析、Excel 文本清理与写入、问题解析、进度表格渲染、流式显示更新和
+配置文件读取的单次耗时。耗时以同一进程中校准循环的单次耗时为单位（相对耗时），
+基线（benchmarks/baselines/micro.json）因此可在不同机器间比较；超出容差的项目视为可能的回退。
+
+在共享的单核机器上，同一代码连续 6 次运行的相对耗时差异实测最大约 17%（有状态的
+log_to_excel、worker_table），默认容差取 50%，留出跨机器（CPU 架构、Python 版本）的差异。
+compare 用于本地发现明显的回退，不适合作为 CI 的硬性门禁。
+
+用法：
+    python benchmarks/micro.py run                     # 运行并打印结果
+    python benchmarks/micro.py run --save              # 运行并覆盖基线
+    python benchmarks/micro.py compare                 # 与基线比较，回退时退出码为 1
+    python benchmarks/micro.py compare --tolerance 0.5 --filter sse
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+from contextlib import ExitStack
+from datetime import datetime
+from unittest.mock import patch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASELINE_FILE = os.path.join(ROOT, "benchmarks", "baselines", "micro.json")
+DEFAULT_TOLERANCE = 0.5
+
+# 流式基准中每个回答的片段数
+STREAM_TOKENS = 200
+
+
+class _FakeStreamResponse:
+    """按预先生成的行返回的流式响应（不经过网络）"""
+
+    status_code = 200
+
+    def __init__(self, lines):
+        self._lines = lines
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self, chunk_size=512):
+        return iter(self._lines)
+
+
+def _sse_lines(events):
+    lines = []
+    for event in events:
+        payload = event if isinstance(event, str) else json.dumps(event)
+        lines += [f"data: {payload}".encode(), b""]
+    return lines
+
+
+def _dify_lines():
+    common = {"conversation_id": "c-1", "message_id": "m-1", "task_id": "t-1"}
+    events = [{"event": "workflow_started", **common}]
+    events += [{"event": "message", "answer": "字", **common}] * STREAM_TOKENS
+    events.append(
+        {
+            "event": "message_end",
+            "metadata": {"usage": {"completion_tokens": STREAM_TOKENS}},
+            **common,
+        }
+    )
+    return [b"event: ping", b""] + _sse_lines(events)
+
+
+def _openai_lines():
+    def chunk(delta, finish_reason=None):
+        return {
+            "id": "chatcmpl-1",
+            "object": "chat.completion.chunk",
+            "model": "m",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+
+    events = [chunk({"role": "assistant", "content": ""})]
+    events += [chunk({"reasoning_content": "想"})] * 20
+    events += [chunk({"content": "字"})] * STREAM_TOKENS
+    events += [chunk({}, "stop"), "[DONE]"]
+    return _sse_lines(events)
+
+
+def _provider_stream(stack, provider, lines):
+    """让 provider.send_message 解析预先生成的流"""
+    stack.enter_context(
+        patch(
+            "dify_chat_tester.providers.base._post_with_retry",
+            side_effect=lambda *a, **kw: _FakeStreamResponse(lines),
+        )
+    )
+
+    def run():
+        provider.send_message(
+            message="问题",
+            model="m",
+            stream=True,
+            show_indicator=False,
+            show_thinking=True,
+            stream_callback=lambda event, content: None,
+        )
+
+    return run
+
+
+def bench_sse_dify(stack):
+    from dify_chat_tester.providers.base import DifyProvider
+
+    return _provider_stream(stack, DifyProvider("http://x/v1", "k", "a"), _dify_lines())
+
+
+def bench_sse_openai(stack):
+    from dify_chat_tester.providers.base import OpenAIProvider
+
+    return _provider_stream(stack, OpenAIProvider("http://x/v1", "k"), _openai_lines())
+
+
+def bench_sse_iflow(stack):
+    from dify_chat_tester.providers.base import iFlowProvider
+
+    return _provider_stream(stack, iFlowProvider("k"), _openai_lines())
+
+
+def bench_clean_excel_text(stack):
+    from dify_chat_tester.utils.excel import clean_excel_text
+
+    text = ("这是一段带有\x07控制字符的回答，包含 English words 和\t制表符。\n" * 40)[
+        :2000
+    ]
+    return lambda: clean_excel_text(text)
+
+
+def bench_log_to_excel(stack):
+    import openpyxl
+
+    from dify_chat_tester.utils.excel import log_to_excel
+
+    row = [
+        "2026-01-01 00:00:00",
+        "员工",
+        "文档.md",
+        "如何申请年假？",
+        "回答" * 200,
+        "True",
+        "",
+        "c-1",
+        "12",
+        "0123456789abcdef",
+        "",
+        "1.234",
+    ]
+    state = {}
+
+    def run():
+        worksheet = state.get("worksheet")
+        # 定期换新工作表，避免工作表无限增长影响测量
+        if worksheet is None or worksheet.max_row > 5000:
+            worksheet = state["worksheet"] = openpyxl.Workbook().active
+        log_to_excel(worksheet, row)
+
+    return run
+
+
+def bench_parse_questions_json(stack):
+    from dify_chat_tester.core.question import parse_questions_from_response
+
+    questions = [f"第{i}个关于年假申请流程的问题是什么？" for i in range(30)]
+    response = "以下是生成的问题：\n" + json.dumps(questions, ensure_ascii=False)
+    return lambda: parse_questions_from_response(response)
+
+
+def bench_parse_questions_lines(stack):
+    from dify_chat_tester.core.question import parse_questions_from_response
+
+    response = "以下是生成的问题：\n" + "\n".join(
+        f"{i}. 第{i}个关于年假申请流程的问题是什么？" for i in range(1, 31)
+    )
+    return lambda: parse_questions_from_response(response)
+
+
+def bench_worker_table(stack):
+    import time
+
+    from rich.console import Console
+
+    from dify_chat_tester.core.batch import _generate_worker_table
+
+    console = Console(file=io.StringIO(), width=120, force_terminal=True)
+    workers = {
+        i: {
+            "state": "处理中" if i % 3 else "完成",
+            "question": f"第{i}个问题" * 5,
+            "response": "回答预览" * 10,
+            "errors": i % 2,
+        }
+        for i in range(1, 11)
+    }
+    start = time.time() - 60
+
+    def run():
+        console.file.seek(0)
+        console.file.truncate()
+        console.print(_generate_worker_table(workers, 500, 2000, 12, start_time=start))
+
+    return run
+
+
+def bench_stream_display_update(stack):
+    from rich.console import Console
+
+    from dify_chat_tester.cli import terminal
+
+    console = Console(file=io.StringIO(), width=120, force_terminal=True)
+    stack.enter_context(patch.object(terminal, "console", console))
+    stack.enter_context(patch.object(terminal, "_use_rich_ui", True))
+    display = terminal.StreamDisplay(title="基准")
+    display.start()
+    stack.callback(display.stop)
+
+    def run():
+        # 内容保持在 1000 字以内，测量的是中等长度回答上的单次更新
+        if len(display.content) > 1000:
+            display.content = ""
+            console.file.seek(0)
+            console.file.truncate()
+        display.update("字字字字字")
+
+    return run
+
+
+def bench_read_config_file(stack):
+    from dify_chat_tester.config.loader import ConfigLoader
+
+    path = os.path.join(ROOT, ".env.config.example")
+    loader = ConfigLoader.__new__(ConfigLoader)
+    loader.config = {}
+    return lambda: loader._read_config_file(path)
+
+
+BENCHMARKS = {
+    "sse_dify": bench_sse_dify,
+    "sse_openai": bench_sse_openai,
+    "sse_iflow": bench_sse_iflow,
+    "clean_excel_text": bench_clean_excel_text,
+    "log_to_excel": bench_log_to_excel,
+    "parse_questions_json": bench_parse_questions_json,
+    "parse_questions_lines": bench_parse_questions_lines,
+    "worker_table": bench_worker_table,
+    "stream_display_update": bench_stream_display_update,
+    "read_config_file": bench_read_config_file,
+}
+
+
+def _timer(fn, min_time: float):
+    """返回 (timeit.Timer, 每个样本的调用次数)，使单个样本至少运行 min_time 秒"""
+    timer = timeit.Timer(fn)
+    number = 1
+    while min_time > 0 and timer.timeit(number) < min_time:
+        number *= 2
+    return timer, number
+
+
+def measure(fn, repeat: int = 15, min_time: float = 0.01) -> float:
+    """返回单次调用的最短耗时（微秒）：每个样本至少运行 min_time 秒，取 repeat 个样本中的最小值"""
+    timer, number = _timer(fn, min_time)
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def _calibration_loop():
+    """固定的纯 Python 工作量（字符串格式化、字典读写），作为相对耗时的单位"""
+    table = {}
+    total = 0
+    for i in range(1000):
+        key = f"k{i}"
+        table[key] = i
+        total += len(key) + table[key]
+    return total
+
+
+def measure_relative(fn, repeat: int = 15, min_time: float = 0.01) -> list:
+    """成对采样：每个基准样本紧接一个校准循环样本，返回各对的耗时比
+
+    相邻样本受到的频率变化和 CPU 抢占基本相同，比值可以抵消大部分机器噪声。
+    """
+    bench, bench_number = _timer(fn, min_time)
+    calib, calib_number = _timer(_calibration_loop, min_time)
+    ratios = []
+    for _ in range(repeat):
+        unit = calib.timeit(calib_number) / calib_number
+        ratios.append(bench.timeit(bench_number) / bench_number / unit)
+    return ratios
+
+
+def run_benchmarks(
+    names=None, repeat: int = 15, min_time: float = 0.01, rounds: int = 3
+) -> dict:
+    """运行指定（默认全部）基准，返回 {名称: 相对耗时}
+
+    相对耗时为基准单次耗时与校准循环单次耗时之比，与机器快慢无关。全部基准交替运行
+    rounds 轮，每个基准取所有成对样本比值的中位数。
+    """
+    selected = [name for name in BENCHMARKS if not names or name in names]
+    samples = {name: [] for name in selected}
+    for _ in range(max(1, rounds)):
+        for name in selected:
+            with ExitStack() as stack:
+                fn = BENCHMARKS[name](stack)
+                fn()  # 预热（导入、缓存）
+                samples[name] += measure_relative(fn, repeat, min_time)
+    return {name: round(statistics.median(samples[name]), 4) for name in selected}
+
+
+def load_baseline(path: str = BASELINE_FILE) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(results: dict, path: str = BASELINE_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "unit": "calibration_loop",
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def compare(results: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE):
+    """与基线比较
+
+    Returns:
+        list: [(名称, 基线, 当前, 比值, 是否回退)]，基线中没有的项目比值为 None
+    """
+    rows = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base:
+            rows.append((name, None, current, None, False))
+            continue
+        ratio = current / base
+        rows.append((name, base, current, ratio, ratio > 1 + tolerance))
+    return rows
+
+
+def _filter_names(patterns):
+    if not patterns:
+        return None
+    return [n for n in BENCHMARKS if any(p in n for p in patterns)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="热点路径微基准")
+    parser.add_argument("command", choices=["run", "compare"], help="运行或与基线比较")
+    parser.add_argument("--filter", nargs="+", help="只运行名称包含任一关键字的基准")
+    parser.add_argument(
+        "--repeat", type=int, default=15, help="每次测量的样本数（取最小值）"
+    )
+    parser.add_argument(
+        "--min-time", type=float, default=0.01, help="每个样本最短运行时间（秒）"
+    )
+    parser.add_argument("--rounds", type=int, default=3, help="交替运行全部基准的轮数")
+    parser.add_argument("--save", action="store_true", help="run 时把结果写入基线")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="基线文件路径")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="允许的变慢比例（默认 0.5，即慢 50%% 以内不算回退）",
+    )
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        _filter_names(args.filter), args.repeat, args.min_time, args.rounds
+    )
+
+    if args.command == "run":
+        width = max(len(n) for n in results)
+        for name, value in results.items():
+            print(f"{name:<{width}}  {value:>10.4f} × 校准循环")
+        if args.save:
+            save_baseline(results, args.baseline)
+            print(f"基线已保存: {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)["results"]
+    rows = compare(results, baseline, args.tolerance)
+    width = max(len(r[0]) for r in rows)
+    print(f"{'基准':<{width}}  {'基线':>12}  {'当前':>12}  {'比值':>7}")
+    for name, base, current, ratio, regressed in rows:
+        base_text = f"{base:12.4f}" if base else f"{'-':>12}"
+        ratio_text = f"{ratio:7.2f}" if ratio else f"{'新增':>7}"
+        flag = "  回退" if regressed else ""
+        print(f"{name:<{width}}  {base_text}  {current:12.4f}  {ratio_text}{flag}")
+    regressions = [r[0] for r in rows if r[4]]
+    if regressions:
+        print(
+            f"\n{len(regressions)} 项超出容差 {args.tolerance:.0%}: {', '.join(regressions)}"
+        )
+        return 1
+    print(f"\n全部在容差 {args.tolerance:.0%} 以内")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+调度策略总用时模拟
+
+用历史批量日志中的“耗时(秒)”列模拟不同调度策略在给定并发数下的总用时（makespan），
+不发送任何请求。
+
+耗时模型不使用被模拟的记录：指定 --history 时用更早的日志建模并模拟全部记录，
+否则随机取一半记录建模、模拟另一半。结果同时给出模型在模拟记录上的估计误差。
+
+用法：
+    python benchmarks/schedule_makespan.py questions_log.xlsx --concurrency 3 5 10
+    python benchmarks/schedule_makespan.py run2.xlsx --history run1.xlsx
+    python benchmarks/schedule_makespan.py --synthetic 500 --concurrency 5
+"""
+
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dify_chat_tester.core.checkpoint import question_hash  # noqa: E402
+from dify_chat_tester.core.scheduling import (  # noqa: E402
+    POLICIES,
+    POLICY_LONGEST,
+    POLICY_SHEET,
+    LatencyModel,
+    compare_policies,
+    load_log_records,
+    model_error,
+    split_records,
+)
+
+
+def synthetic_records(count: int, seed: int = 0):
+    """生成带长尾的模拟记录：耗时与问题长度相关，少量文档触发重检索"""
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        length = int(rng.lognormvariate(3.5, 0.6))
+        doc_name = f"文档{rng.randrange(max(1, count // 20))}"
+        latency = 0.8 + length * 0.03 + rng.expovariate(1.0)
+        if doc_name.endswith("0"):
+            latency *= 3  # 重检索文档
+        question = f"问题{i}" + "字" * length
+        records.append(
+            {
+                "question": question,
+                "doc_name": doc_name,
+                "hash": question_hash(question),
+                "latency": latency,
+            }
+        )
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="模拟各调度策略的批量总用时")
+    parser.add_argument("log_files", nargs="*", help="带耗时列的批量日志文件")
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[5], help="并发数（可多个）"
+    )
+    parser.add_argument(
+        "--synthetic", type=int, default=0, help="不读日志，生成指定数量的模拟记录"
+    )
+    parser.add_argument(
+        "--history",
+        nargs="+",
+        default=[],
+        help="用于建模的更早的批量日志（不指定时从记录中随机取一半建模）",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="随机种子（shuffle 策略和建模集划分）"
+    )
+    args = parser.parse_args(argv)
+
+    records = []
+    for log_file in args.log_files:
+        records.extend(load_log_records(log_file))
+    if args.synthetic:
+        records.extend(synthetic_records(args.synthetic, args.seed))
+    if not records:
+        print("没有可用的耗时记录（日志需包含“耗时(秒)”列，或使用 --synthetic）")
+        return 1
+
+    if args.history:
+        model = LatencyModel.from_logs(args.history)
+        source = f"历史日志 {len(args.history)} 个"
+    else:
+        train, records = split_records(records, seed=args.seed)
+        model = LatencyModel(train)
+        source = f"随机一半记录（{len(train)} 条）"
+    if not records:
+        print("模拟集为空，请提供更多记录")
+        return 1
+
+    error = model_error(model, records)
+    total = sum(r["latency"] for r in records)
+    longest = max(r["latency"] for r in records)
+    print(f"模拟记录数: {len(records)}  总耗时: {total:.1f}s  最长单题: {longest:.1f}s")
+    print(
+        f"耗时模型: 基于{source}，模拟记录上的平均绝对误差 {error['mae']:.2f}s"
+        f"（{error['relative']:.0%}）"
+    )
+    print()
+    print(
+        f"{'并发':>4}  {'下界':>9}  "
+        + "  ".join(f"{p:>9}" for p in POLICIES)
+        + f"  {'longest 收益':>12}"
+    )
+    for concurrency in args.concurrency:
+        lower_bound = max(total / concurrency, longest)
+        results = compare_policies(records, concurrency, model=model, seed=args.seed)
+        cells = "  ".join(f"{results[p]:>8.1f}s" for p in POLICIES)
+        gain = 1 - results[POLICY_LONGEST] / results[POLICY_SHEET]
+        print(f"{concurrency:>4}  {lower_bound:>8.1f}s  {cells}  {gain:>12.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+批量引擎端到端吞吐量基准
+
+在子进程中启动本地模拟服务（python main.py --mode mock-server），再为每个并发数
+单独启动一个子进程，无人值守地运行批量引擎处理合成的问题工作簿，统计：
+行/秒、每行 CPU 时间、峰值内存（RSS），以及客户端在模拟服务固定耗时之外的额外开销。
+结果写入 JSON 和 CSV，用于跨版本跟踪客户端开销、找出客户端自身成为瓶颈的并发数。
+
+用法：
+    python benchmarks/throughput.py
+    python benchmarks/throughput.py --concurrency 1 10 50 --rounds 10 --provider openai
+    python benchmarks/throughput.py --mock-latency 0.5 --mock-token-rate 100 --output out/tp
+"""
+
+import argparse
+import csv
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from datetime import datetime
+from unittest.mock import patch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_CONCURRENCY = [1, 10, 50, 200, 1000]
+
+CSV_FIELDS = [
+    "engine",
+    "provider",
+    "concurrency",
+    "rows",
+    "success",
+    "wall_seconds",
+    "rows_per_second",
+    "ideal_rows_per_second",
+    "efficiency",
+    "cpu_ms_per_row",
+    "peak_rss_mb",
+    "stub_seconds",
+    "latency_p50",
+    "latency_p99",
+    "overhead_p50_ms",
+    "overhead_p99_ms",
+]
+
+
+def _run_threads(provider, input_ws, output_ws, output_wb, output_file, concurrency):
+    """线程池批量引擎（core.batch._run_concurrent_batch）"""
+    from dify_chat_tester.core.batch import _run_concurrent_batch
+
+    _run_concurrent_batch(
+        provider=provider,
+        batch_worksheet=input_ws,
+        output_worksheet=output_ws,
+        output_workbook=output_wb,
+        output_file_name=output_file,
+        resume_from_row=2,
+        question_col_index=0,
+        doc_name_col_index=None,
+        selected_role="员工",
+        selected_model="mock-model",
+        provider_name="Mock",
+        enable_thinking=False,
+        show_batch_response=False,
+        concurrency=concurrency,
+        headless=True,
+    )
+
+
+# 可比较的批量引擎；新的引擎实现同样的签名后在此登记
+ENGINES = {"threads": _run_threads}
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_level(engine, provider_id, base_url, concurrency, rows, workdir) -> dict:
+    """在当前进程中以给定并发数运行一次批量处理（由子进程调用）"""
+    import openpyxl
+
+    from dify_chat_tester.core.metrics import summary_path_for
+    from dify_chat_tester.providers.base import DifyProvider, OpenAIProvider
+
+    if provider_id == "dify":
+        provider = DifyProvider(f"{base_url}/v1", "mock-key", "mock-app")
+    else:
+        provider = OpenAIProvider(f"{base_url}/v1", "mock-key")
+
+    input_wb = openpyxl.Workbook()
+    input_ws = input_wb.active
+    input_ws.append(["问题"])
+    for i in range(rows):
+        input_ws.append([f"第{i}个合成问题：请介绍一下年假的申请流程。"])
+    output_wb = openpyxl.Workbook()
+    output_ws = output_wb.active
+    output_ws.append(["表头"])
+    output_file = os.path.join(workdir, f"throughput_c{concurrency}.xlsx")
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    with ExitStack() as stack:
+        # 只测量引擎本身，不输出报告
+        for name in ("print_info", "print_statistics", "print_run_report"):
+            stack.enter_context(patch(f"dify_chat_tester.core.batch.{name}"))
+        ENGINES[engine](
+            provider, input_ws, output_ws, output_wb, output_file, concurrency
+        )
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    with open(summary_path_for(output_file), encoding="utf-8") as f:
+        summary = json.load(f)
+    return {
+        "rows": rows,
+        "success": summary["success"],
+        "wall_seconds": round(wall, 3),
+        "cpu_seconds": round(cpu, 3),
+        "peak_rss_mb": _peak_rss_mb(),
+        "latency_p50": summary["latency"]["p50"],
+        "latency_p99": summary["latency"]["p99"],
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_port(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"模拟服务未在 {timeout} 秒内启动")
+
+
+def start_stub(args) -> subprocess.Popen:
+    """在子进程中启动模拟服务，使其 CPU 开销不计入被测进程"""
+    port = _free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(ROOT, "main.py"),
+            "--mode",
+            "mock-server",
+            "--mock-port",
+            str(port),
+            "--mock-latency",
+            str(args.mock_latency),
+            "--mock-token-rate",
+            str(args.mock_token_rate),
+            "--mock-answer-tokens",
+            str(args.mock_answer_tokens),
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        cwd=ROOT,
+    )
+    try:
+        _wait_for_port(port)
+    except RuntimeError:
+        process.kill()
+        raise
+    process.base_url = f"http://127.0.0.1:{port}"
+    return process
+
+
+def stub_seconds(args) -> float:
+    """模拟服务每个请求的固定耗时：首字延迟 + 其余 token 的输出时间"""
+    streaming = (
+        (args.mock_answer_tokens - 1) / args.mock_token_rate
+        if args.mock_token_rate > 0
+        else 0.0
+    )
+    return args.mock_latency + streaming
+
+
+def measure_level(args, base_url, concurrency, workdir) -> dict:
+    """在独立子进程中运行一个并发等级，使 CPU 和峰值内存互不影响"""
+    rows = max(args.min_rows, concurrency * args.rounds)
+    result_file = os.path.join(workdir, f"result_c{concurrency}.json")
+    subprocess.run(
+        [
+            sys.executable,
+            os.path.abspath(__file__),
+            "_level",
+            "--engine",
+            args.engine,
+            "--provider",
+            args.provider,
+            "--base-url",
+            base_url,
+            "--level",
+            str(concurrency),
+            "--rows",
+            str(rows),
+            "--workdir",
+            workdir,
+            "--result-file",
+            result_file,
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        cwd=workdir,
+    )
+    with open(result_file, encoding="utf-8") as f:
+        raw = json.load(f)
+
+    stub = stub_seconds(args)
+    ideal = concurrency / stub if stub > 0 else None
+    rows_per_second = raw["rows"] / raw["wall_seconds"] if raw["wall_seconds"] else 0
+    return {
+        "engine": args.engine,
+        "provider": args.provider,
+        "concurrency": concurrency,
+        "rows": raw["rows"],
+        "success": raw["success"],
+        "wall_seconds": raw["wall_seconds"],
+        "rows_per_second": round(rows_per_second, 2),
+        "ideal_rows_per_second": round(ideal, 2) if ideal else None,
+        "efficiency": round(rows_per_second / ideal, 3) if ideal else None,
+        "cpu_ms_per_row": round(raw["cpu_seconds"] / raw["rows"] * 1000, 3),
+        "peak_rss_mb": raw["peak_rss_mb"],
+        "stub_seconds": round(stub, 4),
+        "latency_p50": raw["latency_p50"],
+        "latency_p99": raw["latency_p99"],
+        "overhead_p50_ms": round((raw["latency_p50"] - stub) * 1000, 1),
+        "overhead_p99_ms": round((raw["latency_p99"] - stub) * 1000, 1),
+    }
+
+
+def write_results(results, prefix: str, meta: dict):
+    """写出 <prefix>.json 和 <prefix>.csv"""
+    os.makedirs(os.path.dirname(os.path.abspath(prefix)), exist_ok=True)
+    with open(f"{prefix}.json", "w", encoding="utf-8") as f:
+        json.dump({**meta, "results": results}, f, ensure_ascii=False, indent=2)
+    with open(f"{prefix}.csv", "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def print_results(results):
+    print(
+        f"{'并发':>6} {'行数':>7} {'行/秒':>9} {'效率':>6} {'CPU ms/行':>10} "
+        f"{'峰值MB':>8} {'额外P50 ms':>11} {'额外P99 ms':>11}"
+    )
+    for r in results:
+        efficiency = f"{r['efficiency']:.0%}" if r["efficiency"] is not None else "-"
+        rss = f"{r['peak_rss_mb']:.1f}" if r["peak_rss_mb"] is not None else "-"
+        print(
+            f"{r['concurrency']:>6} {r['rows']:>7} {r['rows_per_second']:>9.2f} "
+            f"{efficiency:>6} {r['cpu_ms_per_row']:>10.3f} {rss:>8} "
+            f"{r['overhead_p50_ms']:>11.1f} {r['overhead_p99_ms']:>11.1f}"
+        )
+
+
+def _level_main(argv):
+    """子进程入口：运行一个并发等级并把原始结果写入文件"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--engine", required=True)
+    parser.add_argument("--provider", required=True)
+    parser.add_argument("--base-url", required=True)
+    parser.add_argument("--level", type=int, required=True)
+    parser.add_argument("--rows", type=int, required=True)
+    parser.add_argument("--workdir", required=True)
+    parser.add_argument("--result-file", required=True)
+    args = parser.parse_args(argv)
+    result = run_level(
+        args.engine, args.provider, args.base_url, args.level, args.rows, args.workdir
+    )
+    with open(args.result_file, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+    return 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["_level"]:
+        return _level_main(argv[1:])
+
+    parser = argparse.ArgumentParser(description="批量引擎端到端吞吐量基准")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=DEFAULT_CONCURRENCY,
+        help="并发数（可多个，默认 1 10 50 200 1000）",
+    )
+    parser.add_argument(
+        "--rounds", type=int, default=5, help="每个并发数处理 并发数×rounds 行"
+    )
+    parser.add_argument("--min-rows", type=int, default=50, help="每个并发数的最少行数")
+    parser.add_argument("--engine", choices=list(ENGINES), default="threads")
+    parser.add_argument("--provider", choices=["dify", "openai"], default="dify")
+    parser.add_argument(
+        "--mock-latency", type=float, default=0.2, help="首字延迟（秒）"
+    )
+    parser.add_argument(
+        "--mock-token-rate", type=float, default=200, help="每秒输出 token 数"
+    )
+    parser.add_argument("--mock-answer-tokens", type=int, default=50, help="回答长度")
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="结果文件前缀（默认 benchmarks/results/throughput_<时间>）",
+    )
+    args = parser.parse_args(argv)
+
+    prefix = args.output or os.path.join(
+        ROOT,
+        "benchmarks",
+        "results",
+        f"throughput_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+    )
+    stub = start_stub(args)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            for concurrency in args.concurrency:
+                print(f"并发 {concurrency} ...", flush=True)
+                results.append(measure_level(args, stub.base_url, concurrency, workdir))
+    finally:
+        stub.terminate()
+        stub.wait(timeout=10)
+
+    meta = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "stub": {
+            "latency": args.mock_latency,
+            "token_rate": args.mock_token_rate,
+            "answer_tokens": args.mock_answer_tokens,
+        },
+    }
+    write_results(results, prefix, meta)
+    print_results(results)
+    print(f"\n结果已保存: {prefix}.json, {prefix}.csv")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
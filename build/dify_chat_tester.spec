@@ -59,8 +59,8 @@ datas = [
 # 过滤掉 None 值
 datas = [d for d in datas if d is not None]
 
-# 收集隐藏导入
-hiddenimports = collect_submodules('dify_chat_tester.plugins')
+# 收集隐藏导入（包的 __init__ 按名称延迟导入子模块，静态分析无法发现，需整体收集）
+hiddenimports = collect_submodules('dify_chat_tester')
 
 # 收集二进制文件
 binaries = []
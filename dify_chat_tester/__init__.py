@@ -9,43 +9,51 @@ Dify Chat Tester - AI 聊天客户端测试工具
 许可证：MIT
 """
 
+from dify_chat_tester._lazy import lazy_exports
 from dify_chat_tester._version import __author__, __email__, __version__
 
-# CLI
-from dify_chat_tester.cli.app import run_app
-from dify_chat_tester.cli.terminal import (
-    console,
-    print_error,
-    print_info,
-    print_success,
-    print_warning,
-)
-
-# 向后兼容导出 - 保持旧的导入路径可用
-# 配置
-from dify_chat_tester.config.loader import ConfigLoader, get_config, parse_ai_providers
-from dify_chat_tester.config.logging import get_logger
-
-# 核心业务
-from dify_chat_tester.core.batch import run_batch_query
-from dify_chat_tester.core.chat import run_interactive_chat
-
-# 供应商
-from dify_chat_tester.providers.base import (
-    AIProvider,
-    DifyProvider,
-    OpenAIProvider,
-    get_provider,
-    iFlowProvider,
-)
-
-# 工具
-from dify_chat_tester.utils.excel import init_excel_log, log_to_excel
-from dify_chat_tester.utils.exceptions import (
-    ConfigError,
-    DifyChatTesterError,
-    NetworkError,
-    ProviderError,
+# 公开名称在首次访问时才导入所在模块：导入包（例如插件只需要 AIProvider）
+# 不会加载批量引擎、Excel、终端界面和配置文件
+__getattr__, __dir__ = lazy_exports(
+    __name__,
+    {
+        # CLI
+        "dify_chat_tester.cli.app": ["run_app"],
+        "dify_chat_tester.cli.terminal": [
+            "console",
+            "print_error",
+            "print_info",
+            "print_success",
+            "print_warning",
+        ],
+        # 向后兼容导出 - 保持旧的导入路径可用
+        # 配置
+        "dify_chat_tester.config.loader": [
+            "ConfigLoader",
+            "get_config",
+            "parse_ai_providers",
+        ],
+        "dify_chat_tester.config.logging": ["get_logger"],
+        # 核心业务
+        "dify_chat_tester.core.batch": ["run_batch_query"],
+        "dify_chat_tester.core.chat": ["run_interactive_chat"],
+        # 供应商
+        "dify_chat_tester.providers.base": [
+            "AIProvider",
+            "DifyProvider",
+            "OpenAIProvider",
+            "get_provider",
+            "iFlowProvider",
+        ],
+        # 工具
+        "dify_chat_tester.utils.excel": ["init_excel_log", "log_to_excel"],
+        "dify_chat_tester.utils.exceptions": [
+            "ConfigError",
+            "DifyChatTesterError",
+            "NetworkError",
+            "ProviderError",
+        ],
+    },
 )
 
 __all__ = [
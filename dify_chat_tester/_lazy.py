@@ -0,0 +1,36 @@
+"""
+延迟导出
+包的 __init__ 通过 lazy_exports() 声明公开名称及其所在模块，首次访问某个名称时才导入对应模块，
+导入包本身不会加载 openpyxl、requests、rich.live、loguru 等依赖
+"""
+
+import importlib
+import sys
+
+
+def lazy_exports(package: str, exports: dict):
+    """生成包的模块级 __getattr__ 和 __dir__
+
+    Args:
+        package: 包名（即 __name__）
+        exports: {模块全名: [从该模块导出的名称]}
+
+    Returns:
+        tuple: (__getattr__, __dir__)，在包的 __init__ 中赋给同名变量
+    """
+    locations = {name: module for module, names in exports.items() for name in names}
+
+    def __getattr__(name: str):
+        module = locations.get(name)
+        if module is None:
+            # 抛出 AttributeError 时，from package import submodule 会继续按子模块导入
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(module), name)
+        # 写回包的命名空间，之后的访问不再经过 __getattr__
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[package])) | set(locations))
+
+    return __getattr__, __dir__
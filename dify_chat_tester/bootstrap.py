@@ -0,0 +1,53 @@
+"""
+启动引导
+程序入口（main.main）在解析命令行参数后调用一次 bootstrap()：加载配置文件（不存在时从模板创建）、
+配置日志输出、初始化终端，并关闭 multiprocessing resource_tracker 的警告。
+
+各模块导入时不再做这些事，配置在首次使用时读取；测试、插件和嵌入使用只为实际用到的子系统付出开销。
+"""
+
+import threading
+import warnings
+
+_lock = threading.Lock()
+_done = False
+
+
+def _silence_resource_tracker():
+    """禁用 multiprocessing 资源警告和 resource_tracker
+
+    沿用原 batch.py 导入时的全局设置，避免退出时打印 resource_tracker 的资源泄漏警告；
+    现在只在程序入口执行，不再影响单独导入本包的代码。
+    """
+    warnings.filterwarnings("ignore", category=UserWarning, module="multiprocessing")
+    try:
+        from multiprocessing import resource_tracker
+
+        # 彻底替换掉 register 和 unregister，并清空内部状态
+        resource_tracker._resource_tracker = None
+
+        def _noop(*args, **kwargs):
+            pass
+
+        resource_tracker.register = _noop
+        resource_tracker.unregister = _noop
+        resource_tracker.ensure_running = _noop
+    except Exception:
+        pass
+
+
+def bootstrap():
+    """初始化运行环境（重复调用只执行一次），返回配置加载器实例"""
+    global _done
+    from dify_chat_tester.cli.terminal import init_terminal
+    from dify_chat_tester.config.loader import get_config
+    from dify_chat_tester.config.logging import setup_logging
+
+    with _lock:
+        config = get_config()
+        if not _done:
+            setup_logging()
+            init_terminal()
+            _silence_resource_tracker()
+            _done = True
+    return config
@@ -1,23 +1,30 @@
 """CLI 模块 - 命令行界面"""
 
-from dify_chat_tester.cli.app import run_app
-from dify_chat_tester.cli.selectors import (
-    select_folder_path,
-    select_main_function,
-    select_mode,
-    select_model,
-    select_role,
-)
-from dify_chat_tester.cli.terminal import (
-    StreamDisplay,
-    console,
-    input_api_key,
-    print_api_key_confirmation,
-    print_error,
-    print_info,
-    print_input_prompt,
-    print_success,
-    print_warning,
+from dify_chat_tester._lazy import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(
+    __name__,
+    {
+        "dify_chat_tester.cli.app": ["run_app"],
+        "dify_chat_tester.cli.selectors": [
+            "select_folder_path",
+            "select_main_function",
+            "select_mode",
+            "select_model",
+            "select_role",
+        ],
+        "dify_chat_tester.cli.terminal": [
+            "StreamDisplay",
+            "console",
+            "input_api_key",
+            "print_api_key_confirmation",
+            "print_error",
+            "print_info",
+            "print_input_prompt",
+            "print_success",
+            "print_warning",
+        ],
+    },
 )
 
 __all__ = [
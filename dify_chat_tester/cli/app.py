@@ -19,6 +19,7 @@ from dify_chat_tester.cli.terminal import (
     print_error,
     print_info,
     print_input_prompt,
+    print_warning,
     print_welcome,
 )
 from dify_chat_tester.config.loader import get_config, parse_ai_providers
@@ -207,6 +208,7 @@ class AppController:
         selected_model,
         provider_id=None,
         concurrency: int = 1,
+        use_cache: bool | None = None,
     ):
         """运行选择的模式"""
         if mode_choice == "1":
@@ -234,8 +236,32 @@ class AppController:
                 self.batch_request_interval,
                 self.batch_default_show_response,
                 concurrency=concurrency,
+                provider_id=provider_id,
+                use_cache=use_cache,
             )
             return "continue"  # 返回标志，表示继续选择模式
+        elif mode_choice == "4":
+            # 多模型对比模式
+            console.print()
+            print_info("已选择: 多模型对比模式")
+            targets = self._build_matrix_targets(
+                provider,
+                selected_role,
+                selected_model,
+                provider_id,
+                concurrency,
+            )
+            run_batch_query(
+                provider,
+                selected_role,
+                provider_name,
+                selected_model,
+                self.batch_request_interval,
+                self.batch_default_show_response,
+                provider_id=provider_id,
+                targets=targets,
+            )
+            return "continue"
         elif mode_choice == "0":
             # 退出程序
             # 其实在 _run_mode 外部循环里会处理退出，这里返回一个特殊值即可
@@ -243,6 +269,56 @@ class AppController:
             # 为了更好的控制流，我们返回 'exit' 状态
             return "exit"
 
+    def _build_matrix_targets(
+        self,
+        provider,
+        selected_role,
+        selected_model,
+        provider_id,
+        concurrency: int = 1,
+    ):
+        """交互式收集多模型对比的目标列表（当前选择作为第一个目标）"""
+        from dify_chat_tester.core.matrix import MatrixTarget
+
+        if concurrency <= 1:
+            concurrency = self.config.get_int("BATCH_MATRIX_CONCURRENCY", 3)
+        rate_limit = self.config.get_float("BATCH_MATRIX_RATE_LIMIT", 0.0)
+
+        def make_target(target_provider, model, role, target_provider_id):
+            return MatrixTarget(
+                target_provider,
+                model,
+                role,
+                provider_id=target_provider_id,
+                concurrency=concurrency,
+                rate_limit=rate_limit,
+            )
+
+        targets = [make_target(provider, selected_model, selected_role, provider_id)]
+        print_info(f"对比目标 1: {targets[0].name}")
+
+        while True:
+            more = print_input_prompt(
+                f"是否继续添加对比目标？(y/N，当前 {len(targets)} 个)"
+            )
+            if more.strip().lower() not in ("y", "yes"):
+                break
+
+            _, next_provider_id = self._select_provider()
+            next_provider, available_models = self._setup_provider(next_provider_id)
+            if not next_provider:
+                continue
+            model = next_provider.select_model(available_models)
+            role = next_provider.select_role(self.roles)
+            target = make_target(next_provider, model, role, next_provider_id)
+            if any(existing.name == target.name for existing in targets):
+                print_warning(f"对比目标已存在，已忽略: {target.name}")
+                continue
+            targets.append(target)
+            print_info(f"对比目标 {len(targets)}: {target.name}")
+
+        return targets
+
     def _run_question_generation(
         self,
         provider,
@@ -312,11 +388,12 @@ class AppController:
             folder_path=folder_path,
         )
 
-    def run(self, concurrency: int | None = None):
+    def run(self, concurrency: int | None = None, use_cache: bool | None = None):
         """运行主程序循环
 
         Args:
             concurrency: 批量处理并发数（None 或 1 为串行，2-10 为并发）
+            use_cache: 是否使用响应缓存（None 时按配置）
         """
         # 从参数或配置中获取并发数
         if concurrency is None:
@@ -404,6 +481,7 @@ class AppController:
                     selected_model,
                     provider_id,
                     concurrency=concurrency,
+                    use_cache=use_cache,
                 )
 
                 # 如果是退出命令，跳出内层循环
@@ -139,6 +139,7 @@ def select_mode():
     default_items = [
         {"id": "1", "label": "会话模式 (实时对话)"},
         {"id": "2", "label": "批量询问模式 (通过 Excel 文件批量询问)"},
+        {"id": "4", "label": "多模型对比模式 (同一批问题同时询问多个模型)"},
     ]
 
     # 获取合并后的菜单项
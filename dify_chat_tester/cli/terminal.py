@@ -4,6 +4,7 @@
 """
 
 import sys
+import time
 
 # 导入 readline 模块以支持命令行编辑功能（方向键、删除键等）
 # 在 macOS/Linux 上，只需导入 readline 即可激活功能
@@ -22,21 +23,39 @@ from rich.text import Text
 
 from dify_chat_tester.config.loader import get_config
 
-# 读取配置，控制是否使用富文本 UI
-_config = get_config()
-USE_RICH_UI = _config.get_bool("USE_RICH_UI", True)
+# 是否使用富文本 UI（USE_RICH_UI 配置），首次使用时读取
+_use_rich_ui = None
 
-# 初始化 colorama（Windows 兼容）
-colorama.init(autoreset=True)
 
-# 设置控制台窗口标题（Windows）
-if sys.platform == "win32":
-    try:
-        import ctypes
+def use_rich_ui() -> bool:
+    """是否使用富文本 UI（读取一次 USE_RICH_UI 配置后缓存）"""
+    global _use_rich_ui
+    if _use_rich_ui is None:
+        config = get_config()
+        _use_rich_ui = config.get_bool("USE_RICH_UI", True) if config else True
+    return _use_rich_ui
+
+
+def __getattr__(name: str):
+    # 兼容旧的模块常量 terminal.USE_RICH_UI
+    if name == "USE_RICH_UI":
+        return use_rich_ui()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def init_terminal():
+    """初始化终端：colorama（Windows 兼容）和控制台窗口标题，由 bootstrap() 调用"""
+    colorama.init(autoreset=True)
+
+    # 设置控制台窗口标题（Windows）
+    if sys.platform == "win32":
+        try:
+            import ctypes
+
+            ctypes.windll.kernel32.SetConsoleTitleW("dify_chat_tester - AI聊天测试工具")
+        except Exception:
+            pass
 
-        ctypes.windll.kernel32.SetConsoleTitleW("dify_chat_tester - AI聊天测试工具")
-    except Exception:
-        pass
 
 # 创建全局控制台对象
 console = Console()
@@ -84,7 +103,7 @@ class Icons:
 
 def print_success(message: str):
     """打印成功信息"""
-    if not USE_RICH_UI:
+    if not use_rich_ui():
         console.print(f"[SUCCESS] {message}")
         return
 
@@ -100,7 +119,7 @@ def print_success(message: str):
 
 def print_error(message: str):
     """打印错误信息"""
-    if not USE_RICH_UI:
+    if not use_rich_ui():
         console.print(f"[ERROR] {message}")
         return
 
@@ -116,7 +135,7 @@ def print_error(message: str):
 
 def print_warning(message: str):
     """打印警告信息"""
-    if not USE_RICH_UI:
+    if not use_rich_ui():
         console.print(f"[WARN] {message}")
         return
 
@@ -132,7 +151,7 @@ def print_warning(message: str):
 
 def print_info(message: str):
     """打印信息"""
-    if not USE_RICH_UI:
+    if not use_rich_ui():
         console.print(f"[INFO] {message}")
         return
 
@@ -149,7 +168,7 @@ def print_info(message: str):
 def print_input_prompt(message: str) -> str:
     """打印输入提示（美化的）"""
     # 使用普通的 input() 替代 Prompt.ask，解决退格键问题
-    if not USE_RICH_UI:
+    if not use_rich_ui():
         # 简单文本提示
         console.print(f">> {message}: ", end="")
     else:
@@ -171,7 +190,7 @@ def input_api_key(prompt: str) -> str:
     """安全地输入 API 密钥（不回显密钥内容）"""
     import getpass
 
-    if not USE_RICH_UI:
+    if not use_rich_ui():
         console.print(prompt, end="")
     else:
         text = Text()
@@ -224,8 +243,20 @@ def _format_duration(seconds: float) -> str:
     return f"{hours} 小时 {minutes_rem} 分 {seconds_rem:.0f} 秒"
 
 
-def print_statistics(total: int, success: int, failed: int, duration: float):
-    """打印统计信息"""
+def print_statistics(
+    total: int,
+    success: int,
+    failed: int,
+    duration: float,
+    cache_hits: int = None,
+    cache_misses: int = None,
+):
+    """打印统计信息
+
+    cache_hits / cache_misses 为响应缓存命中统计，未启用缓存时为 None。
+    """
+    cache_lookups = (cache_hits or 0) + (cache_misses or 0)
+    cache_rate = (cache_hits / cache_lookups * 100) if cache_lookups > 0 else 0
     # 统计数据
     success_rate = (success / total * 100) if total > 0 else 0
     failed_rate = (failed / total * 100) if total > 0 else 0
@@ -235,7 +266,7 @@ def print_statistics(total: int, success: int, failed: int, duration: float):
     formatted_duration = _format_duration(duration)
 
     # 简单文本模式
-    if not USE_RICH_UI:
+    if not use_rich_ui():
         console.print(f"总处理数量: {total}")
         console.print(f"成功数量: {success} ({success_rate:.1f}%)")
         console.print(f"失败数量: {failed} ({failed_rate:.1f}%)")
@@ -243,6 +274,10 @@ def print_statistics(total: int, success: int, failed: int, duration: float):
         console.print(f"平均用时: {avg_time:.2f} 秒/问题")
         speed = total / duration if duration > 0 else 0
         console.print(f"处理速度: {speed:.1f} 问题/秒")
+        if cache_hits is not None:
+            console.print(
+                f"缓存命中: {cache_hits} / 未命中: {cache_misses or 0} ({cache_rate:.1f}%)"
+            )
         console.print()
         return
 
@@ -269,6 +304,13 @@ def print_statistics(total: int, success: int, failed: int, duration: float):
         style="white",
     )
 
+    if cache_hits is not None:
+        stats_text.append("\n\n🗄️  响应缓存\n", style="bold yellow")
+        stats_text.append(
+            f"  • 命中: {cache_hits}  未命中: {cache_misses or 0} ({cache_rate:.1f}%)",
+            style="white",
+        )
+
     # 统计面板
     stats_panel = Panel(
         stats_text,
@@ -283,7 +325,7 @@ def print_statistics(total: int, success: int, failed: int, duration: float):
 
 def print_welcome():
     """打印美化版的程序标题头"""
-    if not USE_RICH_UI:
+    if not use_rich_ui():
         console.print("==============================")
         console.print("dify_chat_tester - AI聊天测试工具")
         console.print("==============================")
@@ -322,7 +364,7 @@ def print_api_key_confirmation(api_key: str) -> bool:
     # 隐藏密钥中间部分
     hidden_key = hide_api_key(api_key)
 
-    if not USE_RICH_UI:
+    if not use_rich_ui():
         console.print(f"已输入密钥: {hidden_key}")
         answer = input("是否正确？[Y/n]: ").strip().lower()
         return answer in ("", "y", "yes")
@@ -364,7 +406,7 @@ def hide_api_key(key: str) -> str:
 def print_file_list(files: list):
     """打印文件列表"""
     if not files:
-        if not USE_RICH_UI:
+        if not use_rich_ui():
             console.print("当前目录没有找到 Excel 文件")
             return
 
@@ -380,7 +422,7 @@ def print_file_list(files: list):
         console.print(warning_panel)
         return
 
-    if not USE_RICH_UI:
+    if not use_rich_ui():
         for i, file_name in enumerate(files, 1):
             console.print(f"[{i}] {file_name}")
         console.print()
@@ -407,7 +449,7 @@ def print_file_list(files: list):
 
 def print_column_list(columns: list):
     """打印列名列表"""
-    if not USE_RICH_UI:
+    if not use_rich_ui():
         for i, col_name in enumerate(columns, 1):
             console.print(f"[{i}] {col_name}")
         console.print()
@@ -463,7 +505,7 @@ class StreamDisplay:
 
     def start(self):
         """开始显示"""
-        if not USE_RICH_UI:
+        if not use_rich_ui():
             return
 
         from rich.live import Live
@@ -487,7 +529,7 @@ class StreamDisplay:
             self.content += new_content
             self.panel.renderable = self.content
             self.live.refresh()
-        elif not USE_RICH_UI:
+        elif not use_rich_ui():
             # 非 Rich UI 模式下的简单输出
             sys.stdout.write(new_content)
             sys.stdout.flush()
@@ -497,13 +539,13 @@ class StreamDisplay:
         if self.live:
             self.live.stop()
             self.live = None
-        elif not USE_RICH_UI:
+        elif not use_rich_ui():
             print()  # 换行
 
     def persist(self):
         """停止显示并将当前内容持久化打印，然后清空缓冲"""
         self.stop()
-        if USE_RICH_UI and self.content.strip():
+        if use_rich_ui() and self.content.strip():
             # 创建一个静态面板打印出来
             static_panel = Panel(
                 self.content,
@@ -516,3 +558,49 @@ class StreamDisplay:
             console.print(static_panel)
             # 清空内容，以便后续重新开始
             self.content = ""
+
+
+class PlainProgress:
+    """纯文本进度输出（无人值守运行时替代 Live 表格）
+
+    每隔 interval 秒输出一行进度，适合写入日志文件或 CI 输出。
+    """
+
+    def __init__(self, total: int, interval: float = 5.0, stream=None):
+        self.total = total
+        self.interval = interval
+        self.stream = stream or sys.stdout
+        self.start_time = time.time()
+        self._last_print = 0.0
+
+    def update(
+        self, completed: int, failed: int = 0, force: bool = False, recent: dict = None
+    ):
+        """按间隔输出进度行
+
+        recent 为最近窗口的滚动统计（RollingWindow.snapshot()），提供时速率和预计剩余时间
+        按最近窗口计算，并附带窗口内的 P95 延迟和错误率。
+        """
+        now = time.time()
+        if not force and now - self._last_print < self.interval:
+            return
+        self._last_print = now
+
+        elapsed = now - self.start_time
+        rate = completed / elapsed if elapsed > 0 else 0
+        if recent and recent["rows_per_second"] > 0:
+            rate = recent["rows_per_second"]
+        percent = completed / self.total * 100 if self.total else 100
+        line = (
+            f"[进度] {completed}/{self.total} ({percent:.1f}%) 失败 {failed}"
+            f" | {rate:.2f} 条/秒 | 已用 {_format_duration(elapsed)}"
+        )
+        if recent and recent["p95"] is not None:
+            line += (
+                f" | 近{recent['window']:.0f}秒 P95 {recent['p95']:.1f}s"
+                f" 错误 {recent['error_rate']:.1%}"
+            )
+        if rate > 0 and completed < self.total:
+            line += f" | 预计剩余 {_format_duration((self.total - completed) / rate)}"
+        self.stream.write(line + "\n")
+        self.stream.flush()
@@ -1,7 +1,18 @@
 """Config 模块 - 配置与日志"""
 
-from dify_chat_tester.config.loader import ConfigLoader, get_config, parse_ai_providers
-from dify_chat_tester.config.logging import get_logger
+from dify_chat_tester._lazy import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(
+    __name__,
+    {
+        "dify_chat_tester.config.loader": [
+            "ConfigLoader",
+            "get_config",
+            "parse_ai_providers",
+        ],
+        "dify_chat_tester.config.logging": ["get_logger"],
+    },
+)
 
 __all__ = [
     "get_config",
@@ -8,6 +8,7 @@
 
 import os
 import sys
+import threading
 from typing import Any, List, Optional
 
 
@@ -365,13 +366,26 @@ class ConfigLoader:
         return value or default_template
 
 
-# 全局配置实例
-config_loader = ConfigLoader()
+# 全局配置实例，首次调用 get_config() 时读取配置文件（不存在时从模板创建）
+_config_loader: Optional[ConfigLoader] = None
+_config_lock = threading.Lock()
 
 
 def get_config():
     """获取配置加载器实例"""
-    return config_loader
+    global _config_loader
+    if _config_loader is None:
+        with _config_lock:
+            if _config_loader is None:
+                _config_loader = ConfigLoader()
+    return _config_loader
+
+
+def __getattr__(name: str):
+    # 兼容旧的模块属性 loader.config_loader
+    if name == "config_loader":
+        return get_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # 特殊解析 AI_PROVIDERS 配置（格式：序号:名称:ID;序号:名称:ID）
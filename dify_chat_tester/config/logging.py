@@ -1,6 +1,7 @@
 """简单日志工具
 
 统一从配置中读取日志相关设置，并返回配置好的 logger。
+get_logger() 只绑定名称，不做任何配置；由 bootstrap() 调用 setup_logging() 一次性配置输出。
 
 配置项（来自 .env.config）：
 - LOG_LEVEL: 日志级别（DEBUG/INFO/WARNING/ERROR/CRITICAL），默认 INFO
@@ -19,7 +20,6 @@ from loguru import logger
 
 from dify_chat_tester.config.loader import get_config
 
-_config = get_config()
 _console_handler_id = None
 
 
@@ -73,22 +73,30 @@ def _get_log_directory(log_dir: str) -> Path:
 
 def get_logger(name: str = "dify_chat_tester"):
     """
-    获取配置好的 loguru logger
+    获取 loguru logger
     注意：loguru 是单例，name 参数主要用于 bind 上下文，
     但为了兼容标准 logging 的用法，我们返回原生的 loguru.logger
     或者根据需要返回 bind 后的 logger
+
+    模块导入时即可调用：输出目标和级别由 setup_logging() 统一配置。
     """
+    return logger.bind(name=name)
+
 
+def setup_logging():
+    """按配置设置 loguru 的控制台和文件输出，并拦截标准 logging（重复调用不会重复配置）"""
     # 防止重复配置
-    if hasattr(sys, "_dify_loguru_configured"):
-        return logger.bind(name=name)
+    if _is_configured():
+        return
+
+    config = get_config()
 
     # 1. 移除 loguru 默认的 handler
     logger.remove()
 
     # 2. 读取配置
-    level_str = _config.get_str("LOG_LEVEL", "INFO").upper()
-    log_to_file = _config.get_bool("LOG_TO_FILE", True)
+    level_str = config.get_str("LOG_LEVEL", "INFO").upper()
+    log_to_file = config.get_bool("LOG_TO_FILE", True)
 
     # 3. 配置控制台输出 (stderr)
     global _console_handler_id
@@ -98,7 +106,7 @@ def get_logger(name: str = "dify_chat_tester"):
             logger.remove(_console_handler_id)
         except ValueError:
             pass
-            
+
     _console_handler_id = logger.add(
         sys.stderr,
         level=level_str,
@@ -107,8 +115,8 @@ def get_logger(name: str = "dify_chat_tester"):
 
     # 4. 配置文件输出
     if log_to_file:
-        log_dir_name = _config.get_str("LOG_DIR", "logs")
-        file_name = _config.get_str("LOG_FILE_NAME", "dify_chat_tester.log")
+        log_dir_name = config.get_str("LOG_DIR", "logs")
+        file_name = config.get_str("LOG_FILE_NAME", "dify_chat_tester.log")
         # 10MB 切割，保留 7 天，旧文件压缩为 zip
         max_bytes = "10 MB"
         retention = "7 days"
@@ -147,13 +155,15 @@ def get_logger(name: str = "dify_chat_tester"):
     # 标记已配置
     setattr(sys, "_dify_loguru_configured", True)
 
-    return logger.bind(name=name)
+
+def _is_configured() -> bool:
+    return hasattr(sys, "_dify_loguru_configured")
 
 
 def disable_console_logging():
-    """禁用控制台日志输出"""
+    """禁用控制台日志输出（setup_logging() 未调用时不做任何事）"""
     global _console_handler_id
-    if _console_handler_id is not None:
+    if _is_configured() and _console_handler_id is not None:
         try:
             logger.remove(_console_handler_id)
         except ValueError:
@@ -162,12 +172,15 @@ def disable_console_logging():
 
 
 def enable_console_logging():
-    """启用控制台日志输出"""
+    """启用控制台日志输出（setup_logging() 未调用时不做任何事）
+
+    未经 setup_logging() 配置时 loguru 默认 handler 仍在输出，再添加一个会导致每条日志打印两次。
+    """
     global _console_handler_id
-    if _console_handler_id is not None:
-        return  # 已经启用
+    if not _is_configured() or _console_handler_id is not None:
+        return  # 未配置或已经启用
 
-    level_str = _config.get_str("LOG_LEVEL", "INFO").upper()
+    level_str = get_config().get_str("LOG_LEVEL", "INFO").upper()
     _console_handler_id = logger.add(
         sys.stderr,
         level=level_str,
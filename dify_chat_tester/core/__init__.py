@@ -1,8 +1,15 @@
 """Core 模块 - 核心业务逻辑"""
 
-from dify_chat_tester.core.batch import run_batch_query
-from dify_chat_tester.core.chat import run_interactive_chat
-from dify_chat_tester.core.question import run_question_generation
+from dify_chat_tester._lazy import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(
+    __name__,
+    {
+        "dify_chat_tester.core.batch": ["run_batch_query"],
+        "dify_chat_tester.core.chat": ["run_interactive_chat"],
+        "dify_chat_tester.core.question": ["run_question_generation"],
+    },
+)
 
 __all__ = [
     "run_interactive_chat",
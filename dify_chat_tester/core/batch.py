@@ -8,8 +8,9 @@ import select
 import sys
 import threading
 import time
-import warnings
-from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
 from datetime import datetime
 
 import openpyxl
@@ -18,41 +19,72 @@ from rich.table import Table
 
 from dify_chat_tester.cli.terminal import (
     Panel,
+    PlainProgress,
     Text,
     box,
     console,
     print_error,
     print_file_list,
+    print_info,
     print_input_prompt,
     print_statistics,
     print_success,
     print_warning,
 )
 from dify_chat_tester.config.loader import get_config
+from dify_chat_tester.core.cache import build_cache_key, open_response_cache
+from dify_chat_tester.core.checkpoint import (
+    HASH_HEADER,
+    LATENCY_HEADER,
+    ROW_ID_HEADER,
+    SOURCE_HEADER,
+    backfill_legacy_rows,
+    is_row_done,
+    load_checkpoint_index,
+    question_hash,
+    summarize_index,
+)
+from dify_chat_tester.core.coalesce import QuestionCoalescer
+from dify_chat_tester.core.exporter import REGISTRY as METRICS_REGISTRY
+from dify_chat_tester.core.exporter import start_metrics_server
+from dify_chat_tester.core.metrics import (
+    RunMetrics,
+    print_run_report,
+    summary_path_for,
+    track_stream_timing,
+    write_summary,
+)
+from dify_chat_tester.core.reorder import ReorderBuffer
+from dify_chat_tester.core.retry import BackoffPolicy, RetryQueue
+from dify_chat_tester.core.scheduling import (
+    POLICIES,
+    POLICY_DOC,
+    POLICY_LONGEST,
+    POLICY_SHEET,
+    LatencyModel,
+    order_tasks,
+)
+from dify_chat_tester.core.tracing import bind as bind_trace
+from dify_chat_tester.core.tracing import start_tracing, stop_tracing
+from dify_chat_tester.core.writer import LogWriter
 from dify_chat_tester.utils.excel import init_excel_log, log_to_excel
 
-# 禁用 multiprocessing 资源警告（在导入前设置）
-warnings.filterwarnings("ignore", category=UserWarning, module="multiprocessing")
-
-# 禁用 resource_tracker 警告，直接在顶层拦截
-try:
-    from multiprocessing import resource_tracker
 
-    # 彻底替换掉 register 和 unregister，并清空内部状态
-    resource_tracker._resource_tracker = None
+def _save_interval() -> int:
+    """批量保存间隔（BATCH_SAVE_INTERVAL），默认每 10 条保存一次"""
+    config = get_config()
+    return config.get_int("BATCH_SAVE_INTERVAL", 10) if config else 10
 
-    def _noop(*args, **kwargs):
-        pass
 
-    resource_tracker.register = _noop
-    resource_tracker.unregister = _noop
-    resource_tracker.ensure_running = _noop
-except Exception:
-    pass
+# 日志“结果来源”列的取值（实时请求留空）
+SOURCE_CACHE = "缓存"
+SOURCE_COALESCED = "合并"
 
-# 从配置中获取批量保存间隔，默认每 10 条保存一次
-_config = get_config()
-SAVE_EVERY_N_QUERIES = _config.get_int("BATCH_SAVE_INTERVAL", 10) if _config else 10
+# 并发模式下每行的紧凑状态（结果写出后只保留状态，不再持有回答内容）
+_ROW_PENDING = 0
+_ROW_SUCCESS = 1
+_ROW_FAILED = 2
+_ROW_EMPTY = 3
 
 
 def wait_for_any(futures: set, timeout: float = None):
@@ -81,6 +113,54 @@ def get_real_max_row(sheet, col_idx):
     return 1
 
 
+# _make_log_row 生成的日志行中“输入行号”的位置
+_LOG_ROW_INDEX = 8
+
+
+def _make_log_row(
+    selected_role,
+    doc_name,
+    question,
+    response,
+    success,
+    error,
+    conversation_id,
+    row_idx,
+    question_suffix="",
+    source="",
+    latency=None,
+):
+    """构造一行批量日志，末尾附带输入行号、问题哈希、结果来源和耗时"""
+    return [
+        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        selected_role,
+        doc_name,
+        question + question_suffix,
+        response,
+        success,
+        error,
+        conversation_id or "",
+        row_idx,
+        question_hash(question),
+        source,
+        f"{latency:.3f}" if latency is not None else "",
+    ]
+
+
+def _make_cache_key(provider, provider_id, selected_model, selected_role, question):
+    """按当前供应商配置生成响应缓存键"""
+    config = get_config()
+    system_prompt = config.get_system_prompt(selected_role) if config else ""
+    return build_cache_key(
+        provider_id,
+        provider,
+        selected_model,
+        selected_role,
+        question,
+        system_prompt=system_prompt,
+    )
+
+
 class KeyboardControl:
     """键盘控制类，用于在并发处理期间检测用户按键"""
 
@@ -140,13 +220,26 @@ def _run_sequential_batch(
     show_batch_response,
     batch_show_indicator,
     request_interval,
+    resume_index=None,
+    response_cache=None,
+    provider_id=None,
 ):
-    """运行串行批量处理逻辑（封装了原有的批量处理核心循环）"""
+    """运行串行批量处理逻辑（封装了原有的批量处理核心循环）
+
+    resume_index 为检查点索引，已有成功结果的输入行会被跳过；
+    response_cache 为响应缓存，命中时不再请求供应商。
+    """
     total_queries = 0
     successful_queries = 0
     failed_queries = 0
     queries_since_last_save = 0
+    save_interval = _save_interval()
     start_time = time.time()
+    metrics = RunMetrics(registry=METRICS_REGISTRY)
+    start_metrics_server()
+    _update_live_gauges(in_flight=0, queue_depth=0, concurrency_limit=1)
+    # 请求追踪（BATCH_TRACE_FILE 或 --trace），串行模式只有一个工作线程
+    tracer = start_tracing()
     # 计算真实总行数
     real_max_row = get_real_max_row(batch_worksheet, question_col_index + 1)
     total_rows = real_max_row - 1
@@ -168,23 +261,29 @@ def _run_sequential_batch(
                 str(question_cell_value) if question_cell_value is not None else ""
             )  # 确保转换为字符串
 
+            # 断点续跑：已有成功结果的行直接跳过
+            if is_row_done(resume_index, row_idx, question):
+                continue
+
             if not question.strip():  # 检查问题是否为空或只包含空格
                 print(f"警告: 第 {row_idx} 行问题为空，跳过。", file=console.file)
                 failed_queries += 1  # 空问题也算作失败
+                metrics.record(("", False, "问题为空", None))
                 log_to_excel(
                     output_worksheet,
-                    [
-                        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    _make_log_row(
                         selected_role,
                         doc_name,
                         question,  # 原始问题为空
                         "",
                         False,
                         "问题为空",
-                        0,
-                        "",
-                    ],
+                        None,
+                        row_idx,
+                    ),
                 )
+                if tracer is not None:
+                    tracer.logged(row_idx)
                 continue  # 跳过当前循环的剩余部分
 
             total_queries += 1  # 只有非空问题才计入总数
@@ -202,14 +301,51 @@ def _run_sequential_batch(
             )
             console.print(f"\n{question_display}")
 
-            response, success, error, conversation_id = provider.send_message(
-                message=question,
-                model=selected_model,
-                role=selected_role,
-                stream=True,
-                show_indicator=batch_show_indicator,
-                show_thinking=enable_thinking,
-            )
+            source = ""
+            latency = None
+            timing = None
+            cache_key = None
+            cached = None
+            if response_cache is not None:
+                cache_key = _make_cache_key(
+                    provider, provider_id, selected_model, selected_role, question
+                )
+                cached = response_cache.get(cache_key)
+
+            if cached is not None:
+                response, conversation_id = cached
+                success, error = True, None
+                source = SOURCE_CACHE
+            else:
+                request_start = time.time()
+                timing = {"start": request_start}
+                METRICS_REGISTRY.set("in_flight_requests", 1)
+                bind_trace(timing)
+                response, success, error, conversation_id = provider.send_message(
+                    message=question,
+                    model=selected_model,
+                    role=selected_role,
+                    stream=True,
+                    show_indicator=batch_show_indicator,
+                    show_thinking=enable_thinking,
+                    stream_callback=track_stream_timing(timing),
+                )
+                bind_trace(None)
+                latency = time.time() - request_start
+                METRICS_REGISTRY.set("in_flight_requests", 0)
+                if tracer is not None:
+                    tracer.request(
+                        row_idx,
+                        1,
+                        1,
+                        request_start,
+                        request_start,
+                        request_start + latency,
+                        timing,
+                        success,
+                    )
+                if success and cache_key is not None:
+                    response_cache.put(cache_key, response, conversation_id)
 
             if success:
                 successful_queries += 1
@@ -231,27 +367,40 @@ def _run_sequential_batch(
                     f"问题 (第 {total_queries} 个) 处理失败。错误: {error}"
                 )  # 简洁提示
 
+            metrics.record(
+                (response, success, error, conversation_id),
+                latency=latency,
+                timing=timing,
+            )
+
             # 记录详细日志到日志文件
             log_to_excel(
                 output_worksheet,
-                [
-                    datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                _make_log_row(
                     selected_role,
                     doc_name,
                     question,
                     response,
                     success,
                     error,
-                    conversation_id or "",
-                ],
+                    conversation_id,
+                    row_idx,
+                    source=source,
+                    latency=latency,
+                ),
             )
+            if tracer is not None:
+                tracer.logged(row_idx)
 
             # 按批次保存日志，减少磁盘 IO
             queries_since_last_save += 1
-            if queries_since_last_save >= SAVE_EVERY_N_QUERIES:
+            if queries_since_last_save >= save_interval:
                 try:
+                    save_start = time.time()
                     output_workbook.save(output_file_name)
                     queries_since_last_save = 0
+                    if tracer is not None:
+                        tracer.saved(save_start, time.time(), tracer.logged_rows)
                 except PermissionError:
                     print_error(
                         f"警告：无法保存日志文件 '{output_file_name}'。请确保文件未被其他程序打开。"
@@ -259,7 +408,8 @@ def _run_sequential_batch(
                 except Exception as e:
                     print_error(f"警告：保存日志时出错：{e}")
 
-            time.sleep(request_interval)  # 间隔时间
+            if not source:
+                time.sleep(request_interval)  # 间隔时间（缓存命中无需等待）
 
     except KeyboardInterrupt:
         print_warning("用户中断批量处理。正在保存当前进度...")
@@ -272,19 +422,32 @@ def _run_sequential_batch(
 
     # 循环结束后做一次最终保存
     try:
+        save_start = time.time()
         output_workbook.save(output_file_name)
+        if tracer is not None:
+            tracer.saved(save_start, time.time(), tracer.logged_rows)
     except PermissionError:
         print_error(
             f"警告：无法保存日志文件 '{output_file_name}'。请确保文件未被其他程序打开。"
         )
     except Exception as e:
         print_error(f"警告：保存日志时出错：{e}")
+    if tracer is not None:
+        _report_trace()
 
     end_time = time.time()
     total_duration = end_time - start_time
 
     # 统计信息面板
-    print_statistics(total_queries, successful_queries, failed_queries, total_duration)
+    print_statistics(
+        total_queries,
+        successful_queries,
+        failed_queries,
+        total_duration,
+        cache_hits=response_cache.hits if response_cache is not None else None,
+        cache_misses=response_cache.misses if response_cache is not None else None,
+    )
+    _report_run_metrics(metrics, total_duration, output_file_name)
 
     # ----------------------------------------
     # 如果需要在函数内打印统计汇总信息，可以复用之前逻辑
@@ -342,8 +505,12 @@ def _process_single_question(
     enable_thinking: bool,
     worker_status: dict = None,
     worker_id: int = None,
+    timing: dict = None,
 ):
-    """处理单个问题的任务函数"""
+    """处理单个问题的任务函数
+
+    timing 不为 None 时记录请求开始和结束时间、首末文本片段时间和输出 token 数。
+    """
     # 创建流式回调（如果提供了 worker_status）
     stream_callback = None
     if worker_status is not None and worker_id is not None:
@@ -370,15 +537,42 @@ def _process_single_question(
             except (KeyError, TypeError):
                 pass  # 忽略状态更新错误
 
-    return provider.send_message(
-        message=question,
-        model=selected_model,
-        role=selected_role,
-        stream=True,
-        show_indicator=False,  # 后台执行时不显示加载指示器
-        show_thinking=enable_thinking,
-        stream_callback=stream_callback,
-    )
+    if timing is None:
+        return provider.send_message(
+            message=question,
+            model=selected_model,
+            role=selected_role,
+            stream=True,
+            show_indicator=False,  # 后台执行时不显示加载指示器
+            show_thinking=enable_thinking,
+            stream_callback=stream_callback,
+        )
+
+    timing["start"] = time.time()
+    stream_callback = track_stream_timing(timing, stream_callback)
+    # 启用请求追踪时，连接建立和响应头等时间点记录到本次请求的 timing
+    bind_trace(timing)
+    try:
+        return provider.send_message(
+            message=question,
+            model=selected_model,
+            role=selected_role,
+            stream=True,
+            show_indicator=False,
+            show_thinking=enable_thinking,
+            stream_callback=stream_callback,
+        )
+    finally:
+        timing["end"] = time.time()
+        bind_trace(None)
+
+
+def _final_failure(result, attempts: int):
+    """运行中重试的行最终失败时记录的结果：请求过多次时在错误信息前注明重试次数"""
+    response, success, error, conversation_id = result
+    if success or attempts <= 1:
+        return result
+    return (response, False, f"重试{attempts - 1}次后失败: {error}", conversation_id)
 
 
 def _process_with_retry(
@@ -390,6 +584,7 @@ def _process_with_retry(
     max_retries: int = 3,
     worker_status: dict = None,
     worker_id: int = None,
+    timing: dict = None,
 ):
     """带重试的问题处理函数，最多重试 max_retries 次"""
     last_error = None
@@ -405,6 +600,7 @@ def _process_with_retry(
                 enable_thinking,
                 worker_status,
                 worker_id,
+                timing,
             )
             response, success, error, conversation_id = result
 
@@ -424,10 +620,52 @@ def _process_with_retry(
                 time.sleep(1)
                 continue
 
-    # 所有重试都失败
+    # 所有重试都失败（不重试时直接返回原始错误）
+    if max_retries == 0:
+        return ("", False, last_error, None), retry_count
     return ("", False, f"重试{max_retries}次后失败: {last_error}", None), retry_count
 
 
+def _process_task(
+    provider,
+    question: str,
+    selected_model: str,
+    selected_role: str,
+    enable_thinking: bool,
+    max_retries: int = 3,
+    worker_status: dict = None,
+    worker_id: int = None,
+    response_cache=None,
+    cache_key: str = None,
+    timing: dict = None,
+):
+    """并发任务入口：先查响应缓存，未命中时带重试请求供应商
+
+    Returns:
+        tuple: (result, retry_count, source)，source 为日志“结果来源”列的值
+    """
+    if response_cache is not None and cache_key is not None:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            response, conversation_id = cached
+            return (response, True, None, conversation_id), 0, SOURCE_CACHE
+
+    result, retry_count = _process_with_retry(
+        provider,
+        question,
+        selected_model,
+        selected_role,
+        enable_thinking,
+        max_retries,
+        worker_status,
+        worker_id,
+        timing,
+    )
+    if result[1] and response_cache is not None and cache_key is not None:
+        response_cache.put(cache_key, result[0], result[3])
+    return result, retry_count, ""
+
+
 def _generate_worker_table(
     worker_status: dict,
     completed: int,
@@ -436,8 +674,15 @@ def _generate_worker_table(
     paused: bool = False,
     start_time: float = None,
     stopping: bool = False,
+    write_backlog: int = 0,
+    recent: dict = None,
+    queue_depth: int = 0,
 ) -> Table:
-    """生成工作线程状态表格"""
+    """生成工作线程状态表格
+
+    recent 为 RollingWindow.snapshot() 的结果：提供时按最近窗口内的完成速率估计剩余时间
+    （预热慢或中途变慢时比全程平均准确），并在底部显示滚动速率、P95、错误率和排队数。
+    """
     # 计算进度百分比
     percent = (completed / total * 100) if total > 0 else 0
 
@@ -447,7 +692,10 @@ def _generate_worker_table(
     if start_time and completed > 0 and not stopping:
         elapsed = time.time() - start_time
         avg_time = elapsed / completed
-        remaining = (total - completed) * avg_time
+        if recent and recent["rows_per_second"] > 0:
+            remaining = (total - completed) / recent["rows_per_second"]
+        else:
+            remaining = (total - completed) * avg_time
         if remaining > 3600:
             eta_text = f"{remaining / 3600:.1f}h"
         elif remaining > 60:
@@ -481,9 +729,27 @@ def _generate_worker_table(
 
     # 底部显示：进度条 + 百分比 + 预计剩余时间 + 平均耗时（同一行）
     avg_display = f"  ⏱ {avg_task_text}" if avg_task_text else ""
+    # 写入队列积压时提示（后台写入线程跟不上）
+    backlog_display = (
+        f"  [yellow]💾 待写入:{write_backlog}[/yellow]" if write_backlog > 0 else ""
+    )
     caption = (
-        f"[cyan]{bar}[/cyan] [bold]{percent:.1f}%[/bold]{eta_display}{avg_display}"
+        f"[cyan]{bar}[/cyan] [bold]{percent:.1f}%[/bold]"
+        f"{eta_display}{avg_display}{backlog_display}"
     )
+    # 第二行：最近窗口的实时指标
+    if recent and not stopping:
+        p95 = recent["p95"]
+        error_rate = recent["error_rate"]
+        error_style = "red" if error_rate >= 0.1 else "dim"
+        caption += (
+            f"\n[dim]近{recent['window']:.0f}秒[/dim] "
+            f"⚡ {recent['rows_per_second']:.2f}行/秒"
+            f"  P95 {f'{p95:.1f}s' if p95 is not None else '-'}"
+            f"  [{error_style}]错误 {error_rate:.1%}[/{error_style}]"
+            f"  🔤 {recent['tokens_per_second']:.0f} tok/s"
+            f"  📥 排队 {queue_depth}"
+        )
 
     table = Table(title=title, caption=caption, box=box.ROUNDED, expand=False)
     table.add_column("线程", style="cyan", width=6)
@@ -533,6 +799,69 @@ def _generate_worker_table(
     return table
 
 
+def _schedule_tasks(tasks, schedule, output_file_name):
+    """按调度策略确定派发顺序
+
+    longest 和 doc 策略使用当前日志及 BATCH_SCHEDULE_HISTORY 中历史日志的耗时估计，
+    没有历史耗时时按问题长度估计。
+    """
+    config = get_config()
+    if schedule is None:
+        schedule = (
+            config.get_str("BATCH_SCHEDULE_POLICY", POLICY_SHEET)
+            if config
+            else POLICY_SHEET
+        )
+    if schedule not in POLICIES:
+        print_warning(f"未知的调度策略 '{schedule}'，按表格顺序派发")
+        schedule = POLICY_SHEET
+    if schedule == POLICY_SHEET:
+        return tasks
+
+    model = None
+    if schedule in (POLICY_LONGEST, POLICY_DOC):
+        history = [output_file_name]
+        if config:
+            history += config.get_list("BATCH_SCHEDULE_HISTORY", ",")
+        model = LatencyModel.from_logs(history)
+        source = "历史耗时" if model.has_history else "问题长度"
+        print_info(f"调度策略: {schedule}（按{source}估计耗时）")
+    else:
+        print_info(f"调度策略: {schedule}")
+    return order_tasks(tasks, schedule, model)
+
+
+def _update_live_gauges(in_flight, queue_depth, concurrency_limit, write_backlog=0):
+    """更新导出指标中的实时仪表（在途请求、排队任务、并发上限、写入积压）"""
+    METRICS_REGISTRY.set("in_flight_requests", in_flight)
+    METRICS_REGISTRY.set("queue_depth", queue_depth)
+    METRICS_REGISTRY.set("concurrency_limit", concurrency_limit)
+    METRICS_REGISTRY.set("write_backlog", write_backlog)
+
+
+def _report_trace():
+    """结束请求追踪并提示 trace 文件位置"""
+    path = stop_tracing()
+    if path:
+        print_info(f"请求追踪已保存: {path}（可在 https://ui.perfetto.dev 打开）")
+
+
+def _report_run_metrics(metrics, duration, output_file_name):
+    """打印延迟分布报告，并在日志旁写出 JSON 摘要"""
+    # 运行已结束，实时仪表归零（计数器和直方图保持累计值）
+    METRICS_REGISTRY.set("in_flight_requests", 0)
+    METRICS_REGISTRY.set("queue_depth", 0)
+    METRICS_REGISTRY.set("write_backlog", 0)
+    summary = metrics.summary(duration, log_file=output_file_name)
+    print_run_report(summary)
+    summary_path = summary_path_for(output_file_name)
+    try:
+        write_summary(summary, summary_path)
+        print_info(f"运行摘要已保存至: {summary_path}")
+    except OSError as e:
+        print_error(f"警告：无法保存运行摘要：{e}")
+
+
 def _run_concurrent_batch(
     provider,
     batch_worksheet,
@@ -548,13 +877,36 @@ def _run_concurrent_batch(
     enable_thinking,
     show_batch_response,
     concurrency,
+    resume_index=None,
+    response_cache=None,
+    provider_id=None,
+    coalesce=None,
+    headless=False,
+    schedule=None,
+    retry_policy=None,
+    ordered_output=None,
 ):
-    """运行并发批量处理逻辑"""
+    """运行并发批量处理逻辑
+
+    resume_index 为检查点索引，已有成功结果的输入行不会再次派发；
+    response_cache 为响应缓存，命中时不再请求供应商；
+    coalesce 控制是否合并重复问题（None 时按 BATCH_COALESCE_DUPLICATES 配置），
+    合并后重复行等待并复用同一问题的结果，不再单独请求；
+    headless 为 True 时不监听键盘、不显示 Live 表格，改为定期输出纯文本进度行；
+    schedule 为任务派发顺序的调度策略（None 时按 BATCH_SCHEDULE_POLICY 配置）；
+    retry_policy 为失败行的退避重试策略（None 时按 BATCH_MAX_RETRIES 等配置）；
+    ordered_output 为 True 时结果经重排缓冲区按输入行顺序写入日志
+    （None 时按 BATCH_ORDERED_OUTPUT 配置）。
+
+    Returns:
+        dict: {"total", "success", "failed", "duration"} 统计结果
+    """
+    config = get_config()
+    if coalesce is None:
+        coalesce = (
+            config.get_bool("BATCH_COALESCE_DUPLICATES", True) if config else True
+        )
 
-    total_queries = 0
-    successful_queries = 0
-    failed_queries = 0
-    queries_since_last_save = 0
     start_time = time.time()
     # 计算真实总行数
     real_max_row = get_real_max_row(batch_worksheet, question_col_index + 1)
@@ -577,280 +929,372 @@ def _run_concurrent_batch(
         ).value
         question = str(question_cell_value) if question_cell_value is not None else ""
 
+        # 断点续跑：只派发没有成功结果的行
+        if is_row_done(resume_index, row_idx, question):
+            continue
+
         tasks.append(
             {
                 "row_idx": row_idx,
                 "doc_name": doc_name,
                 "question": question,
                 "index": len(tasks),  # 相对索引，用于结果排序
+                "cache_key": (
+                    _make_cache_key(
+                        provider, provider_id, selected_model, selected_role, question
+                    )
+                    if response_cache is not None and question.strip()
+                    else None
+                ),
             }
         )
 
     if not tasks:
         print_success("没有需要处理的任务。")
-        return
+        return {"total": 0, "success": 0, "failed": 0, "duration": 0.0}
 
-    # 结果缓冲区 {index: result_tuple}
-    results_buffer = {}
+    total_tasks = len(tasks)
+    # 待首次派发的任务；任务只由该队列、在途表和重试队列持有，写出后即释放
+    pending_tasks = deque(_schedule_tasks(tasks, schedule, output_file_name))
+    # 每行一个字节的状态（按任务序号），用于最终统计
+    row_status = bytearray(total_tasks)
+    # 失败行摘要（仅在需要显示时保留）
+    failed_rows = []
+    # 延迟分布、吞吐量和错误分类（直方图统计，不保存逐行样本）；
+    # 同时累加到进程内的导出指标，配置了 METRICS_PORT 时可实时抓取
+    metrics = RunMetrics(registry=METRICS_REGISTRY)
+    start_metrics_server()
+    # 请求追踪（BATCH_TRACE_FILE 或 --trace）：未启用时为 None
+    tracer = start_tracing()
     # 工作线程状态追踪 {worker_id: {"state": "处理中/完成/失败", "question": "..."}}
     worker_status = {
         i: {"state": "等待", "question": ""} for i in range(1, concurrency + 1)
     }
     completed_count = 0
     failed_count = 0
-    total_tasks = len(tasks)
 
-    # 启动键盘控制
+    # 启动键盘控制（无人值守模式下不监听键盘）
     kb_control = KeyboardControl()
-    kb_control.start()
+    if not headless:
+        kb_control.start()
     user_stopped = False  # 用户主动停止标志
 
+    # 后台写入线程独占输出工作簿，调度线程只负责投递日志行
+    writer = LogWriter(
+        output_workbook,
+        output_worksheet,
+        output_file_name,
+        save_every=_save_interval(),
+    ).start()
+    coalescer = QuestionCoalescer(enabled=coalesce)
+    # 登记每个问题的出现次数，最后一个重复行取走结果后即释放
+    for task in tasks:
+        if task["question"].strip():
+            coalescer.expect(task["question"])
+    tasks.clear()
+    # 失败的行按退避策略放回调度队列，在运行过程中重试，每行只记录最终结果
+    retry_policy = retry_policy or BackoffPolicy.from_config(config)
+    retry_queue = RetryQueue()
+    retries_scheduled = 0
+    # 有序输出：结果按任务序号（即输入行顺序）重排后再交给写入线程
+    if ordered_output is None:
+        ordered_output = (
+            config.get_bool("BATCH_ORDERED_OUTPUT", False) if config else False
+        )
+    write_row = writer.write
+    if tracer is not None:
+
+        def write_row(row):
+            tracer.logged(row[_LOG_ROW_INDEX])
+            return writer.write(row)
+
+    reorder = (
+        ReorderBuffer(
+            write_row,
+            max_bytes=(config.get_int("BATCH_REORDER_BUFFER_MB", 32) if config else 32)
+            * 1024
+            * 1024,
+        )
+        if ordered_output
+        else None
+    )
+
+    def settle(task, result, source="", latency=None):
+        """记录一条任务结果：更新计数和行状态并投递日志行"""
+        nonlocal completed_count, failed_count
+        completed_count += 1
+        response, success, error, conversation_id = result
+        if not task["question"].strip():
+            row_status[task["index"]] = _ROW_EMPTY
+        elif success:
+            row_status[task["index"]] = _ROW_SUCCESS
+        else:
+            row_status[task["index"]] = _ROW_FAILED
+            if show_batch_response:
+                failed_rows.append((task["row_idx"], task["question"][:40], error))
+        if not success:
+            failed_count += 1
+        metrics.record(
+            result,
+            latency=latency,
+            timing=task.get("timing") if latency is not None else None,
+        )
+        row = _make_log_row(
+            selected_role,
+            task["doc_name"],
+            task["question"],
+            response,
+            success,
+            error,
+            conversation_id,
+            task["row_idx"],
+            source=source,
+            latency=latency,
+        )
+        if reorder is not None:
+            if tracer is not None:
+                tracer.settled(task["row_idx"])
+            reorder.put(task["index"], row)
+        else:
+            write_row(row)
+
+    def finish(task, result, source="", latency=None):
+        """记录请求的最终结果，并用同一结果完成等待中的重复行"""
+        settle(task, result, source=source, latency=latency)
+        for follower in coalescer.complete(task["question"], result):
+            settle(follower, result, source=SOURCE_COALESCED)
+
+    def resolve_without_request(task) -> bool:
+        """空问题和可合并的重复问题无需派发，返回是否已处理"""
+        if not task["question"].strip():
+            settle(task, ("", False, "问题为空", None))
+            return True
+        answered = coalescer.lookup(task["question"])
+        if answered is not None:
+            settle(task, answered, source=SOURCE_COALESCED)
+            return True
+        # 相同问题正在处理时挂起等待，结果返回后统一记录
+        return coalescer.join(task["question"], task)
+
+    progress = PlainProgress(total_tasks) if headless else None
+    live = None
+
+    def refresh(paused, stopping=False):
+        """刷新进度：交互模式更新 Live 表格，无人值守模式输出进度行"""
+        queue_depth = len(pending_tasks) + len(retry_queue)
+        _update_live_gauges(
+            in_flight=len(future_to_task),
+            queue_depth=queue_depth,
+            concurrency_limit=concurrency,
+            write_backlog=writer.backlog,
+        )
+        if progress is not None:
+            progress.update(
+                completed_count, failed_count, recent=metrics.recent.snapshot()
+            )
+            return
+        live.update(
+            _generate_worker_table(
+                worker_status,
+                completed_count,
+                total_tasks,
+                failed_count,
+                paused,
+                start_time,
+                stopping=stopping,
+                write_backlog=writer.backlog,
+                recent=metrics.recent.snapshot(),
+                queue_depth=queue_depth,
+            )
+        )
+
     # 临时禁用控制台日志，防止干扰 UI (修复重复 UI 问题)
-    from dify_chat_tester.config.logging import disable_console_logging, enable_console_logging
+    from dify_chat_tester.config.logging import (
+        disable_console_logging,
+        enable_console_logging,
+    )
+
     disable_console_logging()
 
     try:
-        with Live(
-            console=console, refresh_per_second=4
+        with (
+            nullcontext() if headless else Live(console=console, refresh_per_second=4)
         ) as live:
             with ThreadPoolExecutor(max_workers=concurrency) as executor:
-                # 提交任务字典 {future: (task_info, worker_id)}
+                # 在途任务 {future: (task_info, worker_id)}，完成后立即移除
                 future_to_task = {}
-                pending_tasks = list(tasks)  # 待提交的任务队列
-                active_futures = set()  # 当前活跃的 future
-                next_worker_id = 1  # 下一个可用的 worker ID
-
-                # 初始提交 concurrency 个任务
-                while pending_tasks and len(active_futures) < concurrency:
-                    task = pending_tasks.pop(0)
-                    if not task["question"].strip():
-                        # 空问题直接标记为完成
-                        results_buffer[task["index"]] = ("", False, "问题为空", None)
-                        completed_count += 1
-                        failed_count += 1
-                        continue
-
-                    worker_id = next_worker_id
-                    next_worker_id = (next_worker_id % concurrency) + 1
-
-                    worker_status[worker_id] = {
-                        "state": "处理中",
-                        "question": task["question"],
-                        "errors": 0,
-                    }
+                free_workers = list(range(concurrency, 0, -1))  # 空闲的 worker ID
+                stopping = False  # 停止标志
 
-                    future = executor.submit(
-                        _process_with_retry,
-                        provider,
-                        task["question"],
-                        selected_model,
-                        selected_role,
-                        enable_thinking,
-                        3,  # max_retries
-                        worker_status,  # 传递 worker_status
-                        worker_id,  # 传递 worker_id
-                    )
-                    future_to_task[future] = (task, worker_id)
-                    active_futures.add(future)
-
-                # 更新显示
-                live.update(
-                    _generate_worker_table(
-                        worker_status,
-                        completed_count,
-                        total_tasks,
-                        failed_count,
-                        kb_control.paused,
-                        start_time,
-                        stopping=False,
-                    )
-                )
+                def next_task():
+                    """优先取已到重试时间的任务，其次取新任务"""
+                    task = retry_queue.pop_ready()
+                    if task is not None:
+                        return task
+                    while pending_tasks:
+                        task = pending_tasks.popleft()
+                        if not resolve_without_request(task):
+                            return task
+                    return None
+
+                def fill_slots():
+                    """给空闲线程派发任务（停止后不再派发）"""
+                    while free_workers and not stopping:
+                        task = next_task()
+                        if task is None:
+                            return
+                        worker_id = free_workers.pop()
+                        attempts = task.get("attempts", 0)
+                        task["timing"] = {}  # 每次请求单独计时
+                        worker_status[worker_id] = {
+                            "state": "重试中" if attempts else "处理中",
+                            "question": task["question"],
+                            "response": "",
+                            "errors": attempts,
+                        }
+                        future = executor.submit(
+                            _process_task,
+                            provider,
+                            task["question"],
+                            selected_model,
+                            selected_role,
+                            enable_thinking,
+                            0,  # 单次请求，失败后由重试队列按退避策略重新派发
+                            worker_status,  # 传递 worker_status
+                            worker_id,  # 传递 worker_id
+                            response_cache,
+                            task["cache_key"],
+                            task["timing"],
+                        )
+                        task["started"] = time.time()
+                        future_to_task[future] = (task, worker_id)
 
-                stopping = False  # 停止标志
+                fill_slots()
+                refresh(kb_control.paused, False)
 
-                # 处理完成的任务并提交新任务
-                while active_futures or pending_tasks:
+                # 处理完成的任务并派发新任务和到期的重试任务
+                while future_to_task or pending_tasks or len(retry_queue):
                     # 检查用户是否请求停止
                     if kb_control.stop_requested and not stopping:
                         stopping = True
                         user_stopped = True
                         # 清空待处理任务，进入"排水"模式
                         pending_tasks.clear()
+                        # 等待重试的行以最后一次失败结果记录
+                        for task in retry_queue.drain():
+                            finish(
+                                task,
+                                _final_failure(
+                                    task.pop("last_result"), task["attempts"]
+                                ),
+                            )
+                        # 停止时立即落盘已完成的结果
+                        writer.flush(wait=False)
                         # 立即刷新 UI 显示停止状态
                         kb_control.state_changed = False
-                        live.update(
-                            _generate_worker_table(
-                                worker_status,
-                                completed_count,
-                                total_tasks,
-                                failed_count,
-                                False,
-                                start_time,
-                                stopping=True,
-                            )
-                        )
-
-                    # 如果所有任务都已完成（包括正在运行的），退出循环
-                    if not active_futures and not pending_tasks:
-                        break
+                        refresh(False, True)
+                        continue
 
                     # 如果暂停，只更新显示，不处理新任务
                     # 注意：如果正在停止，忽略暂停请求，优先停止
                     if kb_control.paused and not stopping:
                         # 暂停状态通过表格标题显示，不使用 console.print
+                        if not getattr(kb_control, "_pause_notified", False):
+                            # 刚进入暂停时落盘一次，便于用户此时查看日志
+                            writer.flush(wait=False)
                         kb_control._pause_notified = True
-                        live.update(
-                            _generate_worker_table(
-                                worker_status,
-                                completed_count,
-                                total_tasks,
-                                failed_count,
-                                True,
-                                start_time,
-                            )
-                        )
+                        refresh(True, False)
                         time.sleep(0.3)
                         continue
                     else:
                         # 从暂停恢复时重置标志
                         kb_control._pause_notified = False
 
+                    # 退避时间已到的重试任务补到空闲线程
+                    fill_slots()
+                    timeout = 0.5
+                    retry_in = retry_queue.next_ready_in()
+                    if retry_in is not None and free_workers:
+                        timeout = min(timeout, retry_in)
+
+                    if not future_to_task:
+                        # 只剩等待退避的重试任务
+                        time.sleep(timeout)
+                        refresh(kb_control.paused, stopping)
+                        continue
+
                     # 等待任意一个任务完成
-                    done, active_futures = wait_for_any(active_futures, timeout=0.5)
+                    done, _ = wait_for_any(set(future_to_task), timeout=timeout)
 
                     # 如果没有任务完成且正在停止，更新UI显示状态
                     if not done and stopping:
-                        live.update(
-                            _generate_worker_table(
-                                worker_status,
-                                completed_count,
-                                total_tasks,
-                                failed_count,
-                                False,
-                                start_time,
-                                stopping=True,
-                            )
-                        )
+                        refresh(False, True)
                         continue
 
                     for future in done:
-                        task, worker_id = future_to_task[future]
+                        task, worker_id = future_to_task.pop(future)
+                        free_workers.append(worker_id)
                         try:
-                            future_result = future.result()
-                            # _process_with_retry 返回 (result, retry_count)
-                            result, retry_count = future_result
+                            # _process_task 返回 (result, retry_count, source)
+                            result, _, source = future.result()
                         except Exception as e:
                             result = ("", False, str(e), None)
-                            retry_count = 0
+                            source = ""
+                        task["attempts"] = attempts = task.get("attempts", 0) + 1
 
-                        results_buffer[task["index"]] = result
-                        completed_count += 1
-
-                        # 更新状态和错误计数（只显示当前任务的重试次数）
+                        # 更新状态和错误计数（显示当前行已失败的次数）
                         response, success, error, conversation_id = result
-                        response_preview = response[-35:] if response else ""
+                        if tracer is not None:
+                            tracer.request(
+                                task["row_idx"],
+                                worker_id,
+                                attempts,
+                                task.get("queued", start_time),
+                                task["started"],
+                                task["timing"].get("end", time.time()),
+                                task["timing"],
+                                success,
+                                source,
+                            )
                         if success:
                             worker_status[worker_id] = {
                                 "state": "完成",
                                 "question": task["question"],
-                                "response": response_preview,
-                                "errors": retry_count,  # 当前任务重试次数
+                                "response": response[-35:] if response else "",
+                                "errors": attempts - 1,
                             }
                         else:
                             worker_status[worker_id] = {
                                 "state": "失败",
                                 "question": task["question"],
                                 "response": error[:30] if error else "",  # 错误信息预览
-                                "errors": retry_count,
-                            }
-                            failed_count += 1
-
-                        # 【实时保存】立即写入 Excel
-                        log_to_excel(
-                            output_worksheet,
-                            [
-                                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                                selected_role,
-                                task["doc_name"],
-                                task["question"],
-                                response,
-                                success,
-                                error,
-                                conversation_id or "",
-                            ],
-                        )
-                        queries_since_last_save += 1
-
-                        # 每 N 条保存文件
-                        if queries_since_last_save >= SAVE_EVERY_N_QUERIES:
-                            try:
-                                output_workbook.save(output_file_name)
-                                queries_since_last_save = 0
-                            except Exception:
-                                pass  # 忽略保存错误，最后再处理
-
-                        # 提交下一个任务（如果有且未停止）
-                        while pending_tasks:
-                            if stopping:
-                                break
-
-                            next_task = pending_tasks.pop(0)
-                            if not next_task["question"].strip():
-                                results_buffer[next_task["index"]] = (
-                                    "",
-                                    False,
-                                    "问题为空",
-                                    None,
-                                )
-                                completed_count += 1
-                                failed_count += 1
-                                continue
-
-                            # 新任务开始，重试次数归零
-                            worker_status[worker_id] = {
-                                "state": "处理中",
-                                "question": next_task["question"],
-                                "response": "",
-                                "errors": 0,
+                                "errors": attempts,
                             }
 
-                            new_future = executor.submit(
-                                _process_with_retry,
-                                provider,
-                                next_task["question"],
-                                selected_model,
-                                selected_role,
-                                enable_thinking,
-                                3,  # max_retries
-                                worker_status,  # 传递 worker_status
-                                worker_id,  # 传递 worker_id
-                            )
-                            future_to_task[new_future] = (next_task, worker_id)
-                            active_futures.add(new_future)
-                            break
-                        else:
-                            # 没有更多任务，将 worker 标记为空闲
-                            if worker_id in worker_status:
-                                old_q = worker_status[worker_id].get("question", "")
-                                old_errors = worker_status[worker_id].get("errors", 0)
-                                worker_status[worker_id] = {
-                                    "state": "完成",
-                                    "question": old_q,
-                                    "errors": old_errors,
-                                }
+                        # 失败时放回重试队列，退避结束后由空闲线程重试
+                        if (
+                            not success
+                            and not stopping
+                            and retry_policy.should_retry(attempts)
+                        ):
+                            task["last_result"] = result
+                            task["queued"] = time.time()
+                            retry_queue.push(task, retry_policy.delay(attempts))
+                            retries_scheduled += 1
+                            METRICS_REGISTRY.inc("retries_total")
+                            continue
+
+                        result = _final_failure(result, attempts)
+                        task.pop("last_result", None)
+                        # 【实时保存】交给后台写入线程，按间隔批量保存
+                        latency = None if source else time.time() - task["started"]
+                        finish(task, result, source=source, latency=latency)
+
+                    # 提交下一个任务（如果有且未停止）
+                    fill_slots()
 
                     # 更新显示
-                    live.update(
-                        _generate_worker_table(
-                            worker_status,
-                            completed_count,
-                            total_tasks,
-                            failed_count,
-                            kb_control.paused,
-                            start_time,
-                            stopping=stopping,
-                        )
-                    )
+                    refresh(kb_control.paused, stopping)
 
     except KeyboardInterrupt:
         # 立即停止键盘交互检测
@@ -863,93 +1307,31 @@ def _run_concurrent_batch(
         # 刷新标准输出以确保消息立即显示
         sys.stdout.flush()
 
-        # 尝试保存已完成的结果
-        try:
-            output_workbook.save(output_file_name)
+        # 尝试保存已完成的结果（等待写入线程清空队列）
+        if reorder is not None:
+            reorder.close()
+        writer.close(timeout=30)
+        if writer.last_error:
+            print_error(f"保存进度失败: {writer.last_error}")
+        else:
             print_success(f"进度已保存到: {output_file_name}")
-        except Exception as e:
-            print_error(f"保存进度失败: {e}")
+        if tracer is not None:
+            _report_trace()
+        _report_run_metrics(metrics, time.time() - start_time, output_file_name)
 
-        # 快速强制退出
+        if headless:
+            # 无人值守模式交给调用方以“中断”退出码结束，main 的 finally（剖析输出等）照常执行
+            raise
+
+        # 交互模式快速强制退出
         os._exit(0)
     finally:
         # 恢复控制台日志
         enable_console_logging()
         kb_control.stop()
 
-    # 收集所有失败的任务进行批量重试
-    failed_tasks = []
-    for task in tasks:
-        idx = task["index"]
-        if idx in results_buffer:
-            result = results_buffer[idx]
-            if not result[1]:  # success == False
-                failed_tasks.append(task)
-
-    # 如果有失败任务且用户没有主动停止，进行批量重试
-    if failed_tasks and not user_stopped:
-        console.print(
-            f"\n[bold yellow]🔄 发现 {len(failed_tasks)} 个失败任务，开始批量重试...[/bold yellow]"
-        )
-
-        retry_success = 0
-        retry_failed = 0
-
-        with ThreadPoolExecutor(max_workers=concurrency) as retry_executor:
-            retry_futures = {}
-            for task in failed_tasks:
-                future = retry_executor.submit(
-                    _process_with_retry,
-                    provider,
-                    task["question"],
-                    selected_model,
-                    selected_role,
-                    enable_thinking,
-                    3,  # max_retries
-                )
-                retry_futures[future] = task
-
-            for future in as_completed(retry_futures):
-                task = retry_futures[future]
-                try:
-                    result, _ = future.result()
-                except Exception as e:
-                    result = ("", False, str(e), None)
-
-                # 更新结果缓冲区
-                results_buffer[task["index"]] = result
-                response, success, error, conversation_id = result
-
-                if success:
-                    retry_success += 1
-                else:
-                    retry_failed += 1
-
-                # 【实时保存】批量重试结果也立即写入
-                log_to_excel(
-                    output_worksheet,
-                    [
-                        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        selected_role,
-                        task["doc_name"],
-                        task["question"] + " (重试)",
-                        response,
-                        success,
-                        error,
-                        conversation_id or "",
-                    ],
-                )
-                queries_since_last_save += 1
-                if queries_since_last_save >= SAVE_EVERY_N_QUERIES:
-                    try:
-                        output_workbook.save(output_file_name)
-                        queries_since_last_save = 0
-                    except Exception:
-                        pass
-
-        console.print(
-            f"[bold green]✅ 批量重试完成: 成功 {retry_success}, 仍失败 {retry_failed}[/bold green]"
-        )
+    if progress is not None:
+        progress.update(completed_count, failed_count, force=True)
 
     # 统计已写入的结果（结果已在循环中实时保存到 Excel）
     if user_stopped:
@@ -958,43 +1340,56 @@ def _run_concurrent_batch(
         )
     else:
         console.print("\n[bold green]✅ 所有请求处理完成！[/bold green]")
-
-    # 统计结果
-    for task in tasks:
-        idx = task["index"]
-        if idx in results_buffer:
-            result = results_buffer[idx]
-            response, success, error, conversation_id = result
-
-            if not task["question"].strip():
-                failed_queries += 1
-            else:
-                total_queries += 1
-                if success:
-                    successful_queries += 1
-                else:
-                    failed_queries += 1
-
-            # 在最后显示失败的任务（可选）
-            if not success and task["question"].strip() and show_batch_response:
-                console.print(
-                    f"[dim red]✗ ({task['row_idx']}): {task['question'][:40]}... - {error}[/dim red]"
-                )
-
-    # 最终保存文件（确保所有数据持久化）
-    try:
-        output_workbook.save(output_file_name)
-    except Exception as e:
-        print_error(f"警告：保存日志时出错：{e}")
+    if retries_scheduled:
+        print_info(f"运行中自动重试 {retries_scheduled} 次（失败行按退避时间重新派发）")
+    if coalescer.coalesced:
+        print_info(f"已合并 {coalescer.coalesced} 条重复问题，复用了同一问题的结果")
+
+    # 统计结果（空问题只计入失败数）
+    successful_queries = row_status.count(_ROW_SUCCESS)
+    failed_queries = row_status.count(_ROW_FAILED) + row_status.count(_ROW_EMPTY)
+    total_queries = successful_queries + row_status.count(_ROW_FAILED)
+
+    # 在最后显示失败的任务（可选）
+    for row_idx, question, error in sorted(failed_rows):
+        console.print(f"[dim red]✗ ({row_idx}): {question}... - {error}[/dim red]")
+
+    # 最终保存文件（关闭写入线程，确保所有数据持久化）
+    if reorder is not None:
+        reorder.close()
+        if reorder.spilled_rows:
+            print_info(
+                f"有序输出期间 {reorder.spilled_rows} 行暂存到临时文件"
+                f"（最多同时等待 {reorder.peak_held} 行）"
+            )
+    writer.close()
+    if writer.last_error:
+        print_error(f"警告：{writer.last_error}")
+    if tracer is not None:
+        _report_trace()
 
     end_time = time.time()
     total_duration = end_time - start_time
 
     # 打印统计
-    print_statistics(total_queries, successful_queries, failed_queries, total_duration)
+    print_statistics(
+        total_queries,
+        successful_queries,
+        failed_queries,
+        total_duration,
+        cache_hits=response_cache.hits if response_cache is not None else None,
+        cache_misses=response_cache.misses if response_cache is not None else None,
+    )
+    _report_run_metrics(metrics, total_duration, output_file_name)
 
     # 汇总信息（复用部分逻辑，从简）
     print_success(f"并发批量处理完成。日志已保存至: {output_file_name}")
+    return {
+        "total": total_queries,
+        "success": successful_queries,
+        "failed": failed_queries,
+        "duration": total_duration,
+    }
 
 
 def run_batch_query(
@@ -1005,6 +1400,9 @@ def run_batch_query(
     batch_request_interval: float,
     batch_default_show_response: bool,
     concurrency: int = 1,
+    provider_id: str = None,
+    use_cache: bool = None,
+    targets=None,
 ):
     """运行批量询问模式
 
@@ -1016,6 +1414,9 @@ def run_batch_query(
         batch_request_interval: 请求间隔时间（秒）
         batch_default_show_response: 是否默认显示响应
         concurrency: 并发数（1=串行，2-10=并发）
+        provider_id: 供应商 ID（用于响应缓存键）
+        use_cache: 是否使用响应缓存（None 时按 RESPONSE_CACHE_ENABLED 配置）
+        targets: 多目标对比时的 MatrixTarget 列表；提供时每个问题会同时发给所有目标
     """
     # 获取配置
     config = get_config()
@@ -1030,12 +1431,17 @@ def run_batch_query(
     mode_text.append(f"{selected_role}\n", style="bold cyan")
     mode_text.append("💬 供应商: ", style="bold yellow")
     mode_text.append(f"{provider_name}", style="bold cyan")
+    if targets:
+        mode_text = Text()
+        mode_text.append(f"🎯 对比目标 ({len(targets)} 个):", style="bold yellow")
+        for target in targets:
+            mode_text.append(f"\n  • {target.name}", style="bold cyan")
 
     # Dify 不再需要显示应用 ID
 
     mode_panel = Panel(
         mode_text,
-        title="[bold]📄 批量询问模式[/bold]",
+        title=f"[bold]📄 {'多目标对比模式' if targets else '批量询问模式'}[/bold]",
         border_style="bright_magenta",
         box=box.ROUNDED,
         padding=(1, 2),
@@ -1152,7 +1558,7 @@ def run_batch_query(
     # 注意：如果上面切换了文件，input_basename 已经更新
     input_dir = os.path.dirname(selected_excel_file) or "."
     input_basename = os.path.splitext(os.path.basename(selected_excel_file))[0]
-    default_output_name = f"{input_basename}_log.xlsx"
+    default_output_name = f"{input_basename}_{'matrix_' if targets else ''}log.xlsx"
 
     # 让用户确认或修改输出文件名
     console.print(
@@ -1181,52 +1587,87 @@ def run_batch_query(
 
     # 默认从第二行开始（第一行为表头）
     resume_from_row = 2
+    # 检查点索引（按输入行号记录结果），为 None 表示不按行跳过
+    resume_index = None
 
-    # 检测是否存在日志文件以判断进度
-    if os.path.exists(output_file_name):
+    # 检测是否存在日志文件以判断进度（多目标对比每次重新生成结果文件）
+    if not targets and os.path.exists(output_file_name):
         try:
-            # 尝试读取现有的日志文件
-            existing_wb = openpyxl.load_workbook(output_file_name)
-            existing_ws = existing_wb.active
-            if existing_ws and existing_ws.max_row > 1:
-                # 日志文件存在且有数据（不止表头）
-                last_row = existing_ws.max_row
-                # 理论上，日志行数 = 已处理行数 + 1 (表头)
-                # 所以下一行输入行号 = 日志最大行号 + 1
-                # 例如：日志有表头(1) + 1条数据(2) -> max_row=2 ->已处理1条 -> 下一条是输入文件的第3行
-                # 验证：输入头(1) + 数据1(2). 输出头(1) + 数据1(2). resume = 2 + 1 = 3. 正确.
-                potential_resume_row = last_row + 1
-
-                if potential_resume_row <= batch_worksheet.max_row + 1:
-                    processed_count = last_row - 1
-                    console.print(
-                        Panel(
-                            f"检测到历史日志文件: [bold cyan]{output_file_name}[/bold cyan]\n"
-                            f"已处理记录数: [bold green]{processed_count}[/bold green]\n"
-                            f"上次结束位置: 第 {last_row} 行 (对应输入文件第 {potential_resume_row - 1} 行)",
-                            title="[bold yellow]📋 恢复进度提示[/bold yellow]",
-                            border_style="yellow",
-                            box=box.ROUNDED,
-                        )
+            checkpoint = load_checkpoint_index(output_file_name)
+            if checkpoint:
+                # 新版日志：每条记录都带有输入行号和问题哈希
+                succeeded, failed = summarize_index(checkpoint)
+                console.print(
+                    Panel(
+                        f"检测到历史日志文件: [bold cyan]{output_file_name}[/bold cyan]\n"
+                        f"已成功的输入行: [bold green]{succeeded}[/bold green]\n"
+                        f"仅有失败记录的输入行: [bold red]{failed}[/bold red]\n"
+                        f"继续处理时只会派发尚无成功结果的行（问题内容变化的行也会重新处理）。",
+                        title="[bold yellow]📋 恢复进度提示[/bold yellow]",
+                        border_style="yellow",
+                        box=box.ROUNDED,
                     )
+                )
 
-                    resume_choice = (
-                        print_input_prompt(
-                            f"是否从第 {potential_resume_row} 行继续处理？(Y/n，选择 n 将覆盖旧日志)"
-                        )
-                        .strip()
-                        .lower()
+                resume_choice = (
+                    print_input_prompt(
+                        "是否跳过已成功的行继续处理？(Y/n，选择 n 将覆盖旧日志)"
                     )
+                    .strip()
+                    .lower()
+                )
 
-                    if not resume_choice or resume_choice in ("y", "yes"):
-                        resume_from_row = potential_resume_row
-                        print_success(f"已恢复进度，将从第 {resume_from_row} 行开始。")
-                    else:
-                        print_warning("已选择重新开始，旧的日志文件将被覆盖！")
-                        resume_from_row = 2
+                if not resume_choice or resume_choice in ("y", "yes"):
+                    resume_index = checkpoint
+                    print_success(f"已恢复进度，将跳过 {succeeded} 个已成功的行。")
+                else:
+                    print_warning("已选择重新开始，旧的日志文件将被覆盖！")
+            elif checkpoint is None:
+                # 旧版日志没有输入行号列，只能按日志行数推断进度
+                existing_wb = openpyxl.load_workbook(output_file_name, read_only=True)
+                existing_ws = existing_wb.active
+                last_row = existing_ws.max_row if existing_ws else 0
+                existing_wb.close()
+                if last_row and last_row > 1:
+                    # 日志文件存在且有数据（不止表头）
+                    # 理论上，日志行数 = 已处理行数 + 1 (表头)
+                    # 所以下一行输入行号 = 日志最大行号 + 1
+                    potential_resume_row = last_row + 1
+
+                    if potential_resume_row <= batch_worksheet.max_row + 1:
+                        processed_count = last_row - 1
+                        console.print(
+                            Panel(
+                                f"检测到历史日志文件: [bold cyan]{output_file_name}[/bold cyan]\n"
+                                f"已处理记录数: [bold green]{processed_count}[/bold green]\n"
+                                f"上次结束位置: 第 {last_row} 行 (对应输入文件第 {potential_resume_row - 1} 行)\n"
+                                f"[dim]旧版日志未记录输入行号，并发模式下的进度可能不准确。[/dim]",
+                                title="[bold yellow]📋 恢复进度提示[/bold yellow]",
+                                border_style="yellow",
+                                box=box.ROUNDED,
+                            )
+                        )
+
+                        resume_choice = (
+                            print_input_prompt(
+                                f"是否从第 {potential_resume_row} 行继续处理？(Y/n，选择 n 将覆盖旧日志)"
+                            )
+                            .strip()
+                            .lower()
+                        )
+
+                        if not resume_choice or resume_choice in ("y", "yes"):
+                            resume_from_row = potential_resume_row
+                            print_success(
+                                f"已恢复进度，将从第 {resume_from_row} 行开始。"
+                            )
+                        else:
+                            print_warning("已选择重新开始，旧的日志文件将被覆盖！")
+                            resume_from_row = 2
         except Exception as e:
             print_error(f"读取现有日志文件失败: {e}，将重新开始。")
             resume_from_row = 2
+            resume_index = None
 
     # 获取列名
     column_names = [cell.value for cell in batch_worksheet[1]]
@@ -1244,6 +1685,17 @@ def run_batch_query(
 
     question_col_index = select_column_by_index(column_names, "请选择问题所在列的序号")
 
+    if targets:
+        _run_matrix_mode(
+            targets,
+            batch_worksheet,
+            question_col_index,
+            doc_name_col_index,
+            output_file_name,
+            enable_thinking,
+        )
+        return
+
     # 注意：不再创建或使用回答列，所有结果只记录到日志文件
 
     # 询问是否显示每个问题的回答内容（回车则使用配置中的默认值）
@@ -1288,7 +1740,12 @@ def run_batch_query(
     # 如果我们选择了"不恢复"（resume_from_row=2），意味着我们想重写。
     # 所以如果 resume_from_row == 2 且文件存在，我们需要删除它以便 init_excel_log 创建新的（或者清空内容）。
     # 简单做法：如果 resume_from_row == 2，先尝试删除旧文件。
-    if resume_from_row == 2 and os.path.exists(output_file_name):
+    # 按检查点恢复时沿用旧日志，新结果追加在后面
+    if (
+        resume_index is None
+        and resume_from_row == 2
+        and os.path.exists(output_file_name)
+    ):
         try:
             os.remove(output_file_name)
         except Exception:
@@ -1303,10 +1760,17 @@ def run_batch_query(
         "是否成功",
         "错误信息",
         "sessions id",
+        ROW_ID_HEADER,
+        HASH_HEADER,
+        SOURCE_HEADER,
+        LATENCY_HEADER,
     ]
     output_workbook, output_worksheet = init_excel_log(
         output_file_name, batch_log_headers
     )
+    if resume_index is None and resume_from_row > 2:
+        # 按日志行数续跑的旧版日志：补写输入行号，下次续跑即可按检查点跳过
+        backfill_legacy_rows(output_worksheet)
 
     # 由子函数处理统计，这里只计算总行数
 
@@ -1319,14 +1783,33 @@ def run_batch_query(
         print_success("检测到该文件的所有问题均已处理完成，无需继续。")
         return
 
-    print(
-        f"\n开始批量询问... (共 {total_rows} 行数据，当前从第 {resume_from_row} 行开始)"
-    )
+    if resume_index:
+        pending_rows = sum(
+            1
+            for row_idx in range(2, real_max_row + 1)
+            if not is_row_done(
+                resume_index,
+                row_idx,
+                batch_worksheet.cell(row=row_idx, column=question_col_index + 1).value,
+            )
+        )
+        if pending_rows == 0:
+            print_success("检测到该文件的所有问题均已成功处理，无需继续。")
+            return
+        print(f"\n开始批量询问... (共 {total_rows} 行数据，待处理 {pending_rows} 行)")
+    else:
+        print(
+            f"\n开始批量询问... (共 {total_rows} 行数据，当前从第 {resume_from_row} 行开始)"
+        )
 
-    # 根据并发数选择处理模式
-    if concurrency > 1:
-        # 并发模式
-        _run_concurrent_batch(
+    # 响应缓存（可选）
+    response_cache = open_response_cache(config, enabled=use_cache) if config else None
+    if response_cache is not None:
+        print_info(f"已启用响应缓存: {response_cache.path}（{len(response_cache)} 条）")
+
+    try:
+        _dispatch_batch(
+            concurrency,
             provider=provider,
             batch_worksheet=batch_worksheet,
             output_worksheet=output_worksheet,
@@ -1340,25 +1823,70 @@ def run_batch_query(
             provider_name=provider_name,
             enable_thinking=enable_thinking,
             show_batch_response=show_batch_response,
-            concurrency=concurrency,
+            batch_show_indicator=batch_show_indicator,
+            request_interval=request_interval,
+            resume_index=resume_index,
+            response_cache=response_cache,
+            provider_id=provider_id,
         )
+    finally:
+        if response_cache is not None:
+            response_cache.close()
+
+
+def _run_matrix_mode(
+    targets,
+    batch_worksheet,
+    question_col_index,
+    doc_name_col_index,
+    output_file_name,
+    enable_thinking,
+):
+    """选择结果布局并运行多目标对比"""
+    from dify_chat_tester.core.matrix import (
+        LAYOUT_COLUMNS,
+        LAYOUT_SHEETS,
+        run_matrix_batch,
+    )
+
+    config = get_config()
+    default_layout = (
+        config.get_str("BATCH_MATRIX_LAYOUT", LAYOUT_COLUMNS)
+        if config
+        else LAYOUT_COLUMNS
+    )
+    layout_choice = print_input_prompt(
+        "结果布局：1. 同一工作表并排列  2. 每个目标单独工作表（直接回车使用配置默认值）"
+    ).strip()
+    if layout_choice == "1":
+        layout = LAYOUT_COLUMNS
+    elif layout_choice == "2":
+        layout = LAYOUT_SHEETS
+    else:
+        layout = LAYOUT_SHEETS if default_layout == LAYOUT_SHEETS else LAYOUT_COLUMNS
+
+    if os.path.exists(output_file_name):
+        print_warning(f"结果文件 '{output_file_name}' 已存在，将被覆盖。")
+
+    run_matrix_batch(
+        targets,
+        batch_worksheet,
+        question_col_index,
+        doc_name_col_index,
+        output_file_name,
+        enable_thinking=enable_thinking,
+        layout=layout,
+        save_every=_save_interval(),
+    )
+
+
+def _dispatch_batch(concurrency, batch_show_indicator, request_interval, **kwargs):
+    """根据并发数选择串行或并发处理模式"""
+    if concurrency > 1:
+        _run_concurrent_batch(concurrency=concurrency, **kwargs)
     else:
-        # 串行模式（原有逻辑）
         _run_sequential_batch(
-            provider=provider,
-            batch_worksheet=batch_worksheet,
-            output_worksheet=output_worksheet,
-            output_workbook=output_workbook,
-            output_file_name=output_file_name,
-            resume_from_row=resume_from_row,
-            question_col_index=question_col_index,
-            doc_name_col_index=doc_name_col_index,
-            selected_role=selected_role,
-            selected_model=selected_model,
-            provider_name=provider_name,
-            enable_thinking=enable_thinking,
-            show_batch_response=show_batch_response,
             batch_show_indicator=batch_show_indicator,
             request_interval=request_interval,
+            **kwargs,
         )
-    return
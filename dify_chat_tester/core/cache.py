@@ -0,0 +1,197 @@
+"""
+响应缓存模块
+基于 SQLite (WAL) 的持久化响应缓存，用于批量回归测试时复用未变化配置下的回答
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+from dify_chat_tester.config.logging import get_logger
+
+logger = get_logger("dify_chat_tester.cache")
+
+# 每写入多少条执行一次淘汰
+_EVICT_EVERY_N_PUTS = 100
+
+
+def _digest(text) -> str:
+    return hashlib.sha256(str(text or "").encode("utf-8")).hexdigest()
+
+
+def _provider_attr(provider, name: str) -> str:
+    """读取供应商的字符串属性，不存在或非字符串时返回空串"""
+    value = getattr(provider, name, "")
+    return value if isinstance(value, str) else ""
+
+
+def build_cache_key(
+    provider_id: str,
+    provider,
+    model: str,
+    role: str,
+    question: str,
+    system_prompt: str = "",
+) -> str:
+    """生成缓存键
+
+    由供应商 ID、base_url、应用/密钥指纹、模型、角色、系统提示词哈希和问题文本组成。
+    API 密钥只以哈希形式参与计算，不会写入缓存文件。
+    """
+    material = {
+        "provider_id": provider_id or provider.__class__.__name__,
+        "base_url": _provider_attr(provider, "base_url"),
+        "app_id": _provider_attr(provider, "app_id"),
+        "api_key": _digest(_provider_attr(provider, "api_key")),
+        "model": model or "",
+        "role": role or "",
+        "system_prompt": _digest(system_prompt),
+        "question": str(question).strip(),
+    }
+    return _digest(json.dumps(material, ensure_ascii=False, sort_keys=True))
+
+
+class ResponseCache:
+    """线程安全的 SQLite 响应缓存
+
+    只缓存成功的回答；按 TTL 过期，并在条目数超过 max_entries 时
+    淘汰最久未访问的记录。
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 86400, max_entries: int = 50000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._puts_since_evict = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                conversation_id TEXT,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access)"
+        )
+        self._conn.commit()
+        self.evict()
+
+    def get(self, key: str) -> Optional[Tuple[str, Optional[str]]]:
+        """查询缓存，命中时返回 (response, conversation_id)"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, conversation_id, created_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None or (
+                self.ttl_seconds > 0 and now - row[2] > self.ttl_seconds
+            ):
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE responses SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return row[0], row[1]
+
+    def put(self, key: str, response: str, conversation_id: Optional[str] = None):
+        """写入一条成功的回答"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, response, conversation_id, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, response, conversation_id, now, now),
+            )
+            self._conn.commit()
+            self._puts_since_evict += 1
+            should_evict = self._puts_since_evict >= _EVICT_EVERY_N_PUTS
+        if should_evict:
+            self.evict()
+
+    def evict(self) -> int:
+        """删除过期记录并把条目数控制在 max_entries 以内，返回删除条数"""
+        with self._lock:
+            self._puts_since_evict = 0
+            removed = 0
+            if self.ttl_seconds > 0:
+                cursor = self._conn.execute(
+                    "DELETE FROM responses WHERE created_at < ?",
+                    (time.time() - self.ttl_seconds,),
+                )
+                removed += cursor.rowcount
+            count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_entries:
+                cursor = self._conn.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+                removed += cursor.rowcount
+            self._conn.commit()
+        if removed:
+            logger.debug(f"响应缓存淘汰 {removed} 条记录")
+        return removed
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+
+
+def open_response_cache(config, enabled: Optional[bool] = None):
+    """根据配置打开响应缓存
+
+    Args:
+        config: 配置加载器
+        enabled: 显式开关（命令行 --cache / --no-cache）；None 时使用
+                 RESPONSE_CACHE_ENABLED 配置
+
+    Returns:
+        ResponseCache | None: 未启用或打开失败时返回 None
+    """
+    if enabled is None:
+        enabled = config.get_bool("RESPONSE_CACHE_ENABLED", False)
+    if not enabled:
+        return None
+
+    path = config.get_str("RESPONSE_CACHE_PATH", "") or os.path.join(
+        ".cache", "responses.sqlite3"
+    )
+    try:
+        return ResponseCache(
+            path,
+            ttl_seconds=config.get_float("RESPONSE_CACHE_TTL", 86400),
+            max_entries=config.get_int("RESPONSE_CACHE_MAX_ENTRIES", 50000),
+        )
+    except Exception as e:
+        logger.warning(f"无法打开响应缓存 {path}: {e}")
+        return None
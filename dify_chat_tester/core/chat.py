@@ -13,7 +13,8 @@ from dify_chat_tester.cli.terminal import (
     print_success,
 )
 from dify_chat_tester.config.loader import get_config
-from dify_chat_tester.utils.excel import init_excel_log, log_to_excel
+from dify_chat_tester.core.writer import LogWriter
+from dify_chat_tester.utils.excel import init_excel_log
 
 # 每多少轮对话保存一次聊天日志
 SAVE_EVERY_N_ROUNDS = 5
@@ -44,6 +45,10 @@ def run_interactive_chat(
         "对话ID",
     ]
     workbook, worksheet = init_excel_log(chat_log_file_name, chat_headers)
+    # 后台写入线程负责追加和保存，避免保存文件时阻塞对话
+    writer = LogWriter(
+        workbook, worksheet, chat_log_file_name, save_every=SAVE_EVERY_N_ROUNDS
+    ).start()
 
     print_success(f"已选择角色: {selected_role}")
     print_success(f"已选择模型: {selected_model}")
@@ -58,6 +63,37 @@ def run_interactive_chat(
     )
     console.print()
 
+    try:
+        _chat_loop(
+            provider,
+            selected_role,
+            provider_name,
+            selected_model,
+            provider_id,
+            enable_thinking,
+            writer,
+        )
+    finally:
+        # 退出（含 Ctrl+C）时写入剩余日志并保存
+        writer.close()
+        if writer.last_error:
+            print_error(f"警告：{writer.last_error}")
+        try:
+            workbook.close()
+        except Exception:
+            pass  # 静默处理错误
+
+
+def _chat_loop(
+    provider,
+    selected_role: str,
+    provider_name: str,
+    selected_model: str,
+    provider_id,
+    enable_thinking: bool,
+    writer: LogWriter,
+):
+    """会话模式主循环，日志通过 writer 异步写入"""
     # 多轮对话支持
     conversation_id = None  # 对话ID，用于维护Dify的多轮对话上下文
     history = []  # 对话历史，用于维护OpenAI/iFlow的多轮对话上下文
@@ -84,11 +120,7 @@ def run_interactive_chat(
 
         # 处理退出命令 - 返回运行模式选择
         if user_input.lower() in ["/exit", "/quit"]:
-            # 关闭工作簿（日志已实时保存）
-            try:
-                workbook.close()
-            except Exception:
-                pass  # 静默处理错误
+            # 日志由调用方在返回时统一落盘并关闭工作簿
             return  # 直接返回，不显示任何消息
 
         # 处理开启新对话命令
@@ -230,9 +262,8 @@ def run_interactive_chat(
                 if len(history) > 20:
                     history = history[-20:]
 
-        # 记录到 Excel
-        log_to_excel(
-            worksheet,
+        # 记录到 Excel（写入线程按 SAVE_EVERY_N_ROUNDS 轮批量保存）
+        writer.write(
             [
                 timestamp,
                 selected_role,
@@ -242,18 +273,7 @@ def run_interactive_chat(
                 error,
                 conversation_round,
                 conversation_id or "",  # 确保传递字符串（None时用空字符串）
-            ],
+            ]
         )
 
-        # 按轮次批量保存日志，减少 IO 频率
-        if conversation_round % SAVE_EVERY_N_ROUNDS == 0:
-            try:
-                workbook.save(chat_log_file_name)
-            except PermissionError:
-                print_error(
-                    f"警告：无法保存日志文件 '{chat_log_file_name}'。请确保文件未被其他程序打开。"
-                )
-            except Exception as e:
-                print_error(f"警告：保存日志时出错：{e}")
-
     # 注意：循环通过 /exit 或 /quit 返回调用方，此处不再额外处理
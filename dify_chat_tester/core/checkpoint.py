@@ -0,0 +1,146 @@
+"""
+断点续跑模块
+根据日志中记录的输入行号和问题哈希构建检查点索引，用于恢复批量处理进度
+"""
+
+import hashlib
+from typing import Dict, Optional, Tuple
+
+import openpyxl
+
+# 批量日志中用于标识输入行的列
+ROW_ID_HEADER = "输入行号"
+HASH_HEADER = "问题哈希"
+SUCCESS_HEADER = "是否成功"
+# 结果来源：实时请求留空，缓存命中等情况写入对应标记
+SOURCE_HEADER = "结果来源"
+# 单行最后一次请求的耗时（秒），缓存命中和合并行留空
+LATENCY_HEADER = "耗时(秒)"
+
+# 原始问题列（旧版日志据此补写问题哈希）
+QUESTION_HEADER = "原始问题"
+
+# 检查点索引：{输入行号: (问题哈希, 是否成功)}
+CheckpointIndex = Dict[int, Tuple[str, bool]]
+
+
+def question_hash(question) -> str:
+    """计算问题文本的短哈希（忽略首尾空白）"""
+    text = "" if question is None else str(question).strip()
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def is_success(value) -> bool:
+    """解析日志中的“是否成功”单元格（写入时为 True/False 字符串）"""
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("true", "1", "yes", "是")
+
+
+def load_checkpoint_index(log_file: str) -> Optional[CheckpointIndex]:
+    """从批量日志文件构建检查点索引
+
+    同一输入行可能有多条记录（失败后重试），只要有一条成功即视为完成。
+
+    Args:
+        log_file: 批量日志文件路径
+
+    Returns:
+        CheckpointIndex: 检查点索引；日志缺少“输入行号”列（旧版本日志）时返回 None
+    """
+    workbook = openpyxl.load_workbook(log_file, read_only=True)
+    try:
+        worksheet = workbook.active
+        rows = worksheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if not header:
+            return None
+
+        header = [str(h).strip() if h is not None else "" for h in header]
+        if ROW_ID_HEADER not in header or SUCCESS_HEADER not in header:
+            return None
+
+        row_col = header.index(ROW_ID_HEADER)
+        success_col = header.index(SUCCESS_HEADER)
+        hash_col = header.index(HASH_HEADER) if HASH_HEADER in header else None
+
+        index: CheckpointIndex = {}
+        for values in rows:
+            if values is None or len(values) <= row_col:
+                continue
+            try:
+                row_idx = int(values[row_col])
+            except (TypeError, ValueError):
+                continue
+
+            success = len(values) > success_col and is_success(values[success_col])
+            digest = ""
+            if hash_col is not None and len(values) > hash_col:
+                digest = str(values[hash_col] or "")
+
+            previous = index.get(row_idx)
+            if previous is not None and previous[1] and not success:
+                continue  # 已有成功记录，忽略后续失败记录
+            index[row_idx] = (digest, success)
+        return index
+    finally:
+        workbook.close()
+
+
+def backfill_legacy_rows(worksheet) -> int:
+    """为旧版日志中没有输入行号的记录补写输入行号和问题哈希
+
+    旧版日志按输入顺序逐行记录，续跑时也按“日志第 n 行对应输入第 n 行”推断进度，
+    这里沿用同一对应关系；问题哈希按记录中的原始问题计算，与输入不一致的行在续跑时会被重新处理。
+    表头需已由 init_excel_log 补齐新列。
+
+    Returns:
+        int: 补写的记录数
+    """
+    header = [
+        str(cell.value).strip() if cell.value is not None else ""
+        for cell in worksheet[1]
+    ]
+    if ROW_ID_HEADER not in header or QUESTION_HEADER not in header:
+        return 0
+    row_col = header.index(ROW_ID_HEADER) + 1
+    question_col = header.index(QUESTION_HEADER) + 1
+    hash_col = header.index(HASH_HEADER) + 1 if HASH_HEADER in header else None
+
+    filled = 0
+    for row in range(2, worksheet.max_row + 1):
+        if worksheet.cell(row=row, column=row_col).value not in (None, ""):
+            continue
+        worksheet.cell(row=row, column=row_col, value=row)
+        if hash_col is not None:
+            question = worksheet.cell(row=row, column=question_col).value
+            worksheet.cell(row=row, column=hash_col, value=question_hash(question))
+        filled += 1
+    return filled
+
+
+def is_row_done(index: Optional[CheckpointIndex], row_idx: int, question) -> bool:
+    """判断输入行是否已有结果，无需再次请求
+
+    问题哈希不一致（输入文件被修改过）时视为未完成，需要重新处理。
+    空问题不会发送请求，日志中已有该行的记录即视为完成。
+    """
+    if not index:
+        return False
+    entry = index.get(row_idx)
+    if entry is None:
+        return False
+    if question is None or not str(question).strip():
+        return True
+    digest, success = entry
+    if not success:
+        return False
+    return not digest or digest == question_hash(question)
+
+
+def summarize_index(index: Optional[CheckpointIndex]) -> Tuple[int, int]:
+    """统计检查点索引中的 (成功行数, 失败行数)"""
+    if not index:
+        return 0, 0
+    succeeded = sum(1 for _, success in index.values() if success)
+    return succeeded, len(index) - succeeded
@@ -0,0 +1,94 @@
+"""
+重复问题合并模块
+同一批次中相同的问题只请求一次，其余重复行等待并复用该结果（single-flight）
+"""
+
+from typing import Dict, List, Optional
+
+from dify_chat_tester.core.checkpoint import question_hash
+
+
+class QuestionCoalescer:
+    """按问题文本合并重复请求
+
+    只由调度线程调用，无需加锁：
+    - lookup() 查询本次运行中已成功回答的问题；
+    - join() 在相同问题正在处理时登记等待，否则把调用方登记为首个请求；
+    - complete() 在首个请求结束后取出所有等待的重复行。
+
+    失败的结果不会被记住，之后再出现的相同问题会重新请求。
+
+    调用方预先通过 expect() 登记每个问题的出现次数时，成功结果只保留到
+    最后一个重复行取走为止；未登记时保留到运行结束。
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.coalesced = 0  # 复用结果的重复行数
+        self._answered: Dict[str, tuple] = {}
+        self._waiters: Dict[str, List[dict]] = {}
+        self._remaining: Dict[str, int] = {}  # {合并键: 尚未登记的出现次数}
+        self._bounded = False
+
+    def expect(self, question):
+        """预先登记一次问题出现，用于在最后一个重复行取走结果后释放该结果"""
+        if not self.enabled:
+            return
+        self._bounded = True
+        key = self.key(question)
+        self._remaining[key] = self._remaining.get(key, 0) + 1
+
+    def _consume(self, key: str):
+        """一次出现已被处理；该问题不会再出现时释放已记住的结果"""
+        if not self._bounded:
+            return
+        remaining = self._remaining.get(key, 0) - 1
+        if remaining > 0:
+            self._remaining[key] = remaining
+        else:
+            self._remaining.pop(key, None)
+            self._answered.pop(key, None)
+
+    @staticmethod
+    def key(question) -> str:
+        """计算合并键（忽略首尾空白）"""
+        return question_hash(question)
+
+    def lookup(self, question) -> Optional[tuple]:
+        """返回本次运行中该问题的成功结果，没有时返回 None"""
+        if not self.enabled:
+            return None
+        key = self.key(question)
+        result = self._answered.get(key)
+        if result is not None:
+            self.coalesced += 1
+            self._consume(key)
+        return result
+
+    def join(self, question, task: dict) -> bool:
+        """登记一个即将处理的问题
+
+        Returns:
+            bool: True 表示相同问题正在处理，task 已加入等待列表，无需再派发；
+                  False 表示调用方是首个请求，需要正常派发
+        """
+        if not self.enabled:
+            return False
+        key = self.key(question)
+        self._consume(key)
+        waiters = self._waiters.get(key)
+        if waiters is None:
+            self._waiters[key] = []
+            return False
+        waiters.append(task)
+        self.coalesced += 1
+        return True
+
+    def complete(self, question, result: tuple) -> List[dict]:
+        """首个请求完成，返回等待该结果的重复任务列表"""
+        if not self.enabled:
+            return []
+        key = self.key(question)
+        if result[1] and (not self._bounded or key in self._remaining):
+            self._answered[key] = result
+        return self._waiters.pop(key, [])
@@ -0,0 +1,494 @@
+"""
+运行对比模块
+读取两次或多次批量运行的日志（Excel 批量日志或分片 JSONL 日志），按问题哈希对齐，
+用 pandas 向量化计算各次运行和各文档的成功率、延迟分布、回答长度变化和回答是否改变，
+并写出汇总工作簿。第一份日志作为基准，其余日志逐一与之比较。
+
+日志分块读取，回答文本在读取时即转换为长度和 64 位哈希，内存占用与回答长度无关。
+"""
+
+import glob
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from rich.table import Table
+
+from dify_chat_tester.cli.terminal import (
+    box,
+    console,
+    print_error,
+    print_info,
+    print_success,
+)
+from dify_chat_tester.config.logging import get_logger
+from dify_chat_tester.core.checkpoint import (
+    HASH_HEADER,
+    LATENCY_HEADER,
+    ROW_ID_HEADER,
+    SUCCESS_HEADER,
+    question_hash,
+)
+from dify_chat_tester.core.constants import EXIT_OK, EXIT_USAGE, JOURNAL_DIR
+
+logger = get_logger("dify_chat_tester.compare")
+
+# 分块读取的行数
+CHUNK_ROWS = 50_000
+
+# “差异明细”工作表默认最多写出的行数（openpyxl 写入约每秒数千行）
+MAX_DETAIL_ROWS = 10_000
+
+LATENCY_QUANTILES = (0.5, 0.9, 0.99)
+
+# 统一后的列
+COLUMNS = ["row", "hash", "doc_name", "question", "success", "latency", "error"]
+
+# 问题对比状态
+STATUS_SAME = "一致"
+STATUS_CHANGED = "答案变化"
+STATUS_REGRESSED = "新增失败"
+STATUS_FIXED = "修复"
+STATUS_BOTH_FAILED = "均失败"
+STATUS_ONLY_BASE = "仅基准"
+STATUS_ONLY_OTHER = "仅对比"
+
+# 差异明细的排列顺序：越靠前越需要关注
+_STATUS_ORDER = [
+    STATUS_REGRESSED,
+    STATUS_FIXED,
+    STATUS_CHANGED,
+    STATUS_BOTH_FAILED,
+    STATUS_ONLY_BASE,
+    STATUS_ONLY_OTHER,
+]
+
+_TRUE_VALUES = ("true", "1", "yes", "是")
+
+
+def _reduce_chunk(frame: pd.DataFrame) -> pd.DataFrame:
+    """把原始列转换为统一的类型，并把回答文本替换为长度和哈希"""
+    response = frame.pop("response").fillna("").astype(str)
+    frame["answer_len"] = response.str.len().astype("int32")
+    frame["answer_hash"] = pd.util.hash_pandas_object(response, index=False).values
+    success = frame["success"]
+    if success.dtype != bool:
+        success = success.astype(str).str.strip().str.lower().isin(_TRUE_VALUES)
+    frame["success"] = success
+    frame["latency"] = pd.to_numeric(frame["latency"], errors="coerce")
+    frame["row"] = pd.to_numeric(frame["row"], errors="coerce")
+    for column in ("doc_name", "question", "error", "hash"):
+        frame[column] = frame[column].fillna("").astype(str)
+    # 旧版日志没有问题哈希列，按问题文本补算
+    missing = frame["hash"] == ""
+    if missing.any():
+        frame.loc[missing, "hash"] = frame.loc[missing, "question"].map(question_hash)
+    # 对齐用的整数键：按字符串索引连接比按 uint64 慢一个数量级
+    frame["key"] = pd.util.hash_pandas_object(frame["hash"], index=False).values
+    return frame
+
+
+def _read_excel_chunks(path: str, chunk_rows: int):
+    """以只读模式逐块读取批量日志，按表头定位各列"""
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(h) if h is not None else "" for h in next(rows, ())]
+
+        def find(name):
+            return header.index(name) if name in header else None
+
+        # 响应列名为“<供应商名>响应”
+        response_col = next(
+            (i for i, h in enumerate(header) if h.endswith("响应")), None
+        )
+        positions = {
+            "row": find(ROW_ID_HEADER),
+            "hash": find(HASH_HEADER),
+            "doc_name": find("文档名称"),
+            "question": find("原始问题"),
+            "response": response_col,
+            "success": find(SUCCESS_HEADER),
+            "latency": find(LATENCY_HEADER),
+            "error": find("错误信息"),
+        }
+        if positions["question"] is None or positions["success"] is None:
+            raise ValueError(f"{path} 不是批量日志（缺少“原始问题”或“是否成功”列）")
+
+        buffer = []
+        for values in rows:
+            if not values or all(v is None for v in values):
+                continue
+            buffer.append(values)
+            if len(buffer) >= chunk_rows:
+                yield _excel_frame(buffer, positions)
+                buffer = []
+        if buffer:
+            yield _excel_frame(buffer, positions)
+    finally:
+        workbook.close()
+
+
+def _excel_frame(rows: list, positions: Dict[str, Optional[int]]) -> pd.DataFrame:
+    width = max(len(r) for r in rows)
+    raw = pd.DataFrame.from_records(rows, columns=range(width))
+    frame = pd.DataFrame(index=raw.index)
+    for name, position in positions.items():
+        frame[name] = raw[position] if position is not None else None
+    return frame
+
+
+def _journal_files(path: str) -> List[str]:
+    if os.path.isdir(path):
+        files = sorted(glob.glob(os.path.join(path, JOURNAL_DIR, "*.jsonl")))
+        if not files:
+            raise ValueError(f"{path} 中没有分片日志（{JOURNAL_DIR}/*.jsonl）")
+        return files
+    return [path]
+
+
+def _read_journal_chunks(path: str, chunk_rows: int):
+    """逐块读取分片 JSONL 日志（单个文件或分片共享目录）"""
+    for file_path in _journal_files(path):
+        # 跳过中断时留下的半行
+        with open(file_path, encoding="utf-8") as f:
+            lines = []
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    lines.append(json.loads(line))
+                except ValueError:
+                    continue
+                if len(lines) >= chunk_rows:
+                    yield _journal_frame(lines)
+                    lines = []
+            if lines:
+                yield _journal_frame(lines)
+
+
+def _journal_frame(records: list) -> pd.DataFrame:
+    frame = pd.DataFrame.from_records(records)
+    for column in COLUMNS + ["response"]:
+        if column not in frame:
+            frame[column] = None
+    return frame[COLUMNS + ["response"]]
+
+
+def load_run(path: str, chunk_rows: int = CHUNK_ROWS) -> pd.DataFrame:
+    """读取一份运行日志，返回统一列的 DataFrame
+
+    .xlsx 按批量日志读取；.jsonl 文件或分片共享目录按分片日志读取。
+
+    Raises:
+        ValueError: 文件格式无法识别
+    """
+    if os.path.isdir(path) or path.lower().endswith((".jsonl", ".json")):
+        chunks = _read_journal_chunks(path, chunk_rows)
+    else:
+        chunks = _read_excel_chunks(path, chunk_rows)
+    frames = [_reduce_chunk(chunk) for chunk in chunks]
+    if not frames:
+        return _reduce_chunk(pd.DataFrame(columns=COLUMNS + ["response"]))
+    return pd.concat(frames, ignore_index=True)
+
+
+def final_results(run: pd.DataFrame) -> pd.DataFrame:
+    """每个问题取一条最终结果：有成功记录时取最后一次成功，否则取最后一次失败"""
+    ordered = run.sort_values("success", kind="stable")
+    return ordered.drop_duplicates("key", keep="last").set_index("key")
+
+
+def _latency_columns(grouped) -> pd.DataFrame:
+    quantiles = grouped["latency"].quantile(list(LATENCY_QUANTILES)).unstack()
+    quantiles.columns = [f"延迟P{int(q * 100)}(秒)" for q in quantiles.columns]
+    return quantiles
+
+
+def run_overview(runs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """各次运行的行数、成功率、延迟分布和平均回答长度"""
+    combined = pd.concat(runs, names=["运行", None]).reset_index(level=0)
+    grouped = combined.groupby("运行", sort=False)
+    overview = pd.DataFrame(
+        {
+            "行数": grouped.size(),
+            "问题数": grouped["key"].nunique(),
+            "成功率": grouped["success"].mean(),
+            "平均延迟(秒)": grouped["latency"].mean(),
+        }
+    )
+    overview = overview.join(_latency_columns(grouped))
+    overview["最大延迟(秒)"] = grouped["latency"].max()
+    overview["平均回答长度"] = grouped["answer_len"].mean()
+    return overview.reset_index()
+
+
+def doc_overview(runs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """按“文档名称”和运行统计成功率与延迟，每个文档一行，各运行并排"""
+    combined = pd.concat(runs, names=["运行", None]).reset_index(level=0)
+    combined = combined.rename(columns={"doc_name": "文档名称"})
+    grouped = combined.groupby(["文档名称", "运行"], sort=False)
+    stats = pd.DataFrame(
+        {
+            "行数": grouped.size(),
+            "成功率": grouped["success"].mean(),
+            "平均延迟(秒)": grouped["latency"].mean(),
+        }
+    ).join(_latency_columns(grouped)[["延迟P50(秒)", "延迟P90(秒)"]])
+    wide = stats.unstack("运行")
+    order = list(runs)
+    wide = wide.reindex(columns=pd.MultiIndex.from_product([stats.columns, order]))
+    wide.columns = [f"{metric}|{run}" for metric, run in wide.columns]
+    return wide.reset_index()
+
+
+def compare_pair(base: pd.DataFrame, other: pd.DataFrame) -> pd.DataFrame:
+    """按问题哈希对齐两次运行的最终结果，计算状态、延迟差和回答长度差"""
+    joined = final_results(base).join(
+        final_results(other), how="outer", lsuffix="_base", rsuffix="_other"
+    )
+    in_base = joined["row_base"].notna() | joined["question_base"].notna()
+    in_other = joined["row_other"].notna() | joined["question_other"].notna()
+    success_base = joined["success_base"].fillna(False).astype(bool)
+    success_other = joined["success_other"].fillna(False).astype(bool)
+    changed = joined["answer_hash_base"] != joined["answer_hash_other"]
+
+    status = np.select(
+        [
+            ~in_other,
+            ~in_base,
+            success_base & ~success_other,
+            ~success_base & success_other,
+            ~success_base & ~success_other,
+            changed,
+        ],
+        [
+            STATUS_ONLY_BASE,
+            STATUS_ONLY_OTHER,
+            STATUS_REGRESSED,
+            STATUS_FIXED,
+            STATUS_BOTH_FAILED,
+            STATUS_CHANGED,
+        ],
+        default=STATUS_SAME,
+    )
+    return pd.DataFrame(
+        {
+            "输入行号": joined["row_base"].fillna(joined["row_other"]),
+            "文档名称": joined["doc_name_base"].fillna(joined["doc_name_other"]),
+            "问题": joined["question_base"].fillna(joined["question_other"]),
+            "状态": status,
+            "答案变化": changed & in_base & in_other,
+            "基准成功": success_base,
+            "对比成功": success_other,
+            "基准长度": joined["answer_len_base"],
+            "对比长度": joined["answer_len_other"],
+            "长度变化": joined["answer_len_other"] - joined["answer_len_base"],
+            "基准延迟(秒)": joined["latency_base"],
+            "对比延迟(秒)": joined["latency_other"],
+            "延迟变化(秒)": joined["latency_other"] - joined["latency_base"],
+            "对比错误": joined["error_other"].fillna(""),
+            "问题哈希": joined["hash_base"].fillna(joined["hash_other"]),
+        },
+        index=joined.index,
+    )
+
+
+def pair_summary(label: str, pair: pd.DataFrame) -> dict:
+    """汇总一组对比：各状态数量、回答变化率和长度、延迟变化"""
+    counts = pair["状态"].value_counts()
+    common = pair[~pair["状态"].isin([STATUS_ONLY_BASE, STATUS_ONLY_OTHER])]
+    both_ok = common[common["基准成功"] & common["对比成功"]]
+    summary = {
+        "对比": label,
+        "共同问题": len(common),
+        "答案变化": int(counts.get(STATUS_CHANGED, 0)),
+        "答案变化率": (
+            counts.get(STATUS_CHANGED, 0) / len(both_ok) if len(both_ok) else 0.0
+        ),
+        "新增失败": int(counts.get(STATUS_REGRESSED, 0)),
+        "修复": int(counts.get(STATUS_FIXED, 0)),
+        "均失败": int(counts.get(STATUS_BOTH_FAILED, 0)),
+        "仅基准": int(counts.get(STATUS_ONLY_BASE, 0)),
+        "仅对比": int(counts.get(STATUS_ONLY_OTHER, 0)),
+        "平均长度变化": both_ok["长度变化"].mean(),
+        "延迟变化中位数(秒)": common["延迟变化(秒)"].median(),
+    }
+    return {
+        k: (None if isinstance(v, float) and np.isnan(v) else v)
+        for k, v in summary.items()
+    }
+
+
+def compare_runs(runs: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """对比多次运行，第一个运行为基准
+
+    Returns:
+        dict: {"overview", "docs", "pairs", "details": {对比标签: 逐题对比}}
+    """
+    if len(runs) < 2:
+        raise ValueError("至少需要两份日志才能对比")
+    labels = list(runs)
+    base_label = labels[0]
+    details = {}
+    summaries = []
+    for label in labels[1:]:
+        pair_label = f"{label} vs {base_label}"
+        pair = compare_pair(runs[base_label], runs[label])
+        details[pair_label] = pair
+        summaries.append(pair_summary(pair_label, pair))
+    return {
+        "overview": run_overview(runs),
+        "docs": doc_overview(runs),
+        "pairs": pd.DataFrame(summaries),
+        "details": details,
+    }
+
+
+def write_summary_workbook(
+    result: Dict[str, pd.DataFrame], path: str, max_detail_rows: int = MAX_DETAIL_ROWS
+) -> int:
+    """写出汇总工作簿：运行概览、按文档、对比概览，以及各组对比中状态不是“一致”的问题
+
+    差异明细按新增失败、修复、答案变化等顺序排列，最多写出 max_detail_rows 行。
+
+    Returns:
+        int: 差异明细的总行数（可能多于写出的行数）
+    """
+    detail_frames = []
+    for label, pair in result["details"].items():
+        differing = pair[pair["状态"] != STATUS_SAME]
+        detail_frames.append(differing.assign(对比=label))
+    details = (
+        pd.concat(detail_frames, ignore_index=True) if detail_frames else pd.DataFrame()
+    )
+    if len(details):
+        rank = pd.Categorical(details["状态"], categories=_STATUS_ORDER, ordered=True)
+        details = details.iloc[np.argsort(rank.codes, kind="stable")]
+
+    total = len(details)
+    if total > max_detail_rows:
+        logger.info(f"差异明细共 {total} 行，工作簿中写出前 {max_detail_rows} 行")
+        details = details.head(max_detail_rows)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        result["overview"].to_excel(writer, sheet_name="运行概览", index=False)
+        result["pairs"].to_excel(writer, sheet_name="对比概览", index=False)
+        result["docs"].to_excel(writer, sheet_name="按文档", index=False)
+        details.to_excel(writer, sheet_name="差异明细", index=False)
+    return total
+
+
+def run_labels(paths: Sequence[str], labels: Sequence[str] = None) -> List[str]:
+    """运行标签：默认为文件名（去掉扩展名），重名时追加序号"""
+    if labels:
+        if len(labels) != len(paths):
+            raise ValueError("--labels 的数量必须与日志数量一致")
+        return list(labels)
+    result = []
+    for path in paths:
+        label = os.path.splitext(os.path.basename(os.path.normpath(path)))[0]
+        candidate, n = label, 2
+        while candidate in result:
+            candidate, n = f"{label}#{n}", n + 1
+        result.append(candidate)
+    return result
+
+
+def _fmt(value, pattern="{:.3f}") -> str:
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return "-"
+    return pattern.format(value)
+
+
+def print_compare_report(result: Dict[str, pd.DataFrame]):
+    """打印运行概览和对比概览"""
+    table = Table(title="📊 运行概览", box=box.ROUNDED)
+    for column in (
+        "运行",
+        "行数",
+        "成功率",
+        "延迟P50",
+        "延迟P90",
+        "延迟P99",
+        "平均长度",
+    ):
+        table.add_column(column, justify="left" if column == "运行" else "right")
+    for row in result["overview"].to_dict("records"):
+        table.add_row(
+            str(row["运行"]),
+            str(row["行数"]),
+            f"{row['成功率']:.1%}",
+            *[_fmt(row[f"延迟P{q}(秒)"]) for q in (50, 90, 99)],
+            _fmt(row["平均回答长度"], "{:.0f}"),
+        )
+    console.print(table)
+
+    table = Table(title="🔍 与基准对比", box=box.ROUNDED)
+    for column in (
+        "对比",
+        "共同问题",
+        "答案变化",
+        "新增失败",
+        "修复",
+        "长度变化",
+        "延迟变化",
+    ):
+        table.add_column(column, justify="left" if column == "对比" else "right")
+    for row in result["pairs"].to_dict("records"):
+        table.add_row(
+            row["对比"],
+            str(row["共同问题"]),
+            f"{row['答案变化']}（{row['答案变化率']:.1%}）",
+            str(row["新增失败"]),
+            str(row["修复"]),
+            _fmt(row["平均长度变化"], "{:+.1f}"),
+            _fmt(row["延迟变化中位数(秒)"], "{:+.3f}"),
+        )
+    console.print(table)
+
+
+def run_compare(
+    paths: Sequence[str],
+    output_path: str = None,
+    labels: Sequence[str] = None,
+    max_detail_rows: int = None,
+) -> int:
+    """对比多份运行日志并写出汇总工作簿（--mode compare）
+
+    Returns:
+        int: 进程退出码
+    """
+    if not paths or len(paths) < 2:
+        print_error("对比需要通过 --logs 指定至少两份日志（第一份为基准）")
+        return EXIT_USAGE
+    output_path = (
+        output_path or f"compare_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    )
+    max_detail_rows = MAX_DETAIL_ROWS if max_detail_rows is None else max_detail_rows
+
+    try:
+        runs = {}
+        for label, path in zip(run_labels(paths, labels), paths):
+            print_info(f"读取 {label}: {path}")
+            runs[label] = load_run(path)
+    except (OSError, ValueError) as e:
+        print_error(f"读取日志失败: {e}")
+        return EXIT_USAGE
+
+    result = compare_runs(runs)
+    print_compare_report(result)
+    total = write_summary_workbook(result, output_path, max_detail_rows)
+    print_success(f"对比汇总已保存至: {output_path}")
+    if total > max_detail_rows:
+        print_info(
+            f"差异明细共 {total} 行，按新增失败、修复、答案变化的顺序写出前 "
+            f"{max_detail_rows} 行（可用 --max-detail-rows 调整）"
+        )
+    return EXIT_OK
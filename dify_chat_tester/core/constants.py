@@ -0,0 +1,17 @@
+"""
+公共常量
+多个运行模式共用的退出码和分片共享目录结构。本模块不依赖其他模块，
+只需读取这些常量的地方（如 --mode compare）不必加载批量引擎和供应商。
+"""
+
+# 退出码
+EXIT_OK = 0
+EXIT_FAILURE_RATE = 1  # 失败率超过阈值
+EXIT_USAGE = 2  # 参数或配置错误
+EXIT_INTERRUPTED = 130  # 被 Ctrl+C 中断，已完成的结果已保存，可按检查点续跑
+
+# 分片共享目录中的任务清单和子目录
+MANIFEST_FILE = "manifest.json"
+LEASE_DIR = "leases"
+JOURNAL_DIR = "journals"
+DONE_DIR = "done"
@@ -0,0 +1,243 @@
+"""
+指标导出模块
+在后台线程中提供本地 HTTP 端点，以 Prometheus 文本格式（或按 Accept 头返回 OpenMetrics 格式）
+导出批量运行的计数器、仪表和延迟直方图，便于接入现有监控系统
+"""
+
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+from dify_chat_tester.config.loader import get_config
+from dify_chat_tester.config.logging import get_logger
+
+logger = get_logger("dify_chat_tester.exporter")
+
+PREFIX = "dify_chat_tester_"
+
+# 延迟直方图的桶上界（秒）
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+
+_COUNTER = "counter"
+_GAUGE = "gauge"
+_HISTOGRAM = "histogram"
+
+_PROMETHEUS_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+_OPENMETRICS_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """线程安全的指标注册表
+
+    指标需先通过 counter() / gauge() / histogram() 声明，之后由任意线程调用
+    inc() / set() / observe() 更新；render() 生成导出文本。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta: Dict[str, Tuple[str, str]] = {}  # {名称: (类型, 说明)}
+        self._values: Dict[str, Dict[tuple, float]] = {}  # {名称: {标签: 值}}
+        self._histograms: Dict[str, dict] = {}
+
+    def counter(self, name: str, help_text: str):
+        self._declare(name, _COUNTER, help_text)
+
+    def gauge(self, name: str, help_text: str):
+        self._declare(name, _GAUGE, help_text)
+
+    def histogram(self, name: str, help_text: str, buckets=LATENCY_BUCKETS):
+        self._declare(name, _HISTOGRAM, help_text)
+        self._histograms[name] = {
+            "buckets": tuple(sorted(buckets)),
+            "counts": [0] * (len(buckets) + 1),  # 最后一个为 +Inf
+            "sum": 0.0,
+            "count": 0,
+        }
+
+    def _declare(self, name: str, kind: str, help_text: str):
+        with self._lock:
+            self._meta[name] = (kind, help_text)
+            self._values.setdefault(name, {})
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """计数器加 value"""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._values[name]
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        """设置仪表的当前值"""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[name][key] = value
+
+    def observe(self, name: str, value: float):
+        """向直方图记录一个值"""
+        with self._lock:
+            histogram = self._histograms[name]
+            histogram["counts"][bisect.bisect_left(histogram["buckets"], value)] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def value(self, name: str, **labels) -> float:
+        """读取计数器或仪表的当前值（不存在时为 0）"""
+        with self._lock:
+            return self._values[name].get(tuple(sorted(labels.items())), 0)
+
+    def render(self, openmetrics: bool = False) -> str:
+        """生成 Prometheus 文本格式；openmetrics 为 True 时生成 OpenMetrics 格式"""
+        lines = []
+        with self._lock:
+            for name, (kind, help_text) in self._meta.items():
+                full_name = PREFIX + name
+                # OpenMetrics 中计数器的指标族名不带 _total 后缀
+                family = (
+                    full_name[: -len("_total")]
+                    if openmetrics and kind == _COUNTER and name.endswith("_total")
+                    else full_name
+                )
+                lines.append(f"# HELP {family} {help_text}")
+                lines.append(f"# TYPE {family} {kind}")
+                if kind == _HISTOGRAM:
+                    histogram = self._histograms[name]
+                    cumulative = 0
+                    bounds = list(histogram["buckets"]) + [float("inf")]
+                    for bound, count in zip(bounds, histogram["counts"]):
+                        cumulative += count
+                        label = _format_labels((("le", _format_value(float(bound))),))
+                        lines.append(f"{full_name}_bucket{label} {cumulative}")
+                    lines.append(f"{full_name}_sum {histogram['sum']!r}")
+                    lines.append(f"{full_name}_count {histogram['count']}")
+                    continue
+                series = self._values[name] or {(): 0}
+                for labels, value in sorted(series.items()):
+                    lines.append(
+                        f"{full_name}{_format_labels(labels)} {_format_value(value)}"
+                    )
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+def _declare_batch_metrics(registry: MetricsRegistry):
+    registry.counter("rows_total", "已记录结果的输入行数（含缓存和合并行）")
+    registry.counter(
+        "requests_total", "实时请求的行数（重试的行只计最终一次，总请求数另加重试数）"
+    )
+    registry.counter("successes_total", "成功的行数")
+    registry.counter("failures_total", "失败的行数（按错误分类）")
+    registry.counter("retries_total", "运行中安排的重试次数")
+    registry.counter("output_tokens_total", "输出 token 数（未返回用量时为估算值）")
+    registry.gauge("in_flight_requests", "正在处理的请求数")
+    registry.gauge("queue_depth", "等待派发的任务数（含等待重试的任务）")
+    registry.gauge("concurrency_limit", "当前并发数上限")
+    registry.gauge("write_backlog", "等待写入日志的行数")
+    registry.histogram("request_latency_seconds", "单次请求总延迟（秒）")
+    registry.histogram("ttft_seconds", "首字延迟（秒）")
+
+
+# 进程内共享的批量指标注册表
+REGISTRY = MetricsRegistry()
+_declare_batch_metrics(REGISTRY)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+        body = self.registry.render(openmetrics=openmetrics).encode("utf-8")
+        self.send_response(200)
+        self.send_header(
+            "Content-Type", _OPENMETRICS_TYPE if openmetrics else _PROMETHEUS_TYPE
+        )
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """不输出访问日志，避免干扰终端界面"""
+
+
+class MetricsServer:
+    """在后台线程中运行的指标 HTTP 服务"""
+
+    def __init__(
+        self,
+        registry: MetricsRegistry = REGISTRY,
+        host: str = "127.0.0.1",
+        port: int = 9108,
+    ):
+        handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+        self._httpd = ThreadingHTTPServer((host, port), handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._httpd.server_address[:2]
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name="MetricsServer", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+_server: Optional[MetricsServer] = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int = None, host: str = None) -> Optional[MetricsServer]:
+    """启动进程内唯一的指标服务（已启动时直接返回）
+
+    port 为 None 时读取 METRICS_PORT 配置（默认 0，即不启用）；
+    host 为 None 时读取 METRICS_HOST（默认 127.0.0.1，只允许本机访问）。
+    端口被占用等错误只记录警告，不影响批量运行。
+    """
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+        config = get_config()
+        if port is None:
+            port = config.get_int("METRICS_PORT", 0) if config else 0
+        if not port or port <= 0:
+            return None
+        if host is None:
+            host = (
+                config.get_str("METRICS_HOST", "127.0.0.1") if config else "127.0.0.1"
+            )
+        try:
+            _server = MetricsServer(REGISTRY, host, port).start()
+        except OSError as e:
+            logger.warning(f"无法启动指标服务 {host}:{port}: {e}")
+            return None
+        logger.info(f"指标服务已启动: http://{host}:{port}/metrics")
+        return _server
@@ -0,0 +1,489 @@
+"""
+无人值守批量模块
+通过命令行参数或配置文件提供全部批量参数，不进行任何交互，适合定时任务和 CI
+"""
+
+import os
+
+import openpyxl
+
+from dify_chat_tester.cli.terminal import (
+    console,
+    print_error,
+    print_info,
+    print_success,
+    print_warning,
+)
+from dify_chat_tester.config.loader import get_config
+from dify_chat_tester.config.logging import get_logger
+from dify_chat_tester.core.batch import _process_single_question, _run_concurrent_batch
+from dify_chat_tester.core.cache import open_response_cache
+from dify_chat_tester.core.checkpoint import (
+    HASH_HEADER,
+    LATENCY_HEADER,
+    ROW_ID_HEADER,
+    SOURCE_HEADER,
+    load_checkpoint_index,
+    summarize_index,
+)
+from dify_chat_tester.core.constants import (
+    EXIT_FAILURE_RATE,
+    EXIT_INTERRUPTED,
+    EXIT_OK,
+    EXIT_USAGE,
+)
+from dify_chat_tester.core.loadtest import (
+    build_steps,
+    print_load_report,
+    run_load_test,
+    save_load_log,
+    summarize_steps,
+)
+from dify_chat_tester.core.shard import merge_shards, run_shard_worker
+from dify_chat_tester.providers.setup import setup_provider_from_config
+from dify_chat_tester.utils.excel import init_excel_log
+
+logger = get_logger("dify_chat_tester.headless")
+
+# 断点续跑策略
+RESUME_SKIP_SUCCESS = "resume"  # 跳过日志中已成功的行
+RESUME_RESTART = "restart"  # 删除旧日志重新开始
+
+
+def resolve_column(column_names, spec) -> int:
+    """把列名或从 1 开始的列序号解析为列索引（从 0 开始）
+
+    Raises:
+        ValueError: 找不到对应的列
+    """
+    names = ["" if name is None else str(name).strip() for name in column_names]
+    spec = str(spec).strip()
+    if spec in names:
+        return names.index(spec)
+    if spec.isdigit() and 1 <= int(spec) <= len(names):
+        return int(spec) - 1
+    raise ValueError(f"找不到问题列 '{spec}'，可用列: {', '.join(names)}")
+
+
+def _default_model(provider_id, provider, config) -> str:
+    """未指定模型时按配置或供应商默认列表选择第一个"""
+    configured = {
+        "openai": config.get_list("OPENAI_MODELS", ","),
+        "iflow": config.get_list("IFLOW_MODELS", ","),
+    }.get(provider_id) or []
+    models = configured or [m for m in (provider.get_models() or []) if m]
+    if not models:
+        raise ValueError("未指定模型，且无法获取供应商的默认模型列表")
+    return str(models[0])
+
+
+def run_headless_batch(
+    input_path: str = None,
+    question_column: str = None,
+    output_path: str = None,
+    provider_id: str = None,
+    model: str = None,
+    role: str = None,
+    concurrency: int = None,
+    resume_policy: str = None,
+    max_failure_rate: float = None,
+    use_cache: bool = None,
+    schedule: str = None,
+    ordered_output: bool = None,
+) -> int:
+    """运行无人值守批量询问
+
+    所有参数为 None 时依次回退到配置项 BATCH_INPUT_FILE、BATCH_QUESTION_COLUMN、
+    BATCH_OUTPUT_FILE、BATCH_PROVIDER、BATCH_MODEL、BATCH_ROLE、BATCH_CONCURRENCY、
+    BATCH_RESUME_POLICY 和 BATCH_MAX_FAILURE_RATE；schedule 为 None 时使用 BATCH_SCHEDULE_POLICY，
+    ordered_output 为 None 时使用 BATCH_ORDERED_OUTPUT。
+
+    Returns:
+        int: 进程退出码（0 成功，1 失败率超过阈值，2 参数或配置错误）
+    """
+    config = get_config()
+    input_path = input_path or config.get_str("BATCH_INPUT_FILE", "")
+    question_column = question_column or config.get_str("BATCH_QUESTION_COLUMN", "")
+    provider_id = provider_id or config.get_str("BATCH_PROVIDER", "")
+    model = model or config.get_str("BATCH_MODEL", "")
+    roles = config.get_list("ROLES", ",")
+    role = role or config.get_str("BATCH_ROLE", "") or (roles[0] if roles else "员工")
+    if concurrency is None:
+        concurrency = config.get_int("BATCH_CONCURRENCY", 1)
+    concurrency = max(1, concurrency)
+    resume_policy = resume_policy or config.get_str(
+        "BATCH_RESUME_POLICY", RESUME_SKIP_SUCCESS
+    )
+    if max_failure_rate is None:
+        max_failure_rate = config.get_float("BATCH_MAX_FAILURE_RATE", 0.1)
+
+    # 参数校验
+    if not input_path or not os.path.exists(input_path):
+        print_error(f"输入文件不存在: {input_path or '(未指定)'}")
+        return EXIT_USAGE
+    if not provider_id:
+        print_error("未指定供应商，请使用 --provider 或配置 BATCH_PROVIDER")
+        return EXIT_USAGE
+    if resume_policy not in (RESUME_SKIP_SUCCESS, RESUME_RESTART):
+        print_error(f"未知的续跑策略: {resume_policy}")
+        return EXIT_USAGE
+
+    if not output_path:
+        output_path = config.get_str("BATCH_OUTPUT_FILE", "")
+    if not output_path:
+        base = os.path.splitext(input_path)[0]
+        output_path = f"{base}_log.xlsx"
+
+    try:
+        provider = setup_provider_from_config(provider_id)
+        model = model or _default_model(provider_id, provider, config)
+    except ValueError as e:
+        print_error(str(e))
+        return EXIT_USAGE
+
+    batch_workbook = openpyxl.load_workbook(input_path)
+    batch_worksheet = batch_workbook.active
+    column_names = [cell.value for cell in batch_worksheet[1]]
+    try:
+        question_col_index = resolve_column(column_names, question_column or "问题")
+    except ValueError as e:
+        print_error(str(e))
+        return EXIT_USAGE
+    doc_name_col_index = (
+        column_names.index("文档名称") if "文档名称" in column_names else None
+    )
+
+    # 断点续跑
+    resume_index = None
+    if os.path.exists(output_path):
+        if resume_policy == RESUME_RESTART:
+            print_warning(f"按 restart 策略删除旧日志: {output_path}")
+            os.remove(output_path)
+        else:
+            resume_index = load_checkpoint_index(output_path)
+            if resume_index is None:
+                print_error(
+                    f"日志 '{output_path}' 为旧版格式，无法按行续跑；"
+                    "请使用 --resume restart 或指定新的输出文件"
+                )
+                return EXIT_USAGE
+            succeeded, failed = summarize_index(resume_index)
+            print_info(f"按检查点续跑：已成功 {succeeded} 行，失败 {failed} 行")
+
+    headers = [
+        "时间戳",
+        "角色",
+        "文档名称",
+        "原始问题",
+        f"{provider_id}响应",
+        "是否成功",
+        "错误信息",
+        "sessions id",
+        ROW_ID_HEADER,
+        HASH_HEADER,
+        SOURCE_HEADER,
+        LATENCY_HEADER,
+    ]
+    output_workbook, output_worksheet = init_excel_log(output_path, headers)
+
+    console.print(
+        f"无人值守批量: 输入={input_path} 输出={output_path} 供应商={provider_id} "
+        f"模型={model} 角色={role} 并发={concurrency}"
+    )
+
+    response_cache = open_response_cache(config, enabled=use_cache)
+    try:
+        summary = _run_concurrent_batch(
+            provider=provider,
+            batch_worksheet=batch_worksheet,
+            output_worksheet=output_worksheet,
+            output_workbook=output_workbook,
+            output_file_name=output_path,
+            resume_from_row=2,
+            question_col_index=question_col_index,
+            doc_name_col_index=doc_name_col_index,
+            selected_role=role,
+            selected_model=model,
+            provider_name=provider_id,
+            enable_thinking=config.get_enable_thinking(),
+            show_batch_response=False,
+            concurrency=concurrency,
+            resume_index=resume_index,
+            response_cache=response_cache,
+            provider_id=provider_id,
+            headless=True,
+            schedule=schedule,
+            ordered_output=ordered_output,
+        )
+    except KeyboardInterrupt:
+        print_warning(
+            f"批量处理被中断，以退出码 {EXIT_INTERRUPTED} 结束；"
+            "再次运行相同命令即可按检查点续跑"
+        )
+        return EXIT_INTERRUPTED
+    finally:
+        if response_cache is not None:
+            response_cache.close()
+
+    processed = summary["success"] + summary["failed"]
+    failure_rate = summary["failed"] / processed if processed else 0.0
+    if failure_rate > max_failure_rate:
+        print_error(
+            f"失败率 {failure_rate:.1%} 超过阈值 {max_failure_rate:.1%}，"
+            f"以退出码 {EXIT_FAILURE_RATE} 结束"
+        )
+        return EXIT_FAILURE_RATE
+
+    print_success(f"失败率 {failure_rate:.1%}（阈值 {max_failure_rate:.1%}）")
+    return EXIT_OK
+
+
+def _shard_ask(provider, model, role, enable_thinking):
+    """构造分片节点使用的单问题处理函数（带重试）"""
+    from dify_chat_tester.core.batch import _process_with_retry
+
+    def ask(question):
+        result, _ = _process_with_retry(
+            provider, question, model, role, enable_thinking, 3
+        )
+        return result
+
+    return ask
+
+
+def run_sharded_batch(
+    shared_dir: str = None,
+    input_path: str = None,
+    question_column: str = None,
+    provider_id: str = None,
+    model: str = None,
+    role: str = None,
+    concurrency: int = None,
+    node_id: str = None,
+    shard_size: int = None,
+    lease_ttl: float = None,
+    max_failure_rate: float = None,
+) -> int:
+    """作为分片节点运行无人值守批量询问
+
+    多个节点（可以在不同主机上）使用同一输入文件和共享目录，通过租约文件领取分片；
+    全部分片完成后任一节点执行 run_shard_merge 生成最终日志。
+    未指定的参数回退到 BATCH_* 和 SHARD_* 配置。
+
+    Returns:
+        int: 进程退出码
+    """
+    config = get_config()
+    shared_dir = shared_dir or config.get_str("SHARD_SHARED_DIR", "")
+    input_path = input_path or config.get_str("BATCH_INPUT_FILE", "")
+    question_column = question_column or config.get_str("BATCH_QUESTION_COLUMN", "")
+    provider_id = provider_id or config.get_str("BATCH_PROVIDER", "")
+    model = model or config.get_str("BATCH_MODEL", "")
+    roles = config.get_list("ROLES", ",")
+    role = role or config.get_str("BATCH_ROLE", "") or (roles[0] if roles else "员工")
+    if concurrency is None:
+        concurrency = config.get_int("BATCH_CONCURRENCY", 1)
+    shard_size = shard_size or config.get_int("SHARD_SIZE", 500)
+    lease_ttl = lease_ttl or config.get_float("SHARD_LEASE_TTL", 60.0)
+    if max_failure_rate is None:
+        max_failure_rate = config.get_float("BATCH_MAX_FAILURE_RATE", 0.1)
+
+    if not shared_dir:
+        print_error("未指定共享目录，请使用 --shared-dir 或配置 SHARD_SHARED_DIR")
+        return EXIT_USAGE
+    if not input_path or not os.path.exists(input_path):
+        print_error(f"输入文件不存在: {input_path or '(未指定)'}")
+        return EXIT_USAGE
+    if not provider_id:
+        print_error("未指定供应商，请使用 --provider 或配置 BATCH_PROVIDER")
+        return EXIT_USAGE
+
+    try:
+        provider = setup_provider_from_config(provider_id)
+        model = model or _default_model(provider_id, provider, config)
+        workbook = openpyxl.load_workbook(input_path, read_only=True)
+        column_names = [cell.value for cell in next(workbook.active.iter_rows())]
+        workbook.close()
+        question_col_index = resolve_column(column_names, question_column or "问题")
+    except ValueError as e:
+        print_error(str(e))
+        return EXIT_USAGE
+    doc_name_col_index = (
+        column_names.index("文档名称") if "文档名称" in column_names else None
+    )
+
+    try:
+        stats = run_shard_worker(
+            shared_dir,
+            input_path,
+            question_col_index,
+            _shard_ask(provider, model, role, config.get_enable_thinking()),
+            doc_name_col_index=doc_name_col_index,
+            node_id=node_id,
+            shard_size=shard_size,
+            lease_ttl=lease_ttl,
+            concurrency=max(1, concurrency),
+            on_event=lambda message: console.print(message, markup=False),
+        )
+    except ValueError as e:
+        print_error(str(e))
+        return EXIT_USAGE
+
+    processed = stats["success"] + stats["failed"]
+    failure_rate = stats["failed"] / processed if processed else 0.0
+    console.print(
+        f"本节点完成 {stats['shards']} 个分片：成功 {stats['success']}，"
+        f"失败 {stats['failed']}"
+    )
+    if failure_rate > max_failure_rate:
+        print_error(f"失败率 {failure_rate:.1%} 超过阈值 {max_failure_rate:.1%}")
+        return EXIT_FAILURE_RATE
+    return EXIT_OK
+
+
+def run_shard_merge(
+    shared_dir: str = None, output_path: str = None, role: str = None
+) -> int:
+    """合并共享目录中的分片日志，生成最终批量日志
+
+    Returns:
+        int: 进程退出码（有未处理的行时返回 1）
+    """
+    config = get_config()
+    shared_dir = shared_dir or config.get_str("SHARD_SHARED_DIR", "")
+    output_path = output_path or config.get_str("BATCH_OUTPUT_FILE", "")
+    if not shared_dir or not output_path:
+        print_error("合并需要指定 --shared-dir 和 --output")
+        return EXIT_USAGE
+    role = role or config.get_str("BATCH_ROLE", "")
+
+    try:
+        stats = merge_shards(shared_dir, output_path, selected_role=role)
+    except ValueError as e:
+        print_error(str(e))
+        return EXIT_USAGE
+
+    print_success(
+        f"已合并 {stats['rows']} 行（成功 {stats['success']}，失败 {stats['failed']}）"
+        f"到: {output_path}"
+    )
+    if stats["missing"]:
+        print_warning(
+            f"{len(stats['missing'])} 行尚未处理（首个: 第 {stats['missing'][0]} 行），"
+            "请确认所有分片节点已完成"
+        )
+        return EXIT_FAILURE_RATE
+    return EXIT_OK
+
+
+def run_headless_load_test(
+    input_path: str = None,
+    question_column: str = None,
+    output_path: str = None,
+    provider_id: str = None,
+    model: str = None,
+    role: str = None,
+    arrival: str = None,
+    rate: float = None,
+    duration: float = None,
+    steps: int = None,
+    step_increment: float = None,
+    max_in_flight: int = None,
+    seed: int = None,
+) -> int:
+    """运行开环压测
+
+    按目标到达速率循环发送输入文件中的问题，不等待上一个请求完成，
+    结束后输出各阶段的吞吐量和延迟分位数，并保存逐请求日志。
+    未指定的参数回退到 BATCH_* 和 LOADTEST_* 配置。
+
+    Returns:
+        int: 进程退出码（0 成功，1 失败率超过阈值，2 参数或配置错误）
+    """
+    config = get_config()
+    input_path = input_path or config.get_str("BATCH_INPUT_FILE", "")
+    question_column = question_column or config.get_str("BATCH_QUESTION_COLUMN", "")
+    provider_id = provider_id or config.get_str("BATCH_PROVIDER", "")
+    model = model or config.get_str("BATCH_MODEL", "")
+    roles = config.get_list("ROLES", ",")
+    role = role or config.get_str("BATCH_ROLE", "") or (roles[0] if roles else "员工")
+    arrival = arrival or config.get_str("LOADTEST_ARRIVAL", "constant")
+    rate = rate or config.get_float("LOADTEST_RATE", 1.0)
+    duration = duration or config.get_float("LOADTEST_DURATION", 60.0)
+    steps = steps or config.get_int("LOADTEST_STEPS", 4)
+    if step_increment is None and config.get_str("LOADTEST_STEP_INCREMENT", ""):
+        step_increment = config.get_float("LOADTEST_STEP_INCREMENT", rate)
+    max_in_flight = max_in_flight or config.get_int("LOADTEST_MAX_IN_FLIGHT", 256)
+    max_failure_rate = config.get_float("BATCH_MAX_FAILURE_RATE", 0.1)
+
+    if not input_path or not os.path.exists(input_path):
+        print_error(f"输入文件不存在: {input_path or '(未指定)'}")
+        return EXIT_USAGE
+    if not provider_id:
+        print_error("未指定供应商，请使用 --provider 或配置 BATCH_PROVIDER")
+        return EXIT_USAGE
+    if not output_path:
+        output_path = f"{os.path.splitext(input_path)[0]}_loadtest.xlsx"
+
+    try:
+        load_steps = build_steps(arrival, rate, duration, steps, step_increment)
+        provider = setup_provider_from_config(provider_id)
+        model = model or _default_model(provider_id, provider, config)
+        workbook = openpyxl.load_workbook(input_path, read_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+        column_names = list(next(rows, ()))
+        question_col_index = resolve_column(column_names, question_column or "问题")
+        questions = [
+            str(row[question_col_index])
+            for row in rows
+            if question_col_index < len(row) and row[question_col_index] is not None
+        ]
+        workbook.close()
+    except ValueError as e:
+        print_error(str(e))
+        return EXIT_USAGE
+
+    enable_thinking = config.get_enable_thinking()
+
+    def ask(question):
+        # 压测不重试：每个计划请求只发送一次，失败如实计入
+        return _process_single_question(
+            provider, question, model, role, enable_thinking
+        )
+
+    total = sum(int(step.rate * step.duration) for step in load_steps)
+    console.print(
+        f"开环压测: 输入={input_path} 供应商={provider_id} 模型={model} "
+        f"到达模式={arrival} 阶段数={len(load_steps)} 计划请求约 {total} 个",
+        markup=False,
+    )
+    try:
+        records = run_load_test(
+            ask,
+            questions,
+            load_steps,
+            arrival=arrival,
+            max_in_flight=max_in_flight,
+            seed=seed,
+            on_step=lambda index, step: console.print(
+                f"[压测] 阶段 {index + 1}: 目标 {step.rate:g} 次/秒，"
+                f"持续 {step.duration:g} 秒",
+                markup=False,
+            ),
+        )
+    except ValueError as e:
+        print_error(str(e))
+        return EXIT_USAGE
+
+    summaries = summarize_steps(records, load_steps)
+    print_load_report(summaries)
+    save_load_log(output_path, records, summaries)
+    print_success(f"压测日志已保存至: {output_path}")
+
+    completed = sum(s["completed"] for s in summaries)
+    failed = sum(s["failed"] for s in summaries)
+    failure_rate = failed / completed if completed else 0.0
+    if failure_rate > max_failure_rate:
+        print_error(f"失败率 {failure_rate:.1%} 超过阈值 {max_failure_rate:.1%}")
+        return EXIT_FAILURE_RATE
+    return EXIT_OK
@@ -0,0 +1,285 @@
+"""
+开环压测模块
+按目标到达速率（恒定、泊松或阶梯递增）发送问题，不等待上一个请求完成；
+记录每个请求的计划时间和实际开始时间，延迟从计划时间算起，避免协调遗漏（coordinated omission）
+"""
+
+import math
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+import openpyxl
+from rich.table import Table
+
+from dify_chat_tester.cli.terminal import box, console
+from dify_chat_tester.config.logging import get_logger
+
+logger = get_logger("dify_chat_tester.loadtest")
+
+# 到达模式
+ARRIVAL_CONSTANT = "constant"  # 固定间隔
+ARRIVAL_POISSON = "poisson"  # 泊松过程（指数分布间隔）
+ARRIVAL_STEP = "step"  # 阶梯递增，每一阶内固定间隔
+ARRIVALS = (ARRIVAL_CONSTANT, ARRIVAL_POISSON, ARRIVAL_STEP)
+
+# 报告中的延迟分位数
+PERCENTILES = (50, 90, 99)
+
+
+class LoadStep(NamedTuple):
+    """一个负载阶段：目标速率（请求/秒）和持续时间（秒）"""
+
+    rate: float
+    duration: float
+
+
+def build_steps(
+    arrival: str,
+    rate: float,
+    duration: float,
+    steps: int = 1,
+    step_increment: float = None,
+) -> List[LoadStep]:
+    """按到达模式生成负载阶段
+
+    constant 和 poisson 只有一个阶段；step 生成 steps 个阶段，
+    第 i 个阶段的速率为 rate + i * step_increment（默认每阶增加 rate）。
+
+    Raises:
+        ValueError: 参数不合法
+    """
+    if arrival not in ARRIVALS:
+        raise ValueError(f"未知的到达模式 '{arrival}'，可选: {', '.join(ARRIVALS)}")
+    if rate <= 0 or duration <= 0:
+        raise ValueError("目标速率和持续时间必须大于 0")
+    if arrival != ARRIVAL_STEP:
+        return [LoadStep(float(rate), float(duration))]
+    if steps < 1:
+        raise ValueError("阶梯数必须大于 0")
+    increment = rate if step_increment is None else step_increment
+    return [LoadStep(rate + i * increment, float(duration)) for i in range(steps)]
+
+
+def arrival_offsets(
+    steps: List[LoadStep], arrival: str, rng: random.Random = None
+) -> List[Tuple[float, int]]:
+    """计算每个请求的计划发送时间
+
+    Returns:
+        list: [(相对开始时间的秒数, 阶段序号)]，按时间排序
+    """
+    rng = rng or random.Random()
+    offsets = []
+    step_start = 0.0
+    for index, step in enumerate(steps):
+        step_end = step_start + step.duration
+        if step.rate > 0:
+            if arrival == ARRIVAL_POISSON:
+                t = step_start + rng.expovariate(step.rate)
+                while t < step_end:
+                    offsets.append((t, index))
+                    t += rng.expovariate(step.rate)
+            else:
+                count = int(math.floor(step.rate * step.duration + 1e-9))
+                offsets.extend(
+                    (step_start + k / step.rate, index) for k in range(count)
+                )
+        step_start = step_end
+    return offsets
+
+
+def _issue(ask: Callable, record: dict, start: float, clock: Callable):
+    """在工作线程中发送一个请求并记录实际开始和结束时间"""
+    record["started"] = clock() - start
+    try:
+        _, success, error, _ = ask(record["question"])
+    except Exception as e:
+        success, error = False, str(e)
+    record["finished"] = clock() - start
+    record["success"] = bool(success)
+    record["error"] = "" if success else (error or "未知错误")
+
+
+def run_load_test(
+    ask: Callable,
+    questions: List[str],
+    steps: List[LoadStep],
+    arrival: str = ARRIVAL_CONSTANT,
+    max_in_flight: int = 256,
+    seed: Optional[int] = None,
+    clock: Callable = time.monotonic,
+    sleep: Callable = time.sleep,
+    on_step: Callable = None,
+) -> List[dict]:
+    """按计划时间发送请求（开环），不等待已发送的请求完成
+
+    请求的计划时间由到达模式预先算好，调度线程只负责在计划时间把请求交给线程池；
+    在途请求达到 max_in_flight 时新请求在线程池队列中等待，这段等待计入
+    “开始延迟”和总延迟，而不是推迟计划时间。
+
+    Args:
+        ask: 发送单个问题的函数，返回 (response, success, error, conversation_id)
+        questions: 问题列表，按顺序循环使用
+        steps: 负载阶段
+        arrival: 到达模式
+        max_in_flight: 同时在途的最大请求数
+        seed: poisson 模式的随机种子
+        on_step: 进入新阶段时的回调，参数为 (阶段序号, LoadStep)
+
+    Returns:
+        list: 每个请求的记录，时间均为相对开始时间的秒数：
+              {"step", "question", "scheduled", "started", "finished", "success", "error"}；
+              中途停止时未开始的请求没有 "started"
+    """
+    questions = [q for q in questions if q and q.strip()]
+    if not questions:
+        raise ValueError("没有可发送的问题")
+    offsets = arrival_offsets(steps, arrival, random.Random(seed))
+    records = []
+    current_step = -1
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, max_in_flight), thread_name_prefix="LoadTest"
+    )
+    start = clock()
+    try:
+        for i, (offset, step_index) in enumerate(offsets):
+            delay = start + offset - clock()
+            if delay > 0:
+                sleep(delay)
+            if step_index != current_step:
+                current_step = step_index
+                if on_step:
+                    on_step(step_index, steps[step_index])
+            record = {
+                "step": step_index,
+                "question": questions[i % len(questions)],
+                "scheduled": offset,
+            }
+            records.append(record)
+            executor.submit(_issue, ask, record, start, clock)
+    except KeyboardInterrupt:
+        logger.info("压测被中断，不再发送新请求")
+        executor.shutdown(wait=True, cancel_futures=True)
+    else:
+        executor.shutdown(wait=True)
+    return records
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """最近秩法分位数（sorted_values 需已排序）"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize_steps(records: List[dict], steps: List[LoadStep]) -> List[dict]:
+    """按阶段汇总压测结果
+
+    - 延迟：从计划时间到完成（包含排队和开始延迟，已修正协调遗漏）；
+    - 服务时间：从实际开始到完成；
+    - 吞吐量：该阶段成功请求数 / 从阶段开始到该阶段最后一个请求完成的时间
+      （服务端跟不上时会低于目标速率）。
+    """
+    summaries = []
+    step_start = 0.0
+    for index, step in enumerate(steps):
+        step_records = [r for r in records if r["step"] == index]
+        finished = [r for r in step_records if "finished" in r]
+        latencies = sorted(r["finished"] - r["scheduled"] for r in finished)
+        services = sorted(r["finished"] - r["started"] for r in finished)
+        lags = [r["started"] - r["scheduled"] for r in finished]
+        success = sum(1 for r in finished if r["success"])
+        window = max([step.duration] + [r["finished"] - step_start for r in finished])
+        summary = {
+            "step": index + 1,
+            "target_rate": step.rate,
+            "duration": step.duration,
+            "scheduled": len(step_records),
+            "completed": len(finished),
+            "success": success,
+            "failed": len(finished) - success,
+            "throughput": success / window if window > 0 else 0.0,
+            "start_lag_max": max(lags) if lags else 0.0,
+            "latency_max": latencies[-1] if latencies else 0.0,
+            "service_p50": percentile(services, 50),
+        }
+        for p in PERCENTILES:
+            summary[f"latency_p{p}"] = percentile(latencies, p)
+        summaries.append(summary)
+        step_start += step.duration
+    return summaries
+
+
+def print_load_report(summaries: List[dict]):
+    """打印各阶段的目标速率、实际吞吐量和延迟分位数"""
+    table = Table(title="📈 压测结果（延迟从计划时间算起）", box=box.ROUNDED)
+    table.add_column("阶段", justify="right")
+    table.add_column("目标(次/秒)", justify="right")
+    table.add_column("吞吐(次/秒)", justify="right", style="cyan")
+    table.add_column("成功/完成/计划", justify="right")
+    for p in PERCENTILES:
+        table.add_column(f"P{p}(秒)", justify="right")
+    table.add_column("最大(秒)", justify="right")
+    table.add_column("服务P50(秒)", justify="right")
+    table.add_column("最大开始延迟(秒)", justify="right", style="yellow")
+    for s in summaries:
+        table.add_row(
+            str(s["step"]),
+            f"{s['target_rate']:.2f}",
+            f"{s['throughput']:.2f}",
+            f"{s['success']}/{s['completed']}/{s['scheduled']}",
+            *[f"{s[f'latency_p{p}']:.3f}" for p in PERCENTILES],
+            f"{s['latency_max']:.3f}",
+            f"{s['service_p50']:.3f}",
+            f"{s['start_lag_max']:.3f}",
+        )
+    console.print(table)
+
+
+def save_load_log(path: str, records: List[dict], summaries: List[dict]):
+    """保存压测日志：“请求”表记录每个请求，“阶段汇总”表记录各阶段统计"""
+    workbook = openpyxl.Workbook()
+    worksheet = workbook.active
+    worksheet.title = "请求"
+    worksheet.append(
+        [
+            "阶段",
+            "原始问题",
+            "计划时间(秒)",
+            "实际开始(秒)",
+            "开始延迟(秒)",
+            "服务时间(秒)",
+            "延迟(秒)",
+            "是否成功",
+            "错误信息",
+        ]
+    )
+    for r in records:
+        if "finished" not in r:
+            continue
+        worksheet.append(
+            [
+                r["step"] + 1,
+                r["question"],
+                round(r["scheduled"], 4),
+                round(r["started"], 4),
+                round(r["started"] - r["scheduled"], 4),
+                round(r["finished"] - r["started"], 4),
+                round(r["finished"] - r["scheduled"], 4),
+                str(r["success"]),
+                r["error"],
+            ]
+        )
+
+    summary_sheet = workbook.create_sheet("阶段汇总")
+    columns = list(summaries[0]) if summaries else []
+    summary_sheet.append(columns)
+    for s in summaries:
+        summary_sheet.append([s[c] for c in columns])
+    summary_sheet.append([])
+    summary_sheet.append(["生成时间", datetime.now().strftime("%Y-%m-%d %H:%M:%S")])
+    workbook.save(path)
@@ -0,0 +1,406 @@
+"""
+多目标对比模块
+一次读取输入文件，把每个问题同时分发给多个 (供应商, 模型, 角色) 目标，
+各目标独立限制并发数和请求速率，结果并排写入同一工作表或按目标分表保存
+"""
+
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import openpyxl
+from rich.table import Table
+
+from dify_chat_tester.cli.terminal import (
+    box,
+    console,
+    print_error,
+    print_info,
+    print_success,
+    print_warning,
+)
+from dify_chat_tester.config.logging import get_logger
+from dify_chat_tester.core.checkpoint import (
+    HASH_HEADER,
+    LATENCY_HEADER,
+    ROW_ID_HEADER,
+    SOURCE_HEADER,
+    question_hash,
+)
+from dify_chat_tester.core.writer import LogWriter
+
+logger = get_logger("dify_chat_tester.matrix")
+
+# 结果布局
+LAYOUT_COLUMNS = "columns"  # 同一工作表，每个目标占一组并排列
+LAYOUT_SHEETS = "sheets"  # 每个目标一个工作表
+
+
+class MatrixTarget:
+    """对比目标：一个供应商实例 + 模型 + 角色
+
+    Args:
+        provider: AI 提供商实例
+        model: 模型名称
+        role: 角色名称
+        name: 显示名称（用于列名和工作表名），默认由供应商、模型和角色拼接
+        provider_id: 供应商 ID
+        concurrency: 该目标的并发数
+        rate_limit: 该目标每秒最多发起的请求数（0 表示不限速）
+    """
+
+    def __init__(
+        self,
+        provider,
+        model: str,
+        role: str,
+        name: str = None,
+        provider_id: str = None,
+        concurrency: int = 2,
+        rate_limit: float = 0.0,
+    ):
+        self.provider = provider
+        self.model = model
+        self.role = role
+        self.provider_id = provider_id
+        self.concurrency = max(1, int(concurrency))
+        self.rate_limit = max(0.0, float(rate_limit or 0))
+        self.name = (
+            name or f"{provider_id or provider.__class__.__name__}/{model}/{role}"
+        )
+
+
+class RateLimiter:
+    """按固定间隔放行请求的限速器（线程安全）"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """阻塞直到获得下一个请求时间槽"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _sheet_title(name: str, used: set) -> str:
+    """生成合法且不重复的工作表名（最长 31 个字符）"""
+    base = re.sub(r"[\[\]:*?/\\]", "_", name).strip() or "目标"
+    title = base[:31]
+    suffix = 2
+    while title in used:
+        tag = f"_{suffix}"
+        title = base[: 31 - len(tag)] + tag
+        suffix += 1
+    used.add(title)
+    return title
+
+
+def _column_headers(targets):
+    headers = ["时间戳", "文档名称", "原始问题", ROW_ID_HEADER, HASH_HEADER]
+    for target in targets:
+        headers += [
+            f"{target.name}响应",
+            f"{target.name}是否成功",
+            f"{target.name}错误信息",
+        ]
+    return headers
+
+
+def _sheet_headers(target):
+    return [
+        "时间戳",
+        "角色",
+        "文档名称",
+        "原始问题",
+        f"{target.name}响应",
+        "是否成功",
+        "错误信息",
+        "sessions id",
+        ROW_ID_HEADER,
+        HASH_HEADER,
+        SOURCE_HEADER,
+        LATENCY_HEADER,
+    ]
+
+
+def _ask_target(target, limiter, question, enable_thinking, max_retries):
+    """在工作线程中请求单个目标，返回 (result, 耗时)"""
+    from dify_chat_tester.core.batch import _process_with_retry
+
+    limiter.acquire()
+    start = time.time()
+    result, _ = _process_with_retry(
+        target.provider,
+        question,
+        target.model,
+        target.role,
+        enable_thinking,
+        max_retries,
+    )
+    return result, time.time() - start
+
+
+def run_matrix_batch(
+    targets,
+    batch_worksheet,
+    question_col_index: int,
+    doc_name_col_index,
+    output_file_name: str,
+    enable_thinking: bool = False,
+    layout: str = LAYOUT_COLUMNS,
+    resume_from_row: int = 2,
+    max_retries: int = 3,
+    save_every: int = 10,
+):
+    """对多个目标运行同一批问题
+
+    输入只遍历一次：每读到一行就分发给所有目标。每个目标有独立的线程池、
+    限速器和在途窗口（并发数的 2 倍），最慢的目标决定整体进度，
+    已完成的行不会在内存中堆积。
+
+    Args:
+        targets: MatrixTarget 列表，名称不能重复（用作列名、工作表名和统计的键）
+        batch_worksheet: 输入工作表
+        question_col_index: 问题列索引（从 0 开始）
+        doc_name_col_index: 文档名称列索引，没有时为 None
+        output_file_name: 输出文件路径（会覆盖已有文件）
+        enable_thinking: 是否开启思维链
+        layout: 结果布局，LAYOUT_COLUMNS 或 LAYOUT_SHEETS
+        resume_from_row: 起始行号
+        max_retries: 单个请求的最大重试次数
+        save_every: 每写入多少行保存一次
+
+    Returns:
+        dict: {目标名称: {"success": int, "failed": int, "latency": float}}，
+        latency 为成功请求的耗时之和
+    """
+    from dify_chat_tester.core.batch import _make_log_row, get_real_max_row
+
+    if not targets:
+        print_error("没有可用的对比目标。")
+        return {}
+    names = [target.name for target in targets]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        print_error(
+            f"对比目标名称重复: {', '.join(duplicates)}，请为每个目标使用不同的名称。"
+        )
+        return {}
+
+    # 准备输出工作簿
+    workbook = openpyxl.Workbook()
+    if layout == LAYOUT_SHEETS:
+        used_titles = set()
+        sheets = []
+        for i, target in enumerate(targets):
+            worksheet = workbook.active if i == 0 else workbook.create_sheet()
+            worksheet.title = _sheet_title(target.name, used_titles)
+            worksheet.append(_sheet_headers(target))
+            sheets.append(worksheet)
+        main_sheet = sheets[0]
+    else:
+        main_sheet = workbook.active
+        main_sheet.title = "对比结果"
+        main_sheet.append(_column_headers(targets))
+        sheets = None
+
+    stats = {
+        target.name: {"success": 0, "failed": 0, "latency": 0.0} for target in targets
+    }
+    # 每个目标的在途窗口：限制已提交但未完成的请求数
+    windows = [threading.BoundedSemaphore(t.concurrency * 2) for t in targets]
+    limiters = [RateLimiter(t.rate_limit) for t in targets]
+    executors = [
+        ThreadPoolExecutor(max_workers=t.concurrency, thread_name_prefix=f"matrix{i}")
+        for i, t in enumerate(targets)
+    ]
+    completions = queue.Queue()
+    pending_rows = {}  # {row_idx: {"doc_name", "question", "results"}}
+    finished_rows = 0
+
+    writer = LogWriter(workbook, main_sheet, output_file_name, save_every=save_every)
+    writer.start()
+    start_time = time.time()
+
+    def record(row_idx, target_index, result, latency=None):
+        """记录一个目标的结果；所有目标都完成后写出整行"""
+        nonlocal finished_rows
+        entry = pending_rows[row_idx]
+        entry["results"][target_index] = result
+        target = targets[target_index]
+        response, success, error, conversation_id = result
+        if sheets is not None:
+            writer.write(
+                _make_log_row(
+                    target.role,
+                    entry["doc_name"],
+                    entry["question"],
+                    response,
+                    success,
+                    error,
+                    conversation_id,
+                    row_idx,
+                    latency=latency,
+                ),
+                worksheet=sheets[target_index],
+            )
+        if any(r is None for r in entry["results"]):
+            return
+
+        del pending_rows[row_idx]
+        finished_rows += 1
+        if sheets is None:
+            row = [
+                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                entry["doc_name"],
+                entry["question"],
+                row_idx,
+                question_hash(entry["question"]),
+            ]
+            for response, success, error, _ in entry["results"]:
+                row += [response, success, error]
+            writer.write(row)
+
+    def drain(block: bool = False):
+        """处理已完成的请求"""
+        while True:
+            try:
+                row_idx, target_index, future = completions.get(
+                    block=block, timeout=0.2
+                )
+            except queue.Empty:
+                return
+            block = False
+            stat = stats[targets[target_index].name]
+            try:
+                result, latency = future.result()
+            except Exception as e:
+                result, latency = ("", False, str(e), None), 0.0
+            if result[1]:
+                stat["success"] += 1
+                stat["latency"] += latency
+            else:
+                stat["failed"] += 1
+            record(row_idx, target_index, result, latency if result[1] else None)
+
+    def progress_text():
+        return f"已完成 {finished_rows}/{total_rows} 行，处理中 {len(pending_rows)} 行"
+
+    def on_done(row_idx, target_index):
+        def callback(future):
+            windows[target_index].release()
+            completions.put((row_idx, target_index, future))
+
+        return callback
+
+    real_max_row = get_real_max_row(batch_worksheet, question_col_index + 1)
+    total_rows = max(0, real_max_row - resume_from_row + 1)
+    console.print(
+        f"\n[bold cyan]🚀 已启动多目标对比 ({len(targets)} 个目标，共 {total_rows} 行)[/bold cyan]"
+    )
+
+    interrupted = False
+    try:
+        with console.status("") as status:
+            for row_idx, cells in enumerate(
+                batch_worksheet.iter_rows(
+                    min_row=resume_from_row, max_row=real_max_row
+                ),
+                resume_from_row,
+            ):
+                value = cells[question_col_index].value
+                question = str(value) if value is not None else ""
+                doc_name = ""
+                if doc_name_col_index is not None and doc_name_col_index < len(cells):
+                    doc_value = cells[doc_name_col_index].value
+                    doc_name = str(doc_value) if doc_value is not None else ""
+
+                pending_rows[row_idx] = {
+                    "doc_name": doc_name,
+                    "question": question,
+                    "results": [None] * len(targets),
+                }
+                if not question.strip():
+                    for target_index, target in enumerate(targets):
+                        stats[target.name]["failed"] += 1
+                        record(row_idx, target_index, ("", False, "问题为空", None))
+                    continue
+
+                for target_index, target in enumerate(targets):
+                    # 在途窗口已满时先处理完成的结果，避免无限堆积
+                    while not windows[target_index].acquire(timeout=0.1):
+                        drain()
+                    future = executors[target_index].submit(
+                        _ask_target,
+                        target,
+                        limiters[target_index],
+                        question,
+                        enable_thinking,
+                        max_retries,
+                    )
+                    future.add_done_callback(on_done(row_idx, target_index))
+
+                drain()
+                status.update(progress_text())
+
+            while pending_rows:
+                drain(block=True)
+                status.update(progress_text())
+    except KeyboardInterrupt:
+        interrupted = True
+        print_warning("用户中断多目标对比，正在保存已完成的结果...")
+    finally:
+        for executor in executors:
+            executor.shutdown(wait=not interrupted, cancel_futures=interrupted)
+        writer.close(timeout=30 if interrupted else None)
+
+    duration = time.time() - start_time
+    if writer.last_error:
+        print_error(f"警告：{writer.last_error}")
+
+    _print_matrix_summary(targets, stats, duration)
+    if interrupted:
+        print_warning(f"部分问题未完成，已完成的结果已保存至: {output_file_name}")
+    else:
+        print_success(f"多目标对比完成。结果已保存至: {output_file_name}")
+    return stats
+
+
+def _print_matrix_summary(targets, stats, duration: float):
+    """打印各目标的成功率和成功请求的平均耗时"""
+    table = Table(title="📊 对比统计", box=box.ROUNDED, show_lines=False)
+    table.add_column("目标", style="cyan")
+    table.add_column("成功", justify="right", style="green")
+    table.add_column("失败", justify="right", style="red")
+    table.add_column("成功率", justify="right")
+    table.add_column("平均耗时", justify="right")
+
+    for target in targets:
+        stat = stats[target.name]
+        done = stat["success"] + stat["failed"]
+        rate = stat["success"] / done * 100 if done else 0
+        # 失败和空问题行没有有效耗时，平均耗时只统计成功请求
+        avg = f"{stat['latency'] / stat['success']:.2f}s" if stat["success"] else "-"
+        table.add_row(
+            target.name,
+            str(stat["success"]),
+            str(stat["failed"]),
+            f"{rate:.1f}%",
+            avg,
+        )
+
+    console.print()
+    console.print(table)
+    print_info(f"总用时: {duration:.1f} 秒")
@@ -0,0 +1,461 @@
+"""
+运行指标模块
+用可合并的对数分桶直方图统计延迟和首字延迟（TTFT），内存占用与行数无关；
+运行结束后汇总分位数、吞吐量、输出 token 速率和错误分类，并写出 JSON 摘要。
+运行期间另以按秒分槽的环形缓冲统计最近一段时间的速率、P95 延迟和错误率，用于实时显示
+"""
+
+import json
+import math
+import os
+import re
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from rich.table import Table
+
+from dify_chat_tester.cli.terminal import box, console, use_rich_ui
+
+# 报告中的分位数
+REPORT_PERCENTILES = (50, 90, 95, 99)
+
+# 滚动窗口的默认长度（秒）
+ROLLING_WINDOW_SECONDS = 30
+
+# 滚动窗口的延迟分桶：相邻桶上界相差 10%，覆盖 1 毫秒到约 50 小时
+_ROLLING_MIN_LATENCY = 0.001
+_ROLLING_LOG_GROWTH = math.log(1.1)
+_ROLLING_BUCKETS = 200
+
+# 错误分类（JSON 中的键）及显示名称
+ERROR_CATEGORIES = {
+    "empty_question": "问题为空",
+    "auth": "认证失败",
+    "rate_limit": "频率限制",
+    "server": "服务端错误",
+    "network": "网络/超时",
+    "content_filter": "内容拦截",
+    "client": "请求错误",
+    "other": "其他",
+}
+
+
+class LatencyHistogram:
+    """对数分桶直方图
+
+    第 i 个桶覆盖 [min_value * g^i, min_value * g^(i+1))，g = 1 + precision，
+    分位数的相对误差不超过 precision；小于 min_value 的值计入第 0 个桶。
+    只保存非空桶的计数，可通过 merge() 或 to_dict()/from_dict() 跨进程、跨运行合并。
+    """
+
+    def __init__(self, precision: float = 0.01, min_value: float = 0.001):
+        self.precision = precision
+        self.min_value = min_value
+        self._log_growth = math.log1p(precision)
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, value: float):
+        """记录一个值（秒）"""
+        value = max(0.0, float(value))
+        if value <= self.min_value:
+            index = 0
+        else:
+            index = int(math.log(value / self.min_value) / self._log_growth)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "LatencyHistogram"):
+        """合并另一个相同参数的直方图"""
+        if (other.precision, other.min_value) != (self.precision, self.min_value):
+            raise ValueError("直方图参数不同，无法合并")
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, p: float) -> float:
+        """返回第 p 百分位的近似值（所在桶的上界，不超过实际最大值）"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(p / 100 * self.count))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                upper = self.min_value * math.exp((index + 1) * self._log_growth)
+                return min(upper, self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def describe(self) -> dict:
+        """汇总：数量、平均值、各分位数和最大值（秒）"""
+        summary = {"count": self.count, "mean": round(self.mean, 4)}
+        for p in REPORT_PERCENTILES:
+            summary[f"p{p}"] = round(self.percentile(p), 4)
+        summary["max"] = round(self.max or 0.0, 4)
+        return summary
+
+    def to_dict(self) -> dict:
+        return {
+            "precision": self.precision,
+            "min_value": self.min_value,
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+            "buckets": {str(k): v for k, v in sorted(self.buckets.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        histogram = cls(data["precision"], data["min_value"])
+        histogram.buckets = {int(k): v for k, v in data["buckets"].items()}
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        return histogram
+
+
+class RollingWindow:
+    """最近 window 秒的滚动统计
+
+    每秒一个槽的环形缓冲，槽内保存该秒完成的行数、失败数、请求数、token 数和
+    延迟分桶计数；另维护整个窗口的累计值，槽过期时从累计值中减去。
+    每次记录的开销与行数和窗口长度无关，查询 P95 只需扫描固定数量的延迟桶。
+    """
+
+    def __init__(self, window: int = ROLLING_WINDOW_SECONDS, clock=time.monotonic):
+        self.window = max(1, int(window))
+        self.clock = clock
+        self.started = clock()
+        self._current = int(self.started)
+        self._rows = [0] * self.window
+        self._errors = [0] * self.window
+        self._requests = [0] * self.window
+        self._tokens = [0] * self.window
+        self._latency: List[Dict[int, int]] = [{} for _ in range(self.window)]
+        # 窗口内的累计值
+        self.rows = 0
+        self.errors = 0
+        self.requests = 0
+        self.tokens = 0
+        self._latency_totals = [0] * _ROLLING_BUCKETS
+
+    def _expire(self, slot: int):
+        self.rows -= self._rows[slot]
+        self.errors -= self._errors[slot]
+        self.requests -= self._requests[slot]
+        self.tokens -= self._tokens[slot]
+        for index, count in self._latency[slot].items():
+            self._latency_totals[index] -= count
+        self._rows[slot] = self._errors[slot] = 0
+        self._requests[slot] = self._tokens[slot] = 0
+        self._latency[slot] = {}
+
+    def _advance(self, now: float) -> int:
+        """把环形缓冲推进到 now 所在的秒，清空其间过期的槽，返回当前槽位置"""
+        second = int(now)
+        if second > self._current:
+            # 间隔超过窗口长度时只需清空一圈
+            for s in range(
+                max(self._current + 1, second - self.window + 1), second + 1
+            ):
+                self._expire(s % self.window)
+            self._current = second
+        return second % self.window
+
+    def record(
+        self,
+        success: bool,
+        latency: Optional[float] = None,
+        tokens: int = 0,
+        now: float = None,
+    ):
+        """记录一行结果；latency 为 None 表示没有发出请求（缓存命中或合并）"""
+        slot = self._advance(self.clock() if now is None else now)
+        self._rows[slot] += 1
+        self.rows += 1
+        if not success:
+            self._errors[slot] += 1
+            self.errors += 1
+        if tokens:
+            self._tokens[slot] += tokens
+            self.tokens += tokens
+        if latency is None:
+            return
+        self._requests[slot] += 1
+        self.requests += 1
+        if latency <= _ROLLING_MIN_LATENCY:
+            index = 0
+        else:
+            index = min(
+                _ROLLING_BUCKETS - 1,
+                int(math.log(latency / _ROLLING_MIN_LATENCY) / _ROLLING_LOG_GROWTH),
+            )
+        bucket = self._latency[slot]
+        bucket[index] = bucket.get(index, 0) + 1
+        self._latency_totals[index] += 1
+
+    def percentile(self, p: float) -> Optional[float]:
+        """窗口内延迟的第 p 百分位（所在桶的上界）；没有请求时返回 None"""
+        if not self.requests:
+            return None
+        rank = max(1, math.ceil(p / 100 * self.requests))
+        seen = 0
+        for index, count in enumerate(self._latency_totals):
+            seen += count
+            if seen >= rank:
+                break
+        return _ROLLING_MIN_LATENCY * math.exp((index + 1) * _ROLLING_LOG_GROWTH)
+
+    def snapshot(self, now: float = None) -> dict:
+        """当前窗口的统计：每秒行数、请求数和 token 数，P95 延迟（秒）和错误率
+
+        运行时间不足一个窗口时按实际运行时间计算速率。
+        """
+        now = self.clock() if now is None else now
+        self._advance(now)
+        span = max(1.0, min(float(self.window), now - self.started))
+        return {
+            "window": span,
+            "rows_per_second": self.rows / span,
+            "requests_per_second": self.requests / span,
+            "tokens_per_second": self.tokens / span,
+            "p95": self.percentile(95),
+            "error_rate": self.errors / self.rows if self.rows else 0.0,
+        }
+
+
+def categorize_error(error) -> str:
+    """把错误信息归入 ERROR_CATEGORIES 中的一类"""
+    text = str(error or "")
+    # 运行中重试耗尽时的前缀不影响分类
+    text = re.sub(r"^重试\d+次后失败:\s*", "", text)
+    lowered = text.lower()
+    if text == "问题为空":
+        return "empty_question"
+    if "认证失败" in text or re.search(r"\b(401|403)\b", lowered):
+        return "auth"
+    if "频率限制" in text or "429" in lowered or "rate limit" in lowered:
+        return "rate_limit"
+    if "服务端" in text or re.search(r"\b5\d\d\b", lowered) or "queuepool" in lowered:
+        return "server"
+    if (
+        "无法连接" in text
+        or "超时" in text
+        or "ssl" in lowered
+        or "timeout" in lowered
+        or "timed out" in lowered
+        or "connection" in lowered
+    ):
+        return "network"
+    if "敏感" in text or "拒绝处理" in text:
+        return "content_filter"
+    if re.search(r"\b4\d\d\b", lowered) or "状态码" in text:
+        return "client"
+    return "other"
+
+
+def estimate_tokens(text) -> int:
+    """粗略估算输出 token 数：中日韩等多字节字符各计 1 个，其余字符约 4 个计 1 个
+
+    多字节字符数由 UTF-8 编码长度推算（按每字符 3 字节），避免逐字符扫描。
+    """
+    if not text:
+        return 0
+    text = str(text)
+    wide = min(len(text), (len(text.encode("utf-8")) - len(text)) // 2)
+    return wide + math.ceil((len(text) - wide) / 4)
+
+
+def track_stream_timing(timing: dict, inner: Callable = None) -> Callable:
+    """包装流式回调：记录首末文本片段的时间和供应商返回的输出 token 数
+
+    timing 中写入 "first_token"、"last_token"（time.time()）和 "output_tokens"，
+    其余事件原样转交给 inner。
+    """
+
+    def callback(event_type, content):
+        if event_type == "text" and content:
+            now = time.time()
+            timing.setdefault("first_token", now)
+            timing["last_token"] = now
+        elif event_type == "usage":
+            try:
+                timing["output_tokens"] = int(content)
+            except (TypeError, ValueError):
+                pass
+        if inner is not None:
+            inner(event_type, content)
+
+    return callback
+
+
+class RunMetrics:
+    """一次批量运行的指标（仅由调度线程访问）
+
+    传入 registry（exporter.MetricsRegistry）时，每条记录同时累加到导出的计数器和直方图；
+    recent 为最近 ROLLING_WINDOW_SECONDS 秒的滚动统计，用于运行中的实时显示。
+    """
+
+    def __init__(self, registry=None):
+        self.registry = registry
+        self.recent = RollingWindow()
+        self.latency = LatencyHistogram()
+        self.ttft = LatencyHistogram()
+        self.rows = 0
+        self.success = 0
+        self.failed = 0
+        self.output_tokens = 0
+        self.estimated_tokens = 0  # 其中按文本长度估算的部分
+        self.errors = Counter()
+
+    def record(
+        self,
+        result: tuple,
+        latency: Optional[float] = None,
+        timing: Optional[dict] = None,
+    ):
+        """记录一行最终结果
+
+        latency 为 None 表示结果来自缓存或合并（不计入延迟和 token 统计）；
+        timing 为 track_stream_timing 收集的数据（需包含请求开始时间 "start"）。
+        """
+        response, success, error, _ = result
+        registry = self.registry
+        self.rows += 1
+        if success:
+            self.success += 1
+        else:
+            category = categorize_error(error)
+            self.failed += 1
+            self.errors[category] += 1
+        if registry is not None:
+            registry.inc("rows_total")
+            if success:
+                registry.inc("successes_total")
+            else:
+                registry.inc("failures_total", category=category)
+        if latency is None:
+            self.recent.record(success)
+            return
+        self.latency.record(latency)
+        ttft = None
+        timing = timing or {}
+        if "first_token" in timing and "start" in timing:
+            ttft = timing["first_token"] - timing["start"]
+            self.ttft.record(ttft)
+        tokens = 0
+        if success:
+            if timing.get("output_tokens"):
+                tokens = timing["output_tokens"]
+            else:
+                tokens = estimate_tokens(response)
+                self.estimated_tokens += tokens
+            self.output_tokens += tokens
+        self.recent.record(success, latency, tokens)
+        if registry is not None:
+            registry.inc("requests_total")
+            registry.observe("request_latency_seconds", latency)
+            if ttft is not None:
+                registry.observe("ttft_seconds", ttft)
+            if tokens:
+                registry.inc("output_tokens_total", tokens)
+
+    def summary(self, duration: float, log_file: str = None) -> dict:
+        """生成运行摘要（可直接序列化为 JSON）"""
+        return {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "log_file": log_file,
+            "duration_seconds": round(duration, 3),
+            "rows": self.rows,
+            "success": self.success,
+            "failed": self.failed,
+            "requests": self.latency.count,
+            "rows_per_second": round(self.rows / duration, 4) if duration else 0.0,
+            "requests_per_second": (
+                round(self.latency.count / duration, 4) if duration else 0.0
+            ),
+            "output_tokens": self.output_tokens,
+            "output_tokens_estimated": self.estimated_tokens,
+            "output_tokens_per_second": (
+                round(self.output_tokens / duration, 2) if duration else 0.0
+            ),
+            "latency": self.latency.describe(),
+            "ttft": self.ttft.describe(),
+            "errors": dict(self.errors.most_common()),
+            "histograms": {
+                "latency": self.latency.to_dict(),
+                "ttft": self.ttft.to_dict(),
+            },
+        }
+
+
+def summary_path_for(log_file: str) -> str:
+    """日志文件旁的摘要文件路径：<日志文件名>_summary.json"""
+    return f"{os.path.splitext(log_file)[0]}_summary.json"
+
+
+def write_summary(summary: dict, path: str):
+    """写出 JSON 摘要（先写临时文件再替换，避免读到半个文件）"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def print_run_report(summary: dict):
+    """打印延迟分位数、吞吐量和错误分类"""
+    latency, ttft = summary["latency"], summary["ttft"]
+    tokens = f"{summary['output_tokens_per_second']:.1f} token/秒"
+    if summary["output_tokens_estimated"]:
+        tokens += "（含估算）"
+    errors = "，".join(
+        f"{ERROR_CATEGORIES.get(k, k)} {v}" for k, v in summary["errors"].items()
+    )
+    throughput = (
+        f"吞吐: {summary['rows_per_second']:.2f} 行/秒，"
+        f"{summary['requests_per_second']:.2f} 请求/秒，输出 {tokens}"
+    )
+
+    if not use_rich_ui():
+        for name, stats in (("总延迟", latency), ("首字延迟", ttft)):
+            cells = " ".join(f"P{p}={stats[f'p{p}']:.3f}s" for p in REPORT_PERCENTILES)
+            console.print(f"{name}({stats['count']}): {cells} 最大={stats['max']:.3f}s")
+        console.print(throughput)
+        if errors:
+            console.print(f"错误分类: {errors}")
+        return
+
+    table = Table(title="⏱️ 延迟分布（秒）", box=box.ROUNDED)
+    table.add_column("指标", style="cyan")
+    table.add_column("样本", justify="right")
+    for p in REPORT_PERCENTILES:
+        table.add_column(f"P{p}", justify="right")
+    table.add_column("最大", justify="right")
+    for name, stats in (("总延迟", latency), ("首字延迟 TTFT", ttft)):
+        table.add_row(
+            name,
+            str(stats["count"]),
+            *[f"{stats[f'p{p}']:.3f}" for p in REPORT_PERCENTILES],
+            f"{stats['max']:.3f}",
+        )
+    table.caption = throughput + (f"\n错误分类: {errors}" if errors else "")
+    console.print(table)
@@ -0,0 +1,506 @@
+"""
+本地模拟服务模块
+仅依赖标准库的 asyncio HTTP 服务，模拟 Dify（/chat-messages）和 OpenAI 兼容接口
+（/v1/chat/completions，iFlow 使用相同格式）的流式响应，用于离线压测和回归测试；
+延迟、token 速率、回答长度、错误率、429 比例和重定向均可配置
+"""
+
+import asyncio
+import itertools
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Optional, Tuple
+
+from dify_chat_tester.config.logging import get_logger
+
+logger = get_logger("dify_chat_tester.mock_server")
+
+# 模拟回答循环使用的文本，每个字符计为 1 个 token
+ANSWER_TEXT = "这是本地模拟服务返回的测试回答，用于离线评估批量处理的吞吐量和延迟。"
+REASONING_TEXT = "先理解问题，再组织回答。"
+
+# 开启重定向时，首次请求返回 307，Location 指向带此前缀的相同路径
+REDIRECT_PREFIX = "/redirected"
+
+_REASONS = {
+    200: "OK",
+    307: "Temporary Redirect",
+    400: "Bad Request",
+    401: "Unauthorized",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+}
+
+
+class MockSettings:
+    """模拟服务的行为参数
+
+    Args:
+        latency: 首个 token 之前的等待时间（秒）
+        jitter: 首字延迟的随机抖动比例（0-1）
+        token_rate: 每秒输出的 token 数，0 表示不限速
+        answer_tokens: 回答长度（token 数）
+        reasoning_tokens: OpenAI 格式中 reasoning_content 的 token 数
+        error_rate: 返回 HTTP 500 的比例（0-1）
+        rate_limit_rate: 返回 HTTP 429 的比例（0-1）
+        redirect: 是否先返回 307 重定向
+        workflow_events: Dify 流中是否包含 workflow_* 和 node_* 事件
+        api_key: 非空时校验 Authorization 头，不匹配返回 401
+        seed: 随机种子（错误和抖动可复现）
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        jitter: float = 0.0,
+        token_rate: float = 200.0,
+        answer_tokens: int = 50,
+        reasoning_tokens: int = 0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        redirect: bool = False,
+        workflow_events: bool = True,
+        api_key: str = "",
+        seed: Optional[int] = None,
+    ):
+        self.latency = max(0.0, float(latency))
+        self.jitter = min(max(0.0, float(jitter)), 1.0)
+        self.token_rate = max(0.0, float(token_rate))
+        self.answer_tokens = max(1, int(answer_tokens))
+        self.reasoning_tokens = max(0, int(reasoning_tokens))
+        self.error_rate = min(max(0.0, float(error_rate)), 1.0)
+        self.rate_limit_rate = min(max(0.0, float(rate_limit_rate)), 1.0)
+        self.redirect = bool(redirect)
+        self.workflow_events = bool(workflow_events)
+        self.api_key = api_key or ""
+        self.seed = seed
+
+    @classmethod
+    def from_config(cls, config, **overrides) -> "MockSettings":
+        """从 MOCK_* 配置项读取参数，overrides 中不为 None 的值优先（如命令行参数）"""
+        values = {}
+        if config:
+            values = dict(
+                latency=config.get_float("MOCK_LATENCY", 0.05),
+                jitter=config.get_float("MOCK_JITTER", 0.0),
+                token_rate=config.get_float("MOCK_TOKEN_RATE", 200.0),
+                answer_tokens=config.get_int("MOCK_ANSWER_TOKENS", 50),
+                reasoning_tokens=config.get_int("MOCK_REASONING_TOKENS", 0),
+                error_rate=config.get_float("MOCK_ERROR_RATE", 0.0),
+                rate_limit_rate=config.get_float("MOCK_RATE_LIMIT_RATE", 0.0),
+                redirect=config.get_bool("MOCK_REDIRECT", False),
+                workflow_events=config.get_bool("MOCK_WORKFLOW_EVENTS", True),
+                api_key=config.get_str("MOCK_API_KEY", ""),
+            )
+        values.update({k: v for k, v in overrides.items() if v is not None})
+        return cls(**values)
+
+
+def _tokens(text: str, count: int) -> list:
+    """循环取 text 中的字符，生成 count 个 token"""
+    return list(itertools.islice(itertools.cycle(text), count))
+
+
+def _sse(data) -> bytes:
+    payload = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False)
+    return f"data: {payload}\n\n".encode("utf-8")
+
+
+def _chunk(data: bytes) -> bytes:
+    """HTTP 分块传输编码的一个分块"""
+    return f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n"
+
+
+class MockServer:
+    """asyncio 模拟服务
+
+    在测试中通过 start_in_thread() / stop()（或 with 语句）在后台线程运行；
+    命令行通过 run_mock_server() 在前台运行。stats 记录各类响应的次数。
+    """
+
+    def __init__(
+        self,
+        settings: MockSettings = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.settings = settings or MockSettings()
+        self.host = host
+        self.port = port
+        self.stats = Counter()
+        self._rng = random.Random(self.settings.seed)
+        self._server = None
+        self._loop = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        """开始监听（port 为 0 时由系统分配端口）"""
+        # 较大的连接队列，避免高并发压测时连接在握手阶段被丢弃
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, backlog=1024
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start_in_thread(self) -> "MockServer":
+        """在后台线程的事件循环中运行，返回时已开始监听"""
+        ready = threading.Event()
+        errors = []
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            try:
+                self._loop.run_until_complete(self.start())
+            except OSError as e:
+                errors.append(e)
+                ready.set()
+                return
+            ready.set()
+            self._loop.run_forever()
+            # 停止监听并取消仍在处理的连接（如保持中的 keep-alive 连接）
+            self._server.close()
+            pending = asyncio.all_tasks(self._loop)
+            for task in pending:
+                task.cancel()
+            self._loop.run_until_complete(
+                asyncio.gather(*pending, return_exceptions=True)
+            )
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="MockServer", daemon=True)
+        self._thread.start()
+        ready.wait()
+        if errors:
+            raise errors[0]
+        return self
+
+    def stop(self):
+        """停止后台线程中的服务"""
+        if self._loop is not None and self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def __enter__(self):
+        return self.start_in_thread()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    async def _handle_connection(self, reader, writer):
+        """处理一个连接上的请求（支持 keep-alive）"""
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                keep_alive = await self._dispatch(*request, writer)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader) -> Optional[Tuple[str, str, dict, bytes]]:
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        method, path, _ = request_line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length") or 0)
+        body = await reader.readexactly(length) if length else b""
+        return method, path, headers, body
+
+    def _write_head(self, writer, status: int, headers: dict):
+        lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+    def _write_json(self, writer, status: int, data: dict, extra_headers=None):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        headers = {
+            "Content-Type": "application/json",
+            "Content-Length": str(len(body)),
+        }
+        headers.update(extra_headers or {})
+        self._write_head(writer, status, headers)
+        writer.write(body)
+
+    async def _dispatch(self, method, path, headers, body, writer) -> bool:
+        """按路径分发请求，返回连接是否可以继续复用"""
+        settings = self.settings
+        path = path.split("?")[0]
+        redirected = path.startswith(REDIRECT_PREFIX + "/")
+        if redirected:
+            path = path[len(REDIRECT_PREFIX) :]
+        if path.endswith("/chat-messages"):
+            kind = "dify"
+        elif path.endswith("/chat/completions"):
+            kind = "openai"
+        else:
+            self.stats["not_found"] += 1
+            self._write_json(writer, 404, {"message": "not found"})
+            return True
+        if method != "POST":
+            self._write_json(writer, 405, {"message": "method not allowed"})
+            return True
+
+        self.stats["requests"] += 1
+        if settings.redirect and not redirected:
+            self.stats["redirects"] += 1
+            location = f"{self.base_url}{REDIRECT_PREFIX}{path}"
+            self._write_head(writer, 307, {"Location": location, "Content-Length": "0"})
+            return True
+        if settings.api_key and headers.get("authorization") != (
+            f"Bearer {settings.api_key}"
+        ):
+            self.stats["unauthorized"] += 1
+            self._write_json(writer, 401, {"message": "invalid api key"})
+            return True
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            self._write_json(writer, 400, {"message": "invalid json"})
+            return True
+
+        roll = self._rng.random()
+        if roll < settings.rate_limit_rate:
+            self.stats["rate_limited"] += 1
+            self._write_json(
+                writer,
+                429,
+                {"code": "too_many_requests", "message": "rate limit exceeded"},
+                {"Retry-After": "1"},
+            )
+            return True
+        if roll < settings.rate_limit_rate + settings.error_rate:
+            self.stats["errors"] += 1
+            self._write_json(
+                writer, 500, {"code": "internal_error", "message": "mock server error"}
+            )
+            return True
+
+        if kind == "dify":
+            if payload.get("response_mode") == "streaming":
+                await self._stream_dify(writer, payload)
+            else:
+                await self._first_token_delay()
+                self._write_json(writer, 200, self._dify_blocking(payload))
+        else:
+            if payload.get("stream"):
+                await self._stream_openai(writer, payload)
+            else:
+                await self._first_token_delay()
+                self._write_json(writer, 200, self._openai_blocking(payload))
+        self.stats["completed"] += 1
+        return True
+
+    async def _first_token_delay(self):
+        settings = self.settings
+        delay = settings.latency
+        if settings.jitter:
+            delay *= 1 + self._rng.uniform(-settings.jitter, settings.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _token_delay(self):
+        if self.settings.token_rate > 0:
+            await asyncio.sleep(1 / self.settings.token_rate)
+
+    async def _send_events(self, writer, events):
+        """以分块传输发送 SSE 事件；events 中的 None 表示在此处等待一个 token 间隔"""
+        self._write_head(
+            writer,
+            200,
+            {
+                "Content-Type": "text/event-stream; charset=utf-8",
+                "Cache-Control": "no-cache",
+                "Transfer-Encoding": "chunked",
+            },
+        )
+        await writer.drain()
+        await self._first_token_delay()
+        for event in events:
+            if event is None:
+                await self._token_delay()
+                continue
+            writer.write(_chunk(event))
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+
+    def _usage(self, payload_text: str, completion_tokens: int) -> dict:
+        prompt_tokens = len(payload_text)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    async def _stream_dify(self, writer, payload: dict):
+        settings = self.settings
+        conversation_id = payload.get("conversation_id") or str(uuid.uuid4())
+        message_id = str(uuid.uuid4())
+        task_id = str(uuid.uuid4())
+        created_at = int(time.time())
+        common = {
+            "task_id": task_id,
+            "message_id": message_id,
+            "conversation_id": conversation_id,
+            "created_at": created_at,
+        }
+        events = [b"event: ping\n\n"]
+        if settings.workflow_events:
+            run_id = str(uuid.uuid4())
+            events.append(
+                _sse({"event": "workflow_started", "workflow_run_id": run_id, **common})
+            )
+            events.append(
+                _sse({"event": "node_started", "workflow_run_id": run_id, **common})
+            )
+        tokens = _tokens(ANSWER_TEXT, settings.answer_tokens)
+        for i, token in enumerate(tokens):
+            if i:
+                events.append(None)
+            events.append(_sse({"event": "message", "answer": token, **common}))
+        if settings.workflow_events:
+            events.append(
+                _sse({"event": "node_finished", "workflow_run_id": run_id, **common})
+            )
+            events.append(
+                _sse(
+                    {"event": "workflow_finished", "workflow_run_id": run_id, **common}
+                )
+            )
+        usage = self._usage(payload.get("query", ""), len(tokens))
+        events.append(
+            _sse({"event": "message_end", "metadata": {"usage": usage}, **common})
+        )
+        await self._send_events(writer, events)
+
+    def _dify_blocking(self, payload: dict) -> dict:
+        answer = "".join(_tokens(ANSWER_TEXT, self.settings.answer_tokens))
+        return {
+            "event": "message",
+            "message_id": str(uuid.uuid4()),
+            "conversation_id": payload.get("conversation_id") or str(uuid.uuid4()),
+            "mode": "chat",
+            "answer": answer,
+            "metadata": {"usage": self._usage(payload.get("query", ""), len(answer))},
+            "created_at": int(time.time()),
+        }
+
+    def _prompt_text(self, payload: dict) -> str:
+        return "".join(
+            str(m.get("content", ""))
+            for m in payload.get("messages", [])
+            if isinstance(m, dict)
+        )
+
+    async def _stream_openai(self, writer, payload: dict):
+        settings = self.settings
+        model = payload.get("model", "mock-model")
+        base = {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+        }
+
+        def chunk(delta, finish_reason=None, **extra):
+            return _sse(
+                {
+                    **base,
+                    "choices": [
+                        {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                    ],
+                    **extra,
+                }
+            )
+
+        events = [chunk({"role": "assistant", "content": ""})]
+        reasoning = _tokens(REASONING_TEXT, settings.reasoning_tokens)
+        tokens = _tokens(ANSWER_TEXT, settings.answer_tokens)
+        for token in reasoning:
+            events.append(chunk({"reasoning_content": token}))
+            events.append(None)
+        for i, token in enumerate(tokens):
+            if i:
+                events.append(None)
+            events.append(chunk({"content": token}))
+        # usage 随结束片段一起返回（部分兼容服务的做法，客户端在结束片段处停止读取）
+        usage = self._usage(self._prompt_text(payload), len(reasoning) + len(tokens))
+        events.append(chunk({}, finish_reason="stop", usage=usage))
+        events.append(_sse("[DONE]"))
+        await self._send_events(writer, events)
+
+    def _openai_blocking(self, payload: dict) -> dict:
+        settings = self.settings
+        message = {
+            "role": "assistant",
+            "content": "".join(_tokens(ANSWER_TEXT, settings.answer_tokens)),
+        }
+        if settings.reasoning_tokens:
+            message["reasoning_content"] = "".join(
+                _tokens(REASONING_TEXT, settings.reasoning_tokens)
+            )
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "mock-model"),
+            "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+            "usage": self._usage(
+                self._prompt_text(payload),
+                settings.answer_tokens + settings.reasoning_tokens,
+            ),
+        }
+
+
+def run_mock_server(
+    settings: MockSettings = None, host: str = "127.0.0.1", port: int = 8765
+):
+    """在前台运行模拟服务，直到按 Ctrl+C"""
+    from dify_chat_tester.cli.terminal import print_info
+
+    server = MockServer(settings, host, port)
+
+    async def main():
+        await server.start()
+        print_info(
+            f"模拟服务已启动: {server.base_url}（按 Ctrl+C 停止）\n"
+            f"Dify: DIFY_BASE_URL={server.base_url}/v1\n"
+            f"OpenAI 兼容: OPENAI_BASE_URL={server.base_url}/v1"
+        )
+        await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    logger.info(f"模拟服务已停止，统计: {dict(server.stats)}")
+    return server.stats
@@ -0,0 +1,354 @@
+"""
+性能剖析模块
+在后台线程中定期采样所有线程（含并发批量的工作线程、写入线程和 Live 刷新线程）的调用栈，
+运行结束后写出 pstats 格式的剖析文件（可用 snakeviz 或 python -m pstats 查看），
+并按子系统（供应商、批量引擎、Excel 读写、终端渲染、配置）汇总累计耗时最高的函数。
+
+采样不需要修改被测代码，也不依赖 sys.setprofile，对所有 Python 版本和线程都有效。
+阻塞在 socket/SSL 读取或 time.sleep 上的线程单独计为 I/O 等待，不计入热点。
+"""
+
+import marshal
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from rich.table import Table
+
+from dify_chat_tester.cli.terminal import box, console, use_rich_ui
+from dify_chat_tester.config.loader import get_config
+
+# 默认采样间隔（毫秒）
+DEFAULT_INTERVAL_MS = 5
+
+OTHER = "其他"
+
+# 子系统及其路径特征，按顺序匹配；从栈顶向下找到的第一个匹配的帧决定样本所属子系统
+SUBSYSTEMS = (
+    (
+        "供应商",
+        (
+            "dify_chat_tester/providers/",
+            "/requests/",
+            "/urllib3/",
+            "/http/client.py",
+            "/ssl.py",
+            "/socket.py",
+        ),
+    ),
+    ("Excel 读写", ("/openpyxl/", "/et_xmlfile/", "dify_chat_tester/utils/excel")),
+    ("终端渲染", ("/rich/", "dify_chat_tester/cli/")),
+    ("配置", ("dify_chat_tester/config/",)),
+    ("批量引擎", ("dify_chat_tester/core/", "/concurrent/futures/")),
+)
+
+# 栈顶处于这些函数时视为线程空闲（等待锁、队列或 I/O 就绪），不计入热点
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+}
+
+# 栈顶处于这些函数时视为阻塞在网络读写上（I/O 等待），不计入热点
+_IO_WAIT_FRAMES = {
+    ("socket.py", "readinto"),
+    ("socket.py", "create_connection"),
+    ("ssl.py", "read"),
+    ("ssl.py", "recv"),
+    ("ssl.py", "recv_into"),
+    ("ssl.py", "do_handshake"),
+}
+
+# 两次采样之间线程 CPU 时间的增量低于墙钟时间的该比例时视为阻塞（如 time.sleep）
+_BLOCKED_CPU_RATIO = 0.1
+
+FuncKey = Tuple[str, int, str]
+
+
+def _normalize(filename: str) -> str:
+    return filename.replace("\\", "/")
+
+
+def classify(filename: str) -> str:
+    """按文件路径判断所属子系统，不属于任何子系统时返回 "其他" """
+    path = _normalize(filename)
+    for name, patterns in SUBSYSTEMS:
+        if any(pattern in path for pattern in patterns):
+            return name
+    return OTHER
+
+
+def _is_idle(frame_key: FuncKey) -> bool:
+    filename, _, funcname = frame_key
+    return (os.path.basename(filename), funcname) in _IDLE_FRAMES
+
+
+def _is_io_wait(frame_key: FuncKey) -> bool:
+    filename, _, funcname = frame_key
+    return (os.path.basename(filename), funcname) in _IO_WAIT_FRAMES
+
+
+def _thread_cpu_time(thread_id: int) -> Optional[float]:
+    """线程已消耗的 CPU 时间（秒）；平台不支持（如 Windows）时返回 None
+
+    time.sleep 等 C 函数不产生 Python 帧，只能通过 CPU 时间是否增长判断线程是否在运行。
+    """
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(thread_id))
+    except (AttributeError, OSError, OverflowError):
+        return None
+
+
+def _stack_subsystem(stack: Tuple[FuncKey, ...]) -> str:
+    for key in stack:
+        name = classify(key[0])
+        if name != OTHER:
+            return name
+    return OTHER
+
+
+class Profiler:
+    """调用栈采样器
+
+    start() 后每隔 interval 秒记录一次所有线程的调用栈（相同调用栈只计数），
+    stop() 结束采样；之后可用 save() 写出 pstats 文件、summary() 按子系统汇总。
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL_MS / 1000):
+        self.interval = interval
+        self.stacks: Counter = Counter()  # {(栈顶帧, ..., 栈底帧): 样本数}
+        self.idle_samples = 0
+        self.io_wait_samples = 0
+        self.rounds = 0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+        self._cpu_times: Dict[int, float] = {}  # {线程: 上一轮的 CPU 时间}
+        self._last_sample = 0.0
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="Profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.duration = time.perf_counter() - self._started
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample(own_id)
+
+    def sample(self, skip_thread: int = None):
+        """记录一次所有线程（skip_thread 除外）的调用栈"""
+        self.rounds += 1
+        now = time.perf_counter()
+        elapsed = now - self._last_sample if self._last_sample else 0.0
+        self._last_sample = now
+        cpu_times = {}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == skip_thread:
+                continue
+            cpu = _thread_cpu_time(thread_id)
+            previous = self._cpu_times.get(thread_id)
+            if cpu is not None:
+                cpu_times[thread_id] = cpu
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            if not stack:
+                continue
+            if _is_idle(stack[0]):
+                self.idle_samples += 1
+                continue
+            if _is_io_wait(stack[0]) or (
+                cpu is not None
+                and previous is not None
+                and elapsed
+                and cpu - previous < elapsed * _BLOCKED_CPU_RATIO
+            ):
+                self.io_wait_samples += 1
+                continue
+            self.stacks[tuple(stack)] += 1
+        self._cpu_times = cpu_times
+
+    @property
+    def sample_seconds(self) -> float:
+        """每个样本代表的时长：按实际采样轮数折算，避免调度抖动造成偏差"""
+        if self.rounds and self.duration:
+            return self.duration / self.rounds
+        return self.interval
+
+    @property
+    def busy_samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def to_pstats(self) -> Dict[FuncKey, tuple]:
+        """转换为 pstats 的统计字典，调用次数为样本数，时间为样本数折算的秒数"""
+        dt = self.sample_seconds
+        # {函数: [样本数, 自身样本数, 累计样本数]}，{被调函数: {调用方: 累计样本数}}
+        totals: Dict[FuncKey, List[int]] = defaultdict(lambda: [0, 0, 0])
+        callers: Dict[FuncKey, Counter] = defaultdict(Counter)
+        for stack, count in self.stacks.items():
+            totals[stack[0]][1] += count
+            seen = set()
+            for depth, key in enumerate(stack):
+                if key in seen:
+                    continue  # 递归调用只计一次累计时间
+                seen.add(key)
+                totals[key][0] += count
+                totals[key][2] += count
+                if depth + 1 < len(stack):
+                    callers[key][stack[depth + 1]] += count
+        stats = {}
+        for key, (calls, own, cumulative) in totals.items():
+            stats[key] = (
+                calls,
+                calls,
+                own * dt,
+                cumulative * dt,
+                {
+                    caller: (n, n, 0.0, n * dt)
+                    for caller, n in callers.get(key, {}).items()
+                },
+            )
+        return stats
+
+    def save(self, path: str) -> str:
+        """写出 pstats 格式的剖析文件，返回文件路径"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "wb") as f:
+            marshal.dump(self.to_pstats(), f)
+        return path
+
+    def summary(self, top: int = 5) -> List[dict]:
+        """按子系统汇总
+
+        每个样本归入从栈顶向下第一个能识别的子系统（自身耗时），各子系统再列出
+        累计样本数最高的函数（只统计属于该子系统的函数）。
+
+        Returns:
+            list: [{"name", "samples", "share", "seconds", "hotspots": [(函数, 秒, 占比)]}]，
+            按样本数降序
+        """
+        dt = self.sample_seconds
+        busy = self.busy_samples
+        own: Counter = Counter()
+        cumulative: Dict[str, Counter] = defaultdict(Counter)
+        for stack, count in self.stacks.items():
+            own[_stack_subsystem(stack)] += count
+            for key in set(stack):
+                name = classify(key[0])
+                if name != OTHER:
+                    cumulative[name][key] += count
+
+        result = []
+        for name, samples in own.most_common():
+            hotspots = [
+                (format_function(key), n * dt, n / busy)
+                for key, n in cumulative[name].most_common(top)
+            ]
+            result.append(
+                {
+                    "name": name,
+                    "samples": samples,
+                    "share": samples / busy if busy else 0.0,
+                    "seconds": samples * dt,
+                    "hotspots": hotspots,
+                }
+            )
+        return result
+
+
+def format_function(key: FuncKey) -> str:
+    """把 (文件, 行号, 函数名) 显示为 包/模块.py:行号(函数名)，省略安装路径"""
+    filename, lineno, funcname = key
+    path = _normalize(filename)
+    if "/site-packages/" in path:
+        path = path.rsplit("/site-packages/", 1)[1]
+    elif "/dify_chat_tester/" in path:
+        path = "dify_chat_tester/" + path.rsplit("/dify_chat_tester/", 1)[1]
+    else:
+        path = os.path.basename(path)
+    return f"{path}:{lineno}({funcname})"
+
+
+def default_profile_path() -> str:
+    return f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.prof"
+
+
+def start_profiling(interval_ms: float = None) -> Profiler:
+    """开始采样；interval_ms 为 None 时读取 PROFILE_INTERVAL_MS 配置（默认 5 毫秒）"""
+    if interval_ms is None:
+        config = get_config()
+        interval_ms = (
+            config.get_float("PROFILE_INTERVAL_MS", DEFAULT_INTERVAL_MS)
+            if config
+            else DEFAULT_INTERVAL_MS
+        )
+    return Profiler(max(interval_ms, 0.5) / 1000).start()
+
+
+def print_profile_summary(profiler: Profiler, path: str = None, top: int = 5):
+    """打印各子系统的耗时占比和累计耗时最高的函数"""
+    busy = profiler.busy_samples
+    total = busy + profiler.idle_samples + profiler.io_wait_samples
+    header = (
+        f"采样 {profiler.rounds} 轮（间隔 {profiler.interval * 1000:.1f} ms，"
+        f"运行 {profiler.duration:.1f} 秒），"
+        f"活跃样本 {busy}，空闲等待 {profiler.idle_samples}"
+        f"（{profiler.idle_samples / total:.0%}），"
+        f"I/O 等待 {profiler.io_wait_samples}"
+        f"（{profiler.io_wait_samples / total:.0%}）"
+        if total
+        else "未采集到样本"
+    )
+    summary = profiler.summary(top=top)
+
+    if not use_rich_ui():
+        console.print(header)
+        for group in summary:
+            console.print(
+                f"[{group['name']}] {group['share']:.1%} ({group['seconds']:.2f}s)"
+            )
+            for function, seconds, share in group["hotspots"]:
+                console.print(f"    {seconds:8.2f}s {share:6.1%}  {function}")
+        if path:
+            console.print(f"剖析文件: {path}")
+        return
+
+    table = Table(title="🔥 热点（按子系统）", box=box.ROUNDED)
+    table.add_column("子系统", style="cyan")
+    table.add_column("占比", justify="right")
+    table.add_column("累计(秒)", justify="right")
+    table.add_column("热点函数（累计）", overflow="fold")
+    for group in summary:
+        first = True
+        for function, seconds, share in group["hotspots"] or [("", 0.0, 0.0)]:
+            table.add_row(
+                group["name"] if first else "",
+                f"{group['share']:.1%}" if first else "",
+                f"{seconds:.2f}" if function else "",
+                f"{function}  [dim]{share:.1%}[/dim]" if function else "",
+            )
+            first = False
+        table.add_section()
+    table.caption = header + (
+        f"\n剖析文件: {path}（可用 snakeviz 或 python -m pstats 查看）" if path else ""
+    )
+    console.print(table)
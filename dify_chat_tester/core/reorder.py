@@ -0,0 +1,111 @@
+"""
+有序输出模块
+并发结果按完成顺序到达，经重排缓冲区后按输入顺序写出；缓冲超过内存上限时溢出到临时文件
+"""
+
+import pickle
+import tempfile
+from typing import Callable, Dict, Tuple
+
+from dify_chat_tester.config.logging import get_logger
+
+logger = get_logger("dify_chat_tester.reorder")
+
+
+def _row_size(row) -> int:
+    """估算一行日志占用的内存（按字符数计）"""
+    return sum(len(str(item)) for item in row) + 64
+
+
+class ReorderBuffer:
+    """按序号重排的输出缓冲区（仅由调度线程访问）
+
+    put(seq, row) 接收任意顺序到达的行，序号连续的行立即交给 emit 写出；
+    领先的行暂存在内存中，超过 max_bytes 后新到达的行写入临时文件，
+    队首的慢行完成后再按序读回，调度线程不会因此阻塞。
+
+    Args:
+        emit: 按顺序写出一行的函数（例如 LogWriter.write）
+        max_bytes: 内存中暂存行的上限（按字符数估算）
+        start: 第一个序号
+    """
+
+    def __init__(
+        self, emit: Callable, max_bytes: int = 32 * 1024 * 1024, start: int = 0
+    ):
+        self.emit = emit
+        self.max_bytes = max(0, int(max_bytes))
+        self._next = start
+        self._memory: Dict[int, list] = {}
+        self._memory_bytes = 0
+        self._spilled: Dict[int, Tuple[int, int]] = {}  # {序号: (偏移, 长度)}
+        self._spill_file = None
+
+        # 统计信息
+        self.spilled_rows = 0
+        self.peak_held = 0
+
+    @property
+    def held(self) -> int:
+        """当前等待队首、尚未写出的行数"""
+        return len(self._memory) + len(self._spilled)
+
+    def put(self, seq: int, row):
+        """放入一行；序号到达队首时连同后续已就绪的行一起写出"""
+        if seq < self._next or seq in self._memory or seq in self._spilled:
+            logger.warning(f"重排缓冲区收到重复或过期的序号 {seq}，直接写出")
+            self.emit(row)
+            return
+        if seq == self._next:
+            self.emit(row)
+            self._next += 1
+            self._release()
+            return
+
+        size = _row_size(row)
+        if self._memory_bytes + size <= self.max_bytes:
+            self._memory[seq] = row
+            self._memory_bytes += size
+        else:
+            self._spill(seq, row)
+        self.peak_held = max(self.peak_held, self.held)
+
+    def close(self):
+        """按序号写出剩余的全部行（中途停止时跳过缺失的序号）"""
+        for seq in sorted([*self._memory, *self._spilled]):
+            self._next = seq
+            self._release()
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+    def _release(self):
+        while True:
+            if self._next in self._memory:
+                row = self._memory.pop(self._next)
+                self._memory_bytes -= _row_size(row)
+            elif self._next in self._spilled:
+                row = self._load(self._spilled.pop(self._next))
+                if not self._spilled:
+                    # 溢出的行已全部读回，回收临时文件空间
+                    self._spill_file.seek(0)
+                    self._spill_file.truncate()
+            else:
+                return
+            self.emit(row)
+            self._next += 1
+
+    def _spill(self, seq: int, row):
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile(prefix="dify_reorder_")
+            logger.info("重排缓冲区超过内存上限，领先的结果暂存到临时文件")
+        data = pickle.dumps(row, protocol=pickle.HIGHEST_PROTOCOL)
+        self._spill_file.seek(0, 2)
+        self._spilled[seq] = (self._spill_file.tell(), len(data))
+        self._spill_file.write(data)
+        self.spilled_rows += 1
+
+    def _load(self, location: Tuple[int, int]):
+        offset, length = location
+        self._spill_file.seek(offset)
+        return pickle.loads(self._spill_file.read(length))
@@ -0,0 +1,94 @@
+"""
+重试调度模块
+失败的任务按退避策略计算最早重试时间，放回调度队列，由空闲线程在运行过程中重试
+"""
+
+import heapq
+import itertools
+import random
+import time
+from typing import List, Optional
+
+
+class BackoffPolicy:
+    """指数退避策略
+
+    第 n 次重试前等待 base * 2^(n-1) 秒（不超过 cap），并加入 ±jitter 比例的随机抖动，
+    避免大量失败请求在同一时刻重试。
+
+    Args:
+        max_retries: 每行最多重试次数（不含首次请求）
+        base: 首次重试的等待时间（秒）
+        cap: 单次等待时间上限（秒）
+        jitter: 抖动比例（0-1）
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        base: float = 1.0,
+        cap: float = 30.0,
+        jitter: float = 0.2,
+        rng: Optional[random.Random] = None,
+    ):
+        self.max_retries = max(0, int(max_retries))
+        self.base = max(0.0, float(base))
+        self.cap = max(self.base, float(cap))
+        self.jitter = min(max(0.0, float(jitter)), 1.0)
+        self._rng = rng or random.Random()
+
+    @classmethod
+    def from_config(cls, config) -> "BackoffPolicy":
+        """按 BATCH_MAX_RETRIES、BATCH_RETRY_BACKOFF 和 BATCH_RETRY_BACKOFF_MAX 配置创建"""
+        if not config:
+            return cls()
+        return cls(
+            max_retries=config.get_int("BATCH_MAX_RETRIES", 3),
+            base=config.get_float("BATCH_RETRY_BACKOFF", 1.0),
+            cap=config.get_float("BATCH_RETRY_BACKOFF_MAX", 30.0),
+        )
+
+    def should_retry(self, attempts: int) -> bool:
+        """已请求 attempts 次后是否还可以重试"""
+        return attempts <= self.max_retries
+
+    def delay(self, attempts: int) -> float:
+        """已请求 attempts 次（>=1）后，下一次重试前的等待时间"""
+        delay = min(self.cap, self.base * (2 ** max(0, attempts - 1)))
+        if self.jitter and delay:
+            delay *= 1 + self._rng.uniform(-self.jitter, self.jitter)
+        return delay
+
+
+class RetryQueue:
+    """按最早重试时间排序的待重试任务队列（仅由调度线程访问）"""
+
+    def __init__(self, clock=time.monotonic):
+        self._heap = []
+        self._counter = itertools.count()  # 同一时间按入队顺序出队
+        self._clock = clock
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, task, delay: float):
+        """放入任务，delay 秒后才可以重试"""
+        heapq.heappush(self._heap, (self._clock() + delay, next(self._counter), task))
+
+    def pop_ready(self):
+        """取出一个已到重试时间的任务，没有时返回 None"""
+        if self._heap and self._heap[0][0] <= self._clock():
+            return heapq.heappop(self._heap)[2]
+        return None
+
+    def next_ready_in(self) -> Optional[float]:
+        """距离最早一个任务可以重试还有多少秒，队列为空时返回 None"""
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - self._clock())
+
+    def drain(self) -> List:
+        """取出全部任务（停止时使用）"""
+        tasks = [entry[2] for entry in sorted(self._heap)]
+        self._heap.clear()
+        return tasks
@@ -0,0 +1,260 @@
+"""
+任务调度模块
+决定并发批量处理时的派发顺序，减少长问题集中在末尾导致的“拖尾”（只剩一个线程在忙）
+"""
+
+import heapq
+import os
+import random
+import statistics
+from typing import Dict, Iterable, List, Optional
+
+import openpyxl
+
+from dify_chat_tester.config.logging import get_logger
+from dify_chat_tester.core.checkpoint import (
+    HASH_HEADER,
+    LATENCY_HEADER,
+    ROW_ID_HEADER,
+    SUCCESS_HEADER,
+    is_success,
+    question_hash,
+)
+
+logger = get_logger("dify_chat_tester.scheduling")
+
+# 调度策略
+POLICY_SHEET = "sheet"  # 按表格顺序（默认）
+POLICY_LONGEST = "longest"  # 预计耗时最长的先派发
+POLICY_DOC = "doc"  # 同一文档的问题连续派发
+POLICY_SHUFFLE = "shuffle"  # 随机打乱
+POLICIES = (POLICY_SHEET, POLICY_LONGEST, POLICY_DOC, POLICY_SHUFFLE)
+
+QUESTION_HEADER = "原始问题"
+DOC_NAME_HEADER = "文档名称"
+RETRY_SUFFIX = " (重试)"
+
+
+def load_log_records(log_file: str) -> List[dict]:
+    """读取批量日志中带耗时的成功记录
+
+    同一输入行有多条记录时保留最后一条，结果按输入行号排序（还原表格顺序）。
+
+    Returns:
+        list: [{"question", "doc_name", "hash", "latency"}]，旧版日志（没有耗时列）返回空列表
+    """
+    workbook = openpyxl.load_workbook(log_file, read_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if not header:
+            return []
+        header = [str(h).strip() if h is not None else "" for h in header]
+        if LATENCY_HEADER not in header or QUESTION_HEADER not in header:
+            return []
+        columns = {name: i for i, name in enumerate(header)}
+
+        def cell(values, name):
+            col = columns.get(name)
+            if col is None or col >= len(values):
+                return None
+            return values[col]
+
+        records = {}
+        for position, values in enumerate(rows):
+            if not values:
+                continue
+            try:
+                latency = float(cell(values, LATENCY_HEADER))
+            except (TypeError, ValueError):
+                continue  # 缓存命中、合并行或失败行没有耗时
+            if SUCCESS_HEADER in columns and not is_success(
+                cell(values, SUCCESS_HEADER)
+            ):
+                continue
+            question = str(cell(values, QUESTION_HEADER) or "")
+            if question.endswith(RETRY_SUFFIX):
+                question = question[: -len(RETRY_SUFFIX)]
+            try:
+                order = int(cell(values, ROW_ID_HEADER))
+            except (TypeError, ValueError):
+                order = position
+            records[order] = {
+                "question": question,
+                "doc_name": str(cell(values, DOC_NAME_HEADER) or ""),
+                "hash": str(cell(values, HASH_HEADER) or question_hash(question)),
+                "latency": latency,
+            }
+        return [records[key] for key in sorted(records)]
+    finally:
+        workbook.close()
+
+
+class LatencyModel:
+    """单个问题耗时的估计模型
+
+    同一问题（按问题哈希）有历史耗时时直接使用历史均值，否则按问题长度线性估计；
+    没有任何历史数据时以问题长度作为相对耗时。
+    """
+
+    def __init__(self, records: Iterable[dict] = ()):
+        samples: Dict[str, List[float]] = {}
+        points = []
+        for record in records:
+            samples.setdefault(record["hash"], []).append(record["latency"])
+            points.append((len(record["question"]), record["latency"]))
+        self.known = {key: statistics.fmean(values) for key, values in samples.items()}
+        self.base, self.per_char = self._fit(points)
+
+    @staticmethod
+    def _fit(points):
+        """最小二乘拟合 耗时 = base + per_char * 长度"""
+        if len(points) < 2:
+            if points:
+                return points[0][1], 0.0
+            return 0.0, 1.0
+        lengths = [p[0] for p in points]
+        latencies = [p[1] for p in points]
+        mean_len = statistics.fmean(lengths)
+        mean_lat = statistics.fmean(latencies)
+        var = sum((x - mean_len) ** 2 for x in lengths)
+        if var == 0:
+            return mean_lat, 0.0
+        per_char = sum((x - mean_len) * (y - mean_lat) for x, y in points) / var
+        per_char = max(0.0, per_char)
+        return max(0.0, mean_lat - per_char * mean_len), per_char
+
+    @classmethod
+    def from_logs(cls, log_files: Iterable[str]) -> "LatencyModel":
+        """从一个或多个历史批量日志构建模型（不存在或无法读取的文件会被忽略）"""
+        records = []
+        for log_file in log_files:
+            if not log_file or not os.path.exists(log_file):
+                continue
+            try:
+                records.extend(load_log_records(log_file))
+            except Exception as e:
+                logger.warning(f"读取历史耗时失败 {log_file}: {e}")
+        return cls(records)
+
+    @property
+    def has_history(self) -> bool:
+        return bool(self.known)
+
+    def estimate(self, question: str) -> float:
+        """估计问题的处理耗时"""
+        known = self.known.get(question_hash(question))
+        if known is not None:
+            return known
+        return self.base + self.per_char * len(question.strip())
+
+
+def order_tasks(
+    tasks: List[dict],
+    policy: str = POLICY_SHEET,
+    model: Optional[LatencyModel] = None,
+    seed: Optional[int] = None,
+) -> List[dict]:
+    """按调度策略返回新的任务派发顺序（不修改原列表）
+
+    Args:
+        tasks: 任务列表，每个任务至少包含 question 和 doc_name
+        policy: 调度策略，见 POLICIES
+        model: 耗时估计模型，longest 和 doc 策略使用，默认按问题长度估计
+        seed: shuffle 策略的随机种子
+
+    Raises:
+        ValueError: 未知的调度策略
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"未知的调度策略: {policy}（可选: {', '.join(POLICIES)}）")
+    ordered = list(tasks)
+    model = model or LatencyModel()
+
+    if policy == POLICY_LONGEST:
+        # 最长处理时间优先（LPT），稳定排序保证同耗时时保持表格顺序
+        ordered.sort(key=lambda task: -model.estimate(task["question"]))
+    elif policy == POLICY_DOC:
+        # 同一文档的问题连续派发；总耗时大的文档先开始，避免大文档落在末尾
+        groups: Dict[str, List[dict]] = {}
+        for task in ordered:
+            groups.setdefault(task.get("doc_name", ""), []).append(task)
+        ranked = sorted(
+            groups.values(),
+            key=lambda group: -sum(model.estimate(t["question"]) for t in group),
+        )
+        ordered = [task for group in ranked for task in group]
+    elif policy == POLICY_SHUFFLE:
+        random.Random(seed).shuffle(ordered)
+    return ordered
+
+
+def split_records(records: List[dict], holdout: float = 0.5, seed: int = 0):
+    """把记录随机分为建模集和模拟集（模拟集保持原表格顺序）
+
+    评估调度策略时，耗时模型不能用被模拟的记录构建，否则 longest 策略相当于提前知道每行的实际耗时。
+
+    Returns:
+        tuple: (建模集, 模拟集)
+    """
+    indexes = list(range(len(records)))
+    random.Random(seed).shuffle(indexes)
+    cut = int(round(len(records) * holdout))
+    held_out = set(indexes[:cut])
+    train = [r for i, r in enumerate(records) if i not in held_out]
+    test = [r for i, r in enumerate(records) if i in held_out]
+    return train, test
+
+
+def model_error(model: LatencyModel, records: List[dict]) -> Dict[str, float]:
+    """模型在给定记录上的估计误差
+
+    Returns:
+        dict: {"mae": 平均绝对误差（秒）, "relative": 平均绝对误差 / 平均实际耗时}
+    """
+    if not records:
+        return {"mae": 0.0, "relative": 0.0}
+    mae = statistics.fmean(
+        abs(model.estimate(r["question"]) - r["latency"]) for r in records
+    )
+    mean_latency = statistics.fmean(r["latency"] for r in records)
+    return {"mae": mae, "relative": mae / mean_latency if mean_latency else 0.0}
+
+
+def simulate_makespan(durations: Iterable[float], concurrency: int) -> float:
+    """模拟按给定顺序派发时的总用时（空闲线程立即领取下一个任务）"""
+    workers = [0.0] * max(1, concurrency)
+    for duration in durations:
+        free_at = heapq.heappop(workers)
+        heapq.heappush(workers, free_at + duration)
+    return max(workers)
+
+
+def compare_policies(
+    records: List[dict],
+    concurrency: int,
+    policies: Iterable[str] = POLICIES,
+    model: Optional[LatencyModel] = None,
+    seed: int = 0,
+) -> Dict[str, float]:
+    """用历史记录的实际耗时模拟各调度策略的总用时
+
+    Args:
+        records: load_log_records 返回的记录（按原表格顺序）
+        concurrency: 并发数
+        policies: 要比较的策略
+        model: 策略使用的耗时估计模型，应由更早的日志或 split_records 的建模集构建；
+            默认只按问题长度估计，不使用 records 中的耗时
+        seed: shuffle 策略的随机种子
+
+    Returns:
+        dict: {策略: 模拟总用时（秒）}
+    """
+    model = model or LatencyModel()
+    return {
+        policy: simulate_makespan(
+            (r["latency"] for r in order_tasks(records, policy, model, seed)),
+            concurrency,
+        )
+        for policy in policies
+    }
@@ -0,0 +1,610 @@
+"""
+分片执行模块
+多个进程（可以在不同主机上）指向同一输入文件和共享目录（NFS 或同步卷），
+通过原子租约文件领取行范围分片，写入各自的分片日志，最后合并为完整的批量日志
+
+共享目录结构：
+    manifest.json            输入文件指纹、行数和分片大小，所有节点必须一致
+    leases/shard-00000.lease 分片租约（持有者、到期时间），持有者定期续约
+    journals/shard-00000.jsonl 分片日志，每行一条处理结果
+    done/shard-00000.done    分片完成标记
+
+租约到期时间使用各节点的系统时间，多主机部署时需要开启时间同步。
+"""
+
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import openpyxl
+
+from dify_chat_tester.config.logging import get_logger
+from dify_chat_tester.core.batch import get_real_max_row
+from dify_chat_tester.core.checkpoint import (
+    HASH_HEADER,
+    LATENCY_HEADER,
+    ROW_ID_HEADER,
+    SOURCE_HEADER,
+    question_hash,
+)
+from dify_chat_tester.core.constants import (
+    DONE_DIR,
+    JOURNAL_DIR,
+    LEASE_DIR,
+    MANIFEST_FILE,
+)
+from dify_chat_tester.utils.excel import log_to_excel
+
+logger = get_logger("dify_chat_tester.shard")
+
+# 续约时租约剩余有效期至少为 ttl 的该比例，否则视为即将过期并放弃
+RENEW_MARGIN = 0.1
+
+# 分片：(分片编号, 起始行, 结束行（不含）)
+Shard = Tuple[int, int, int]
+
+
+def default_node_id() -> str:
+    """默认节点 ID：主机名 + 进程号"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def shard_ranges(last_row: int, shard_size: int, first_row: int = 2) -> List[Shard]:
+    """把输入行 [first_row, last_row] 切分为固定大小的分片"""
+    shard_size = max(1, shard_size)
+    shards = []
+    for shard_id, start in enumerate(range(first_row, last_row + 1, shard_size)):
+        shards.append((shard_id, start, min(start + shard_size, last_row + 1)))
+    return shards
+
+
+def file_fingerprint(path: str) -> str:
+    """计算输入文件内容的 SHA-1 指纹"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _shard_name(shard_id: int) -> str:
+    return f"shard-{shard_id:05d}"
+
+
+def _read_json(path: str) -> Optional[dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json_atomic(path: str, data: dict):
+    """写入临时文件后原子替换，读者不会看到写了一半的文件"""
+    tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def ensure_manifest(shared_dir: str, manifest: dict) -> dict:
+    """创建或校验共享目录中的任务清单
+
+    第一个节点以排他方式创建 manifest.json，其余节点校验输入指纹和分片参数一致，
+    防止不同输入混入同一共享目录。
+
+    Raises:
+        ValueError: 清单与当前任务不一致
+    """
+    for sub_dir in (LEASE_DIR, JOURNAL_DIR, DONE_DIR):
+        os.makedirs(os.path.join(shared_dir, sub_dir), exist_ok=True)
+
+    path = os.path.join(shared_dir, MANIFEST_FILE)
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        existing = None
+        for _ in range(50):  # 等待创建者写完
+            existing = _read_json(path)
+            if existing is not None:
+                break
+            time.sleep(0.1)
+        if existing is None:
+            raise ValueError(f"无法读取任务清单: {path}")
+        for key in ("input_sha1", "last_row", "shard_size", "question_col_index"):
+            if existing.get(key) != manifest.get(key):
+                raise ValueError(
+                    f"共享目录中的任务清单与当前任务不一致（{key}: "
+                    f"{existing.get(key)} != {manifest.get(key)}）"
+                )
+        return existing
+
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    return manifest
+
+
+class LeaseManager:
+    """基于文件的分片租约
+
+    - 领取：以 O_CREAT | O_EXCL 创建租约文件，同一时刻只有一个节点成功；
+    - 续约：持有者先写好新的临时文件，确认租约仍属于自己且距到期还有余量后原子替换，
+      租约文件始终存在，其他节点不会误以为分片空闲；
+    - 回收：租约过期后，其他节点先把它重命名为唯一的墓碑文件（只有一个节点能成功），
+      再按领取流程重新创建。
+    """
+
+    def __init__(self, shared_dir: str, node_id: str, ttl: float = 60.0):
+        self.shared_dir = shared_dir
+        self.node_id = node_id
+        self.ttl = ttl
+
+    def _lease_path(self, shard_id: int) -> str:
+        return os.path.join(
+            self.shared_dir, LEASE_DIR, f"{_shard_name(shard_id)}.lease"
+        )
+
+    def _done_path(self, shard_id: int) -> str:
+        return os.path.join(self.shared_dir, DONE_DIR, f"{_shard_name(shard_id)}.done")
+
+    def _lease_data(self) -> dict:
+        now = time.time()
+        return {"owner": self.node_id, "heartbeat": now, "expires_at": now + self.ttl}
+
+    def is_done(self, shard_id: int) -> bool:
+        return os.path.exists(self._done_path(shard_id))
+
+    def lease_info(self, shard_id: int) -> Optional[dict]:
+        return _read_json(self._lease_path(shard_id))
+
+    def _is_expired(self, path: str) -> bool:
+        info = _read_json(path)
+        if info is not None:
+            return info.get("expires_at", 0) < time.time()
+        # 租约文件损坏或正在创建：按修改时间判断
+        try:
+            return os.path.getmtime(path) + self.ttl < time.time()
+        except OSError:
+            return False
+
+    def try_claim(self, shard_id: int) -> bool:
+        """尝试领取分片，成功返回 True"""
+        if self.is_done(shard_id):
+            return False
+
+        path = self._lease_path(shard_id)
+        if os.path.exists(path):
+            if not self._is_expired(path):
+                return False
+            tombstone = f"{path}.expired.{self.node_id}.{time.time():.6f}"
+            try:
+                os.rename(path, tombstone)  # 只有一个节点能重命名成功
+            except OSError:
+                return False
+            info = _read_json(tombstone) or {}
+            if info and info.get("expires_at", 0) >= time.time():
+                # 判断过期后其他节点已抢先回收并重新领取，改回去（link 不会覆盖已存在的文件）
+                try:
+                    os.link(tombstone, path)
+                except OSError:
+                    pass  # 无法恢复时原持有者续约失败会自行放弃
+                os.remove(tombstone)
+                return False
+            logger.info(
+                f"节点 {self.node_id} 回收过期分片 {shard_id}"
+                f"（原持有者 {info.get('owner', '未知')}）"
+            )
+            try:
+                os.remove(tombstone)
+            except OSError:
+                pass
+
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self._lease_data(), f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # 领取期间分片可能刚被其他节点完成
+        if self.is_done(shard_id):
+            self.release(shard_id)
+            return False
+        return True
+
+    def renew(self, shard_id: int) -> bool:
+        """续约；租约已过期、即将过期或已被其他节点回收时返回 False
+
+        回收方只会回收已过期的租约。检查时要求剩余有效期不少于 ttl 的 RENEW_MARGIN，
+        检查到替换之间只有一次 os.replace，回收方不可能在此期间判定过期，也就不会被覆盖。
+        """
+        path = self._lease_path(shard_id)
+        tmp_path = f"{path}.renew.{os.getpid()}.{threading.get_ident()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._lease_data(), f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            info = _read_json(path)
+            if (
+                info is None
+                or info.get("owner") != self.node_id
+                or info.get("expires_at", 0) - time.time() < self.ttl * RENEW_MARGIN
+            ):
+                return False
+            os.replace(tmp_path, path)
+            return True
+        finally:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def release(self, shard_id: int):
+        """释放自己持有的租约"""
+        path = self._lease_path(shard_id)
+        info = _read_json(path)
+        if info is not None and info.get("owner") == self.node_id:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def mark_done(self, shard_id: int):
+        """写入分片完成标记"""
+        _write_json_atomic(
+            self._done_path(shard_id),
+            {"owner": self.node_id, "finished_at": time.time()},
+        )
+
+
+class Heartbeat:
+    """后台续约线程：每 ttl/3 秒续约一次，续约失败（含 I/O 错误）时置 lost 标志"""
+
+    def __init__(self, leases: LeaseManager, shard_id: int):
+        self.leases = leases
+        self.shard_id = shard_id
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name=f"Heartbeat-{shard_id}", daemon=True
+        )
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def _run(self):
+        interval = max(0.05, self.leases.ttl / 3)
+        while not self._stop.wait(interval):
+            try:
+                renewed = self.leases.renew(self.shard_id)
+            except OSError as e:
+                logger.warning(f"分片 {self.shard_id} 续约失败: {e}")
+                renewed = False
+            if not renewed:
+                # 无法确认仍持有租约，停止写入该分片，由租约过期后的新持有者接管
+                self.lost = True
+                logger.warning(f"分片 {self.shard_id} 的租约已丢失")
+                return
+
+
+class ShardJournal:
+    """分片日志：每行一个 JSON 记录，追加写入并立即落盘"""
+
+    def __init__(self, shared_dir: str, shard_id: int):
+        self.path = os.path.join(
+            shared_dir, JOURNAL_DIR, f"{_shard_name(shard_id)}.jsonl"
+        )
+
+    def load(self) -> Dict[int, dict]:
+        """读取已有记录：{输入行号: 最终记录}，成功记录优先"""
+        records: Dict[int, dict] = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # 上一个持有者中断时可能留下半行
+                previous = records.get(record.get("row"))
+                if (
+                    previous is not None
+                    and previous["success"]
+                    and not record["success"]
+                ):
+                    continue
+                records[record["row"]] = record
+        return records
+
+    def append(self, record: dict):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _read_row(worksheet, row_idx, question_col_index, doc_name_col_index):
+    value = worksheet.cell(row=row_idx, column=question_col_index + 1).value
+    question = str(value) if value is not None else ""
+    doc_name = ""
+    if doc_name_col_index is not None:
+        doc_value = worksheet.cell(row=row_idx, column=doc_name_col_index + 1).value
+        doc_name = str(doc_value) if doc_value is not None else ""
+    return question, doc_name
+
+
+def _timed_ask(ask, question):
+    start = time.time()
+    return ask(question), time.time() - start
+
+
+def _process_shard(
+    shard: Shard,
+    worksheet,
+    question_col_index,
+    doc_name_col_index,
+    ask,
+    journal: ShardJournal,
+    heartbeat: Heartbeat,
+    node_id: str,
+    concurrency: int,
+) -> Tuple[int, int, bool]:
+    """处理一个分片，返回 (成功数, 失败数, 是否完整处理)"""
+    _, start, end = shard
+    existing = journal.load()
+    todo = []
+    for row_idx in range(start, end):
+        question, doc_name = _read_row(
+            worksheet, row_idx, question_col_index, doc_name_col_index
+        )
+        record = existing.get(row_idx)
+        if (
+            record
+            and record["success"]
+            and record.get("hash") == question_hash(question)
+        ):
+            continue  # 上一个持有者已成功处理
+        todo.append((row_idx, question, doc_name))
+
+    def make_record(row_idx, question, doc_name, result, latency=None):
+        response, success, error, conversation_id = result
+        return {
+            "row": row_idx,
+            "hash": question_hash(question),
+            "question": question,
+            "doc_name": doc_name,
+            "response": response,
+            "success": bool(success),
+            "error": error,
+            "conversation_id": conversation_id,
+            "latency": latency,
+            "node": node_id,
+            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+    succeeded = failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {}
+        for row_idx, question, doc_name in todo:
+            if heartbeat.lost:
+                break  # 租约已丢失，不再写入该分片
+            if not question.strip():
+                journal.append(
+                    make_record(
+                        row_idx, question, doc_name, ("", False, "问题为空", None)
+                    )
+                )
+                failed += 1
+                continue
+            futures[executor.submit(_timed_ask, ask, question)] = (
+                row_idx,
+                question,
+                doc_name,
+            )
+
+        for future in as_completed(futures):
+            row_idx, question, doc_name = futures[future]
+            try:
+                result, latency = future.result()
+            except Exception as e:
+                result, latency = ("", False, str(e), None), None
+            if heartbeat.lost:
+                for pending in futures:
+                    pending.cancel()
+                return succeeded, failed, False
+            journal.append(make_record(row_idx, question, doc_name, result, latency))
+            if result[1]:
+                succeeded += 1
+            else:
+                failed += 1
+
+    return succeeded, failed, not heartbeat.lost
+
+
+def run_shard_worker(
+    shared_dir: str,
+    input_path: str,
+    question_col_index: int,
+    ask: Callable[[str], tuple],
+    doc_name_col_index: Optional[int] = None,
+    node_id: Optional[str] = None,
+    shard_size: int = 500,
+    lease_ttl: float = 60.0,
+    concurrency: int = 1,
+    poll_interval: Optional[float] = None,
+    on_event: Optional[Callable[[str], None]] = None,
+) -> dict:
+    """作为一个节点参与分片处理，直到所有分片完成
+
+    Args:
+        shared_dir: 共享目录
+        input_path: 输入 Excel 文件（所有节点必须是同一份内容）
+        question_col_index: 问题列索引（从 0 开始）
+        ask: 处理单个问题的函数，返回 (response, success, error, conversation_id)
+        doc_name_col_index: 文档名称列索引
+        node_id: 节点 ID，默认主机名 + 进程号
+        shard_size: 每个分片的行数
+        lease_ttl: 租约有效期（秒），持有者每 ttl/3 秒续约一次
+        concurrency: 分片内的并发数
+        poll_interval: 所有剩余分片都被占用时的轮询间隔，默认 ttl/4
+        on_event: 进度消息回调
+
+    Returns:
+        dict: {"shards": 本节点完成的分片数, "success": int, "failed": int}
+    """
+    node_id = node_id or default_node_id()
+    poll_interval = poll_interval or max(0.05, lease_ttl / 4)
+    notify = on_event or (lambda message: logger.info(message))
+
+    workbook = openpyxl.load_workbook(input_path)
+    worksheet = workbook.active
+
+    last_row = get_real_max_row(worksheet, question_col_index + 1)
+    manifest = ensure_manifest(
+        shared_dir,
+        {
+            "input_sha1": file_fingerprint(input_path),
+            "input_name": os.path.basename(input_path),
+            "last_row": last_row,
+            "shard_size": shard_size,
+            "question_col_index": question_col_index,
+            "doc_name_col_index": doc_name_col_index,
+            "created_by": node_id,
+        },
+    )
+    shards = shard_ranges(manifest["last_row"], manifest["shard_size"])
+    leases = LeaseManager(shared_dir, node_id, ttl=lease_ttl)
+    stats = {"shards": 0, "success": 0, "failed": 0}
+
+    while True:
+        remaining = [s for s in shards if not leases.is_done(s[0])]
+        if not remaining:
+            break
+
+        claimed = False
+        for shard in remaining:
+            shard_id, start, end = shard
+            if not leases.try_claim(shard_id):
+                continue
+            claimed = True
+            notify(f"[分片] {node_id} 领取分片 {shard_id}（第 {start}-{end - 1} 行）")
+            journal = ShardJournal(shared_dir, shard_id)
+            with Heartbeat(leases, shard_id) as heartbeat:
+                succeeded, failed, complete = _process_shard(
+                    shard,
+                    worksheet,
+                    question_col_index,
+                    doc_name_col_index,
+                    ask,
+                    journal,
+                    heartbeat,
+                    node_id,
+                    concurrency,
+                )
+            stats["success"] += succeeded
+            stats["failed"] += failed
+            if complete:
+                leases.mark_done(shard_id)
+                leases.release(shard_id)
+                stats["shards"] += 1
+                notify(
+                    f"[分片] {node_id} 完成分片 {shard_id}：成功 {succeeded}，失败 {failed}"
+                )
+            else:
+                notify(f"[分片] {node_id} 失去分片 {shard_id} 的租约，已放弃")
+            break
+
+        if not claimed:
+            # 剩余分片都由其他存活节点持有，等待完成或租约过期
+            time.sleep(poll_interval)
+
+    return stats
+
+
+def merge_shards(
+    shared_dir: str,
+    output_file: str,
+    selected_role: str = "",
+    response_header: str = "响应",
+) -> dict:
+    """把所有分片日志合并为一个批量日志文件（按输入行号排序）
+
+    Returns:
+        dict: {"rows": 写入行数, "success": int, "failed": int, "missing": [未处理的行号]}
+    """
+    manifest = _read_json(os.path.join(shared_dir, MANIFEST_FILE))
+    if manifest is None:
+        raise ValueError(f"共享目录中没有任务清单: {shared_dir}")
+
+    workbook = openpyxl.Workbook()
+    worksheet = workbook.active
+    worksheet.append(
+        [
+            "时间戳",
+            "角色",
+            "文档名称",
+            "原始问题",
+            response_header,
+            "是否成功",
+            "错误信息",
+            "sessions id",
+            ROW_ID_HEADER,
+            HASH_HEADER,
+            SOURCE_HEADER,
+            LATENCY_HEADER,
+        ]
+    )
+
+    stats = {"rows": 0, "success": 0, "failed": 0, "missing": []}
+    for shard_id, start, end in shard_ranges(
+        manifest["last_row"], manifest["shard_size"]
+    ):
+        records = ShardJournal(shared_dir, shard_id).load()
+        for row_idx in range(start, end):
+            record = records.get(row_idx)
+            if record is None:
+                stats["missing"].append(row_idx)
+                continue
+            log_to_excel(
+                worksheet,
+                [
+                    record.get("time", ""),
+                    selected_role,
+                    record.get("doc_name", ""),
+                    record.get("question", ""),
+                    record.get("response", ""),
+                    record["success"],
+                    record.get("error"),
+                    record.get("conversation_id") or "",
+                    row_idx,
+                    record.get("hash", ""),
+                    "",
+                    (
+                        f"{record['latency']:.3f}"
+                        if record.get("latency") is not None
+                        else ""
+                    ),
+                ],
+            )
+            stats["rows"] += 1
+            stats["success" if record["success"] else "failed"] += 1
+
+    workbook.save(output_file)
+    return stats
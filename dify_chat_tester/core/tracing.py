@@ -0,0 +1,376 @@
+"""
+请求追踪模块
+按行记录批量请求各阶段的时间点（排队、派发、建立连接、收到响应头、首字、末字、
+交给写入线程、落盘），导出为 Chrome trace-event 格式的 trace.json，
+可在 Perfetto（https://ui.perfetto.dev）或 chrome://tracing 中按工作线程查看同一时间轴。
+
+未启用时各记录点只做一次全局变量判断，不影响正常运行。
+"""
+
+import json
+import os
+import threading
+import time
+from typing import List, Optional
+
+from dify_chat_tester.config.loader import get_config
+from dify_chat_tester.config.logging import get_logger
+
+logger = get_logger("dify_chat_tester.tracing")
+
+# trace 中写入线程和调度线程使用的线程号（工作线程使用 worker_id）
+WRITER_TID = 0
+SCHEDULER_TID = -1
+
+_PID = 1
+
+# 命令行 --trace 指定的文件，优先于 BATCH_TRACE_FILE 配置
+_trace_path: Optional[str] = None
+_tracer: Optional["Tracer"] = None
+_local = threading.local()
+_original_connects = {}
+
+
+class Tracer:
+    """一次批量运行的追踪记录
+
+    调度线程在每次请求结束时调用 request()，结果交给写入线程时调用 logged()，
+    写入线程每次保存工作簿后调用 saved()；export() 生成 trace.json。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.origin = time.time()
+        self._lock = threading.Lock()
+        self._requests: List[tuple] = []
+        self._settled = {}  # {输入行号: 进入重排缓冲区的时间}
+        self._logged: List[tuple] = []  # [(输入行号, 时间)]，按交给写入线程的顺序
+        self._saves: List[tuple] = []  # [(开始, 结束, 累计写入行数)]
+
+    def request(
+        self,
+        row_idx: int,
+        worker_id: int,
+        attempt: int,
+        queued: float,
+        dispatched: float,
+        finished: float,
+        timing: dict,
+        success: bool,
+        source: str = "",
+    ):
+        """记录一次请求（含重试中的每次尝试）"""
+        self._requests.append(
+            (
+                row_idx,
+                worker_id,
+                attempt,
+                queued,
+                dispatched,
+                finished,
+                dict(timing or {}),
+                success,
+                source,
+            )
+        )
+
+    def settled(self, row_idx: int, when: float = None):
+        """记录有序输出时一行进入重排缓冲区的时间"""
+        self._settled[row_idx] = when or time.time()
+
+    def logged(self, row_idx: int):
+        """记录一行交给写入线程的时间"""
+        self._logged.append((row_idx, time.time()))
+
+    @property
+    def logged_rows(self) -> int:
+        """已交给写入线程（或串行模式已写入工作表）的行数"""
+        return len(self._logged)
+
+    def saved(self, start: float, end: float, rows_written: int):
+        """记录一次工作簿保存（由写入线程调用）"""
+        with self._lock:
+            self._saves.append((start, end, rows_written))
+
+    def _ts(self, when: float) -> float:
+        return round((when - self.origin) * 1e6, 1)
+
+    def _span(self, name, tid, start, end, cat, args=None):
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "pid": _PID,
+            "tid": tid,
+            "ts": self._ts(start),
+            "dur": round(max(end - start, 0) * 1e6, 1),
+        }
+        if args:
+            event["args"] = args
+        return event
+
+    def _async(self, name, span_id, start, end, cat, args=None):
+        begin = {
+            "name": name,
+            "cat": cat,
+            "ph": "b",
+            "id": span_id,
+            "pid": _PID,
+            "tid": SCHEDULER_TID,
+            "ts": self._ts(start),
+        }
+        if args:
+            begin["args"] = args
+        end_event = dict(begin, ph="e", ts=self._ts(max(end, start)))
+        end_event.pop("args", None)
+        return [begin, end_event]
+
+    def _request_events(self, record) -> list:
+        (
+            row_idx,
+            worker_id,
+            attempt,
+            queued,
+            dispatched,
+            finished,
+            timing,
+            success,
+            source,
+        ) = record
+        args = {"row": row_idx, "attempt": attempt, "worker": worker_id}
+        events = self._async(
+            "排队" if attempt == 1 else "等待重试",
+            f"queue-{row_idx}-{attempt}",
+            queued,
+            dispatched,
+            "queue",
+            args,
+        )
+        args = dict(args, success=success)
+        if source:
+            args["source"] = source
+        events.append(
+            self._span(
+                f"第{row_idx}行", worker_id, dispatched, finished, "request", args
+            )
+        )
+
+        # 请求内的阶段：缺少的时间点（如复用连接时没有建立连接）不生成对应片段
+        start = timing.get("start")
+        connect_end = timing.get("connect_end")
+        headers = timing.get("headers")
+        first_token = timing.get("first_token")
+        phases = [
+            ("建立连接", timing.get("connect_start"), connect_end),
+            ("等待响应头", connect_end or start, headers),
+            ("等待首字", headers or start, first_token),
+            ("流式输出", first_token, timing.get("last_token")),
+        ]
+        for name, begin, end in phases:
+            if begin is not None and end is not None and end >= begin:
+                events.append(self._span(name, worker_id, begin, end, "phase"))
+        return events
+
+    def to_events(self) -> list:
+        """生成 Chrome trace-event 列表"""
+        events = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": _PID,
+                "args": {"name": "dify_chat_tester"},
+            },
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": _PID,
+                "tid": WRITER_TID,
+                "args": {"name": "日志写入"},
+            },
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": _PID,
+                "tid": SCHEDULER_TID,
+                "args": {"name": "调度"},
+            },
+        ]
+        workers = sorted({record[1] for record in self._requests})
+        for worker_id in workers:
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": _PID,
+                    "tid": worker_id,
+                    "args": {"name": f"工作线程 #{worker_id}"},
+                }
+            )
+            events.append(
+                {
+                    "name": "thread_sort_index",
+                    "ph": "M",
+                    "pid": _PID,
+                    "tid": worker_id,
+                    "args": {"sort_index": worker_id},
+                }
+            )
+
+        for record in self._requests:
+            events.extend(self._request_events(record))
+
+        with self._lock:
+            saves = list(self._saves)
+        for start, end, rows_written in saves:
+            events.append(
+                self._span(
+                    "保存日志", WRITER_TID, start, end, "save", {"rows": rows_written}
+                )
+            )
+
+        # 第 n 个交给写入线程的行，在累计写入行数首次达到 n 的那次保存时落盘
+        save_index = 0
+        for ordinal, (row_idx, logged) in enumerate(self._logged, start=1):
+            settled = self._settled.get(row_idx, logged)
+            if logged > settled:
+                events.extend(
+                    self._async(
+                        "等待有序输出",
+                        f"reorder-{row_idx}",
+                        settled,
+                        logged,
+                        "write",
+                        {"row": row_idx},
+                    )
+                )
+            while save_index < len(saves) and saves[save_index][2] < ordinal:
+                save_index += 1
+            if save_index < len(saves):
+                events.extend(
+                    self._async(
+                        "等待落盘",
+                        f"save-{row_idx}",
+                        logged,
+                        saves[save_index][1],
+                        "write",
+                        {"row": row_idx},
+                    )
+                )
+        return events
+
+    def export(self, path: str = None) -> str:
+        """写出 trace.json，返回文件路径"""
+        path = path or self.path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"traceEvents": self.to_events(), "displayTimeUnit": "ms"},
+                f,
+                ensure_ascii=False,
+            )
+        return path
+
+
+def configure_tracing(path: Optional[str]):
+    """设置追踪文件（命令行 --trace），之后启动的批量运行都会记录追踪"""
+    global _trace_path
+    _trace_path = path or None
+
+
+def trace_path() -> Optional[str]:
+    """当前生效的追踪文件：命令行优先，其次 BATCH_TRACE_FILE 配置，未设置时为 None"""
+    if _trace_path:
+        return _trace_path
+    config = get_config()
+    path = config.get_str("BATCH_TRACE_FILE", "") if config else ""
+    return path or None
+
+
+def get_tracer() -> Optional[Tracer]:
+    return _tracer
+
+
+def start_tracing(path: str = None) -> Optional[Tracer]:
+    """开始一次追踪；未指定文件且未配置时返回 None（不启用）"""
+    global _tracer
+    path = path or trace_path()
+    if not path:
+        return None
+    _tracer = Tracer(path)
+    _install_connection_hooks()
+    return _tracer
+
+
+def stop_tracing() -> Optional[str]:
+    """结束追踪并导出，返回写出的文件路径（未启用或写出失败时为 None）"""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    _uninstall_connection_hooks()
+    if tracer is None:
+        return None
+    try:
+        return tracer.export()
+    except OSError as e:
+        logger.warning(f"写出追踪文件 {tracer.path} 失败: {e}")
+        return None
+
+
+def record_save(start: float, end: float, rows_written: int):
+    """写入线程保存工作簿后调用；未启用追踪时直接返回"""
+    tracer = _tracer
+    if tracer is not None:
+        tracer.saved(start, end, rows_written)
+
+
+def bind(timing: Optional[dict]):
+    """把当前线程后续的 mark() 记录到 timing（传 None 解除绑定）"""
+    if _tracer is not None or timing is None:
+        _local.timing = timing
+
+
+def mark(name: str, first: bool = False):
+    """在当前线程绑定的 timing 中记录时间点；first 为 True 时只保留第一次"""
+    if _tracer is None:
+        return
+    timing = getattr(_local, "timing", None)
+    if timing is None:
+        return
+    if first:
+        timing.setdefault(name, time.time())
+    else:
+        timing[name] = time.time()
+
+
+def _traced_connect(original):
+    def connect(self, *args, **kwargs):
+        mark("connect_start", first=True)
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            mark("connect_end")
+
+    connect._traced = True
+    return connect
+
+
+def _install_connection_hooks():
+    """包装 urllib3 的连接建立，记录新建连接（含 TLS 握手）的耗时"""
+    if _original_connects:
+        return
+    try:
+        from urllib3.connection import HTTPConnection, HTTPSConnection
+    except ImportError:  # pragma: no cover - requests 依赖 urllib3
+        return
+    for cls in (HTTPConnection, HTTPSConnection):
+        original = cls.__dict__.get("connect")
+        if original is None or getattr(original, "_traced", False):
+            continue
+        _original_connects[cls] = original
+        cls.connect = _traced_connect(original)
+
+
+def _uninstall_connection_hooks():
+    for cls, original in _original_connects.items():
+        cls.connect = original
+    _original_connects.clear()
@@ -0,0 +1,212 @@
+"""
+日志写入模块
+提供后台写入线程，独占输出工作簿，避免 Excel 保存阻塞调度线程
+"""
+
+import queue
+import threading
+import time
+
+from dify_chat_tester.config.logging import get_logger
+from dify_chat_tester.core.tracing import record_save
+from dify_chat_tester.utils.excel import log_to_excel
+
+logger = get_logger("dify_chat_tester.writer")
+
+# 队列消息类型
+_ROW = "row"
+_FLUSH = "flush"
+_STOP = "stop"
+
+
+class LogWriter:
+    """后台日志写入器
+
+    调用方通过 write() 把行数据放入有界队列，由专用线程批量追加到工作表，
+    并按 save_every 间隔保存文件。启动后工作簿只允许由写入线程访问。
+
+    当队列写满时 write() 会阻塞（背压），阻塞次数和累计等待时间记录在
+    backpressure_events / backpressure_seconds 中，可用于界面展示。
+    """
+
+    def __init__(
+        self,
+        workbook,
+        worksheet,
+        file_name: str,
+        save_every: int = 10,
+        max_queue: int = 1000,
+        batch_size: int = 50,
+    ):
+        self.workbook = workbook
+        self.worksheet = worksheet
+        self.file_name = file_name
+        self.save_every = max(1, save_every)
+        self.max_queue = max(1, max_queue)
+        self.batch_size = max(1, batch_size)
+
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._thread = None
+        self._closed = False
+        self._pending_rows = 0  # 已追加但尚未保存的行数
+
+        # 统计信息
+        self.rows_written = 0
+        self.saves = 0
+        self.last_save_duration = 0.0
+        self.backpressure_events = 0
+        self.backpressure_seconds = 0.0
+        self.last_error = None
+
+    # ------------------------------------------------------------------
+    # 生命周期
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """启动写入线程"""
+        if self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._run, name="LogWriter", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self, timeout: float = None):
+        """写入剩余数据、保存文件并停止线程"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is None:
+            # 未启动时直接在当前线程保存
+            self._save()
+            return
+        self._queue.put((_STOP, None))
+        self._thread.join(timeout=timeout)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    # ------------------------------------------------------------------
+    # 调用方接口
+    # ------------------------------------------------------------------
+
+    def write(self, row_data, worksheet=None) -> bool:
+        """提交一行日志
+
+        Args:
+            row_data: 行数据
+            worksheet: 目标工作表（同一工作簿内），默认为构造时传入的工作表
+
+        Returns:
+            bool: 是否发生了背压（队列已满需要等待）
+        """
+        if self._closed:
+            raise RuntimeError("LogWriter 已关闭，无法继续写入")
+        if self._thread is None:
+            self.start()
+
+        item = (_ROW, (worksheet, row_data))
+        try:
+            self._queue.put_nowait(item)
+            return False
+        except queue.Full:
+            self.backpressure_events += 1
+            wait_start = time.time()
+            self._queue.put(item)
+            self.backpressure_seconds += time.time() - wait_start
+            return True
+
+    def flush(self, wait: bool = True, timeout: float = None) -> bool:
+        """请求把队列中的数据全部写入并保存文件
+
+        Args:
+            wait: 是否等待写入线程完成保存（False 时仅投递请求，立即返回）
+            timeout: 等待超时时间（秒）
+
+        Returns:
+            bool: 是否在超时时间内完成（wait=False 时恒为 True）
+        """
+        if self._closed or self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        if not wait:
+            return True
+        return done.wait(timeout)
+
+    @property
+    def backlog(self) -> int:
+        """当前排队等待写入的条目数"""
+        return self._queue.qsize()
+
+    @property
+    def is_backlogged(self) -> bool:
+        """队列是否接近写满（超过 80%）"""
+        return self._queue.qsize() >= self.max_queue * 0.8
+
+    # ------------------------------------------------------------------
+    # 写入线程
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        """写入线程主循环：批量取出消息，追加行并按需保存"""
+        while True:
+            kind, payload = self._queue.get()
+            batch = [(kind, payload)]
+            # 尽量多取一些，减少单次处理的开销
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = False
+            for kind, payload in batch:
+                if kind == _ROW:
+                    self._append(payload)
+                elif kind == _FLUSH:
+                    self._save()
+                    payload.set()
+                elif kind == _STOP:
+                    stop = True
+
+            if self._pending_rows >= self.save_every:
+                self._save()
+
+            if stop:
+                self._save()
+                return
+
+    def _append(self, payload):
+        worksheet, row_data = payload
+        try:
+            log_to_excel(worksheet or self.worksheet, row_data)
+            self.rows_written += 1
+            self._pending_rows += 1
+        except Exception as e:
+            self.last_error = f"写入日志行失败: {e}"
+            logger.warning(self.last_error)
+
+    def _save(self):
+        if self._pending_rows == 0 and self.saves > 0:
+            return
+        start = time.time()
+        try:
+            self.workbook.save(self.file_name)
+            self._pending_rows = 0
+            self.saves += 1
+            self.last_error = None
+            record_save(start, time.time(), self.rows_written)
+        except PermissionError:
+            self.last_error = (
+                f"无法保存日志文件 '{self.file_name}'。请确保文件未被其他程序打开。"
+            )
+            logger.warning(self.last_error)
+        except Exception as e:
+            self.last_error = f"保存日志时出错：{e}"
+            logger.warning(self.last_error)
+        finally:
+            self.last_save_duration = time.time() - start
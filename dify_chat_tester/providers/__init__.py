@@ -1,19 +1,26 @@
 """Providers 模块 - AI 供应商"""
 
-from dify_chat_tester.providers.base import (
-    AIProvider,
-    DifyProvider,
-    OpenAIProvider,
-    get_provider,
-    iFlowProvider,
-)
-from dify_chat_tester.providers.plugin_manager import PluginManager
-from dify_chat_tester.providers.setup import (
-    get_plugin_providers_config,
-    setup_dify_provider,
-    setup_iflow_provider,
-    setup_openai_provider,
-    setup_plugin_provider,
+from dify_chat_tester._lazy import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(
+    __name__,
+    {
+        "dify_chat_tester.providers.base": [
+            "AIProvider",
+            "DifyProvider",
+            "OpenAIProvider",
+            "get_provider",
+            "iFlowProvider",
+        ],
+        "dify_chat_tester.providers.plugin_manager": ["PluginManager"],
+        "dify_chat_tester.providers.setup": [
+            "get_plugin_providers_config",
+            "setup_dify_provider",
+            "setup_iflow_provider",
+            "setup_openai_provider",
+            "setup_plugin_provider",
+        ],
+    },
 )
 
 __all__ = [
@@ -21,34 +21,28 @@ from typing import Callable, List, Optional
 
 import requests
 
+from dify_chat_tester.config.loader import get_config
 from dify_chat_tester.config.logging import get_logger
+from dify_chat_tester.core.tracing import mark as mark_trace
 
-# 导入配置加载器
-try:
-    from dify_chat_tester.config.loader import get_config
+logger = get_logger("dify_chat_tester.ai_providers")
 
-    config = get_config()
-except ImportError:
-    # 如果没有配置加载器，使用默认配置
-    config = None
 
+# 网络重试的默认值（仅针对网络超时/连接错误生效），可由 NETWORK_MAX_RETRIES、
+# NETWORK_RETRY_DELAY 配置覆盖
+NETWORK_MAX_RETRIES = 3
+NETWORK_RETRY_DELAY = 1.0
 
-logger = get_logger("dify_chat_tester.ai_providers")
 
-
-# 全局网络重试配置（仅针对网络超时/连接错误生效）
-if config:
-    try:
-        NETWORK_MAX_RETRIES = int(config.get_float("NETWORK_MAX_RETRIES", 3))
-    except Exception:
-        NETWORK_MAX_RETRIES = 3
-    try:
-        NETWORK_RETRY_DELAY = float(config.get_float("NETWORK_RETRY_DELAY", 1.0))
-    except Exception:
-        NETWORK_RETRY_DELAY = 1.0
-else:
-    NETWORK_MAX_RETRIES = 3
-    NETWORK_RETRY_DELAY = 1.0
+def _network_retry_settings() -> tuple:
+    """读取网络重试配置，返回 (最大尝试次数, 重试间隔秒数)"""
+    config = get_config()
+    if not config:
+        return NETWORK_MAX_RETRIES, NETWORK_RETRY_DELAY
+    return (
+        int(config.get_float("NETWORK_MAX_RETRIES", NETWORK_MAX_RETRIES)),
+        float(config.get_float("NETWORK_RETRY_DELAY", NETWORK_RETRY_DELAY)),
+    )
 
 
 def _post_with_retry(
@@ -62,15 +56,20 @@ def _post_with_retry(
 
     仅在出现 Timeout / ConnectionError 时重试，其他异常原样抛出。
     """
-    if max_retries is None:
-        max_retries = NETWORK_MAX_RETRIES
-    if retry_delay is None:
-        retry_delay = NETWORK_RETRY_DELAY
+    if max_retries is None or retry_delay is None:
+        default_retries, default_delay = _network_retry_settings()
+        if max_retries is None:
+            max_retries = default_retries
+        if retry_delay is None:
+            retry_delay = default_delay
 
     last_exc: Exception | None = None
     for attempt in range(1, max_retries + 1):
         try:
-            return requests.post(url, **kwargs)
+            response = requests.post(url, **kwargs)
+            # 流式请求在收到响应头后即返回
+            mark_trace("headers")
+            return response
         except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:  # type: ignore[attr-defined]
             last_exc = e
             logger.warning("请求失败（第 %s/%s 次）：%s", attempt, max_retries, str(e))
@@ -190,7 +189,8 @@ class AIProvider(ABC):
             show_indicator: 是否显示等待指示器
             show_thinking: 是否显示思维链
             stream_callback: 流式回调函数 (event_type, content)
-                             event_type: "text" | "tool_call" | "tool_result" | "thinking"
+                             event_type: "text" | "tool_call" | "tool_result" | "thinking" | "usage"
+                             （"usage" 的 content 为供应商返回的输出 token 数）
                              可选参数，不传则不回调
 
         Returns:
@@ -199,32 +199,44 @@ class AIProvider(ABC):
         pass
 
     # 等待指示器配置（可调整）
-    # 从配置中获取，如果失败则使用默认值
-    if config:
-        WAITING_INDICATORS = config.get_list(
-            "WAITING_INDICATORS", default=["⣾", "⣽", "⣻", "⢿", "⡿", "⣟", "⣯", "⣷"]
+    # 子类可直接覆盖；为 None 时在显示时读取 WAITING_* 配置，没有配置则使用默认值
+    WAITING_INDICATORS = None
+    WAITING_TEXT = None
+    WAITING_DELAY = None
+
+    def _waiting_settings(self) -> tuple:
+        """返回 (指示器字符列表, 提示文本, 刷新间隔秒数)"""
+        indicators = ["⣾", "⣽", "⣻", "⢿", "⡿", "⣟", "⣯", "⣷"]
+        text, delay = "正在思考", 0.1
+        config = get_config()
+        if config:
+            indicators = config.get_list("WAITING_INDICATORS", default=indicators)
+            text = config.get_str("WAITING_TEXT", text)
+            delay = config.get_float("WAITING_DELAY", delay)
+        return (
+            (
+                self.WAITING_INDICATORS
+                if self.WAITING_INDICATORS is not None
+                else indicators
+            ),
+            self.WAITING_TEXT if self.WAITING_TEXT is not None else text,
+            self.WAITING_DELAY if self.WAITING_DELAY is not None else delay,
         )
-        WAITING_TEXT = config.get_str("WAITING_TEXT", "正在思考")
-        WAITING_DELAY = config.get_float("WAITING_DELAY", 0.1)
-    else:
-        WAITING_INDICATORS = ["⣾", "⣽", "⣻", "⢿", "⡿", "⣟", "⣯", "⣷"]
-        WAITING_TEXT = "正在思考"
-        WAITING_DELAY = 0.1
 
     def show_waiting_indicator(self, stop_event: threading.Event):
         """显示等待状态指示器"""
-        indicators = self.WAITING_INDICATORS
+        indicators, waiting_text_prefix, delay = self._waiting_settings()
         idx = 0
         # 使用固定长度的字符串来避免截断
         while not stop_event.is_set():
             # 构建完整的等待信息，确保长度一致
-            waiting_text = f"AI: {self.WAITING_TEXT} {indicators[idx]}"
+            waiting_text = f"AI: {waiting_text_prefix} {indicators[idx]}"
             # 添加足够的空格来覆盖之前的文本
             padding = " " * (50 - len(waiting_text))
             sys.stdout.write(f"\r{waiting_text}{padding}")
             sys.stdout.flush()
             idx = (idx + 1) % len(indicators)
-            time.sleep(self.WAITING_DELAY)
+            time.sleep(delay)
         # 清除整行
         sys.stdout.write("\r" + " " * 50 + "\r")
         sys.stdout.flush()
@@ -430,6 +442,12 @@ class DifyProvider(AIProvider):
                                     # 消息结束，可以在这里处理元数据
                                     if "conversation_id" in data:
                                         new_conversation_id = data["conversation_id"]
+                                    usage = (data.get("metadata") or {}).get("usage")
+                                    if stream_callback and isinstance(usage, dict):
+                                        if "completion_tokens" in usage:
+                                            stream_callback(
+                                                "usage", usage["completion_tokens"]
+                                            )
                                     # 流式响应正常结束
                                     break
 
@@ -487,6 +505,7 @@ class OpenAIProvider(AIProvider):
         self.api_key = api_key
 
         # 从配置中获取 OpenAI 模型列表
+        config = get_config()
         if config:
             self.DEFAULT_MODELS = config.get_list(
                 "OPENAI_MODELS",
@@ -543,6 +562,7 @@ class OpenAIProvider(AIProvider):
         }
 
         # 准备消息
+        config = get_config()
         messages = [
             {
                 "role": "system",
@@ -647,6 +667,18 @@ class OpenAIProvider(AIProvider):
                                 try:
                                     data = json.loads(decoded_line[6:])
 
+                                    # 部分服务在结束片段中附带 usage
+                                    usage = (
+                                        data.get("usage")
+                                        if isinstance(data, dict)
+                                        else None
+                                    )
+                                    if stream_callback and isinstance(usage, dict):
+                                        if "completion_tokens" in usage:
+                                            stream_callback(
+                                                "usage", usage["completion_tokens"]
+                                            )
+
                                     if "choices" in data and len(data["choices"]) > 0:
                                         choice = data["choices"][0]
 
@@ -974,6 +1006,7 @@ class iFlowProvider(AIProvider):
         self.api_key = api_key
 
         # 从配置中获取 iFlow 模型列表
+        config = get_config()
         if config:
             self.DEFAULT_MODELS = config.get_list(
                 "IFLOW_MODELS",
@@ -1011,6 +1044,7 @@ class iFlowProvider(AIProvider):
         }
 
         # 准备消息
+        config = get_config()
         messages = [
             {
                 "role": "system",
@@ -0,0 +1,261 @@
+"""
+插件发现缓存
+外部插件目录的扫描结果保存为清单（manifest.json），启动时只需检查清单中各目录的修改时间和
+zip 文件的大小/修改时间，未变化时直接复用，不再递归扫描。zip 插件按内容哈希解压到缓存目录，
+内容不变则复用已解压的目录，不再被引用且超过保留期的解压目录会被清理。
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from dify_chat_tester.config.logging import get_logger
+
+logger = get_logger("dify_chat_tester.plugin_cache")
+
+MANIFEST_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+# 递归扫描的最大深度
+MAX_SCAN_DEPTH = 3
+# 不再被清单引用的解压目录的保留时间（秒），其他仍在运行的进程可能还在使用
+PRUNE_GRACE_SECONDS = 24 * 3600
+
+# (插件名, 插件目录, 需要加入 sys.path 的目录；文件夹插件为 None)
+DiscoveredPlugin = Tuple[str, Path, Optional[Path]]
+
+
+def _stamp(path: Path) -> List[int]:
+    """文件/目录的 [修改时间(ns), 大小]，用于判断是否变化"""
+    st = path.stat()
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _find_package(root: Path) -> Optional[str]:
+    """返回 root 下第一个含 __init__.py 的子目录名"""
+    for item in sorted(root.iterdir()):
+        if item.is_dir() and (item / "__init__.py").exists():
+            return item.name
+    return None
+
+
+def _extract_zip(zip_path: Path, digest: str, zips_dir: Path) -> Optional[str]:
+    """按内容哈希解压 zip 插件，已解压过则直接复用
+
+    先解压到同级临时目录再整体改名，中断或并发启动都不会留下半个插件目录。
+
+    Returns:
+        插件包名；zip 中没有插件时返回 None
+    """
+    target = zips_dir / digest
+    if target.is_dir():
+        logger.debug(f"复用已解压插件: {zip_path.name}")
+        return _find_package(target)
+
+    zips_dir.mkdir(parents=True, exist_ok=True)
+    temp_dir = Path(tempfile.mkdtemp(prefix=".extract-", dir=zips_dir))
+    try:
+        with zipfile.ZipFile(zip_path, "r") as zf:
+            zf.extractall(temp_dir)
+        try:
+            os.replace(temp_dir, target)
+        except OSError:
+            # 其他进程已解压同一内容
+            if not target.is_dir():
+                raise
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    name = _find_package(target)
+    if name:
+        logger.info(f"已解压插件: {zip_path.name} -> {name}")
+    return name
+
+
+def _scan(plugins_dir: Path, cache_dir: Path, old_zips: Dict[str, dict]) -> dict:
+    """递归扫描插件目录，生成新的清单"""
+    zips_dir = cache_dir / "zips"
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "root": str(plugins_dir.resolve()),
+        "dirs": {},
+        "zips": {},
+        "plugins": [],
+    }
+
+    def scan(scan_dir: Path, depth: int):
+        if depth > MAX_SCAN_DEPTH:
+            return
+        manifest["dirs"][scan_dir.relative_to(plugins_dir).as_posix()] = _stamp(
+            scan_dir
+        )
+
+        for item in sorted(scan_dir.iterdir()):
+            # 跳过隐藏目录（含缓存目录）和特殊目录
+            if item.name.startswith(".") or item.name == "__pycache__":
+                continue
+            rel = item.relative_to(plugins_dir).as_posix()
+
+            if item.is_dir():
+                if (item / "__init__.py").exists():
+                    # 记录插件目录本身，删除 __init__.py 时清单失效
+                    manifest["dirs"][rel] = _stamp(item)
+                    manifest["plugins"].append({"name": item.name, "dir": rel})
+                    logger.debug(f"发现插件目录: {rel}")
+                else:
+                    scan(item, depth + 1)
+
+            elif item.is_file() and item.suffix == ".zip":
+                stamp = _stamp(item)
+                old = old_zips.get(rel)
+                # 大小和修改时间未变时沿用旧哈希，避免每次重新读取整个文件
+                if old and old["stamp"] == stamp:
+                    digest = old["hash"]
+                else:
+                    digest = _file_hash(item)
+                try:
+                    name = _extract_zip(item, digest, zips_dir)
+                except zipfile.BadZipFile:
+                    logger.error(f"无效的 zip 文件: {item.name}")
+                    name = None
+                except Exception as e:
+                    logger.error(f"解压插件 {item.name} 失败: {e}")
+                    # 不记录修改时间，使清单在下次启动时失效并重试解压
+                    manifest["zips"][rel] = {
+                        "stamp": None,
+                        "hash": digest,
+                        "name": None,
+                    }
+                    continue
+                manifest["zips"][rel] = {"stamp": stamp, "hash": digest, "name": name}
+                if name:
+                    manifest["plugins"].append({"name": name, "zip": rel})
+                else:
+                    logger.warning(f"zip 文件 {item.name} 中未找到有效插件")
+
+    scan(plugins_dir, 0)
+    return manifest
+
+
+def _load_manifest(path: Path) -> Optional[dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def _save_manifest(path: Path, manifest: dict):
+    """原子写入清单；失败（如目录只读）只影响下次启动的速度"""
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+    except OSError as e:
+        logger.debug(f"写入插件清单失败: {e}")
+
+
+def _is_fresh(manifest: dict, plugins_dir: Path, zips_dir: Path) -> bool:
+    """清单记录的目录和 zip 文件均未变化，且解压目录仍在"""
+    if manifest.get("root") != str(plugins_dir.resolve()):
+        return False
+    try:
+        for rel, stamp in manifest["dirs"].items():
+            if _stamp(plugins_dir / rel) != stamp:
+                return False
+        for rel, entry in manifest["zips"].items():
+            if _stamp(plugins_dir / rel) != entry["stamp"]:
+                return False
+            if entry["name"] and not (zips_dir / entry["hash"]).is_dir():
+                return False
+    except (OSError, KeyError, TypeError):
+        return False
+    return True
+
+
+def _touch(path: Path):
+    """更新解压目录的修改时间，标记为仍在使用"""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _prune(zips_dir: Path, keep: set, grace: float = PRUNE_GRACE_SECONDS):
+    """删除不再被清单引用、且超过 grace 秒未被使用的解压目录
+
+    其他进程正在解压的临时目录（.extract-*）和最近仍被使用的目录都会保留。
+    """
+    if not zips_dir.is_dir():
+        return
+    now = time.time()
+    for item in zips_dir.iterdir():
+        if item.name in keep or item.name.startswith("."):
+            continue
+        try:
+            if now - item.stat().st_mtime < grace:
+                continue
+        except OSError:
+            continue
+        shutil.rmtree(item, ignore_errors=True)
+        logger.debug(f"已清理插件解压目录: {item.name}")
+
+
+def discover_plugins(
+    plugins_dir: Path, cache_dir: Optional[Path] = None
+) -> List[DiscoveredPlugin]:
+    """发现外部插件目录中的文件夹插件和 zip 插件
+
+    Args:
+        plugins_dir: 外部插件目录
+        cache_dir: 清单和解压目录的存放位置，默认为插件目录下的 .cache
+
+    Returns:
+        List[DiscoveredPlugin]: 按路径排序的插件列表
+    """
+    plugins_dir = Path(plugins_dir)
+    cache_dir = Path(cache_dir) if cache_dir else plugins_dir / ".cache"
+    manifest_path = cache_dir / MANIFEST_NAME
+    zips_dir = cache_dir / "zips"
+
+    manifest = _load_manifest(manifest_path)
+    if manifest is not None and _is_fresh(manifest, plugins_dir, zips_dir):
+        logger.debug(f"插件清单未变化，跳过扫描: {plugins_dir}")
+    else:
+        old_zips = manifest.get("zips", {}) if manifest else {}
+        # 缓存目录默认位于插件目录内，需在记录目录修改时间之前创建
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            logger.debug(f"创建插件缓存目录失败: {e}")
+        manifest = _scan(plugins_dir, cache_dir, old_zips)
+        _save_manifest(manifest_path, manifest)
+        _prune(zips_dir, {entry["hash"] for entry in manifest["zips"].values()})
+
+    plugins = []
+    for entry in manifest["plugins"]:
+        if "zip" in entry:
+            root = zips_dir / manifest["zips"][entry["zip"]]["hash"]
+            _touch(root)
+            plugins.append((entry["name"], root / entry["name"], root))
+        else:
+            plugins.append((entry["name"], plugins_dir / entry["dir"], None))
+    return plugins
@@ -57,23 +57,28 @@ class PluginManager:
         except Exception as e:
             logger.error(f"插件加载过程发生错误: {e}", exc_info=True)
 
-    def load_external_plugins(self, external_path: str, enable_demo: bool = False):
+    def load_external_plugins(
+        self, external_path: str, enable_demo: bool = False, cache_dir: str = None
+    ):
         """
         从外部路径加载私有插件
 
         支持:
         - 文件夹形式的插件
-        - .zip 压缩包形式的插件
+        - .zip 压缩包形式的插件（按内容哈希解压到缓存目录并复用）
         - 自动检测和安装第三方依赖
 
+        扫描结果缓存在清单中，目录和 zip 文件未变化时启动不再重新扫描和解压。
+
         Args:
             external_path: 外部插件目录的绝对路径
+            cache_dir: 插件清单和解压目录的存放位置，默认为插件目录下的 .cache
         """
         import sys
-        import tempfile
-        import zipfile
         from pathlib import Path
 
+        from dify_chat_tester.providers.plugin_cache import discover_plugins
+
         plugins_dir = Path(external_path)
 
         if not plugins_dir.exists():
@@ -96,71 +101,15 @@ class PluginManager:
         else:
             path_added = False
 
-        # 临时目录用于解压 zip 插件
-        temp_dirs = []
-
         try:
-            # 收集所有插件目录（包括解压后的 zip）
+            # 收集所有插件目录（zip 插件按内容哈希解压到缓存目录）
             plugin_dirs = []
-
-            # 递归扫描函数：支持多层目录结构
-            def scan_for_plugins(scan_dir: Path, depth: int = 0, max_depth: int = 3):
-                """递归扫描目录查找插件"""
-                if depth > max_depth:
-                    return
-
-                for item in scan_dir.iterdir():
-                    # 跳过隐藏目录和特殊目录
-                    if item.name.startswith(".") or item.name == "__pycache__":
-                        continue
-
-                    # 处理文件夹形式的插件
-                    if item.is_dir():
-                        if (item / "__init__.py").exists():
-                            # 找到插件目录
-                            plugin_dirs.append((item.name, item))
-                            logger.debug(
-                                f"发现插件目录: {item.relative_to(plugins_dir)}"
-                            )
-                        else:
-                            # 不是插件目录，继续递归扫描
-                            scan_for_plugins(item, depth + 1, max_depth)
-
-                    # 处理 zip 形式的插件
-                    elif item.is_file() and item.suffix == ".zip":
-                        try:
-                            # 解压到临时目录
-                            temp_dir = Path(tempfile.mkdtemp(prefix="plugin_"))
-                            temp_dirs.append(temp_dir)
-
-                            with zipfile.ZipFile(item, "r") as zf:
-                                zf.extractall(temp_dir)
-
-                            # 查找解压后的插件目录
-                            for extracted_item in temp_dir.iterdir():
-                                if (
-                                    extracted_item.is_dir()
-                                    and (extracted_item / "__init__.py").exists()
-                                ):
-                                    plugin_name = extracted_item.name
-                                    # 将临时目录添加到 sys.path
-                                    if str(temp_dir) not in sys.path:
-                                        sys.path.insert(0, str(temp_dir))
-                                    plugin_dirs.append((plugin_name, extracted_item))
-                                    logger.info(
-                                        f"已解压插件: {item.name} -> {plugin_name}"
-                                    )
-                                    break
-                            else:
-                                logger.warning(f"zip 文件 {item.name} 中未找到有效插件")
-
-                        except zipfile.BadZipFile:
-                            logger.error(f"无效的 zip 文件: {item.name}")
-                        except Exception as e:
-                            logger.error(f"解压插件 {item.name} 失败: {e}")
-
-            # 开始扫描
-            scan_for_plugins(plugins_dir)
+            for plugin_name, plugin_path, import_root in discover_plugins(
+                plugins_dir, cache_dir
+            ):
+                if import_root is not None and str(import_root) not in sys.path:
+                    sys.path.insert(0, str(import_root))
+                plugin_dirs.append((plugin_name, plugin_path))
 
             # 加载所有插件
             for plugin_name, plugin_path in plugin_dirs:
@@ -226,8 +175,6 @@ class PluginManager:
                     sys.path.remove(parent_dir)
                 except ValueError:
                     pass
-            # 注意：不清理临时目录，因为插件可能仍在使用
-            # temp_dirs 会在程序退出时自动清理
 
     def _check_plugin_dependencies(self, plugin_name: str, plugin_path) -> bool:
         """
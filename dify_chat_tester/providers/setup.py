@@ -17,8 +17,6 @@ from dify_chat_tester.config.loader import get_config
 from dify_chat_tester.providers.base import get_provider
 from dify_chat_tester.providers.plugin_manager import PluginManager
 
-_config = get_config()
-
 
 def _is_interactive() -> bool:
     """判断当前环境是否为交互式终端。
@@ -48,9 +46,10 @@ def setup_dify_provider():
     优先从配置文件读取 Dify 相关配置；若缺失则回退到交互式输入。
     """
     # 1. 优先从配置读取
-    cfg_base_url = _normalize_base_url(_config.get_str("DIFY_BASE_URL", ""))
-    cfg_api_key = _config.get_str("DIFY_API_KEY", "").strip()
-    cfg_app_id = _config.get_str("DIFY_APP_ID", "").strip()
+    config = get_config()
+    cfg_base_url = _normalize_base_url(config.get_str("DIFY_BASE_URL", ""))
+    cfg_api_key = config.get_str("DIFY_API_KEY", "").strip()
+    cfg_app_id = config.get_str("DIFY_APP_ID", "").strip()
 
     # 优先使用配置中已经提供的字段，缺失的再走交互
     base_url = cfg_base_url
@@ -159,8 +158,9 @@ def setup_openai_provider():
     若缺失则回退到交互式输入。
     """
     # 1. 优先从配置读取
-    cfg_base_url = _normalize_base_url(_config.get_str("OPENAI_BASE_URL", ""))
-    cfg_api_key = _config.get_str("OPENAI_API_KEY", "").strip()
+    config = get_config()
+    cfg_base_url = _normalize_base_url(config.get_str("OPENAI_BASE_URL", ""))
+    cfg_api_key = config.get_str("OPENAI_API_KEY", "").strip()
 
     base_url = cfg_base_url
     api_key = cfg_api_key
@@ -219,7 +219,7 @@ def setup_iflow_provider():
     优先从配置文件读取 IFLOW_API_KEY；若缺失则回退到交互式输入。
     """
     # 1. 优先从配置读取
-    cfg_api_key = _config.get_str("IFLOW_API_KEY", "").strip()
+    cfg_api_key = get_config().get_str("IFLOW_API_KEY", "").strip()
 
     if cfg_api_key:
         api_key = cfg_api_key
@@ -264,25 +264,30 @@ def init_plugin_manager(enable_demo: bool = False):
         _plugin_manager.load_plugins()
 
         # 2. 加载外部私有插件（如果配置了路径）
-        external_plugins_path = _config.get_str("EXTERNAL_PLUGINS_PATH", "").strip()
+        config = get_config()
+        external_plugins_path = config.get_str("EXTERNAL_PLUGINS_PATH", "").strip()
         if external_plugins_path:
-            import os
             from pathlib import Path
 
-            # 处理相对路径
-            if not os.path.isabs(external_plugins_path):
-                # 判断运行模式：打包后的可执行文件 vs 源码运行
-                if getattr(sys, "frozen", False):
-                    # PyInstaller 打包后，基于可执行文件所在目录
-                    base_dir = Path(sys.executable).parent
-                else:
-                    # 源码运行，基于当前工作目录
-                    base_dir = Path.cwd()
+            # 判断运行模式：打包后的可执行文件 vs 源码运行
+            if getattr(sys, "frozen", False):
+                # PyInstaller 打包后，基于可执行文件所在目录
+                base_dir = Path(sys.executable).parent
+            else:
+                # 源码运行，基于当前工作目录
+                base_dir = Path.cwd()
 
-                external_plugins_path = str(base_dir / external_plugins_path)
+            # 处理相对路径（绝对路径与 base_dir 拼接后不变）
+            external_plugins_path = str(base_dir / external_plugins_path)
+            # 插件清单和 zip 解压缓存目录，未配置时放在插件目录下的 .cache
+            plugin_cache_path = config.get_str("PLUGIN_CACHE_PATH", "").strip()
 
             _plugin_manager.load_external_plugins(
-                external_plugins_path, enable_demo=enable_demo
+                external_plugins_path,
+                enable_demo=enable_demo,
+                cache_dir=(
+                    str(base_dir / plugin_cache_path) if plugin_cache_path else None
+                ),
             )
     except Exception as e:
         # 插件加载不应影响主程序启动
@@ -318,6 +323,48 @@ def setup_plugin_provider(provider_id: str):
     return None
 
 
+def setup_provider_from_config(provider_id: str):
+    """仅根据配置文件创建供应商实例，不进行任何交互（用于无人值守运行）
+
+    Args:
+        provider_id: 供应商 ID（dify / openai / iflow 或插件 ID）
+
+    Returns:
+        AIProvider: 初始化的供应商实例
+
+    Raises:
+        ValueError: 未知供应商或缺少必需的配置项
+    """
+    required = {
+        "dify": {
+            "base_url": "DIFY_BASE_URL",
+            "api_key": "DIFY_API_KEY",
+            "app_id": "DIFY_APP_ID",
+        },
+        "openai": {"base_url": "OPENAI_BASE_URL", "api_key": "OPENAI_API_KEY"},
+        "iflow": {"api_key": "IFLOW_API_KEY"},
+    }
+
+    if provider_id not in required:
+        provider = setup_plugin_provider(provider_id)
+        if provider is None:
+            raise ValueError(f"未知的供应商: {provider_id}")
+        return provider
+
+    kwargs = {}
+    missing = []
+    config = get_config()
+    for arg, key in required[provider_id].items():
+        value = config.get_str(key, "").strip()
+        if not value:
+            missing.append(key)
+        kwargs[arg] = _normalize_base_url(value) if arg == "base_url" else value
+    if missing:
+        raise ValueError(f"缺少供应商配置项: {', '.join(missing)}")
+
+    return get_provider(provider_id, **kwargs)
+
+
 def get_plugin_providers_config():
     """获取所有插件供应商的配置信息 (用于菜单显示)"""
     configs = {}
@@ -4,6 +4,13 @@
 提供业务逻辑服务的入口。
 """
 
-from dify_chat_tester.services.question_service import QuestionService
+from dify_chat_tester._lazy import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(
+    __name__,
+    {
+        "dify_chat_tester.services.question_service": ["QuestionService"],
+    },
+)
 
 __all__ = ["QuestionService"]
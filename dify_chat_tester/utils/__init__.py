@@ -1,11 +1,21 @@
 """Utils 模块 - 工具函数"""
 
-from dify_chat_tester.utils.excel import init_excel_log, log_to_excel
-from dify_chat_tester.utils.exceptions import (
-    ConfigError,
-    DifyChatTesterError,
-    NetworkError,
-    ProviderError,
+from dify_chat_tester._lazy import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(
+    __name__,
+    {
+        "dify_chat_tester.utils.excel": [
+            "init_excel_log",
+            "log_to_excel",
+        ],
+        "dify_chat_tester.utils.exceptions": [
+            "ConfigError",
+            "DifyChatTesterError",
+            "NetworkError",
+            "ProviderError",
+        ],
+    },
 )
 
 __all__ = [
@@ -30,6 +30,13 @@ def init_excel_log(file_name, headers):
     if os.path.exists(file_name):
         workbook = openpyxl.load_workbook(file_name)
         worksheet = workbook.active
+        # 旧日志的表头是新表头的前缀时，补齐新增的列名
+        existing = [cell.value for cell in worksheet[1]]
+        while existing and existing[-1] is None:
+            existing.pop()
+        if existing == list(headers[: len(existing)]):
+            for col, header in enumerate(headers[len(existing) :], len(existing) + 1):
+                worksheet.cell(row=1, column=col, value=header)
     else:
         workbook = openpyxl.Workbook()
         worksheet = workbook.active
@@ -11,15 +11,21 @@ AI 聊天客户端测试工具 - 主程序入口
 import argparse
 import sys
 
-from dify_chat_tester.cli.app import AppController
+# 各模式所需的模块在 main() 中按需导入，--help 和参数错误时不加载界面、批量引擎和供应商
 
 
 def parse_args(argv: list[str]) -> argparse.Namespace:
     """解析命令行参数。
 
-    支持两种模式：
+    支持以下模式：
     - interactive（默认）：完整交互式体验；
-    - question-generation：直接进入“AI生成测试提问点”流程，可选指定文档文件夹路径。
+    - question-generation：直接进入“AI生成测试提问点”流程，可选指定文档文件夹路径；
+    - batch：无人值守批量询问，参数来自命令行或配置文件，不进行任何交互；
+    - shard-worker：作为分片节点，与其他节点通过共享目录协作处理同一输入文件；
+    - shard-merge：合并共享目录中的分片结果，生成最终日志；
+    - loadtest：开环压测，按目标到达速率发送问题，报告各阶段吞吐量和延迟分位数；
+    - mock-server：启动本地模拟服务，离线模拟 Dify 和 OpenAI 兼容接口的流式响应；
+    - compare：对比两次或多次批量运行的日志，写出成功率、延迟和回答变化的汇总工作簿。
     """
     parser = argparse.ArgumentParser(
         prog="dify_chat_tester",
@@ -27,9 +33,18 @@ def parse_args(argv: list[str]) -> argparse.Namespace:
     )
     parser.add_argument(
         "--mode",
-        choices=["interactive", "question-generation"],
+        choices=[
+            "interactive",
+            "question-generation",
+            "batch",
+            "shard-worker",
+            "shard-merge",
+            "loadtest",
+            "mock-server",
+            "compare",
+        ],
         default="interactive",
-        help="运行模式：interactive 或 question-generation（默认：interactive）",
+        help="运行模式（默认：interactive）",
     )
     parser.add_argument(
         "--folder",
@@ -43,6 +58,207 @@ def parse_args(argv: list[str]) -> argparse.Namespace:
         default=None,
         help="批量处理并发数（2-10 启用并发，1 或不指定为串行模式）",
     )
+    batch_group = parser.add_argument_group(
+        "无人值守批量（--mode batch）",
+        "未指定的参数回退到 .env.config 中对应的 BATCH_* 配置",
+    )
+    batch_group.add_argument("--input", help="输入 Excel 文件路径")
+    batch_group.add_argument(
+        "--question-column", help="问题列：列名或从 1 开始的列序号（默认：问题）"
+    )
+    batch_group.add_argument(
+        "--output", help="输出日志文件路径（默认：<输入文件名>_log.xlsx）"
+    )
+    batch_group.add_argument(
+        "--provider", help="供应商 ID：dify、openai、iflow 或插件 ID"
+    )
+    batch_group.add_argument("--model", help="模型名称")
+    batch_group.add_argument("--role", help="角色名称")
+    batch_group.add_argument(
+        "--resume",
+        choices=["resume", "restart"],
+        default=None,
+        help="已有日志时的处理方式：resume 跳过已成功的行，restart 删除旧日志",
+    )
+    batch_group.add_argument(
+        "--max-failure-rate",
+        type=float,
+        default=None,
+        help="失败率阈值（0-1），超过时以非零状态退出（默认：0.1）",
+    )
+    shard_group = parser.add_argument_group(
+        "分片执行（--mode shard-worker / shard-merge）",
+        "多个节点共享同一目录，通过租约文件领取分片；未指定的参数回退到 SHARD_* 配置",
+    )
+    shard_group.add_argument("--shared-dir", help="所有节点共享的协调目录")
+    shard_group.add_argument("--node-id", help="节点 ID（默认：主机名-进程号）")
+    shard_group.add_argument(
+        "--shard-size", type=int, default=None, help="每个分片的行数（默认：500）"
+    )
+    shard_group.add_argument(
+        "--lease-ttl",
+        type=float,
+        default=None,
+        help="分片租约有效期（秒），节点失联超过该时间后分片会被其他节点接管（默认：60）",
+    )
+    batch_group.add_argument(
+        "--schedule",
+        choices=["sheet", "longest", "doc", "shuffle"],
+        default=None,
+        help="并发派发顺序：sheet 表格顺序、longest 预计耗时长的优先、"
+        "doc 按文档分组、shuffle 随机（默认：BATCH_SCHEDULE_POLICY 或 sheet）",
+    )
+    batch_group.add_argument(
+        "--ordered-output",
+        action="store_true",
+        default=None,
+        help="并发模式下按输入行顺序写入日志（覆盖 BATCH_ORDERED_OUTPUT 配置）",
+    )
+    loadtest_group = parser.add_argument_group(
+        "开环压测（--mode loadtest）",
+        "输入文件、问题列、供应商等沿用无人值守批量参数；未指定的参数回退到 LOADTEST_* 配置",
+    )
+    loadtest_group.add_argument(
+        "--arrival",
+        choices=["constant", "poisson", "step"],
+        default=None,
+        help="到达模式：constant 固定间隔、poisson 泊松到达、step 阶梯递增（默认：constant）",
+    )
+    loadtest_group.add_argument(
+        "--rate", type=float, default=None, help="目标到达速率（次/秒，默认：1）"
+    )
+    loadtest_group.add_argument(
+        "--duration",
+        type=float,
+        default=None,
+        help="每个阶段的持续时间（秒，默认：60）",
+    )
+    loadtest_group.add_argument(
+        "--steps", type=int, default=None, help="step 模式的阶段数（默认：4）"
+    )
+    loadtest_group.add_argument(
+        "--step-increment",
+        type=float,
+        default=None,
+        help="step 模式每阶增加的速率（次/秒，默认：等于 --rate）",
+    )
+    loadtest_group.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=None,
+        help="同时在途的最大请求数，超出时排队并计入延迟（默认：256）",
+    )
+    loadtest_group.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="随机种子（poisson 到达时间、模拟服务的错误抽样）",
+    )
+    mock_group = parser.add_argument_group(
+        "本地模拟服务（--mode mock-server）",
+        "模拟 Dify 和 OpenAI 兼容接口的流式响应；未指定的参数回退到 MOCK_* 配置",
+    )
+    mock_group.add_argument(
+        "--mock-host", default=None, help="监听地址（默认：127.0.0.1）"
+    )
+    mock_group.add_argument(
+        "--mock-port", type=int, default=None, help="监听端口（默认：8765）"
+    )
+    mock_group.add_argument(
+        "--mock-latency",
+        type=float,
+        default=None,
+        help="首个 token 之前的等待时间（秒，默认：0.05）",
+    )
+    mock_group.add_argument(
+        "--mock-token-rate",
+        type=float,
+        default=None,
+        help="每秒输出的 token 数，0 表示不限速（默认：200）",
+    )
+    mock_group.add_argument(
+        "--mock-answer-tokens",
+        type=int,
+        default=None,
+        help="回答长度（token 数，默认：50）",
+    )
+    mock_group.add_argument(
+        "--mock-reasoning-tokens",
+        type=int,
+        default=None,
+        help="OpenAI 格式中思维链的 token 数（默认：0）",
+    )
+    mock_group.add_argument(
+        "--mock-error-rate",
+        type=float,
+        default=None,
+        help="返回 HTTP 500 的比例（0-1，默认：0）",
+    )
+    mock_group.add_argument(
+        "--mock-429-rate",
+        dest="mock_rate_limit_rate",
+        type=float,
+        default=None,
+        help="返回 HTTP 429 的比例（0-1，默认：0）",
+    )
+    mock_group.add_argument(
+        "--mock-redirect",
+        action="store_true",
+        default=None,
+        help="每个请求先返回 307 重定向到相同接口",
+    )
+    compare_group = parser.add_argument_group(
+        "运行对比（--mode compare，汇总工作簿路径使用 --output）"
+    )
+    compare_group.add_argument(
+        "--logs",
+        nargs="+",
+        metavar="LOG",
+        help="要对比的批量日志（.xlsx）、分片日志（.jsonl）或分片共享目录，第一份为基准",
+    )
+    compare_group.add_argument(
+        "--labels", nargs="+", help="各日志在报告中的名称（默认使用文件名）"
+    )
+    compare_group.add_argument(
+        "--max-detail-rows",
+        type=int,
+        default=None,
+        help="“差异明细”工作表最多写出的行数（默认：10000）",
+    )
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument(
+        "--cache",
+        dest="use_cache",
+        action="store_true",
+        default=None,
+        help="批量处理时启用响应缓存（覆盖 RESPONSE_CACHE_ENABLED 配置）",
+    )
+    cache_group.add_argument(
+        "--no-cache",
+        dest="use_cache",
+        action="store_false",
+        help="绕过响应缓存，所有问题都实时请求",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="在 127.0.0.1 的指定端口提供 Prometheus 指标（/metrics），覆盖 METRICS_PORT 配置",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        default=None,
+        help="记录批量请求各阶段耗时并导出 Chrome trace 文件（如 trace.json），覆盖 BATCH_TRACE_FILE 配置",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        nargs="?",
+        const="",
+        default=None,
+        help="在采样剖析下运行所选模式，结束时写出 pstats 文件（默认 profile_时间戳.prof）并按子系统打印热点",
+    )
     parser.add_argument(
         "--enable-demo-plugin",
         action="store_true",
@@ -55,7 +271,56 @@ def main():
     """主程序入口"""
     args = parse_args(sys.argv[1:])
 
+    from dify_chat_tester.bootstrap import bootstrap
+
+    bootstrap()
+
+    profiler = None
+    if args.profile is not None:
+        from dify_chat_tester.core.profiling import start_profiling
+
+        profiler = start_profiling()
+
     try:
+        if args.mode == "mock-server":
+            from dify_chat_tester.config.loader import get_config
+            from dify_chat_tester.core.mock_server import MockSettings, run_mock_server
+
+            config = get_config()
+            settings = MockSettings.from_config(
+                config,
+                latency=args.mock_latency,
+                token_rate=args.mock_token_rate,
+                answer_tokens=args.mock_answer_tokens,
+                reasoning_tokens=args.mock_reasoning_tokens,
+                error_rate=args.mock_error_rate,
+                rate_limit_rate=args.mock_rate_limit_rate,
+                redirect=args.mock_redirect,
+                seed=args.seed,
+            )
+            run_mock_server(
+                settings,
+                host=args.mock_host
+                or (
+                    config.get_str("MOCK_HOST", "127.0.0.1") if config else "127.0.0.1"
+                ),
+                port=args.mock_port
+                or (config.get_int("MOCK_PORT", 8765) if config else 8765),
+            )
+            sys.exit(0)
+
+        if args.mode == "compare":
+            from dify_chat_tester.core.compare import run_compare
+
+            sys.exit(
+                run_compare(
+                    args.logs,
+                    output_path=args.output,
+                    labels=args.labels,
+                    max_detail_rows=args.max_detail_rows,
+                )
+            )
+
         # 初始化插件系统
         # 0. 自动检查并补充插件依赖 (仅在源码 + uv 模式下生效)
         _auto_install_dependencies()
@@ -64,20 +329,128 @@ def main():
 
         init_plugin_manager(enable_demo=args.enable_demo_plugin)
 
+        if args.metrics_port:
+            from dify_chat_tester.core.exporter import start_metrics_server
+
+            start_metrics_server(port=args.metrics_port)
+
+        if args.trace:
+            from dify_chat_tester.core.tracing import configure_tracing
+
+            configure_tracing(args.trace)
+
+        if args.mode == "batch":
+            from dify_chat_tester.core.headless import run_headless_batch
+
+            sys.exit(
+                run_headless_batch(
+                    input_path=args.input,
+                    question_column=args.question_column,
+                    output_path=args.output,
+                    provider_id=args.provider,
+                    model=args.model,
+                    role=args.role,
+                    concurrency=args.concurrency,
+                    resume_policy=args.resume,
+                    max_failure_rate=args.max_failure_rate,
+                    use_cache=args.use_cache,
+                    schedule=args.schedule,
+                    ordered_output=args.ordered_output,
+                )
+            )
+
+        if args.mode == "shard-worker":
+            from dify_chat_tester.core.headless import run_sharded_batch
+
+            sys.exit(
+                run_sharded_batch(
+                    shared_dir=args.shared_dir,
+                    input_path=args.input,
+                    question_column=args.question_column,
+                    provider_id=args.provider,
+                    model=args.model,
+                    role=args.role,
+                    concurrency=args.concurrency,
+                    node_id=args.node_id,
+                    shard_size=args.shard_size,
+                    lease_ttl=args.lease_ttl,
+                    max_failure_rate=args.max_failure_rate,
+                )
+            )
+
+        if args.mode == "shard-merge":
+            from dify_chat_tester.core.headless import run_shard_merge
+
+            sys.exit(
+                run_shard_merge(
+                    shared_dir=args.shared_dir,
+                    output_path=args.output,
+                    role=args.role,
+                )
+            )
+
+        if args.mode == "loadtest":
+            from dify_chat_tester.core.headless import run_headless_load_test
+
+            sys.exit(
+                run_headless_load_test(
+                    input_path=args.input,
+                    question_column=args.question_column,
+                    output_path=args.output,
+                    provider_id=args.provider,
+                    model=args.model,
+                    role=args.role,
+                    arrival=args.arrival,
+                    rate=args.rate,
+                    duration=args.duration,
+                    steps=args.steps,
+                    step_increment=args.step_increment,
+                    max_in_flight=args.max_in_flight,
+                    seed=args.seed,
+                )
+            )
+
+        from dify_chat_tester.cli.app import AppController
+
         app = AppController()
         if args.mode == "question-generation":
             app.run_question_generation_cli(folder_path=args.folder)
         else:
-            app.run(concurrency=args.concurrency)
+            app.run(concurrency=args.concurrency, use_cache=args.use_cache)
         print("\n\n程序已退出。")
         sys.exit(0)
     except KeyboardInterrupt:
         # 优雅处理 Ctrl+C
         print("\n\n⚠️  用户取消操作，程序退出")
+        if args.mode in ("batch", "shard-worker", "loadtest"):
+            # 无人值守运行被中断不能以成功状态退出
+            from dify_chat_tester.core.constants import EXIT_INTERRUPTED
+
+            sys.exit(EXIT_INTERRUPTED)
         sys.exit(0)
     except Exception as e:
         print(f"\n程序发生错误: {e}")
         sys.exit(1)
+    finally:
+        if profiler is not None:
+            _finish_profiling(profiler, args.profile)
+
+
+def _finish_profiling(profiler, path: str):
+    """结束采样，写出剖析文件并打印按子系统汇总的热点"""
+    from dify_chat_tester.core.profiling import (
+        default_profile_path,
+        print_profile_summary,
+    )
+
+    profiler.stop()
+    path = path or default_profile_path()
+    try:
+        profiler.save(path)
+    except OSError as e:
+        print(f"写出剖析文件失败: {e}")
+        path = None
+    print_profile_summary(profiler, path)
 
 
 def _auto_install_dependencies(plugins_dir=None):
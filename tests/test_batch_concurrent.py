@@ -326,6 +326,32 @@ class TestWorkerTableAdvanced:
         assert table.caption is not None
         assert "剩余" in table.caption
 
+    def test_eta_uses_recent_rate(self):
+        """提供滚动统计时按最近速率估计剩余时间，并显示实时指标"""
+        start_time = time.time() - 100  # 全程平均 10 秒/行
+        recent = {
+            "window": 30.0,
+            "rows_per_second": 2.0,
+            "requests_per_second": 2.0,
+            "tokens_per_second": 150.0,
+            "p95": 3.2,
+            "error_rate": 0.05,
+        }
+        table = _generate_worker_table(
+            {},
+            completed=10,
+            total=110,
+            failed=0,
+            start_time=start_time,
+            recent=recent,
+            queue_depth=7,
+        )
+        assert "剩余:50s" in table.caption
+        assert "2.00行/秒" in table.caption
+        assert "P95 3.2s" in table.caption
+        assert "错误 5.0%" in table.caption
+        assert "排队 7" in table.caption
+
     def test_worker_states_display(self):
         """测试各种工作状态的显示"""
         worker_status = {
@@ -0,0 +1,110 @@
+"""微基准套件的冒烟测试（不测量性能，只保证各基准可运行、比较逻辑正确）"""
+
+import argparse
+import csv
+import importlib.util
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _load_benchmark(name):
+    spec = importlib.util.spec_from_file_location(
+        name, os.path.join(ROOT, "benchmarks", f"{name}.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def micro():
+    return _load_benchmark("micro")
+
+
+@pytest.fixture(scope="module")
+def throughput():
+    return _load_benchmark("throughput")
+
+
+class TestMicroBenchmarks:
+    """测试 benchmarks/micro.py"""
+
+    def test_all_benchmarks_run(self, micro):
+        results = micro.run_benchmarks(repeat=1, min_time=0, rounds=1)
+        assert set(results) == set(micro.BENCHMARKS)
+        assert all(value > 0 for value in results.values())
+
+    def test_relative_time_cancels_machine_speed(self, micro):
+        # 校准循环本身的相对耗时约为 1，与机器快慢无关
+        ratios = micro.measure_relative(micro._calibration_loop, repeat=5)
+        assert 0.5 < sorted(ratios)[2] < 2
+
+    def test_baseline_covers_all_benchmarks(self, micro):
+        baseline = micro.load_baseline()["results"]
+        assert set(baseline) == set(micro.BENCHMARKS)
+
+    def test_compare_flags_regressions(self, micro):
+        rows = micro.compare(
+            {"a": 130.0, "b": 110.0, "c": 5.0},
+            {"a": 100.0, "b": 100.0},
+            tolerance=0.25,
+        )
+        assert [(r[0], r[4]) for r in rows] == [
+            ("a", True),
+            ("b", False),
+            ("c", False),
+        ]
+        assert rows[2][3] is None  # 基线中没有的新基准
+
+    def test_compare_command_exit_code(self, micro, tmp_path, capsys):
+        path = str(tmp_path / "baseline.json")
+        micro.save_baseline({"clean_excel_text": 1e-6}, path)
+        code = micro.main(
+            [
+                "compare",
+                "--filter",
+                "clean_excel",
+                "--baseline",
+                path,
+                "--repeat",
+                "1",
+                "--min-time",
+                "0",
+                "--rounds",
+                "1",
+            ]
+        )
+        assert code == 1
+        assert "回退" in capsys.readouterr().out
+
+
+class TestThroughputBenchmark:
+    """测试 benchmarks/throughput.py"""
+
+    def test_stub_seconds(self, throughput):
+        args = argparse.Namespace(
+            mock_latency=0.2, mock_token_rate=100, mock_answer_tokens=51
+        )
+        assert throughput.stub_seconds(args) == pytest.approx(0.7)
+
+    def test_run_level_and_write_results(self, throughput, tmp_path):
+        from dify_chat_tester.core.mock_server import MockServer, MockSettings
+
+        settings = MockSettings(latency=0.01, token_rate=0, answer_tokens=5)
+        with MockServer(settings) as server:
+            raw = throughput.run_level(
+                "threads", "openai", server.base_url, 4, 12, str(tmp_path)
+            )
+        assert raw["rows"] == 12 and raw["success"] == 12
+        assert raw["latency_p50"] >= 0.01
+        assert raw["cpu_seconds"] > 0
+
+        prefix = str(tmp_path / "out" / "tp")
+        throughput.write_results([{"concurrency": 4, **raw}], prefix, {"x": 1})
+        with open(f"{prefix}.csv", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        assert rows[0]["concurrency"] == "4"
+        assert rows[0]["rows"] == "12"
@@ -0,0 +1,74 @@
+"""启动引导的单元测试"""
+
+import json
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from dify_chat_tester import bootstrap as bootstrap_module
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 导入全部业务模块后检查：配置未加载、日志未配置、resource_tracker 未被替换
+_PROBE = """
+import json, sys
+from multiprocessing import resource_tracker
+register = resource_tracker.register
+import dify_chat_tester.core.batch, dify_chat_tester.cli.app
+import dify_chat_tester.providers.setup, dify_chat_tester.core.headless
+from dify_chat_tester.config import loader
+print(json.dumps({
+    "config_loaded": loader._config_loader is not None,
+    "logging_configured": hasattr(sys, "_dify_loguru_configured"),
+    "tracker_patched": resource_tracker.register is not register,
+}))
+"""
+
+
+@pytest.fixture()
+def fresh_bootstrap():
+    with patch.object(bootstrap_module, "_done", False):
+        yield
+
+
+class TestBootstrap:
+    """测试 bootstrap"""
+
+    def test_imports_have_no_side_effects(self):
+        result = subprocess.run(
+            [sys.executable, "-c", _PROBE],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        state = json.loads(result.stdout.splitlines()[-1])
+        assert state == {
+            "config_loaded": False,
+            "logging_configured": False,
+            "tracker_patched": False,
+        }
+
+    def test_idempotent(self, fresh_bootstrap):
+        with (
+            patch("dify_chat_tester.config.logging.setup_logging") as setup_logging,
+            patch("dify_chat_tester.cli.terminal.init_terminal") as init_terminal,
+            patch.object(bootstrap_module, "_silence_resource_tracker") as silence,
+        ):
+            config = bootstrap_module.bootstrap()
+            assert bootstrap_module.bootstrap() is config
+        assert setup_logging.call_count == 1
+        assert init_terminal.call_count == 1
+        assert silence.call_count == 1
+
+    def test_lazy_config_accessors(self):
+        from dify_chat_tester.cli import terminal
+        from dify_chat_tester.config import loader
+
+        assert loader.config_loader is loader.get_config()
+        assert terminal.USE_RICH_UI == terminal.use_rich_ui()
+        with patch.object(terminal, "_use_rich_ui", False):
+            assert terminal.use_rich_ui() is False
@@ -0,0 +1,140 @@
+"""响应缓存的单元测试"""
+
+import time
+from contextlib import ExitStack
+from unittest.mock import MagicMock, patch
+
+import openpyxl
+
+from dify_chat_tester.core.batch import _run_sequential_batch
+from dify_chat_tester.core.cache import ResponseCache, build_cache_key
+
+
+def _provider(base_url="https://api.example.com"):
+    provider = MagicMock()
+    provider.base_url = base_url
+    provider.api_key = "sk-test"
+    return provider
+
+
+class TestCacheKey:
+    """测试缓存键生成"""
+
+    def test_key_depends_on_target_and_prompt(self):
+        """供应商地址、模型、角色、系统提示词或问题变化时缓存键应不同"""
+        provider = _provider()
+        base = build_cache_key("openai", provider, "m1", "user", "你好", "提示词")
+
+        assert base == build_cache_key(
+            "openai", provider, "m1", "user", " 你好 ", "提示词"
+        )
+        assert base != build_cache_key(
+            "openai", provider, "m2", "user", "你好", "提示词"
+        )
+        assert base != build_cache_key(
+            "openai", provider, "m1", "admin", "你好", "提示词"
+        )
+        assert base != build_cache_key(
+            "openai", provider, "m1", "user", "你好", "新提示词"
+        )
+        assert base != build_cache_key(
+            "openai", _provider("https://other.example.com"), "m1", "user", "你好"
+        )
+
+
+class TestResponseCache:
+    """测试 ResponseCache"""
+
+    def test_hit_and_miss_counters(self, tmp_path):
+        cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+        assert cache.get("k") is None
+        cache.put("k", "回答", "conv-1")
+        assert cache.get("k") == ("回答", "conv-1")
+        assert (cache.hits, cache.misses) == (1, 1)
+        cache.close()
+
+    def test_persisted_across_instances(self, tmp_path):
+        path = str(tmp_path / "cache.sqlite3")
+        cache = ResponseCache(path)
+        cache.put("k", "回答")
+        cache.close()
+
+        reopened = ResponseCache(path)
+        assert reopened.get("k") == ("回答", None)
+        reopened.close()
+
+    def test_ttl_expiry(self, tmp_path):
+        cache = ResponseCache(str(tmp_path / "cache.sqlite3"), ttl_seconds=0.05)
+        cache.put("k", "回答")
+        time.sleep(0.1)
+        assert cache.get("k") is None
+        assert cache.evict() == 1
+        assert len(cache) == 0
+        cache.close()
+
+    def test_size_eviction_keeps_recent(self, tmp_path):
+        cache = ResponseCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+        for key in ("a", "b", "c"):
+            cache.put(key, key)
+            time.sleep(0.01)
+        cache.get("a")  # 刷新 a 的访问时间
+        cache.evict()
+
+        assert len(cache) == 2
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        cache.close()
+
+
+class TestBatchWithCache:
+    """测试批量处理复用缓存"""
+
+    def _run(self, tmp_path, provider, cache):
+        input_wb = openpyxl.Workbook()
+        input_ws = input_wb.active
+        input_ws.append(["问题"])
+        input_ws.append(["问题A"])
+
+        output_wb = openpyxl.Workbook()
+        output_ws = output_wb.active
+        output_ws.append(["表头"])
+
+        with ExitStack() as stack:
+            stack.enter_context(patch("dify_chat_tester.core.batch.console"))
+            stack.enter_context(patch("dify_chat_tester.core.batch.print_statistics"))
+            _run_sequential_batch(
+                provider=provider,
+                batch_worksheet=input_ws,
+                output_worksheet=output_ws,
+                output_workbook=output_wb,
+                output_file_name=str(tmp_path / "output.xlsx"),
+                resume_from_row=2,
+                question_col_index=0,
+                doc_name_col_index=None,
+                selected_role="user",
+                selected_model="model",
+                provider_name="Provider",
+                enable_thinking=False,
+                show_batch_response=False,
+                batch_show_indicator=False,
+                request_interval=0,
+                response_cache=cache,
+                provider_id="openai",
+            )
+        return output_ws
+
+    def test_second_run_served_from_cache(self, tmp_path):
+        """第二次运行应直接使用缓存并在日志中标记来源"""
+        cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+        provider = _provider()
+        provider.send_message.return_value = ("回答", True, None, "conv-1")
+
+        first = self._run(tmp_path, provider, cache)
+        second = self._run(tmp_path, provider, cache)
+        cache.close()
+
+        assert provider.send_message.call_count == 1
+        assert first.cell(row=2, column=11).value in (None, "")
+        assert second.cell(row=2, column=5).value == "回答"
+        assert second.cell(row=2, column=11).value == "缓存"
+        assert (cache.hits, cache.misses) == (1, 1)
@@ -0,0 +1,240 @@
+"""断点续跑检查点索引的单元测试"""
+
+from contextlib import ExitStack
+from unittest.mock import MagicMock, patch
+
+import openpyxl
+
+from dify_chat_tester.core.batch import _run_sequential_batch
+from dify_chat_tester.core.checkpoint import (
+    backfill_legacy_rows,
+    is_row_done,
+    is_success,
+    load_checkpoint_index,
+    question_hash,
+    summarize_index,
+)
+from dify_chat_tester.utils.excel import init_excel_log
+
+LOG_HEADERS = [
+    "时间戳",
+    "角色",
+    "文档名称",
+    "原始问题",
+    "响应",
+    "是否成功",
+    "错误信息",
+    "sessions id",
+    "输入行号",
+    "问题哈希",
+]
+
+
+def _write_log(path, rows, headers=LOG_HEADERS):
+    workbook = openpyxl.Workbook()
+    worksheet = workbook.active
+    worksheet.append(headers)
+    for row in rows:
+        worksheet.append(row)
+    workbook.save(path)
+
+
+def _log_row(row_idx, question, success, suffix=""):
+    return [
+        "t",
+        "user",
+        "",
+        question + suffix,
+        "回答" if success else "",
+        str(success),
+        None if success else "错误",
+        "",
+        row_idx,
+        question_hash(question),
+    ]
+
+
+class TestCheckpointIndex:
+    """测试检查点索引构建"""
+
+    def test_is_success_cell_values(self):
+        """“是否成功”单元格兼容布尔值和常见的真值写法"""
+        assert is_success(True) and is_success("True") and is_success(" 是 ")
+        assert not is_success(False) and not is_success("False")
+        assert not is_success(None) and not is_success("")
+
+    def test_completion_order_and_retry_rows(self, tmp_path):
+        """乱序记录和重试记录应按输入行号归并"""
+        log_file = str(tmp_path / "log.xlsx")
+        _write_log(
+            log_file,
+            [
+                _log_row(4, "问题C", True),
+                _log_row(2, "问题A", False),
+                _log_row(3, "问题B", False),
+                _log_row(2, "问题A", True, suffix=" (重试)"),
+            ],
+        )
+
+        index = load_checkpoint_index(log_file)
+
+        assert is_row_done(index, 2, "问题A")
+        assert not is_row_done(index, 3, "问题B")
+        assert is_row_done(index, 4, "问题C")
+        assert not is_row_done(index, 5, "问题D")
+        assert summarize_index(index) == (2, 1)
+
+    def test_success_not_overridden_by_later_failure(self, tmp_path):
+        """已成功的行不应被后面的失败记录覆盖"""
+        log_file = str(tmp_path / "log.xlsx")
+        _write_log(log_file, [_log_row(2, "问题A", True), _log_row(2, "问题A", False)])
+
+        index = load_checkpoint_index(log_file)
+        assert is_row_done(index, 2, "问题A")
+
+    def test_changed_question_is_not_done(self, tmp_path):
+        """输入文件中问题被修改后应重新处理"""
+        log_file = str(tmp_path / "log.xlsx")
+        _write_log(log_file, [_log_row(2, "旧问题", True)])
+
+        index = load_checkpoint_index(log_file)
+        assert not is_row_done(index, 2, "新问题")
+
+    def test_legacy_log_returns_none(self, tmp_path):
+        """旧版日志没有输入行号列时返回 None"""
+        log_file = str(tmp_path / "log.xlsx")
+        _write_log(
+            log_file,
+            [["t", "user", "", "问题", "回答", "True", None, ""]],
+            headers=LOG_HEADERS[:8],
+        )
+
+        assert load_checkpoint_index(log_file) is None
+
+
+class TestSequentialResume:
+    """测试串行模式按检查点跳过已成功的行"""
+
+    def test_skips_successful_rows(self, tmp_path):
+        input_wb = openpyxl.Workbook()
+        input_ws = input_wb.active
+        input_ws.append(["问题"])
+        for question in ["问题A", "问题B", "问题C"]:
+            input_ws.append([question])
+
+        index = {2: (question_hash("问题A"), True), 3: (question_hash("问题B"), False)}
+
+        output_wb = openpyxl.Workbook()
+        output_ws = output_wb.active
+        output_ws.append(LOG_HEADERS)
+
+        mock_provider = MagicMock()
+        mock_provider.send_message.return_value = ("回答", True, None, None)
+
+        with ExitStack() as stack:
+            stack.enter_context(patch("dify_chat_tester.core.batch.console"))
+            stack.enter_context(patch("dify_chat_tester.core.batch.print_statistics"))
+            _run_sequential_batch(
+                provider=mock_provider,
+                batch_worksheet=input_ws,
+                output_worksheet=output_ws,
+                output_workbook=output_wb,
+                output_file_name=str(tmp_path / "output.xlsx"),
+                resume_from_row=2,
+                question_col_index=0,
+                doc_name_col_index=None,
+                selected_role="user",
+                selected_model="model",
+                provider_name="Provider",
+                enable_thinking=False,
+                show_batch_response=False,
+                batch_show_indicator=False,
+                request_interval=0,
+                resume_index=index,
+            )
+
+        asked = [c.kwargs["message"] for c in mock_provider.send_message.call_args_list]
+        assert asked == ["问题B", "问题C"]
+        # 每条日志都记录了输入行号
+        assert [output_ws.cell(row=r, column=9).value for r in (2, 3)] == ["3", "4"]
+
+
+class TestLegacyLogResume:
+    """测试从旧版日志（无输入行号列）开始的连续两次续跑"""
+
+    QUESTIONS = ["问题A", "", "问题C", "问题D", "问题E"]
+
+    def _run(self, tmp_path, log_file, resume_from_row, resume_index):
+        input_wb = openpyxl.Workbook()
+        input_ws = input_wb.active
+        input_ws.append(["问题"])
+        for question in self.QUESTIONS:
+            input_ws.append([question])
+
+        output_wb, output_ws = init_excel_log(log_file, LOG_HEADERS)
+        if resume_index is None and resume_from_row > 2:
+            backfill_legacy_rows(output_ws)
+
+        mock_provider = MagicMock()
+        mock_provider.send_message.return_value = ("回答", True, None, None)
+        with ExitStack() as stack:
+            stack.enter_context(patch("dify_chat_tester.core.batch.console"))
+            stack.enter_context(patch("dify_chat_tester.core.batch.print_statistics"))
+            _run_sequential_batch(
+                provider=mock_provider,
+                batch_worksheet=input_ws,
+                output_worksheet=output_ws,
+                output_workbook=output_wb,
+                output_file_name=log_file,
+                resume_from_row=resume_from_row,
+                question_col_index=0,
+                doc_name_col_index=None,
+                selected_role="user",
+                selected_model="model",
+                provider_name="Provider",
+                enable_thinking=False,
+                show_batch_response=False,
+                batch_show_indicator=False,
+                request_interval=0,
+                resume_index=resume_index,
+            )
+        return [c.kwargs["message"] for c in mock_provider.send_message.call_args_list]
+
+    def test_resume_twice(self, tmp_path):
+        log_file = str(tmp_path / "log.xlsx")
+        # 旧版日志：前三行已处理（第 3 行为空问题，记为失败），没有输入行号和问题哈希列
+        _write_log(
+            log_file,
+            [
+                ["t", "user", "", "问题A", "回答", "True", None, ""],
+                ["t", "user", "", "", "", "False", "问题为空", ""],
+                ["t", "user", "", "问题C", "回答", "True", None, ""],
+            ],
+            headers=LOG_HEADERS[:8],
+        )
+
+        # 第一次续跑：旧版日志按日志行数推断进度，同时补写输入行号
+        assert load_checkpoint_index(log_file) is None
+        assert self._run(tmp_path, log_file, 5, None) == ["问题D", "问题E"]
+
+        index = load_checkpoint_index(log_file)
+        assert sorted(index) == [2, 3, 4, 5, 6]
+        assert index[2] == (question_hash("问题A"), True)
+
+        # 第二次续跑：按检查点跳过全部已完成的行，空问题不再重复记录
+        rows_before = openpyxl.load_workbook(log_file).active.max_row
+        assert self._run(tmp_path, log_file, 2, index) == []
+        assert openpyxl.load_workbook(log_file).active.max_row == rows_before
+
+    def test_legacy_row_with_changed_question_is_redone(self, tmp_path):
+        log_file = str(tmp_path / "log.xlsx")
+        _write_log(
+            log_file,
+            [["t", "user", "", "旧问题", "回答", "True", None, ""]],
+            headers=LOG_HEADERS[:8],
+        )
+        # 日志记录的问题与输入第 2 行不一致：补写的哈希不匹配，下次续跑会重新处理
+        assert self._run(tmp_path, log_file, 3, None) == ["问题C", "问题D", "问题E"]
+        index = load_checkpoint_index(log_file)
+        assert not is_row_done(index, 2, "问题A")
+        assert is_row_done(index, 4, "问题C")
@@ -0,0 +1,135 @@
+"""重复问题合并的单元测试"""
+
+import threading
+import time
+from contextlib import ExitStack
+from unittest.mock import MagicMock, patch
+
+import openpyxl
+
+from dify_chat_tester.core.batch import _run_concurrent_batch
+from dify_chat_tester.core.coalesce import QuestionCoalescer
+
+
+class TestQuestionCoalescer:
+    """测试 QuestionCoalescer"""
+
+    def test_waiters_released_on_complete(self):
+        coalescer = QuestionCoalescer()
+        assert coalescer.join("问题", {"index": 0}) is False
+        assert coalescer.join(" 问题 ", {"index": 1}) is True
+
+        waiters = coalescer.complete("问题", ("回答", True, None, None))
+        assert [t["index"] for t in waiters] == [1]
+        assert coalescer.lookup("问题") == ("回答", True, None, None)
+        assert coalescer.coalesced == 2
+
+    def test_failed_result_not_remembered(self):
+        coalescer = QuestionCoalescer()
+        coalescer.join("问题", {"index": 0})
+        coalescer.complete("问题", ("", False, "错误", None))
+        assert coalescer.lookup("问题") is None
+
+    def test_answer_released_after_last_duplicate(self):
+        """预先登记出现次数时，最后一个重复行取走结果后释放该结果"""
+        coalescer = QuestionCoalescer()
+        for question in ("问题", "问题", "问题", "单独"):
+            coalescer.expect(question)
+
+        assert coalescer.join("问题", {"index": 0}) is False
+        coalescer.complete("问题", ("回答", True, None, None))
+        assert coalescer.lookup("问题") == ("回答", True, None, None)
+        assert coalescer.lookup("问题") == ("回答", True, None, None)
+        assert coalescer._answered == {}
+
+        # 没有重复行的问题不会被记住
+        coalescer.join("单独", {"index": 3})
+        coalescer.complete("单独", ("回答", True, None, None))
+        assert coalescer._answered == {}
+
+    def test_disabled(self):
+        coalescer = QuestionCoalescer(enabled=False)
+        assert coalescer.join("问题", {}) is False
+        assert coalescer.join("问题", {}) is False
+        assert coalescer.complete("问题", ("回答", True, None, None)) == []
+        assert coalescer.lookup("问题") is None
+
+
+def _run_batch(tmp_path, provider, questions, coalesce):
+    input_wb = openpyxl.Workbook()
+    input_ws = input_wb.active
+    input_ws.append(["问题"])
+    for question in questions:
+        input_ws.append([question])
+
+    output_wb = openpyxl.Workbook()
+    output_ws = output_wb.active
+    output_ws.append(["表头"])
+
+    with ExitStack() as stack:
+        stack.enter_context(patch("dify_chat_tester.core.batch.console"))
+        stack.enter_context(patch("dify_chat_tester.core.batch.Live"))
+        stack.enter_context(patch("dify_chat_tester.core.batch.KeyboardControl"))
+        stack.enter_context(patch("dify_chat_tester.core.batch.print_statistics"))
+        _run_concurrent_batch(
+            provider=provider,
+            batch_worksheet=input_ws,
+            output_worksheet=output_ws,
+            output_workbook=output_wb,
+            output_file_name=str(tmp_path / "output.xlsx"),
+            resume_from_row=2,
+            question_col_index=0,
+            doc_name_col_index=None,
+            selected_role="user",
+            selected_model="model",
+            provider_name="Provider",
+            enable_thinking=False,
+            show_batch_response=False,
+            concurrency=3,
+            coalesce=coalesce,
+        )
+    return openpyxl.load_workbook(str(tmp_path / "output.xlsx")).active
+
+
+def _slow_provider():
+    provider = MagicMock()
+    lock = threading.Lock()
+    asked = []
+
+    def send_message(message, **kwargs):
+        with lock:
+            asked.append(message)
+        time.sleep(0.05)
+        return f"回答:{message}", True, None, None
+
+    provider.send_message.side_effect = send_message
+    return provider, asked
+
+
+class TestConcurrentCoalescing:
+    """测试并发批量处理合并重复问题"""
+
+    def test_duplicates_share_one_request(self, tmp_path):
+        """重复问题只请求一次，每一行仍单独记录并标记为合并"""
+        provider, asked = _slow_provider()
+        questions = ["问题A", "问题A", "问题B", "问题A ", "问题B"]
+
+        log = _run_batch(tmp_path, provider, questions, coalesce=True)
+
+        assert sorted(asked) == ["问题A", "问题B"]
+        rows = [[cell.value for cell in row] for row in log.iter_rows(min_row=2)]
+        assert len(rows) == 5
+        assert sorted(int(r[8]) for r in rows) == [2, 3, 4, 5, 6]
+        assert sum(1 for r in rows if r[10] == "合并") == 3
+        assert all(r[4].startswith("回答:问题") for r in rows)
+
+    def test_disabled_sends_every_row(self, tmp_path):
+        """关闭合并时每一行都独立请求"""
+        provider, asked = _slow_provider()
+
+        log = _run_batch(
+            tmp_path, provider, ["问题A", "问题A", "问题A"], coalesce=False
+        )
+
+        assert asked == ["问题A"] * 3
+        assert all(row[10].value in (None, "") for row in log.iter_rows(min_row=2))
@@ -0,0 +1,221 @@
+"""运行对比的单元测试"""
+
+import json
+import os
+from unittest.mock import patch
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from dify_chat_tester.core.batch import _make_log_row
+from dify_chat_tester.core.checkpoint import question_hash
+from dify_chat_tester.core.compare import (
+    STATUS_CHANGED,
+    STATUS_FIXED,
+    STATUS_ONLY_BASE,
+    STATUS_ONLY_OTHER,
+    STATUS_REGRESSED,
+    STATUS_SAME,
+    compare_runs,
+    load_run,
+    run_compare,
+    run_labels,
+    write_summary_workbook,
+)
+from dify_chat_tester.core.constants import EXIT_OK, EXIT_USAGE
+
+HEADERS = [
+    "时间戳",
+    "角色",
+    "文档名称",
+    "原始问题",
+    "Dify响应",
+    "是否成功",
+    "错误信息",
+    "sessions id",
+    "输入行号",
+    "问题哈希",
+    "结果来源",
+    "耗时(秒)",
+]
+
+
+def _write_log(path, rows):
+    """rows: [(行号, 文档, 问题, 回答, 是否成功, 耗时)]"""
+    workbook = openpyxl.Workbook()
+    worksheet = workbook.active
+    worksheet.append(HEADERS)
+    for row_idx, doc, question, answer, success, latency in rows:
+        worksheet.append(
+            _make_log_row(
+                "员工",
+                doc,
+                question,
+                answer,
+                success,
+                None if success else "HTTP 500",
+                "c-1",
+                row_idx,
+                latency=latency,
+            )
+        )
+    workbook.save(path)
+    return str(path)
+
+
+def _write_journal(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        for row_idx, doc, question, answer, success, latency in rows:
+            record = {
+                "row": row_idx,
+                "hash": question_hash(question),
+                "question": question,
+                "doc_name": doc,
+                "response": answer,
+                "success": success,
+                "error": None if success else "HTTP 500",
+                "conversation_id": None,
+                "latency": latency,
+            }
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.write('{"row": 99, "hash"')  # 中断时留下的半行
+    return str(path)
+
+
+BASE_ROWS = [
+    (2, "A.md", "问题1", "回答1", True, 1.0),
+    (3, "A.md", "问题2", "回答2", True, 2.0),
+    (4, "B.md", "问题3", "", False, 3.0),
+    (5, "B.md", "问题4", "回答4", True, 4.0),
+    (6, "B.md", "问题5", "回答5", True, 5.0),
+]
+OTHER_ROWS = [
+    (2, "A.md", "问题1", "回答1", True, 1.5),
+    (3, "A.md", "问题2", "新的更长的回答2", True, 2.0),
+    (4, "B.md", "问题3", "回答3", True, 3.0),
+    (5, "B.md", "问题4", "", False, 6.0),
+    (7, "B.md", "问题6", "回答6", True, 1.0),
+]
+
+
+@pytest.fixture()
+def result(tmp_path):
+    base = load_run(_write_log(tmp_path / "v1.xlsx", BASE_ROWS))
+    other = load_run(_write_journal(tmp_path / "v2.jsonl", OTHER_ROWS))
+    return compare_runs({"v1": base, "v2": other})
+
+
+class TestLoadRun:
+    """测试日志读取"""
+
+    def test_excel_and_journal_equivalent(self, tmp_path):
+        excel = load_run(_write_log(tmp_path / "a.xlsx", BASE_ROWS), chunk_rows=2)
+        journal = load_run(_write_journal(tmp_path / "a.jsonl", BASE_ROWS))
+        columns = ["row", "hash", "doc_name", "success", "latency", "answer_len"]
+        pd.testing.assert_frame_equal(
+            excel[columns].reset_index(drop=True),
+            journal[columns].reset_index(drop=True),
+            check_dtype=False,
+        )
+        assert (excel["answer_hash"].values == journal["answer_hash"].values).all()
+        assert "response" not in excel
+
+    def test_shard_directory(self, tmp_path):
+        os.makedirs(tmp_path / "journals")
+        _write_journal(tmp_path / "journals" / "shard-00000.jsonl", BASE_ROWS[:2])
+        _write_journal(tmp_path / "journals" / "shard-00001.jsonl", BASE_ROWS[2:])
+        assert len(load_run(str(tmp_path))) == len(BASE_ROWS)
+
+    def test_old_log_without_hash(self, tmp_path):
+        workbook = openpyxl.Workbook()
+        workbook.active.append(HEADERS[:8])
+        workbook.active.append(["t", "员工", "", "问题1", "回答", "True", "", ""])
+        path = tmp_path / "old.xlsx"
+        workbook.save(path)
+        run = load_run(str(path))
+        assert run["hash"].tolist() == [question_hash("问题1")]
+        assert run["latency"].isna().all()
+
+    def test_not_a_batch_log(self, tmp_path):
+        workbook = openpyxl.Workbook()
+        workbook.active.append(["a", "b"])
+        workbook.save(tmp_path / "x.xlsx")
+        with pytest.raises(ValueError):
+            load_run(str(tmp_path / "x.xlsx"))
+
+
+class TestCompareRuns:
+    """测试对比结果"""
+
+    def test_statuses(self, result):
+        pair = result["details"]["v2 vs v1"].set_index("问题")
+        assert pair.loc["问题1", "状态"] == STATUS_SAME
+        assert pair.loc["问题2", "状态"] == STATUS_CHANGED
+        assert pair.loc["问题2", "长度变化"] == len("新的更长的回答2") - len("回答2")
+        assert pair.loc["问题3", "状态"] == STATUS_FIXED
+        assert pair.loc["问题4", "状态"] == STATUS_REGRESSED
+        assert pair.loc["问题4", "延迟变化(秒)"] == pytest.approx(2.0)
+        assert pair.loc["问题5", "状态"] == STATUS_ONLY_BASE
+        assert pair.loc["问题6", "状态"] == STATUS_ONLY_OTHER
+        assert bool(pair.loc["问题2", "答案变化"])
+        assert not pair.loc["问题6", "答案变化"]
+
+    def test_summaries(self, result):
+        overview = result["overview"].set_index("运行")
+        assert overview.loc["v1", "成功率"] == pytest.approx(0.8)
+        assert overview.loc["v2", "行数"] == 5
+        assert overview.loc["v1", "延迟P50(秒)"] == pytest.approx(3.0)
+
+        summary = result["pairs"].iloc[0]
+        assert summary["共同问题"] == 4
+        assert (summary["答案变化"], summary["新增失败"], summary["修复"]) == (1, 1, 1)
+        assert summary["答案变化率"] == pytest.approx(0.5)
+
+        docs = result["docs"].set_index("文档名称")
+        assert docs.loc["A.md", "成功率|v1"] == 1.0
+        assert docs.loc["B.md", "成功率|v2"] == pytest.approx(2 / 3)
+
+    def test_retried_rows_use_final_success(self, tmp_path):
+        rows = BASE_ROWS + [(4, "B.md", "问题3", "回答3", True, 1.0)]
+        base = load_run(_write_log(tmp_path / "v1.xlsx", rows))
+        other = load_run(_write_log(tmp_path / "v2.xlsx", rows))
+        pair = compare_runs({"v1": base, "v2": other})["details"]["v2 vs v1"]
+        assert len(pair) == 5
+        assert (pair["状态"] == STATUS_SAME).all()
+        retried = pair.set_index("问题").loc["问题3"]
+        assert retried["基准成功"] and retried["基准长度"] == len("回答3")
+
+    def test_workbook(self, result, tmp_path):
+        path = str(tmp_path / "summary.xlsx")
+        assert write_summary_workbook(result, path, max_detail_rows=2) == 5
+        workbook = openpyxl.load_workbook(path, read_only=True)
+        assert workbook.sheetnames == ["运行概览", "对比概览", "按文档", "差异明细"]
+        details = list(workbook["差异明细"].iter_rows(values_only=True))
+        header = details[0]
+        statuses = [row[header.index("状态")] for row in details[1:]]
+        assert statuses == [STATUS_REGRESSED, STATUS_FIXED]
+
+
+class TestRunCompare:
+    """测试命令入口"""
+
+    def test_labels(self):
+        assert run_labels(["a/run.xlsx", "b/run.xlsx", "c.jsonl"]) == [
+            "run",
+            "run#2",
+            "c",
+        ]
+        with pytest.raises(ValueError):
+            run_labels(["a.xlsx"], ["x", "y"])
+
+    def test_run_compare(self, tmp_path):
+        base = _write_log(tmp_path / "v1.xlsx", BASE_ROWS)
+        other = _write_journal(tmp_path / "v2.jsonl", OTHER_ROWS)
+        output = str(tmp_path / "out.xlsx")
+        with patch("dify_chat_tester.core.compare.console"):
+            assert run_compare([base, other], output_path=output) == EXIT_OK
+        assert os.path.exists(output)
+        with patch("dify_chat_tester.core.compare.print_error"):
+            assert run_compare([base]) == EXIT_USAGE
+            assert run_compare([base, str(tmp_path / "missing.xlsx")]) == EXIT_USAGE
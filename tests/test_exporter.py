@@ -0,0 +1,164 @@
+"""指标导出的单元测试"""
+
+import time
+import urllib.error
+import urllib.request
+from contextlib import ExitStack
+from unittest.mock import MagicMock, patch
+
+import openpyxl
+import pytest
+
+from dify_chat_tester.core.batch import _run_concurrent_batch
+from dify_chat_tester.core.exporter import (
+    REGISTRY,
+    MetricsRegistry,
+    MetricsServer,
+    _declare_batch_metrics,
+    start_metrics_server,
+)
+from dify_chat_tester.core.metrics import RunMetrics
+
+
+@pytest.fixture
+def registry():
+    registry = MetricsRegistry()
+    _declare_batch_metrics(registry)
+    return registry
+
+
+class TestMetricsRegistry:
+    """测试 MetricsRegistry"""
+
+    def test_run_metrics_mirrored(self, registry):
+        metrics = RunMetrics(registry=registry)
+        metrics.record(
+            ("回答", True, None, None),
+            latency=0.3,
+            timing={"start": 1.0, "first_token": 1.2, "output_tokens": 9},
+        )
+        metrics.record(("", False, "HTTP 429", None), latency=3.0)
+        metrics.record(("回答", True, None, None))  # 缓存行不计请求数
+
+        assert registry.value("rows_total") == 3
+        assert registry.value("requests_total") == 2
+        assert registry.value("successes_total") == 2
+        assert registry.value("failures_total", category="rate_limit") == 1
+        assert registry.value("output_tokens_total") == 9
+
+        text = registry.render()
+        assert 'dify_chat_tester_failures_total{category="rate_limit"} 1' in text
+        assert 'dify_chat_tester_request_latency_seconds_bucket{le="0.5"} 1' in text
+        assert 'dify_chat_tester_request_latency_seconds_bucket{le="5.0"} 2' in text
+        assert 'dify_chat_tester_request_latency_seconds_bucket{le="+Inf"} 2' in text
+        assert "dify_chat_tester_request_latency_seconds_count 2" in text
+        assert "dify_chat_tester_ttft_seconds_count 1" in text
+        assert "# TYPE dify_chat_tester_retries_total counter" in text
+        assert "dify_chat_tester_retries_total 0" in text
+
+    def test_openmetrics_format(self, registry):
+        registry.inc("retries_total")
+        text = registry.render(openmetrics=True)
+        assert "# TYPE dify_chat_tester_retries counter" in text
+        assert "dify_chat_tester_retries_total 1" in text
+        assert text.endswith("# EOF\n")
+
+    def test_label_escaping(self, registry):
+        registry.inc("failures_total", category='a"b\\c')
+        assert 'category="a\\"b\\\\c"' in registry.render()
+
+
+class TestMetricsServer:
+    """测试后台 HTTP 服务"""
+
+    def test_scrape(self, registry):
+        registry.set("in_flight_requests", 4)
+        server = MetricsServer(registry, "127.0.0.1", 0).start()
+        try:
+            host, port = server.address
+            with urllib.request.urlopen(f"http://{host}:{port}/metrics") as resp:
+                assert resp.headers["Content-Type"].startswith("text/plain")
+                body = resp.read().decode("utf-8")
+            assert "dify_chat_tester_in_flight_requests 4" in body
+
+            request = urllib.request.Request(
+                f"http://{host}:{port}/metrics",
+                headers={"Accept": "application/openmetrics-text; version=1.0.0"},
+            )
+            with urllib.request.urlopen(request) as resp:
+                assert "openmetrics" in resp.headers["Content-Type"]
+                assert resp.read().decode("utf-8").endswith("# EOF\n")
+
+            with pytest.raises(urllib.error.HTTPError):
+                urllib.request.urlopen(f"http://{host}:{port}/other")
+        finally:
+            server.stop()
+
+    def test_disabled_by_default(self):
+        with patch("dify_chat_tester.core.exporter._server", None):
+            assert start_metrics_server(port=0) is None
+
+
+class TestConcurrentRunExport:
+    """测试并发批量处理更新导出指标"""
+
+    def test_counters_and_gauges(self, tmp_path):
+        input_wb = openpyxl.Workbook()
+        input_ws = input_wb.active
+        input_ws.append(["问题"])
+        for question in ["问题1", "问题2", "问题3"]:
+            input_ws.append([question])
+        output_wb = openpyxl.Workbook()
+        output_ws = output_wb.active
+        output_ws.append(["表头"])
+
+        provider = MagicMock()
+        calls = {"问题2": 0}
+
+        def send_message(message, stream_callback=None, **kwargs):
+            time.sleep(0.02)
+            if message == "问题2" and calls["问题2"] == 0:
+                calls["问题2"] += 1
+                return "", False, "HTTP 502", None
+            return "回答", True, None, None
+
+        provider.send_message.side_effect = send_message
+        before = {
+            name: REGISTRY.value(name)
+            for name in ("rows_total", "requests_total", "retries_total")
+        }
+
+        with ExitStack() as stack:
+            stack.enter_context(patch("dify_chat_tester.core.batch.console"))
+            stack.enter_context(patch("dify_chat_tester.core.batch.print_info"))
+            stack.enter_context(patch("dify_chat_tester.core.batch.print_statistics"))
+            stack.enter_context(patch("dify_chat_tester.core.batch.print_run_report"))
+            _run_concurrent_batch(
+                provider=provider,
+                batch_worksheet=input_ws,
+                output_worksheet=output_ws,
+                output_workbook=output_wb,
+                output_file_name=str(tmp_path / "questions_log.xlsx"),
+                resume_from_row=2,
+                question_col_index=0,
+                doc_name_col_index=None,
+                selected_role="user",
+                selected_model="model",
+                provider_name="Provider",
+                enable_thinking=False,
+                show_batch_response=False,
+                concurrency=2,
+                headless=True,
+                retry_policy=MagicMock(
+                    should_retry=lambda attempts: attempts < 2,
+                    delay=lambda attempts: 0,
+                ),
+            )
+
+        assert REGISTRY.value("rows_total") - before["rows_total"] == 3
+        # 重试后成功的行只记录最终一次请求
+        assert REGISTRY.value("requests_total") - before["requests_total"] == 3
+        assert REGISTRY.value("retries_total") - before["retries_total"] == 1
+        assert REGISTRY.value("concurrency_limit") == 2
+        assert REGISTRY.value("in_flight_requests") == 0
+        assert REGISTRY.value("queue_depth") == 0
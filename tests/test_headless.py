@@ -0,0 +1,182 @@
+"""无人值守批量模式的单元测试"""
+
+from unittest.mock import MagicMock, patch
+
+import openpyxl
+import pytest
+
+from dify_chat_tester.core.constants import (
+    EXIT_FAILURE_RATE,
+    EXIT_INTERRUPTED,
+    EXIT_OK,
+    EXIT_USAGE,
+)
+from dify_chat_tester.core.headless import (
+    resolve_column,
+    run_headless_batch,
+    run_headless_load_test,
+)
+from dify_chat_tester.core.retry import BackoffPolicy
+
+
+def _input_file(path, questions):
+    workbook = openpyxl.Workbook()
+    worksheet = workbook.active
+    worksheet.append(["编号", "问题"])
+    for i, question in enumerate(questions, 1):
+        worksheet.append([i, question])
+    workbook.save(path)
+    return str(path)
+
+
+def _provider(fail_on=()):
+    provider = MagicMock()
+
+    def send_message(message, **kwargs):
+        if message in fail_on:
+            return "", False, "HTTP 500", None
+        return f"回答:{message}", True, None, None
+
+    provider.send_message.side_effect = send_message
+    return provider
+
+
+class TestResolveColumn:
+    """测试问题列解析"""
+
+    def test_by_name_and_index(self):
+        assert resolve_column(["编号", "问题"], "问题") == 1
+        assert resolve_column(["编号", "问题"], "1") == 0
+
+    def test_unknown_column(self):
+        with pytest.raises(ValueError):
+            resolve_column(["编号", "问题"], "答案")
+
+
+class TestRunHeadlessBatch:
+    """测试 run_headless_batch"""
+
+    def _run(self, provider, **kwargs):
+        with patch(
+            "dify_chat_tester.core.headless.setup_provider_from_config",
+            return_value=provider,
+        ), patch(
+            "dify_chat_tester.core.batch.BackoffPolicy.from_config",
+            return_value=BackoffPolicy(base=0),
+        ):
+            return run_headless_batch(
+                provider_id="openai", model="m", role="user", **kwargs
+            )
+
+    def test_success_and_resume(self, tmp_path):
+        """成功运行返回 0；再次运行时按检查点跳过已成功的行"""
+        input_path = _input_file(tmp_path / "q.xlsx", ["问题A", "问题B"])
+        output_path = str(tmp_path / "out.xlsx")
+
+        provider = _provider()
+        code = self._run(
+            provider,
+            input_path=input_path,
+            question_column="问题",
+            output_path=output_path,
+            concurrency=2,
+        )
+        assert code == EXIT_OK
+        assert provider.send_message.call_count == 2
+
+        log = openpyxl.load_workbook(output_path).active
+        assert log.max_row == 3
+
+        provider = _provider()
+        code = self._run(
+            provider,
+            input_path=input_path,
+            question_column="2",
+            output_path=output_path,
+        )
+        assert code == EXIT_OK
+        assert provider.send_message.call_count == 0
+
+    def test_failure_rate_exceeded(self, tmp_path):
+        """失败率超过阈值时返回非零退出码"""
+        input_path = _input_file(tmp_path / "q.xlsx", ["问题A", "问题B"])
+        code = self._run(
+            _provider(fail_on={"问题B"}),
+            input_path=input_path,
+            question_column="问题",
+            output_path=str(tmp_path / "out.xlsx"),
+            max_failure_rate=0.25,
+        )
+        assert code == EXIT_FAILURE_RATE
+
+    def test_missing_input(self, tmp_path):
+        code = self._run(_provider(), input_path=str(tmp_path / "missing.xlsx"))
+        assert code == EXIT_USAGE
+
+    def test_interrupted(self, tmp_path):
+        """Ctrl+C 中断时保存已完成的结果并返回中断退出码，而不是直接退出进程"""
+        input_path = _input_file(tmp_path / "q.xlsx", ["问题A", "问题B", "问题C"])
+        output_path = str(tmp_path / "out.xlsx")
+        provider = _provider()
+        answer = provider.send_message.side_effect
+
+        def send_message(message, **kwargs):
+            if message == "问题B":
+                raise KeyboardInterrupt
+            return answer(message, **kwargs)
+
+        provider.send_message.side_effect = send_message
+        with patch("dify_chat_tester.core.batch.os._exit") as hard_exit:
+            code = self._run(
+                provider,
+                input_path=input_path,
+                question_column="问题",
+                output_path=output_path,
+                concurrency=1,
+            )
+        assert code == EXIT_INTERRUPTED
+        hard_exit.assert_not_called()
+        log = openpyxl.load_workbook(output_path).active
+        assert [row[3].value for row in log.iter_rows(min_row=2)] == ["问题A"]
+
+
+class TestRunHeadlessLoadTest:
+    """测试 run_headless_load_test"""
+
+    def test_report_and_log(self, tmp_path):
+        input_path = _input_file(tmp_path / "q.xlsx", ["问题A", "问题B"])
+        output_path = str(tmp_path / "load.xlsx")
+        provider = _provider(fail_on=("问题B",))
+
+        with patch(
+            "dify_chat_tester.core.headless.setup_provider_from_config",
+            return_value=provider,
+        ):
+            code = run_headless_load_test(
+                input_path=input_path,
+                output_path=output_path,
+                provider_id="openai",
+                model="m",
+                role="user",
+                arrival="step",
+                rate=20,
+                duration=0.2,
+                steps=2,
+            )
+
+        # 一半请求失败，超过默认失败率阈值
+        assert code == EXIT_FAILURE_RATE
+        assert provider.send_message.call_count == 4 + 8
+        requests = openpyxl.load_workbook(output_path)["请求"]
+        assert [row[0] for row in requests.iter_rows(min_row=2, values_only=True)] == (
+            [1] * 4 + [2] * 8
+        )
+
+    def test_invalid_arrival(self, tmp_path):
+        input_path = _input_file(tmp_path / "q.xlsx", ["问题A"])
+        assert (
+            run_headless_load_test(
+                input_path=input_path, provider_id="openai", arrival="burst"
+            )
+            == EXIT_USAGE
+        )
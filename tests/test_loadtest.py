@@ -0,0 +1,157 @@
+"""开环压测的单元测试"""
+
+import random
+import threading
+import time
+
+import openpyxl
+import pytest
+
+from dify_chat_tester.core.loadtest import (
+    ARRIVAL_CONSTANT,
+    ARRIVAL_POISSON,
+    ARRIVAL_STEP,
+    LoadStep,
+    arrival_offsets,
+    build_steps,
+    percentile,
+    run_load_test,
+    save_load_log,
+    summarize_steps,
+)
+
+
+class TestArrivals:
+    """测试负载阶段和到达时间"""
+
+    def test_step_ramp(self):
+        assert build_steps(ARRIVAL_STEP, 5, 30, steps=3) == [
+            LoadStep(5, 30),
+            LoadStep(10, 30),
+            LoadStep(15, 30),
+        ]
+        assert build_steps(ARRIVAL_STEP, 5, 30, steps=2, step_increment=1)[1].rate == 6
+        assert build_steps(ARRIVAL_POISSON, 5, 30, steps=3) == [LoadStep(5, 30)]
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            build_steps("burst", 5, 30)
+        with pytest.raises(ValueError):
+            build_steps(ARRIVAL_CONSTANT, 0, 30)
+
+    def test_constant_spacing(self):
+        offsets = arrival_offsets([LoadStep(4, 1), LoadStep(2, 1)], ARRIVAL_CONSTANT)
+        assert offsets == [
+            (0.0, 0),
+            (0.25, 0),
+            (0.5, 0),
+            (0.75, 0),
+            (1.0, 1),
+            (1.5, 1),
+        ]
+
+    def test_poisson_rate(self):
+        offsets = arrival_offsets([LoadStep(50, 20)], ARRIVAL_POISSON, random.Random(1))
+        assert 850 <= len(offsets) <= 1150
+        times = [t for t, _ in offsets]
+        assert times == sorted(times) and times[-1] < 20
+
+
+class TestPercentile:
+    """测试 percentile"""
+
+    def test_nearest_rank(self):
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 50
+        assert percentile(values, 99) == 99
+        assert percentile(values, 100) == 100
+        assert percentile([], 50) == 0.0
+
+
+def _slow_ask(delay):
+    lock = threading.Lock()
+    active = [0, 0]  # [当前在途数, 最大在途数]
+
+    def ask(question):
+        with lock:
+            active[0] += 1
+            active[1] = max(active[1], active[0])
+        time.sleep(delay)
+        with lock:
+            active[0] -= 1
+        return "回答", question != "坏问题", "HTTP 500", None
+
+    return ask, active
+
+
+class TestRunLoadTest:
+    """测试开环发送"""
+
+    def test_does_not_wait_for_completions(self):
+        """请求按计划时间发出，在途数随到达速率增长（闭环模式下为 1）"""
+        ask, active = _slow_ask(0.3)
+        start = time.monotonic()
+        records = run_load_test(ask, ["问题"], [LoadStep(20, 0.5)])
+        elapsed = time.monotonic() - start
+
+        assert len(records) == 10
+        assert active[1] >= 5
+        assert elapsed < 1.5
+        assert all(r["started"] - r["scheduled"] < 0.2 for r in records)
+
+    def test_queueing_counted_from_schedule(self):
+        """在途数受限时排队时间计入延迟，服务时间不变（修正协调遗漏）"""
+        ask, _ = _slow_ask(0.1)
+        records = run_load_test(ask, ["问题"], [LoadStep(20, 0.5)], max_in_flight=1)
+        summary = summarize_steps(records, [LoadStep(20, 0.5)])[0]
+
+        assert summary["completed"] == 10
+        assert summary["service_p50"] < 0.2
+        assert summary["latency_p99"] > 0.5
+        assert summary["start_lag_max"] > 0.4
+        assert summary["throughput"] < 20
+
+    def test_cycles_questions_and_records_failures(self):
+        ask, _ = _slow_ask(0)
+        records = run_load_test(
+            ask, ["好问题", "坏问题", " "], [LoadStep(100, 0.04)], max_in_flight=4
+        )
+        assert [r["question"] for r in records] == ["好问题", "坏问题"] * 2
+        assert [r["success"] for r in records] == [True, False] * 2
+        assert records[1]["error"] == "HTTP 500"
+
+    def test_no_questions(self):
+        with pytest.raises(ValueError):
+            run_load_test(lambda q: None, ["", None], [LoadStep(1, 1)])
+
+
+class TestSummaries:
+    """测试按阶段汇总和日志保存"""
+
+    def test_per_step_summary_and_log(self, tmp_path):
+        steps = [LoadStep(2, 1), LoadStep(4, 1)]
+        records = [
+            {"step": 0, "question": "q", "scheduled": 0.0, "started": 0.0},
+            {"step": 0, "question": "q", "scheduled": 0.5, "started": 0.5},
+            {"step": 1, "question": "q", "scheduled": 1.0, "started": 1.2},
+            {"step": 1, "question": "q", "scheduled": 1.25},  # 中途停止，未发送
+        ]
+        for record, finished, success in zip(
+            records, [0.2, 0.9, 3.0], [True, False, True]
+        ):
+            record.update(finished=finished, success=success, error="")
+
+        first, second = summarize_steps(records, steps)
+        assert (first["success"], first["failed"], first["throughput"]) == (1, 1, 1)
+        assert first["latency_max"] == pytest.approx(0.4)
+        assert second["scheduled"] == 2 and second["completed"] == 1
+        # 最后一个请求在阶段开始 2 秒后才完成
+        assert second["throughput"] == pytest.approx(0.5)
+        assert second["latency_p50"] == pytest.approx(2.0)
+        assert second["start_lag_max"] == pytest.approx(0.2)
+
+        path = str(tmp_path / "loadtest.xlsx")
+        save_load_log(path, records, [first, second])
+        workbook = openpyxl.load_workbook(path)
+        assert workbook["请求"].max_row == 4
+        assert workbook["阶段汇总"]["A1"].value == "step"
@@ -0,0 +1,38 @@
+"""日志配置的单元测试"""
+
+import sys
+
+from loguru import logger
+
+from dify_chat_tester.config import logging as logging_module
+
+
+class TestConsoleLogging:
+    """测试 disable_console_logging / enable_console_logging"""
+
+    def test_noop_before_setup_logging(self, monkeypatch):
+        """未调用 setup_logging() 时不改动 loguru 的 handler，日志不会重复输出"""
+        monkeypatch.delattr(sys, "_dify_loguru_configured", raising=False)
+        monkeypatch.setattr(logging_module, "_console_handler_id", None)
+        handlers = dict(logger._core.handlers)
+
+        logging_module.disable_console_logging()
+        logging_module.enable_console_logging()
+
+        assert dict(logger._core.handlers) == handlers
+        assert logging_module._console_handler_id is None
+
+    def test_toggle_after_setup_logging(self, monkeypatch):
+        monkeypatch.setattr(sys, "_dify_loguru_configured", True, raising=False)
+        handler_id = logger.add(sys.stderr, level="INFO")
+        monkeypatch.setattr(logging_module, "_console_handler_id", handler_id)
+        try:
+            logging_module.disable_console_logging()
+            assert handler_id not in logger._core.handlers
+            assert logging_module._console_handler_id is None
+
+            logging_module.enable_console_logging()
+            assert logging_module._console_handler_id in logger._core.handlers
+        finally:
+            if logging_module._console_handler_id is not None:
+                logger.remove(logging_module._console_handler_id)
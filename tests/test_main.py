@@ -1,5 +1,6 @@
 from unittest.mock import patch
-from main import parse_args, _auto_install_dependencies
+
+from main import _auto_install_dependencies, parse_args
 
 
 class TestMain:
@@ -17,6 +18,107 @@ class TestMain:
         args = parse_args(["--concurrency", "5"])
         assert args.concurrency == 5
 
+    def test_parse_args_metrics_port(self):
+        assert parse_args([]).metrics_port is None
+        assert parse_args(["--metrics-port", "9108"]).metrics_port == 9108
+
+    def test_parse_args_profile(self):
+        assert parse_args([]).profile is None
+        assert parse_args(["--profile"]).profile == ""
+        assert parse_args(["--profile", "run.prof"]).profile == "run.prof"
+
+    def test_parse_args_trace(self):
+        assert parse_args([]).trace is None
+        assert parse_args(["--trace", "trace.json"]).trace == "trace.json"
+
+    def test_parse_args_compare(self):
+        args = parse_args(
+            [
+                "--mode",
+                "compare",
+                "--logs",
+                "a.xlsx",
+                "b.xlsx",
+                "--labels",
+                "v1",
+                "v2",
+                "--max-detail-rows",
+                "50",
+            ]
+        )
+        assert args.mode == "compare"
+        assert args.logs == ["a.xlsx", "b.xlsx"]
+        assert args.labels == ["v1", "v2"]
+        assert args.max_detail_rows == 50
+
+    def test_parse_args_batch(self):
+        args = parse_args(
+            [
+                "--mode",
+                "batch",
+                "--input",
+                "q.xlsx",
+                "--question-column",
+                "2",
+                "--provider",
+                "openai",
+                "--resume",
+                "restart",
+                "--max-failure-rate",
+                "0.2",
+                "--ordered-output",
+            ]
+        )
+        assert args.mode == "batch"
+        assert args.input == "q.xlsx"
+        assert args.question_column == "2"
+        assert args.resume == "restart"
+        assert args.max_failure_rate == 0.2
+        assert args.ordered_output is True
+        assert parse_args([]).ordered_output is None
+
+    def test_parse_args_shard(self):
+        args = parse_args(
+            [
+                "--mode",
+                "shard-worker",
+                "--shared-dir",
+                "/mnt/shared",
+                "--shard-size",
+                "100",
+                "--lease-ttl",
+                "30",
+            ]
+        )
+        assert args.mode == "shard-worker"
+        assert args.shared_dir == "/mnt/shared"
+        assert args.shard_size == 100
+        assert args.lease_ttl == 30.0
+
+    def test_parse_args_loadtest(self):
+        args = parse_args(
+            [
+                "--mode",
+                "loadtest",
+                "--input",
+                "q.xlsx",
+                "--arrival",
+                "step",
+                "--rate",
+                "5",
+                "--steps",
+                "3",
+                "--max-in-flight",
+                "64",
+            ]
+        )
+        assert args.mode == "loadtest"
+        assert args.arrival == "step"
+        assert args.rate == 5.0
+        assert args.steps == 3
+        assert args.max_in_flight == 64
+        assert args.duration is None
+
     def test_auto_install_no_uv(self):
         with patch("shutil.which", return_value=None):
             # Should return safely
@@ -0,0 +1,148 @@
+"""多目标对比模式的单元测试"""
+
+import time
+from unittest.mock import MagicMock, patch
+
+import openpyxl
+
+from dify_chat_tester.core.matrix import (
+    LAYOUT_COLUMNS,
+    LAYOUT_SHEETS,
+    MatrixTarget,
+    RateLimiter,
+    _print_matrix_summary,
+    run_matrix_batch,
+)
+
+
+def _input_sheet(questions):
+    workbook = openpyxl.Workbook()
+    worksheet = workbook.active
+    worksheet.append(["文档名称", "问题"])
+    for question in questions:
+        worksheet.append(["文档", question])
+    return worksheet
+
+
+def _target(model, delay=0.0, fail=False):
+    provider = MagicMock()
+
+    def send_message(message, **kwargs):
+        time.sleep(delay)
+        if fail:
+            return "", False, "HTTP 500", None
+        return f"{model}:{message}", True, None, None
+
+    provider.send_message.side_effect = send_message
+    return MatrixTarget(provider, model, "user", name=model, concurrency=2)
+
+
+class TestRateLimiter:
+    """测试 RateLimiter"""
+
+    def test_spacing(self):
+        limiter = RateLimiter(20)
+        start = time.monotonic()
+        for _ in range(4):
+            limiter.acquire()
+        assert time.monotonic() - start >= 0.14
+
+    def test_unlimited(self):
+        limiter = RateLimiter(0)
+        start = time.monotonic()
+        for _ in range(100):
+            limiter.acquire()
+        assert time.monotonic() - start < 0.05
+
+
+class TestRunMatrixBatch:
+    """测试 run_matrix_batch"""
+
+    def _run(self, tmp_path, targets, questions, layout):
+        output_file = str(tmp_path / "matrix.xlsx")
+        with patch("dify_chat_tester.core.matrix.console"):
+            stats = run_matrix_batch(
+                targets,
+                _input_sheet(questions),
+                question_col_index=1,
+                doc_name_col_index=0,
+                output_file_name=output_file,
+                layout=layout,
+                max_retries=1,
+            )
+        return stats, openpyxl.load_workbook(output_file)
+
+    def test_side_by_side_columns(self, tmp_path):
+        """每个问题一行，各目标的回答并排写入"""
+        targets = [_target("fast"), _target("slow", delay=0.02)]
+        stats, workbook = self._run(
+            tmp_path, targets, ["问题1", "问题2", "问题3"], LAYOUT_COLUMNS
+        )
+
+        sheet = workbook.active
+        header = [c.value for c in sheet[1]]
+        assert header[5:] == [
+            "fast响应",
+            "fast是否成功",
+            "fast错误信息",
+            "slow响应",
+            "slow是否成功",
+            "slow错误信息",
+        ]
+        rows = sorted(
+            ([c.value for c in row] for row in sheet.iter_rows(min_row=2)),
+            key=lambda r: int(r[3]),
+        )
+        assert [r[2] for r in rows] == ["问题1", "问题2", "问题3"]
+        assert rows[0][5] == "fast:问题1"
+        assert rows[0][8] == "slow:问题1"
+        assert stats["fast"]["success"] == 3
+        assert stats["slow"]["success"] == 3
+
+    def test_duplicate_target_names_rejected(self, tmp_path):
+        """名称相同的目标会合并统计和列，直接拒绝"""
+        targets = [_target("same"), _target("same"), _target("other")]
+        output_file = tmp_path / "matrix.xlsx"
+        with patch("dify_chat_tester.core.matrix.console"):
+            stats = run_matrix_batch(
+                targets,
+                _input_sheet(["问题1"]),
+                question_col_index=1,
+                doc_name_col_index=0,
+                output_file_name=str(output_file),
+            )
+        assert stats == {}
+        assert not output_file.exists()
+        for target in targets:
+            target.provider.send_message.assert_not_called()
+
+    def test_per_target_sheets(self, tmp_path):
+        """按目标分表时每个目标一个工作表，失败结果单独记录"""
+        targets = [_target("ok"), _target("bad", fail=True)]
+        stats, workbook = self._run(tmp_path, targets, ["", "问题1"], LAYOUT_SHEETS)
+
+        assert workbook.sheetnames == ["ok", "bad"]
+        ok_rows = list(workbook["ok"].iter_rows(min_row=2, values_only=True))
+        bad_rows = list(workbook["bad"].iter_rows(min_row=2, values_only=True))
+        assert len(ok_rows) == len(bad_rows) == 2
+        assert stats["ok"] == {
+            "success": 1,
+            "failed": 1,
+            "latency": stats["ok"]["latency"],
+        }
+        assert stats["bad"]["failed"] == 2
+        assert any(row[6] == "问题为空" for row in bad_rows)
+
+    def test_average_latency_counts_successes_only(self, tmp_path):
+        """失败请求和空问题行不计入平均耗时"""
+        targets = [_target("ok"), _target("slow_bad", delay=0.05, fail=True)]
+        stats, _ = self._run(tmp_path, targets, ["", "问题1"], LAYOUT_COLUMNS)
+
+        assert stats["slow_bad"] == {"success": 0, "failed": 2, "latency": 0.0}
+        stats["ok"]["latency"] = 3.0
+        with patch("dify_chat_tester.core.matrix.console") as console:
+            _print_matrix_summary(targets, stats, duration=1.0)
+        table = console.print.call_args_list[1].args[0]
+        averages = list(table.columns[4].cells)
+        # ok 目标 1 次成功、1 个空问题行：3.0 秒只除以成功次数
+        assert averages == ["3.00s", "-"]
@@ -0,0 +1,105 @@
+"""长时间并发运行时派发器和重排缓冲区的内存占用测试
+
+写入线程被替换为只计数、不保留行的 _SampledWriter，因此这里只覆盖派发器（待派发队列、
+在途表、重试队列、重复问题合并）和重排缓冲区在结果交出后是否释放回答；openpyxl 工作表
+本身会保留写入的每个单元格，不在本测试范围内。
+
+每组参数运行约需 40 秒，默认不执行：uv run pytest -m slow
+"""
+
+import tracemalloc
+from contextlib import ExitStack
+from unittest.mock import patch
+
+import openpyxl
+import pytest
+
+from dify_chat_tester.core.batch import _run_concurrent_batch
+
+pytestmark = pytest.mark.slow
+
+ROWS = 100_000
+ANSWER_SIZE = 1000  # 每个回答约 1KB，全部保留时约 100MB
+
+
+class _Provider:
+    """立即返回独立长回答的供应商（不使用 MagicMock，避免记录每次调用）"""
+
+    def send_message(self, message, **kwargs):
+        return message + "答" * ANSWER_SIZE, True, None, None
+
+
+class _SampledWriter:
+    """代替 LogWriter：丢弃已写出的行，并在指定行数时记录当前内存"""
+
+    backlog = 0
+    last_error = None
+
+    def __init__(self, *args, **kwargs):
+        self.rows = 0
+        self.samples = {}
+
+    def start(self):
+        _SampledWriter.instance = self
+        return self
+
+    def write(self, row_data, worksheet=None):
+        self.rows += 1
+        if self.rows in (ROWS // 10, ROWS):
+            self.samples[self.rows] = tracemalloc.get_traced_memory()[0]
+        return True
+
+    def flush(self, wait=True, timeout=None):
+        return True
+
+    def close(self, timeout=None):
+        pass
+
+
+class TestDispatcherMemory:
+    """测试派发器和重排缓冲区在结果交给写入线程后释放回答内容"""
+
+    @pytest.mark.parametrize("ordered_output", [False, True])
+    def test_dispatcher_memory_flat_over_100k_rows(self, tmp_path, ordered_output):
+        input_wb = openpyxl.Workbook()
+        input_ws = input_wb.active
+        input_ws.append(["问题"])
+        for i in range(ROWS):
+            # 每 10 行有一个重复问题，覆盖合并结果的释放
+            input_ws.append([f"问题{i - i % 10 if i % 10 == 9 else i}"])
+
+        with ExitStack() as stack:
+            stack.enter_context(patch("dify_chat_tester.core.batch.console"))
+            stack.enter_context(patch("dify_chat_tester.core.batch.print_info"))
+            stack.enter_context(patch("dify_chat_tester.core.batch.print_statistics"))
+            stack.enter_context(
+                patch("dify_chat_tester.core.batch.LogWriter", _SampledWriter)
+            )
+            tracemalloc.start()
+            try:
+                summary = _run_concurrent_batch(
+                    provider=_Provider(),
+                    batch_worksheet=input_ws,
+                    output_worksheet=None,
+                    output_workbook=None,
+                    output_file_name=str(tmp_path / "output.xlsx"),
+                    resume_from_row=2,
+                    question_col_index=0,
+                    doc_name_col_index=None,
+                    selected_role="user",
+                    selected_model="model",
+                    provider_name="Provider",
+                    enable_thinking=False,
+                    show_batch_response=False,
+                    concurrency=4,
+                    headless=True,
+                    ordered_output=ordered_output,
+                )
+            finally:
+                tracemalloc.stop()
+
+        assert summary["success"] == ROWS
+        samples = _SampledWriter.instance.samples
+        growth = samples[ROWS] - samples[ROWS // 10]
+        # 后 90% 的回答（约 90MB）交出后均已释放，派发器内存不随行数增长
+        assert growth < 5 * 1024 * 1024, f"内存增长 {growth / 1024 / 1024:.1f}MB"
@@ -0,0 +1,251 @@
+"""运行指标的单元测试"""
+
+import json
+import math
+import random
+import time
+from contextlib import ExitStack
+from unittest.mock import MagicMock, patch
+
+import openpyxl
+import pytest
+
+from dify_chat_tester.core.batch import _run_concurrent_batch
+from dify_chat_tester.core.metrics import (
+    LatencyHistogram,
+    RollingWindow,
+    RunMetrics,
+    categorize_error,
+    estimate_tokens,
+    summary_path_for,
+    track_stream_timing,
+)
+
+
+def _exact_percentile(values, p):
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(p / 100 * len(ordered))) - 1]
+
+
+class TestLatencyHistogram:
+    """测试 LatencyHistogram"""
+
+    def test_percentiles_within_precision(self):
+        rng = random.Random(0)
+        values = [rng.lognormvariate(0.5, 0.8) for _ in range(20000)]
+        histogram = LatencyHistogram()
+        for value in values:
+            histogram.record(value)
+
+        for p in (50, 90, 95, 99):
+            exact = _exact_percentile(values, p)
+            assert histogram.percentile(p) == pytest.approx(exact, rel=0.011)
+        assert histogram.percentile(100) == max(values)
+        assert histogram.count == len(values)
+        # 只保存非空桶，数量与样本数无关
+        assert len(histogram.buckets) < 1000
+
+    def test_merge_equals_single(self):
+        rng = random.Random(1)
+        values = [rng.expovariate(1.0) for _ in range(5000)]
+        whole, first, second = (
+            LatencyHistogram(),
+            LatencyHistogram(),
+            LatencyHistogram(),
+        )
+        for i, value in enumerate(values):
+            whole.record(value)
+            (first if i % 2 else second).record(value)
+
+        first.merge(LatencyHistogram.from_dict(second.to_dict()))
+        assert first.buckets == whole.buckets
+        assert first.describe() == whole.describe()
+
+    def test_merge_rejects_different_precision(self):
+        with pytest.raises(ValueError):
+            LatencyHistogram().merge(LatencyHistogram(precision=0.05))
+
+    def test_empty(self):
+        assert LatencyHistogram().describe()["p99"] == 0.0
+
+
+class TestCategorizeError:
+    """测试错误分类"""
+
+    @pytest.mark.parametrize(
+        "error, category",
+        [
+            ("问题为空", "empty_question"),
+            ("认证失败：API 密钥无效或权限不足，请检查配置。", "auth"),
+            ("重试3次后失败: HTTP 429 Too Many Requests", "rate_limit"),
+            ("服务端错误（HTTP 502），请稍后重试或联系服务提供方。", "server"),
+            ("HTTP 503", "server"),
+            (
+                "无法连接到 API 服务器，请检查网络连接和 base_url 配置是否正确。",
+                "network",
+            ),
+            ("Read timed out", "network"),
+            ("请求内容可能包含敏感信息，被模型拒绝处理。", "content_filter"),
+            ("API返回错误状态码: 404 - not found", "client"),
+            ("奇怪的错误", "other"),
+            (None, "other"),
+        ],
+    )
+    def test_categories(self, error, category):
+        assert categorize_error(error) == category
+
+
+class TestRunMetrics:
+    """测试 RunMetrics"""
+
+    def test_estimate_tokens(self):
+        assert estimate_tokens("你好，世界") == 5
+        assert estimate_tokens("hello world!") == 3
+        assert estimate_tokens("") == 0
+
+    def test_stream_timing_and_usage(self):
+        timing = {"start": time.time()}
+        forwarded = []
+        callback = track_stream_timing(timing, lambda *e: forwarded.append(e))
+        callback("thinking", "...")
+        callback("text", "第一")
+        first = timing["first_token"]
+        callback("text", "第一段")
+        callback("usage", 42)
+
+        assert timing["first_token"] == first
+        assert timing["output_tokens"] == 42
+        assert len(forwarded) == 4
+
+    def test_record_and_summary(self):
+        metrics = RunMetrics()
+        metrics.record(
+            ("回答", True, None, None),
+            latency=2.0,
+            timing={"start": 10.0, "first_token": 10.5, "output_tokens": 100},
+        )
+        metrics.record(("回答", True, None, None))  # 缓存或合并行
+        metrics.record(("", False, "HTTP 500", None), latency=1.0)
+        metrics.record(("", False, "问题为空", None))
+
+        summary = metrics.summary(duration=2.0)
+        assert (summary["rows"], summary["success"], summary["failed"]) == (4, 2, 2)
+        assert summary["requests"] == 2
+        assert summary["requests_per_second"] == 1.0
+        assert summary["output_tokens"] == 100
+        assert summary["output_tokens_estimated"] == 0
+        assert summary["ttft"]["count"] == 1
+        assert summary["ttft"]["p50"] == pytest.approx(0.5, rel=0.01)
+        assert summary["latency"]["max"] == 2.0
+        assert summary["errors"] == {"server": 1, "empty_question": 1}
+        json.dumps(summary)
+
+
+class TestRollingWindow:
+    """测试 RollingWindow"""
+
+    def test_rates_over_partial_window(self):
+        window = RollingWindow(window=30, clock=lambda: 100.0)
+        for i in range(20):
+            window.record(
+                i % 4 != 0, latency=1.0 + i / 10, tokens=10, now=100.0 + i / 2
+            )
+        snapshot = window.snapshot(now=110.0)
+        # 运行 10 秒，不足一个窗口时按实际运行时间计算速率
+        assert snapshot["window"] == 10.0
+        assert snapshot["rows_per_second"] == pytest.approx(2.0)
+        assert snapshot["tokens_per_second"] == pytest.approx(20.0)
+        assert snapshot["error_rate"] == pytest.approx(0.25)
+        latencies = [1.0 + i / 10 for i in range(20)]
+        assert snapshot["p95"] == pytest.approx(
+            _exact_percentile(latencies, 95), rel=0.1
+        )
+
+    def test_old_slots_expire(self):
+        window = RollingWindow(window=30, clock=lambda: 0.0)
+        for _ in range(100):
+            window.record(False, latency=10.0, now=5.0)  # 预热阶段很慢且全部失败
+        for second in range(41, 71):
+            window.record(True, latency=0.5, now=second + 0.5)
+        snapshot = window.snapshot(now=70.9)
+        assert snapshot["window"] == 30
+        assert snapshot["rows_per_second"] == pytest.approx(1.0)
+        assert snapshot["error_rate"] == 0.0
+        assert snapshot["p95"] == pytest.approx(0.5, rel=0.1)
+
+        # 长时间没有完成的行时窗口清空
+        snapshot = window.snapshot(now=1000.0)
+        assert snapshot["rows_per_second"] == 0.0
+        assert snapshot["p95"] is None
+        assert window.requests == 0 and sum(window._latency_totals) == 0
+
+    def test_run_metrics_feeds_window(self):
+        metrics = RunMetrics()
+        metrics.record(("回答", True, None, None), latency=1.0, timing={})
+        metrics.record(("回答", True, None, None))  # 缓存或合并行不计入请求
+        snapshot = metrics.recent.snapshot()
+        assert (metrics.recent.rows, metrics.recent.requests) == (2, 1)
+        assert snapshot["tokens_per_second"] > 0
+
+
+class TestConcurrentRunSummary:
+    """测试并发批量处理结束后写出的 JSON 摘要"""
+
+    def test_summary_written_next_to_log(self, tmp_path):
+        input_wb = openpyxl.Workbook()
+        input_ws = input_wb.active
+        input_ws.append(["问题"])
+        for question in ["问题1", "", "问题2", "问题3"]:
+            input_ws.append([question])
+        output_wb = openpyxl.Workbook()
+        output_ws = output_wb.active
+        output_ws.append(["表头"])
+        output_file = str(tmp_path / "questions_log.xlsx")
+
+        provider = MagicMock()
+
+        def send_message(message, stream_callback=None, **kwargs):
+            time.sleep(0.05)
+            if message == "问题3":
+                return "", False, "HTTP 502", None
+            stream_callback("text", "回答")
+            time.sleep(0.05)
+            stream_callback("usage", 7)
+            return "回答", True, None, None
+
+        provider.send_message.side_effect = send_message
+
+        with ExitStack() as stack:
+            stack.enter_context(patch("dify_chat_tester.core.batch.console"))
+            stack.enter_context(patch("dify_chat_tester.core.batch.print_info"))
+            stack.enter_context(patch("dify_chat_tester.core.batch.print_statistics"))
+            stack.enter_context(patch("dify_chat_tester.core.batch.print_run_report"))
+            _run_concurrent_batch(
+                provider=provider,
+                batch_worksheet=input_ws,
+                output_worksheet=output_ws,
+                output_workbook=output_wb,
+                output_file_name=output_file,
+                resume_from_row=2,
+                question_col_index=0,
+                doc_name_col_index=None,
+                selected_role="user",
+                selected_model="model",
+                provider_name="Provider",
+                enable_thinking=False,
+                show_batch_response=False,
+                concurrency=2,
+                headless=True,
+                retry_policy=MagicMock(should_retry=lambda attempts: False),
+            )
+
+        path = summary_path_for(output_file)
+        assert path == str(tmp_path / "questions_log_summary.json")
+        with open(path, encoding="utf-8") as f:
+            summary = json.load(f)
+        assert summary["rows"] == 4 and summary["success"] == 2
+        assert summary["errors"] == {"server": 1, "empty_question": 1}
+        assert summary["ttft"]["count"] == 2
+        assert 0.04 <= summary["ttft"]["p50"] < summary["latency"]["p50"]
+        assert summary["output_tokens"] == 14
+        assert LatencyHistogram.from_dict(summary["histograms"]["latency"]).count == 3
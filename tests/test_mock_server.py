@@ -0,0 +1,213 @@
+"""本地模拟服务的单元测试"""
+
+import time
+from contextlib import ExitStack
+from unittest.mock import patch
+
+import openpyxl
+import pytest
+import requests
+
+from dify_chat_tester.core.batch import _run_concurrent_batch
+from dify_chat_tester.core.metrics import categorize_error
+from dify_chat_tester.core.mock_server import (
+    ANSWER_TEXT,
+    MockServer,
+    MockSettings,
+)
+from dify_chat_tester.providers.base import (
+    DifyProvider,
+    OpenAIProvider,
+    iFlowProvider,
+)
+
+FAST = dict(latency=0, token_rate=0)
+
+
+def _send(provider, question="你好", stream=True):
+    events = []
+    result = provider.send_message(
+        message=question,
+        model="mock-model",
+        role="员工",
+        stream=stream,
+        show_indicator=False,
+        show_thinking=True,
+        stream_callback=lambda event, content: events.append((event, content)),
+    )
+    return result, events
+
+
+class TestDifyStreaming:
+    """测试 Dify 格式"""
+
+    def test_stream_with_workflow_events(self):
+        with MockServer(MockSettings(answer_tokens=12, **FAST)) as server:
+            provider = DifyProvider(f"{server.base_url}/v1", "key", "app")
+            (response, success, error, conversation_id), events = _send(provider)
+
+        assert success and error is None
+        assert response == ANSWER_TEXT[:12]
+        assert conversation_id
+        assert ("usage", 12) in events
+        assert server.stats["completed"] == 1
+
+    def test_conversation_id_kept(self):
+        with MockServer(MockSettings(**FAST)) as server:
+            response = requests.post(
+                f"{server.base_url}/v1/chat-messages",
+                json={
+                    "query": "q",
+                    "response_mode": "blocking",
+                    "conversation_id": "c-1",
+                },
+                timeout=5,
+            )
+        assert response.json()["conversation_id"] == "c-1"
+        assert response.json()["answer"]
+
+    def test_redirect_followed(self):
+        settings = MockSettings(redirect=True, **FAST)
+        with MockServer(settings) as server:
+            provider = DifyProvider(f"{server.base_url}/v1", "key", "app")
+            (_, success, _, _), _ = _send(provider)
+        assert success
+        assert server.stats["redirects"] == 1
+        assert server.stats["completed"] == 1
+
+
+class TestOpenAIStreaming:
+    """测试 OpenAI 兼容格式（iFlow 使用相同格式）"""
+
+    def test_stream_with_reasoning_and_usage(self):
+        settings = MockSettings(answer_tokens=20, reasoning_tokens=3, **FAST)
+        with MockServer(settings) as server:
+            provider = OpenAIProvider(f"{server.base_url}/v1", "key")
+            (response, success, _, _), events = _send(provider)
+
+        assert success
+        assert response == ANSWER_TEXT[:20]
+        assert [c for e, c in events if e == "thinking"] == list("先理解")
+        assert ("usage", 23) in events
+
+    def test_iflow_and_blocking(self):
+        with MockServer(MockSettings(answer_tokens=5, **FAST)) as server:
+            provider = iFlowProvider("key")
+            provider.base_url = f"{server.base_url}/v1"
+            (response, success, _, _), _ = _send(provider)
+            blocking = requests.post(
+                f"{server.base_url}/v1/chat/completions",
+                json={"model": "m", "messages": [], "stream": False},
+                timeout=5,
+            ).json()
+        assert success and response == ANSWER_TEXT[:5]
+        assert blocking["choices"][0]["message"]["content"] == ANSWER_TEXT[:5]
+
+    def test_token_rate_and_latency(self):
+        settings = MockSettings(latency=0.1, token_rate=100, answer_tokens=20)
+        with MockServer(settings) as server:
+            provider = OpenAIProvider(f"{server.base_url}/v1", "key")
+            first = {}
+            start = time.monotonic()
+            provider.send_message(
+                message="q",
+                model="m",
+                stream=True,
+                show_indicator=False,
+                stream_callback=lambda e, c: first.setdefault(e, time.monotonic()),
+            )
+            elapsed = time.monotonic() - start
+        assert first["text"] - start >= 0.1
+        # 19 个 token 间隔，每个 10 毫秒
+        assert elapsed >= 0.28
+
+
+class TestErrors:
+    """测试错误注入"""
+
+    @pytest.mark.parametrize(
+        "settings, category, stat",
+        [
+            (MockSettings(error_rate=1, **FAST), "server", "errors"),
+            (MockSettings(rate_limit_rate=1, **FAST), "rate_limit", "rate_limited"),
+            (MockSettings(api_key="secret", **FAST), "auth", "unauthorized"),
+        ],
+    )
+    def test_error_responses(self, settings, category, stat):
+        with MockServer(settings) as server:
+            for provider in (
+                DifyProvider(f"{server.base_url}/v1", "key", "app"),
+                OpenAIProvider(f"{server.base_url}/v1", "key"),
+            ):
+                (_, success, error, _), _ = _send(provider)
+                assert not success
+                assert categorize_error(error) == category
+        assert server.stats[stat] == 2
+
+    def test_error_rate_is_seeded(self):
+        def outcomes():
+            settings = MockSettings(error_rate=0.5, seed=3, **FAST)
+            with MockServer(settings) as server:
+                return [
+                    requests.post(
+                        f"{server.base_url}/v1/chat-messages",
+                        json={"query": "q"},
+                        timeout=5,
+                    ).status_code
+                    for _ in range(20)
+                ]
+
+        first = outcomes()
+        assert first == outcomes()
+        assert {200, 500} == set(first)
+
+    def test_unknown_path(self):
+        with MockServer(MockSettings(**FAST)) as server:
+            response = requests.get(f"{server.base_url}/v1/models", timeout=5)
+        assert response.status_code == 404
+
+
+class TestBatchAgainstMock:
+    """测试并发批量处理对接模拟服务"""
+
+    def test_concurrent_batch(self, tmp_path):
+        input_wb = openpyxl.Workbook()
+        input_ws = input_wb.active
+        input_ws.append(["问题"])
+        for i in range(20):
+            input_ws.append([f"问题{i}"])
+        output_wb = openpyxl.Workbook()
+        output_ws = output_wb.active
+        output_ws.append(["表头"])
+        output_file = str(tmp_path / "questions_log.xlsx")
+
+        settings = MockSettings(latency=0.02, token_rate=1000, answer_tokens=10)
+        with MockServer(settings) as server, ExitStack() as stack:
+            stack.enter_context(patch("dify_chat_tester.core.batch.console"))
+            stack.enter_context(patch("dify_chat_tester.core.batch.print_info"))
+            stack.enter_context(patch("dify_chat_tester.core.batch.print_statistics"))
+            stack.enter_context(patch("dify_chat_tester.core.batch.print_run_report"))
+            _run_concurrent_batch(
+                provider=DifyProvider(f"{server.base_url}/v1", "key", "app"),
+                batch_worksheet=input_ws,
+                output_worksheet=output_ws,
+                output_workbook=output_wb,
+                output_file_name=output_file,
+                resume_from_row=2,
+                question_col_index=0,
+                doc_name_col_index=None,
+                selected_role="user",
+                selected_model="model",
+                provider_name="Dify",
+                enable_thinking=False,
+                show_batch_response=False,
+                concurrency=5,
+                headless=True,
+            )
+
+        assert server.stats["completed"] == 20
+        rows = list(
+            openpyxl.load_workbook(output_file).active.iter_rows(values_only=True)
+        )
+        assert len(rows) == 21
+        assert all(row[4] == ANSWER_TEXT[:10] for row in rows[1:])
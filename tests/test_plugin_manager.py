@@ -1,7 +1,10 @@
-import pytest
+import os
 from unittest.mock import MagicMock, patch
-from dify_chat_tester.providers.plugin_manager import PluginManager
+
+import pytest
+
 from dify_chat_tester.providers.base import AIProvider
+from dify_chat_tester.providers.plugin_manager import PluginManager
 
 
 class MockProvider(AIProvider):
@@ -97,3 +100,127 @@ class TestPluginManager:
         assert items[0]["id"] == "1"
         # Plugin item gets ID "2" (max_id + 1)
         assert items[1]["id"] == "2"
+
+
+def _write_zip_plugin(path, package, body="def setup(pm): pass\n"):
+    import zipfile
+
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr(f"{package}/__init__.py", body)
+
+
+class TestPluginDiscoveryCache:
+    """测试插件清单缓存和 zip 解压缓存"""
+
+    @pytest.fixture
+    def plugins_dir(self, tmp_path):
+        plugins_dir = tmp_path / "plugins"
+        (plugins_dir / "group" / "folder_plugin").mkdir(parents=True)
+        (plugins_dir / "group" / "folder_plugin" / "__init__.py").write_text("")
+        _write_zip_plugin(plugins_dir / "zipped.zip", "zipped_plugin")
+        return plugins_dir
+
+    def test_manifest_reused(self, plugins_dir):
+        from dify_chat_tester.providers import plugin_cache
+
+        first = plugin_cache.discover_plugins(plugins_dir)
+        assert [name for name, _, _ in first] == ["folder_plugin", "zipped_plugin"]
+        _, zip_path, import_root = first[1]
+        assert (zip_path / "__init__.py").exists()
+        assert import_root.parent == plugins_dir / ".cache" / "zips"
+
+        with (
+            patch.object(plugin_cache, "_scan") as scan,
+            patch.object(plugin_cache, "_file_hash") as file_hash,
+        ):
+            assert plugin_cache.discover_plugins(plugins_dir) == first
+        scan.assert_not_called()
+        file_hash.assert_not_called()
+
+    def test_new_plugin_invalidates_manifest(self, plugins_dir):
+        from dify_chat_tester.providers import plugin_cache
+
+        plugin_cache.discover_plugins(plugins_dir)
+        (plugins_dir / "group" / "another").mkdir()
+        (plugins_dir / "group" / "another" / "__init__.py").write_text("")
+        names = [name for name, _, _ in plugin_cache.discover_plugins(plugins_dir)]
+        assert names == ["another", "folder_plugin", "zipped_plugin"]
+
+    def test_zip_extraction_reused_and_pruned(self, plugins_dir):
+        from dify_chat_tester.providers import plugin_cache
+
+        zips_dir = plugins_dir / ".cache" / "zips"
+        plugin_cache.discover_plugins(plugins_dir)
+        old_root = plugin_cache.discover_plugins(plugins_dir)[1][2]
+
+        # 内容不变仅修改时间变化：沿用同一解压目录
+        os.utime(plugins_dir / "zipped.zip", ns=(1, 1))
+        with patch.object(plugin_cache.zipfile, "ZipFile") as zip_file:
+            assert plugin_cache.discover_plugins(plugins_dir)[1][2] == old_root
+        zip_file.assert_not_called()
+
+        # 内容变化：解压到新目录，清理超过保留期的旧目录，不留临时目录
+        _write_zip_plugin(plugins_dir / "zipped.zip", "zipped_plugin", "VERSION = 2\n")
+        os.utime(old_root, (1, 1))
+        new_root = plugin_cache.discover_plugins(plugins_dir)[1][2]
+        assert new_root != old_root
+        assert list(zips_dir.iterdir()) == [new_root]
+
+    def test_prune_keeps_recent_and_in_progress_dirs(self, plugins_dir):
+        from dify_chat_tester.providers import plugin_cache
+
+        zips_dir = plugins_dir / ".cache" / "zips"
+        old_root = plugin_cache.discover_plugins(plugins_dir)[1][2]
+        # 其他进程正在解压的临时目录，修改时间早于保留期也不能删除
+        extracting = zips_dir / ".extract-other"
+        extracting.mkdir()
+        os.utime(extracting, (1, 1))
+
+        # 旧版本刚被其他进程使用过：仍在保留期内，不清理
+        _write_zip_plugin(plugins_dir / "zipped.zip", "zipped_plugin", "VERSION = 2\n")
+        new_root = plugin_cache.discover_plugins(plugins_dir)[1][2]
+        assert sorted(zips_dir.iterdir()) == sorted([extracting, old_root, new_root])
+
+    def test_failed_extraction_is_retried(self, plugins_dir):
+        from dify_chat_tester.providers import plugin_cache
+
+        with patch.object(
+            plugin_cache.zipfile, "ZipFile", side_effect=OSError("disk full")
+        ):
+            names = [name for name, _, _ in plugin_cache.discover_plugins(plugins_dir)]
+        assert names == ["folder_plugin"]
+
+        names = [name for name, _, _ in plugin_cache.discover_plugins(plugins_dir)]
+        assert names == ["folder_plugin", "zipped_plugin"]
+
+    def test_bad_zip_is_skipped(self, plugins_dir):
+        from dify_chat_tester.providers import plugin_cache
+
+        (plugins_dir / "broken.zip").write_bytes(b"not a zip")
+        names = [name for name, _, _ in plugin_cache.discover_plugins(plugins_dir)]
+        assert names == ["folder_plugin", "zipped_plugin"]
+        assert len(list((plugins_dir / ".cache" / "zips").iterdir())) == 1
+
+    def test_load_zip_plugin(self, tmp_path):
+        import sys
+
+        plugins_dir = tmp_path / "plugins"
+        plugins_dir.mkdir()
+        _write_zip_plugin(
+            plugins_dir / "p.zip",
+            "cached_zip_plugin",
+            "from dify_chat_tester.providers.base import AIProvider\n"
+            "def setup(pm):\n"
+            "    pm.register_provider('cached_zip', AIProvider)\n",
+        )
+        cache_dir = tmp_path / "cache"
+        pm = PluginManager()
+        try:
+            pm.load_external_plugins(str(plugins_dir), cache_dir=str(cache_dir))
+        finally:
+            sys.modules.pop("cached_zip_plugin", None)
+            for entry in list(sys.path):
+                if entry.startswith(str(cache_dir)):
+                    sys.path.remove(entry)
+        assert pm.get_provider_class("cached_zip") is AIProvider
+        assert (cache_dir / "manifest.json").exists()
@@ -0,0 +1,153 @@
+"""采样剖析的单元测试"""
+
+import pstats
+import socket
+import threading
+import time
+
+import pytest
+
+from dify_chat_tester.core.profiling import (
+    OTHER,
+    Profiler,
+    classify,
+    format_function,
+    print_profile_summary,
+)
+from dify_chat_tester.utils.excel import clean_excel_text
+
+
+@pytest.fixture()
+def busy_profiler():
+    """一个线程反复清理 Excel 文本，另一个线程空闲等待"""
+    stop = threading.Event()
+
+    def busy():
+        while not stop.is_set():
+            clean_excel_text("回答\x07内容" * 200)
+
+    threads = [
+        threading.Thread(target=busy, daemon=True),
+        threading.Thread(target=stop.wait, daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+    profiler = Profiler(interval=0.002).start()
+    stop.wait(0.3)  # 主线程也处于空闲等待
+    profiler.stop()
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return profiler
+
+
+@pytest.fixture()
+def waiting_profiler():
+    """一个线程阻塞在 socket 读取上，一个线程反复 time.sleep，一个线程在干活"""
+    stop = threading.Event()
+    reader, writer = socket.socketpair()
+
+    def read_socket():
+        with reader.makefile("rb") as f:
+            f.read(1)
+
+    def sleep_loop():
+        while not stop.is_set():
+            time.sleep(0.05)
+
+    def busy():
+        while not stop.is_set():
+            clean_excel_text("回答\x07内容" * 200)
+
+    threads = [
+        threading.Thread(target=target, daemon=True)
+        for target in (read_socket, sleep_loop, busy)
+    ]
+    for thread in threads:
+        thread.start()
+    profiler = Profiler(interval=0.002).start()
+    stop.wait(0.3)
+    profiler.stop()
+    stop.set()
+    writer.sendall(b"x")
+    for thread in threads:
+        thread.join()
+    reader.close()
+    writer.close()
+    return profiler
+
+
+class TestClassify:
+    """测试子系统划分"""
+
+    @pytest.mark.parametrize(
+        "filename, subsystem",
+        [
+            ("/app/dify_chat_tester/providers/base.py", "供应商"),
+            ("/venv/lib/site-packages/urllib3/response.py", "供应商"),
+            ("C:\\Python\\Lib\\ssl.py", "供应商"),
+            ("/venv/lib/site-packages/openpyxl/cell/cell.py", "Excel 读写"),
+            ("/app/dify_chat_tester/utils/excel.py", "Excel 读写"),
+            ("/venv/lib/site-packages/rich/live.py", "终端渲染"),
+            ("/app/dify_chat_tester/config/loader.py", "配置"),
+            ("/app/dify_chat_tester/core/batch.py", "批量引擎"),
+            ("/usr/lib/python3.11/json/decoder.py", OTHER),
+        ],
+    )
+    def test_paths(self, filename, subsystem):
+        assert classify(filename) == subsystem
+
+    def test_format_function(self):
+        key = ("/venv/lib/python3.11/site-packages/rich/live.py", 10, "refresh")
+        assert format_function(key) == "rich/live.py:10(refresh)"
+        key = ("/root/package/dify_chat_tester/core/batch.py", 5, "f")
+        assert format_function(key) == "dify_chat_tester/core/batch.py:5(f)"
+
+
+class TestProfiler:
+    """测试采样结果"""
+
+    def test_summary_groups_worker_threads(self, busy_profiler, capsys):
+        assert busy_profiler.rounds > 10
+        assert busy_profiler.idle_samples > 0
+        summary = busy_profiler.summary(top=3)
+        groups = {group["name"]: group for group in summary}
+        excel = groups["Excel 读写"]
+        assert excel["share"] > 0.5
+        assert any("clean_excel_text" in f for f, _, _ in excel["hotspots"])
+        assert summary[0]["name"] == "Excel 读写"
+
+        print_profile_summary(busy_profiler, "run.prof")
+        output = capsys.readouterr().out
+        assert "Excel 读写" in output and "run.prof" in output
+
+    def test_save_loads_with_pstats(self, busy_profiler, tmp_path):
+        path = busy_profiler.save(str(tmp_path / "run.prof"))
+        stats = pstats.Stats(path)
+        entries = {
+            func: values
+            for func, values in stats.stats.items()
+            if func[2] == "clean_excel_text"
+        }
+        assert len(entries) == 1
+        calls, _, _, cumulative, callers = next(iter(entries.values()))
+        assert calls > 0 and cumulative > 0
+        assert any(caller[2] == "busy" for caller in callers)
+        assert stats.total_tt == pytest.approx(
+            busy_profiler.busy_samples * busy_profiler.sample_seconds
+        )
+
+    def test_blocking_reads_and_sleeps_are_io_wait(self, waiting_profiler):
+        assert waiting_profiler.io_wait_samples > 10
+
+        def samples_in(function):
+            return sum(
+                count
+                for stack, count in waiting_profiler.stacks.items()
+                if any(key[2] == function for key in stack)
+            )
+
+        assert samples_in("busy") > 10
+        assert samples_in("read_socket") == 0
+        # 首轮采样还没有上一轮的 CPU 时间，无法判断 time.sleep
+        assert samples_in("sleep_loop") <= 2
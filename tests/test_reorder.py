@@ -0,0 +1,128 @@
+"""有序输出重排缓冲区的单元测试"""
+
+import random
+import threading
+import time
+from contextlib import ExitStack
+from unittest.mock import MagicMock, patch
+
+import openpyxl
+
+from dify_chat_tester.core.batch import _run_concurrent_batch
+from dify_chat_tester.core.reorder import ReorderBuffer
+
+
+def _row(seq):
+    return [f"行{seq}", "x" * 50]
+
+
+class TestReorderBuffer:
+    """测试 ReorderBuffer"""
+
+    def test_shuffled_puts_emit_in_order(self):
+        emitted = []
+        buffer = ReorderBuffer(emitted.append)
+        order = list(range(50))
+        random.Random(0).shuffle(order)
+        for seq in order:
+            buffer.put(seq, _row(seq))
+        buffer.close()
+
+        assert emitted == [_row(seq) for seq in range(50)]
+        assert buffer.held == 0
+        assert buffer.spilled_rows == 0
+
+    def test_head_releases_consecutive_rows(self):
+        emitted = []
+        buffer = ReorderBuffer(emitted.append)
+        buffer.put(2, _row(2))
+        buffer.put(1, _row(1))
+        assert emitted == [] and buffer.held == 2
+        buffer.put(0, _row(0))
+        assert emitted == [_row(0), _row(1), _row(2)]
+        assert buffer.held == 0
+
+    def test_spills_when_head_is_slow(self):
+        """队首慢行未完成时，超过内存上限的行暂存到临时文件"""
+        emitted = []
+        buffer = ReorderBuffer(emitted.append, max_bytes=500)
+        for seq in range(1, 40):
+            buffer.put(seq, _row(seq))
+        assert emitted == []
+        assert buffer.spilled_rows > 0
+        assert buffer.peak_held == 39
+
+        buffer.put(0, _row(0))
+        assert emitted == [_row(seq) for seq in range(40)]
+        buffer.close()
+
+    def test_close_skips_gaps(self):
+        """中途停止时，缺失的序号被跳过，其余行仍按顺序写出"""
+        emitted = []
+        buffer = ReorderBuffer(emitted.append, max_bytes=0)
+        for seq in (5, 3, 1):
+            buffer.put(seq, _row(seq))
+        buffer.close()
+        assert emitted == [_row(1), _row(3), _row(5)]
+
+    def test_duplicate_sequence_written_directly(self):
+        emitted = []
+        buffer = ReorderBuffer(emitted.append)
+        buffer.put(0, _row(0))
+        buffer.put(0, ["重复"])
+        assert emitted == [_row(0), ["重复"]]
+
+
+class TestOrderedConcurrentOutput:
+    """测试并发批量处理的有序输出"""
+
+    def test_log_rows_follow_input_order(self, tmp_path):
+        input_wb = openpyxl.Workbook()
+        input_ws = input_wb.active
+        input_ws.append(["问题"])
+        for i in range(8):
+            input_ws.append([f"问题{i}"])
+        output_wb = openpyxl.Workbook()
+        output_ws = output_wb.active
+        output_ws.append(["表头"])
+
+        provider = MagicMock()
+        lock = threading.Lock()
+        completed = []
+
+        def send_message(message, **kwargs):
+            # 第一行最慢，其余行先完成
+            time.sleep(0.2 if message == "问题0" else 0.01)
+            with lock:
+                completed.append(message)
+            return f"回答:{message}", True, None, None
+
+        provider.send_message.side_effect = send_message
+
+        with ExitStack() as stack:
+            stack.enter_context(patch("dify_chat_tester.core.batch.console"))
+            stack.enter_context(patch("dify_chat_tester.core.batch.print_info"))
+            stack.enter_context(patch("dify_chat_tester.core.batch.print_statistics"))
+            _run_concurrent_batch(
+                provider=provider,
+                batch_worksheet=input_ws,
+                output_worksheet=output_ws,
+                output_workbook=output_wb,
+                output_file_name=str(tmp_path / "output.xlsx"),
+                resume_from_row=2,
+                question_col_index=0,
+                doc_name_col_index=None,
+                selected_role="user",
+                selected_model="model",
+                provider_name="Provider",
+                enable_thinking=False,
+                show_batch_response=False,
+                concurrency=3,
+                headless=True,
+                ordered_output=True,
+            )
+
+        assert completed[-1] == "问题0"
+        log = openpyxl.load_workbook(str(tmp_path / "output.xlsx")).active
+        row_ids = [int(row[8].value) for row in log.iter_rows(min_row=2)]
+        assert row_ids == list(range(2, 10))
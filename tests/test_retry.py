@@ -0,0 +1,170 @@
+"""运行中重试调度的单元测试"""
+
+import random
+import threading
+import time
+from contextlib import ExitStack
+from unittest.mock import MagicMock, patch
+
+import openpyxl
+
+from dify_chat_tester.core.batch import _run_concurrent_batch
+from dify_chat_tester.core.retry import BackoffPolicy, RetryQueue
+
+
+class TestBackoffPolicy:
+    """测试 BackoffPolicy"""
+
+    def test_exponential_with_cap(self):
+        policy = BackoffPolicy(max_retries=5, base=1.0, cap=5.0, jitter=0)
+        assert [policy.delay(n) for n in range(1, 6)] == [1.0, 2.0, 4.0, 5.0, 5.0]
+
+    def test_jitter_bounds(self):
+        policy = BackoffPolicy(base=2.0, jitter=0.5, rng=random.Random(0))
+        delays = [policy.delay(1) for _ in range(50)]
+        assert all(1.0 <= d <= 3.0 for d in delays)
+        assert len(set(delays)) > 1
+
+    def test_should_retry(self):
+        policy = BackoffPolicy(max_retries=2)
+        assert policy.should_retry(1) and policy.should_retry(2)
+        assert not policy.should_retry(3)
+
+
+class TestRetryQueue:
+    """测试 RetryQueue"""
+
+    def test_not_before_order(self):
+        now = [100.0]
+        retry_queue = RetryQueue(clock=lambda: now[0])
+        retry_queue.push("late", 5)
+        retry_queue.push("early", 1)
+
+        assert retry_queue.pop_ready() is None
+        assert retry_queue.next_ready_in() == 1
+        now[0] = 102.0
+        assert retry_queue.pop_ready() == "early"
+        assert retry_queue.pop_ready() is None
+        assert retry_queue.drain() == ["late"]
+        assert len(retry_queue) == 0
+
+
+def _run_batch(tmp_path, provider, questions, retry_policy, concurrency=2):
+    input_wb = openpyxl.Workbook()
+    input_ws = input_wb.active
+    input_ws.append(["问题"])
+    for question in questions:
+        input_ws.append([question])
+
+    output_wb = openpyxl.Workbook()
+    output_ws = output_wb.active
+    output_ws.append(["表头"])
+
+    with ExitStack() as stack:
+        stack.enter_context(patch("dify_chat_tester.core.batch.console"))
+        stack.enter_context(patch("dify_chat_tester.core.batch.print_info"))
+        stack.enter_context(patch("dify_chat_tester.core.batch.print_statistics"))
+        summary = _run_concurrent_batch(
+            provider=provider,
+            batch_worksheet=input_ws,
+            output_worksheet=output_ws,
+            output_workbook=output_wb,
+            output_file_name=str(tmp_path / "output.xlsx"),
+            resume_from_row=2,
+            question_col_index=0,
+            doc_name_col_index=None,
+            selected_role="user",
+            selected_model="model",
+            provider_name="Provider",
+            enable_thinking=False,
+            show_batch_response=False,
+            concurrency=concurrency,
+            headless=True,
+            retry_policy=retry_policy,
+        )
+    rows = [
+        [cell.value for cell in row]
+        for row in openpyxl.load_workbook(
+            str(tmp_path / "output.xlsx")
+        ).active.iter_rows(min_row=2)
+    ]
+    return summary, rows
+
+
+def _flaky_provider(failures):
+    """failures: {问题: 前几次请求失败}"""
+    provider = MagicMock()
+    lock = threading.Lock()
+    asked = []
+
+    def send_message(message, **kwargs):
+        with lock:
+            asked.append(message)
+            attempt = asked.count(message)
+        time.sleep(0.02)
+        if attempt <= failures.get(message, 0):
+            return "", False, "HTTP 503", None
+        return f"回答:{message}", True, None, None
+
+    provider.send_message.side_effect = send_message
+    return provider, asked
+
+
+class TestInlineRetry:
+    """测试并发批量处理中的运行中重试"""
+
+    def test_retry_overlaps_main_pass_and_logs_once(self, tmp_path):
+        """失败行在主流程中重试，每个输入行只记录一条最终结果"""
+        provider, asked = _flaky_provider({"问题0": 2})
+        questions = [f"问题{i}" for i in range(12)]
+        policy = BackoffPolicy(max_retries=3, base=0.01, jitter=0)
+
+        summary, rows = _run_batch(tmp_path, provider, questions, policy)
+
+        assert summary["success"] == 12 and summary["failed"] == 0
+        assert sorted(int(r[8]) for r in rows) == list(range(2, 14))
+        assert not any("重试" in str(r[3]) for r in rows)
+        # 第三次请求（最后一次重试）发生在最后一个新问题派发之前
+        assert asked.count("问题0") == 3
+        last_retry = max(i for i, q in enumerate(asked) if q == "问题0")
+        assert last_retry < asked.index("问题11")
+
+    def test_exhausted_retries_single_failure_row(self, tmp_path):
+        provider, asked = _flaky_provider({"问题A": 10})
+        policy = BackoffPolicy(max_retries=2, base=0, jitter=0)
+
+        summary, rows = _run_batch(tmp_path, provider, ["问题A", "问题B"], policy)
+
+        assert asked.count("问题A") == 3
+        assert summary["failed"] == 1
+        failed = [r for r in rows if r[5] == "False"]
+        assert len(failed) == 1
+        assert failed[0][6] == "重试2次后失败: HTTP 503"
+
+    def test_stop_logs_waiting_retry_like_exhausted_retry(self, tmp_path):
+        """停止时仍在等待重试的行与重试耗尽的行记录相同格式的错误"""
+        provider, asked = _flaky_provider({"问题A": 10})
+        policy = MagicMock()
+        policy.should_retry.return_value = True
+        # 第一次重试立即进行，第二次退避很久，停止时该行仍在重试队列中
+        policy.delay.side_effect = lambda attempts: 0 if attempts == 1 else 60
+
+        class StopAfterRetry:
+            paused = False
+            state_changed = False
+
+            def start(self):
+                pass
+
+            def stop(self):
+                pass
+
+            @property
+            def stop_requested(self):
+                return asked.count("问题A") >= 2
+
+        with patch("dify_chat_tester.core.batch.KeyboardControl", StopAfterRetry):
+            summary, rows = _run_batch(tmp_path, provider, ["问题A"], policy)
+
+        assert asked.count("问题A") == 2
+        assert [r[6] for r in rows if r[5] == "False"] == ["重试1次后失败: HTTP 503"]
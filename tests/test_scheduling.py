@@ -0,0 +1,215 @@
+"""任务调度策略的单元测试"""
+
+import threading
+from contextlib import ExitStack
+from unittest.mock import MagicMock, patch
+
+import openpyxl
+import pytest
+
+from dify_chat_tester.core.batch import _run_concurrent_batch
+from dify_chat_tester.core.checkpoint import (
+    HASH_HEADER,
+    LATENCY_HEADER,
+    ROW_ID_HEADER,
+    question_hash,
+)
+from dify_chat_tester.core.scheduling import (
+    POLICY_DOC,
+    POLICY_LONGEST,
+    POLICY_SHEET,
+    POLICY_SHUFFLE,
+    LatencyModel,
+    compare_policies,
+    load_log_records,
+    model_error,
+    order_tasks,
+    simulate_makespan,
+    split_records,
+)
+
+
+def _tasks(*items):
+    return [
+        {"question": q, "doc_name": d, "index": i} for i, (q, d) in enumerate(items)
+    ]
+
+
+def _record(question, latency, doc_name=""):
+    return {
+        "question": question,
+        "doc_name": doc_name,
+        "hash": question_hash(question),
+        "latency": latency,
+    }
+
+
+class TestOrderTasks:
+    """测试 order_tasks"""
+
+    def test_sheet_keeps_order(self):
+        tasks = _tasks(("a", ""), ("bbb", ""))
+        assert order_tasks(tasks, POLICY_SHEET) == tasks
+
+    def test_longest_by_length_without_history(self):
+        tasks = _tasks(("短", ""), ("很长很长的问题", ""), ("中等问题", ""))
+        ordered = order_tasks(tasks, POLICY_LONGEST)
+        assert [t["index"] for t in ordered] == [1, 2, 0]
+
+    def test_longest_prefers_history(self):
+        """有历史耗时的问题按历史耗时排序，而不是按长度"""
+        model = LatencyModel([_record("短", 30.0), _record("很长很长的问题", 1.0)])
+        tasks = _tasks(("很长很长的问题", ""), ("短", ""))
+        ordered = order_tasks(tasks, POLICY_LONGEST, model)
+        assert [t["question"] for t in ordered] == ["短", "很长很长的问题"]
+
+    def test_doc_groups_contiguous(self):
+        tasks = _tasks(("q1", "A"), ("q2", "B"), ("问题三很长", "A"), ("q4", "B"))
+        ordered = order_tasks(tasks, POLICY_DOC)
+        assert [t["doc_name"] for t in ordered] == ["A", "A", "B", "B"]
+        assert [t["index"] for t in ordered] == [0, 2, 1, 3]
+
+    def test_shuffle_is_deterministic_with_seed(self):
+        tasks = _tasks(*[(f"q{i}", "") for i in range(20)])
+        first = order_tasks(tasks, POLICY_SHUFFLE, seed=1)
+        assert first == order_tasks(tasks, POLICY_SHUFFLE, seed=1)
+        assert sorted(t["index"] for t in first) == list(range(20))
+        assert first != tasks
+
+    def test_unknown_policy(self):
+        with pytest.raises(ValueError):
+            order_tasks([], "fastest")
+
+
+class TestMakespan:
+    """测试总用时模拟"""
+
+    def test_simulate(self):
+        assert simulate_makespan([1, 1, 1, 1], 2) == 2
+        assert simulate_makespan([1, 1, 1, 5], 2) == 6
+        assert simulate_makespan([5, 1, 1, 1], 2) == 5
+
+    def test_longest_beats_sheet_with_long_tail(self):
+        records = [_record(f"q{i}", 1.0) for i in range(20)]
+        records.append(_record("慢问题", 10.0))
+        # 模型来自上一次运行的日志（同样的问题和耗时）
+        history = LatencyModel(records)
+        results = compare_policies(records, concurrency=4, model=history)
+        assert results[POLICY_LONGEST] < results[POLICY_SHEET]
+        assert results[POLICY_LONGEST] == 10.0
+
+    def test_default_model_ignores_simulated_latencies(self):
+        """未指定模型时不使用被模拟记录的耗时，longest 不会提前知道哪一行慢"""
+        records = [_record(f"q{i:02d}", 1.0) for i in range(20)]
+        records.append(_record("慢问", 10.0))
+        results = compare_policies(records, concurrency=4)
+        assert results[POLICY_LONGEST] == results[POLICY_SHEET]
+
+    def test_split_and_model_error(self):
+        records = [
+            {**_record("q" * (i % 10 + 1), 0.5 + 2.0 * (i % 10 + 1)), "row": i}
+            for i in range(40)
+        ]
+        train, test = split_records(records, seed=3)
+        assert len(train) == len(test) == 20
+        assert sorted(r["row"] for r in train + test) == list(range(40))
+        # 模拟集保持原表格顺序
+        assert [r["row"] for r in test] == sorted(r["row"] for r in test)
+        # 耗时与长度严格线性，由建模集拟合的模型在模拟集上几乎没有误差
+        assert model_error(LatencyModel(train), test)["mae"] < 0.01
+        assert model_error(LatencyModel(), test)["relative"] > 0
+
+
+def _latency_log(path, rows):
+    workbook = openpyxl.Workbook()
+    worksheet = workbook.active
+    worksheet.append(
+        ["原始问题", "是否成功", ROW_ID_HEADER, HASH_HEADER, LATENCY_HEADER]
+    )
+    for row in rows:
+        worksheet.append(row)
+    workbook.save(path)
+
+
+class TestLoadLogRecords:
+    """测试 load_log_records"""
+
+    def test_reads_successful_rows_in_input_order(self, tmp_path):
+        path = str(tmp_path / "log.xlsx")
+        _latency_log(
+            path,
+            [
+                ["q3", "True", 3, question_hash("q3"), "2.500"],
+                ["q2", "False", 2, question_hash("q2"), "9.000"],
+                ["q2 (重试)", "True", 2, question_hash("q2"), "1.250"],
+                ["q4", "True", 4, question_hash("q4"), ""],
+            ],
+        )
+        records = load_log_records(path)
+        assert [(r["question"], r["latency"]) for r in records] == [
+            ("q2", 1.25),
+            ("q3", 2.5),
+        ]
+
+    def test_legacy_log_without_latency(self, tmp_path):
+        path = str(tmp_path / "old.xlsx")
+        workbook = openpyxl.Workbook()
+        workbook.active.append(["原始问题", "是否成功"])
+        workbook.save(path)
+        assert load_log_records(path) == []
+        assert LatencyModel.from_logs([path, "missing.xlsx"]).has_history is False
+
+
+class TestConcurrentSchedule:
+    """测试并发批量处理按调度策略派发"""
+
+    def test_longest_dispatched_first_and_latency_logged(self, tmp_path):
+        input_wb = openpyxl.Workbook()
+        input_ws = input_wb.active
+        input_ws.append(["问题"])
+        for question in ["短", "中等长度", "这是最长的一个问题"]:
+            input_ws.append([question])
+        output_wb = openpyxl.Workbook()
+        output_ws = output_wb.active
+        output_ws.append(["表头"])
+
+        lock = threading.Lock()
+        asked = []
+        provider = MagicMock()
+
+        def send_message(message, **kwargs):
+            with lock:
+                asked.append(message)
+            return "回答", True, None, None
+
+        provider.send_message.side_effect = send_message
+
+        with ExitStack() as stack:
+            stack.enter_context(patch("dify_chat_tester.core.batch.console"))
+            stack.enter_context(patch("dify_chat_tester.core.batch.print_info"))
+            stack.enter_context(patch("dify_chat_tester.core.batch.print_statistics"))
+            _run_concurrent_batch(
+                provider=provider,
+                batch_worksheet=input_ws,
+                output_worksheet=output_ws,
+                output_workbook=output_wb,
+                output_file_name=str(tmp_path / "output.xlsx"),
+                resume_from_row=2,
+                question_col_index=0,
+                doc_name_col_index=None,
+                selected_role="user",
+                selected_model="model",
+                provider_name="Provider",
+                enable_thinking=False,
+                show_batch_response=False,
+                concurrency=2,
+                headless=True,
+                schedule=POLICY_LONGEST,
+            )
+
+        assert set(asked[:2]) == {"这是最长的一个问题", "中等长度"}
+        assert asked[2] == "短"
+        log = openpyxl.load_workbook(str(tmp_path / "output.xlsx")).active
+        latencies = [row[11].value for row in log.iter_rows(min_row=2)]
+        assert len(latencies) == 3
+        assert all(float(value) >= 0 for value in latencies)
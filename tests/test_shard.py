@@ -0,0 +1,286 @@
+"""分片执行的单元测试"""
+
+import json
+import multiprocessing
+import os
+import time
+
+import openpyxl
+import pytest
+
+from dify_chat_tester.core import shard as shard_module
+from dify_chat_tester.core.checkpoint import question_hash
+from dify_chat_tester.core.constants import LEASE_DIR
+from dify_chat_tester.core.shard import (
+    Heartbeat,
+    LeaseManager,
+    ShardJournal,
+    ensure_manifest,
+    merge_shards,
+    run_shard_worker,
+    shard_ranges,
+)
+
+
+def _echo(question):
+    time.sleep(0.005)
+    return f"回答:{question}", True, None, None
+
+
+def _input_file(tmp_path, count):
+    workbook = openpyxl.Workbook()
+    worksheet = workbook.active
+    worksheet.append(["文档名称", "问题"])
+    for i in range(count):
+        worksheet.append(["文档", f"问题{i}"])
+    path = str(tmp_path / "input.xlsx")
+    workbook.save(path)
+    return path
+
+
+def _worker(shared_dir, input_path, node_id):
+    run_shard_worker(
+        shared_dir,
+        input_path,
+        question_col_index=1,
+        ask=_echo,
+        doc_name_col_index=0,
+        node_id=node_id,
+        shard_size=7,
+        lease_ttl=1.0,
+        concurrency=2,
+        on_event=lambda message: None,
+    )
+
+
+class TestShardRanges:
+    """测试 shard_ranges"""
+
+    def test_split(self):
+        assert shard_ranges(11, 4) == [(0, 2, 6), (1, 6, 10), (2, 10, 12)]
+
+    def test_empty(self):
+        assert shard_ranges(1, 4) == []
+
+
+class TestManifest:
+    """测试 ensure_manifest"""
+
+    def test_mismatch_rejected(self, tmp_path):
+        manifest = {"input_sha1": "a", "last_row": 10, "shard_size": 5}
+        ensure_manifest(str(tmp_path), manifest)
+        assert ensure_manifest(str(tmp_path), dict(manifest)) == manifest
+        with pytest.raises(ValueError):
+            ensure_manifest(str(tmp_path), dict(manifest, input_sha1="b"))
+
+
+class TestLeaseManager:
+    """测试 LeaseManager"""
+
+    def _leases(self, tmp_path, node_id, ttl=60.0):
+        os.makedirs(tmp_path / LEASE_DIR, exist_ok=True)
+        os.makedirs(tmp_path / "done", exist_ok=True)
+        return LeaseManager(str(tmp_path), node_id, ttl=ttl)
+
+    def test_exclusive_claim(self, tmp_path):
+        a = self._leases(tmp_path, "a")
+        b = self._leases(tmp_path, "b")
+        assert a.try_claim(0) is True
+        assert b.try_claim(0) is False
+        assert a.renew(0) is True
+
+        a.release(0)
+        assert b.try_claim(0) is True
+
+    def test_expired_lease_stolen(self, tmp_path):
+        """租约过期后可被其他节点接管，原持有者续约失败"""
+        a = self._leases(tmp_path, "a", ttl=0.1)
+        b = self._leases(tmp_path, "b", ttl=60.0)
+        assert a.try_claim(0) is True
+        time.sleep(0.15)
+
+        assert b.try_claim(0) is True
+        assert b.lease_info(0)["owner"] == "b"
+        assert a.renew(0) is False
+
+    def test_fresh_lease_not_stolen(self, tmp_path):
+        """判断过期后租约已被重新领取时不会误删新租约"""
+        a = self._leases(tmp_path, "a")
+        b = self._leases(tmp_path, "b")
+        assert a.try_claim(0) is True
+        b._is_expired = lambda path: True
+
+        assert b.try_claim(0) is False
+        assert a.lease_info(0)["owner"] == "a"
+        assert a.renew(0) is True
+
+    def _during_renew(self, monkeypatch, action):
+        """在续约读取租约之后、替换之前执行 action，返回其结果列表"""
+        read_json = shard_module._read_json
+        results = []
+
+        def read_then_act(path):
+            info = read_json(path)
+            if path.endswith(".lease") and not results:
+                results.append(None)  # action 内部的读取不再触发
+                results[0] = action()
+            return info
+
+        monkeypatch.setattr(shard_module, "_read_json", read_then_act)
+        return results
+
+    def test_renew_cannot_steal_back_reclaimed_lease(self, tmp_path, monkeypatch):
+        """续约读取租约后租约过期并被回收时，续约失败且不会覆盖新持有者"""
+        a = self._leases(tmp_path, "a", ttl=0.1)
+        b = self._leases(tmp_path, "b", ttl=60.0)
+        assert a.try_claim(0) is True
+
+        def expire_and_reclaim():
+            time.sleep(0.15)
+            return b.try_claim(0)
+
+        claims = self._during_renew(monkeypatch, expire_and_reclaim)
+        assert a.renew(0) is False
+        monkeypatch.undo()
+        assert claims == [True]
+        assert b.lease_info(0)["owner"] == "b"
+        assert sorted(os.listdir(tmp_path / LEASE_DIR)) == ["shard-00000.lease"]
+
+    def test_claim_during_renew_keeps_live_owner(self, tmp_path, monkeypatch):
+        """续约期间租约文件始终存在，其他节点无法领取存活节点的分片"""
+        a = self._leases(tmp_path, "a")
+        b = self._leases(tmp_path, "b")
+        assert a.try_claim(0) is True
+
+        claims = self._during_renew(monkeypatch, lambda: b.try_claim(0))
+        assert a.renew(0) is True
+        monkeypatch.undo()
+        assert claims == [False]
+        assert b.lease_info(0)["owner"] == "a"
+        assert sorted(os.listdir(tmp_path / LEASE_DIR)) == ["shard-00000.lease"]
+
+    def test_renew_gives_up_near_expiry(self, tmp_path):
+        a = self._leases(tmp_path, "a", ttl=1.0)
+        assert a.try_claim(0) is True
+        time.sleep(0.95)
+        assert a.renew(0) is False
+
+    def test_heartbeat_io_error_marks_lost(self, tmp_path, monkeypatch):
+        """续约出现 I/O 错误时无法确认仍持有租约，停止写入"""
+        a = self._leases(tmp_path, "a", ttl=0.15)
+        assert a.try_claim(0) is True
+
+        def broken_renew(shard_id):
+            raise OSError("共享目录不可用")
+
+        monkeypatch.setattr(a, "renew", broken_renew)
+        with Heartbeat(a, 0) as heartbeat:
+            time.sleep(0.2)
+        assert heartbeat.lost is True
+
+    def test_done_shard_not_claimed(self, tmp_path):
+        a = self._leases(tmp_path, "a")
+        a.mark_done(0)
+        assert a.try_claim(0) is False
+
+
+class TestShardJournal:
+    """测试 ShardJournal"""
+
+    def test_success_preferred_and_partial_line_skipped(self, tmp_path):
+        os.makedirs(tmp_path / "journals")
+        journal = ShardJournal(str(tmp_path), 0)
+        journal.append({"row": 2, "success": True, "response": "好"})
+        journal.append({"row": 2, "success": False, "response": ""})
+        journal.append({"row": 3, "success": False, "response": ""})
+        with open(journal.path, "a", encoding="utf-8") as f:
+            f.write('{"row": 4, "succ')
+
+        records = journal.load()
+        assert sorted(records) == [2, 3]
+        assert records[2]["response"] == "好"
+
+
+class TestShardWorker:
+    """测试 run_shard_worker 和 merge_shards"""
+
+    def test_resume_skips_journaled_rows(self, tmp_path):
+        """接管分片时跳过上一个持有者已成功处理的行"""
+        input_path = _input_file(tmp_path, 5)
+        shared_dir = str(tmp_path / "shared")
+        asked = []
+
+        def ask(question):
+            asked.append(question)
+            return _echo(question)
+
+        os.makedirs(os.path.join(shared_dir, "journals"))
+        journal = ShardJournal(shared_dir, 0)
+        journal.append(
+            {
+                "row": 2,
+                "hash": question_hash("问题0"),
+                "success": True,
+                "question": "问题0",
+                "response": "回答:问题0",
+            }
+        )
+
+        stats = run_shard_worker(
+            shared_dir,
+            input_path,
+            1,
+            ask,
+            node_id="n1",
+            shard_size=10,
+            on_event=lambda message: None,
+        )
+        assert stats == {"shards": 1, "success": 4, "failed": 0}
+        assert sorted(asked) == ["问题1", "问题2", "问题3", "问题4"]
+
+    def test_multiple_processes_cover_every_row_once(self, tmp_path):
+        """多个进程协作处理后，合并结果覆盖每一行且只出现一次"""
+        input_path = _input_file(tmp_path, 60)
+        shared_dir = str(tmp_path / "shared")
+
+        context = multiprocessing.get_context("fork")
+        processes = [
+            context.Process(target=_worker, args=(shared_dir, input_path, f"n{i}"))
+            for i in range(3)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(timeout=60)
+            assert process.exitcode == 0
+
+        output_file = str(tmp_path / "merged.xlsx")
+        stats = merge_shards(shared_dir, output_file, selected_role="员工")
+        assert stats == {"rows": 60, "success": 60, "failed": 0, "missing": []}
+
+        rows = list(
+            openpyxl.load_workbook(output_file).active.iter_rows(
+                min_row=2, values_only=True
+            )
+        )
+        assert [int(row[8]) for row in rows] == list(range(2, 62))
+        assert all(row[4] == f"回答:{row[3]}" for row in rows)
+
+        nodes = set()
+        for name in os.listdir(os.path.join(shared_dir, "journals")):
+            with open(
+                os.path.join(shared_dir, "journals", name), encoding="utf-8"
+            ) as f:
+                nodes.update(json.loads(line)["node"] for line in f)
+        assert nodes <= {"n0", "n1", "n2"}
+
+    def test_merge_reports_missing_rows(self, tmp_path):
+        shared_dir = str(tmp_path)
+        ensure_manifest(shared_dir, {"last_row": 4, "shard_size": 10})
+        ShardJournal(shared_dir, 0).append(
+            {"row": 2, "success": True, "question": "q", "response": "a"}
+        )
+
+        stats = merge_shards(shared_dir, str(tmp_path / "out.xlsx"))
+        assert stats["rows"] == 1
+        assert stats["missing"] == [3, 4]
@@ -0,0 +1,122 @@
+"""启动开销的单元测试：检查轻量路径上加载的模块，并用 -X importtime 检查导入耗时"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import dify_chat_tester
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 导入包、--help 等轻量路径上不应加载的依赖
+HEAVY_MODULES = (
+    "openpyxl",
+    "pandas",
+    "requests",
+    "rich.live",
+    "loguru",
+    "concurrent.futures.thread",
+    "dify_chat_tester.cli.app",
+    "dify_chat_tester.core.batch",
+    "dify_chat_tester.config.loader",
+)
+
+# 导入耗时预算（毫秒，-X importtime 的累计值）；在较慢的机器上可用环境变量放宽
+IMPORT_BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", "50"))
+
+
+def _loaded_modules(code: str) -> set:
+    """在子进程中执行 code，返回之后已加载的模块名
+
+    延迟导出经 importlib.import_module 加载的模块不会出现在 -X importtime 的输出中，
+    因此以 sys.modules 为准。
+    """
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"{code}\nimport json, sys\nprint(json.dumps(sorted(sys.modules)))",
+        ],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(json.loads(result.stdout.splitlines()[-1]))
+
+
+def _import_times(code: str) -> dict:
+    """在子进程中执行 code，返回 {模块名: 累计导入耗时（微秒）}"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestImportTime:
+    """测试导入开销"""
+
+    @pytest.mark.parametrize(
+        "code",
+        [
+            "import dify_chat_tester",
+            "import dify_chat_tester.core, dify_chat_tester.cli, dify_chat_tester.utils",
+            "import main; main.parse_args(['--mode', 'batch'])",
+        ],
+    )
+    def test_light_paths_skip_heavy_modules(self, code):
+        modules = _loaded_modules(code)
+        assert [name for name in HEAVY_MODULES if name in modules] == []
+
+    def test_package_import_budget(self):
+        times = _import_times("import dify_chat_tester")
+        assert times["dify_chat_tester"] / 1000 < IMPORT_BUDGET_MS
+
+    def test_compare_does_not_load_engine(self):
+        modules = _loaded_modules("import dify_chat_tester.core.compare")
+        for name in (
+            "dify_chat_tester.core.batch",
+            "dify_chat_tester.core.headless",
+            "dify_chat_tester.core.shard",
+            "dify_chat_tester.providers.setup",
+        ):
+            assert name not in modules
+
+    def test_provider_base_does_not_load_engine(self):
+        modules = _loaded_modules("from dify_chat_tester.providers import AIProvider")
+        assert "dify_chat_tester.providers.base" in modules
+        for name in ("openpyxl", "rich.live", "dify_chat_tester.core.batch"):
+            assert name not in modules
+
+
+class TestLazyExports:
+    """测试延迟导出与原有导入路径兼容"""
+
+    def test_public_names_resolve(self):
+        from dify_chat_tester.providers.base import AIProvider
+
+        for name in dify_chat_tester.__all__:
+            assert getattr(dify_chat_tester, name) is not None
+        assert dify_chat_tester.AIProvider is AIProvider
+        assert set(dify_chat_tester.__all__) <= set(dir(dify_chat_tester))
+
+    def test_unknown_name_and_submodule(self):
+        with pytest.raises(AttributeError):
+            dify_chat_tester.not_exported
+        from dify_chat_tester.core import tracing
+
+        assert tracing.__name__ == "dify_chat_tester.core.tracing"
@@ -0,0 +1,149 @@
+"""请求追踪的单元测试"""
+
+import json
+from contextlib import ExitStack
+from unittest.mock import patch
+
+import openpyxl
+import pytest
+
+from dify_chat_tester.core import tracing
+from dify_chat_tester.core.batch import _run_concurrent_batch
+from dify_chat_tester.core.mock_server import MockServer, MockSettings
+from dify_chat_tester.core.tracing import Tracer
+from dify_chat_tester.providers.base import OpenAIProvider
+
+
+@pytest.fixture(autouse=True)
+def _reset_tracing():
+    yield
+    tracing.stop_tracing()
+    tracing.configure_tracing(None)
+
+
+def _by_name(events, name):
+    return [e for e in events if e.get("name") == name]
+
+
+class TestTracer:
+    """测试 Tracer 生成的事件"""
+
+    def test_request_phases(self):
+        tracer = Tracer("unused.json")
+        base = tracer.origin
+        timing = {
+            "start": base + 1.0,
+            "connect_start": base + 1.0,
+            "connect_end": base + 1.1,
+            "headers": base + 1.5,
+            "first_token": base + 2.0,
+            "last_token": base + 3.0,
+            "end": base + 3.0,
+        }
+        tracer.request(5, 2, 1, base, base + 0.9, base + 3.0, timing, True)
+        events = tracer.to_events()
+
+        request = _by_name(events, "第5行")[0]
+        assert (request["ph"], request["tid"]) == ("X", 2)
+        assert request["ts"] == pytest.approx(0.9e6, abs=1)
+        assert request["dur"] == pytest.approx(2.1e6, abs=1)
+        durations = {
+            name: _by_name(events, name)[0]["dur"]
+            for name in ("建立连接", "等待响应头", "等待首字", "流式输出")
+        }
+        assert durations == pytest.approx(
+            {
+                "建立连接": 0.1e6,
+                "等待响应头": 0.4e6,
+                "等待首字": 0.5e6,
+                "流式输出": 1e6,
+            },
+            abs=1,
+        )
+        queued = _by_name(events, "排队")
+        assert [e["ph"] for e in queued] == ["b", "e"]
+        assert queued[1]["ts"] == pytest.approx(0.9e6, abs=1)
+        names = {e["args"]["name"] for e in _by_name(events, "thread_name")}
+        assert "工作线程 #2" in names
+
+    def test_reused_connection_and_retry(self):
+        tracer = Tracer("unused.json")
+        base = tracer.origin
+        timing = {"start": base, "headers": base + 0.2}
+        tracer.request(3, 1, 2, base, base, base + 0.2, timing, False)
+        events = tracer.to_events()
+        assert not _by_name(events, "建立连接")
+        assert _by_name(events, "等待响应头")[0]["dur"] == pytest.approx(0.2e6, abs=1)
+        assert len(_by_name(events, "等待重试")) == 2
+
+    def test_rows_mapped_to_saves(self):
+        tracer = Tracer("unused.json")
+        base = tracer.origin
+        for row_idx in (2, 3, 4):
+            tracer.logged(row_idx)
+        tracer.saved(base + 10, base + 11, 2)
+        tracer.saved(base + 20, base + 21, 3)
+        waits = [e for e in _by_name(tracer.to_events(), "等待落盘") if e["ph"] == "e"]
+        assert [e["ts"] for e in waits] == pytest.approx([11e6, 11e6, 21e6], abs=1)
+
+    def test_disabled_is_noop(self):
+        assert tracing.start_tracing() is None
+        timing = {}
+        tracing.bind(timing)
+        tracing.mark("headers")
+        tracing.record_save(0, 1, 1)
+        assert timing == {}
+        assert tracing.stop_tracing() is None
+
+
+class TestConcurrentTrace:
+    """测试并发批量运行导出的 trace 文件"""
+
+    def test_trace_written(self, tmp_path):
+        input_wb = openpyxl.Workbook()
+        input_ws = input_wb.active
+        input_ws.append(["问题"])
+        for i in range(8):
+            input_ws.append([f"问题{i}"])
+        output_wb = openpyxl.Workbook()
+        output_wb.active.append(["表头"])
+        trace_file = tmp_path / "trace.json"
+        tracing.configure_tracing(str(trace_file))
+
+        settings = MockSettings(latency=0.05, token_rate=0, answer_tokens=5)
+        with MockServer(settings) as server, ExitStack() as stack:
+            stack.enter_context(patch("dify_chat_tester.core.batch.console"))
+            stack.enter_context(patch("dify_chat_tester.core.batch.print_info"))
+            stack.enter_context(patch("dify_chat_tester.core.batch.print_statistics"))
+            stack.enter_context(patch("dify_chat_tester.core.batch.print_run_report"))
+            _run_concurrent_batch(
+                provider=OpenAIProvider(f"{server.base_url}/v1", "key"),
+                batch_worksheet=input_ws,
+                output_worksheet=output_wb.active,
+                output_workbook=output_wb,
+                output_file_name=str(tmp_path / "log.xlsx"),
+                resume_from_row=2,
+                question_col_index=0,
+                doc_name_col_index=None,
+                selected_role="user",
+                selected_model="model",
+                provider_name="OpenAI",
+                enable_thinking=False,
+                show_batch_response=False,
+                concurrency=3,
+                headless=True,
+                ordered_output=True,
+            )
+
+        assert tracing.get_tracer() is None
+        events = json.loads(trace_file.read_text(encoding="utf-8"))["traceEvents"]
+        requests = [e for e in events if e.get("cat") == "request"]
+        assert len(requests) == 8
+        assert {e["tid"] for e in requests} <= {1, 2, 3}
+        # 每个工作线程至少新建一次连接，之后可能复用
+        assert 1 <= len(_by_name(events, "建立连接")) <= 8
+        assert len(_by_name(events, "等待首字")) == 8
+        assert len(_by_name(events, "流式输出")) == 8
+        assert _by_name(events, "保存日志")
+        saved = [e for e in _by_name(events, "等待落盘") if e["ph"] == "b"]
+        assert sorted(e["args"]["row"] for e in saved) == list(range(2, 10))
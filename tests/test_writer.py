@@ -0,0 +1,90 @@
+"""后台日志写入线程的单元测试"""
+
+import threading
+import time
+
+import openpyxl
+
+from dify_chat_tester.core.writer import LogWriter
+
+
+def _new_workbook():
+    workbook = openpyxl.Workbook()
+    worksheet = workbook.active
+    worksheet.append(["时间戳", "问题", "回答"])
+    return workbook, worksheet
+
+
+class TestLogWriter:
+    """测试 LogWriter"""
+
+    def test_rows_persisted_on_close(self, tmp_path):
+        """关闭时应写入全部排队的行并保存"""
+        output_file = str(tmp_path / "log.xlsx")
+        workbook, worksheet = _new_workbook()
+
+        writer = LogWriter(workbook, worksheet, output_file, save_every=100).start()
+        for i in range(25):
+            writer.write(["t", f"问题{i}", f"回答{i}"])
+        writer.close()
+
+        saved = openpyxl.load_workbook(output_file).active
+        assert saved.max_row == 26
+        assert saved.cell(row=26, column=2).value == "问题24"
+        assert writer.rows_written == 25
+
+    def test_flush_saves_pending_rows(self, tmp_path):
+        """flush 应立即保存尚未达到保存间隔的行"""
+        output_file = str(tmp_path / "log.xlsx")
+        workbook, worksheet = _new_workbook()
+
+        with LogWriter(workbook, worksheet, output_file, save_every=1000) as writer:
+            writer.write(["t", "问题", "回答"])
+            assert writer.flush(timeout=5) is True
+            saved = openpyxl.load_workbook(output_file).active
+            assert saved.max_row == 2
+
+    def test_backpressure_reported(self, tmp_path):
+        """队列写满时 write 应阻塞并记录背压"""
+        output_file = str(tmp_path / "log.xlsx")
+        workbook, worksheet = _new_workbook()
+
+        # 让保存变慢，模拟大文件保存
+        release = threading.Event()
+        original_save = workbook.save
+
+        def slow_save(name):
+            release.wait(timeout=5)
+            original_save(name)
+
+        workbook.save = slow_save
+
+        writer = LogWriter(
+            workbook, worksheet, output_file, save_every=1, max_queue=2, batch_size=1
+        ).start()
+        writer.write(["t", "问题0", ""])  # 写入线程取走后卡在保存
+        time.sleep(0.1)
+
+        threading.Timer(0.2, release.set).start()
+        stalled = [writer.write(["t", f"问题{i}", ""]) for i in range(1, 4)]
+        writer.close()
+
+        assert any(stalled)
+        assert writer.backpressure_events >= 1
+        assert writer.backpressure_seconds > 0
+
+    def test_save_error_recorded(self, tmp_path):
+        """保存失败不应抛出异常，而是记录 last_error"""
+        workbook, worksheet = _new_workbook()
+
+        def failing_save(name):
+            raise PermissionError("locked")
+
+        workbook.save = failing_save
+
+        writer = LogWriter(workbook, worksheet, str(tmp_path / "log.xlsx")).start()
+        writer.write(["t", "问题", "回答"])
+        writer.close()
+
+        assert writer.last_error is not None
+        assert "无法保存日志文件" in writer.last_error